@@ -0,0 +1,24 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings.local")
+
+application = get_asgi_application()
+
+if settings.SSE_STREAMING_ENABLED:
+    from sse.asgi import EnvironmentStreamApplication
+    from sse.streaming import check_backend
+
+    check_backend()
+    application = EnvironmentStreamApplication(application)
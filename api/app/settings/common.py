@@ -58,12 +58,51 @@ HOSTED_SEATS_LIMIT = env.int("HOSTED_SEATS_LIMIT", default=0)
 GOOGLE_ANALYTICS_KEY = env("GOOGLE_ANALYTICS_KEY", default="")
 GOOGLE_SERVICE_ACCOUNT = env("GOOGLE_SERVICE_ACCOUNT", default=None)
 GA_TABLE_ID = env("GA_TABLE_ID", default=None)
+# API requests are tracked in Google Analytics at this rate (between 0 and 1), and
+# sent in batches from a queue of up to GOOGLE_ANALYTICS_MAX_QUEUE_SIZE hits. New
+# hits are dropped if the queue is full. See app_analytics.google_analytics
+GOOGLE_ANALYTICS_SAMPLE_RATE = env.float("GOOGLE_ANALYTICS_SAMPLE_RATE", 1.0)
+GOOGLE_ANALYTICS_MAX_QUEUE_SIZE = env.int("GOOGLE_ANALYTICS_MAX_QUEUE_SIZE", 10000)
 
 INFLUXDB_TOKEN = env.str("INFLUXDB_TOKEN", default="")
 INFLUXDB_BUCKET = env.str("INFLUXDB_BUCKET", default="")
 INFLUXDB_URL = env.str("INFLUXDB_URL", default="")
 INFLUXDB_ORG = env.str("INFLUXDB_ORG", default="")
 
+# Where API usage and flag analytics are stored and queried. Self hosted installations
+# without InfluxDB can use app_analytics.backends.database.DatabaseAnalyticsBackend
+# which stores hourly and daily totals in the database.
+INFLUXDB_ANALYTICS_BACKEND = "app_analytics.backends.influxdb.InfluxDBAnalyticsBackend"
+ANALYTICS_BACKEND = env.str("ANALYTICS_BACKEND", default=INFLUXDB_ANALYTICS_BACKEND)
+# analytics are only tracked if the backend is able to store them
+ANALYTICS_ENABLED = (
+    bool(INFLUXDB_TOKEN) or ANALYTICS_BACKEND != INFLUXDB_ANALYTICS_BACKEND
+)
+
+# API usage and flag evaluations are counted in memory and written to the analytics
+# backend in batches, every ANALYTICS_FLUSH_INTERVAL_SECONDS or once
+# ANALYTICS_FLUSH_SIZE distinct keys have been counted. Counts for new keys are
+# dropped if ANALYTICS_MAX_BUFFER_SIZE are waiting to be written. See
+# app_analytics.aggregation
+ANALYTICS_FLUSH_INTERVAL_SECONDS = env.int("ANALYTICS_FLUSH_INTERVAL_SECONDS", 10)
+ANALYTICS_FLUSH_SIZE = env.int("ANALYTICS_FLUSH_SIZE", 1000)
+ANALYTICS_MAX_BUFFER_SIZE = env.int("ANALYTICS_MAX_BUFFER_SIZE", 10000)
+
+# Hourly totals are only used for short time ranges, so aren't kept for as long as
+# daily totals. See app_analytics.backends.database
+ANALYTICS_HOURLY_BUCKET_RETENTION_DAYS = env.int(
+    "ANALYTICS_HOURLY_BUCKET_RETENTION_DAYS", 7
+)
+ANALYTICS_DAILY_BUCKET_RETENTION_DAYS = env.int(
+    "ANALYTICS_DAILY_BUCKET_RETENTION_DAYS", 365
+)
+
+# How often the API usage of each organisation, used by the usage endpoint and the
+# sales dashboard, is updated by the task processor. See app_analytics.usage
+ORGANISATION_API_USAGE_UPDATE_INTERVAL_MINUTES = env.int(
+    "ORGANISATION_API_USAGE_UPDATE_INTERVAL_MINUTES", 60
+)
+
 ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=[])
 USE_X_FORWARDED_HOST = env.bool("USE_X_FORWARDED_HOST", default=False)
 
@@ -153,11 +192,10 @@ INSTALLED_APPS = [
     "django_filters",
     "import_export",
     "task_processor",
+    "app_analytics",
+    "webhooks",
 ]
 
-if GOOGLE_ANALYTICS_KEY or INFLUXDB_TOKEN:
-    INSTALLED_APPS.append("app_analytics")
-
 SITE_ID = 1
 
 db_conn_max_age = env.int("DJANGO_DB_CONN_MAX_AGE", 60)
@@ -244,8 +282,8 @@ if ENABLE_GZIP_COMPRESSION:
 if GOOGLE_ANALYTICS_KEY:
     MIDDLEWARE.append("app_analytics.middleware.GoogleAnalyticsMiddleware")
 
-if INFLUXDB_TOKEN:
-    MIDDLEWARE.append("app_analytics.middleware.InfluxDBMiddleware")
+if ANALYTICS_ENABLED:
+    MIDDLEWARE.append("app_analytics.middleware.APIUsageMiddleware")
 
 ALLOWED_ADMIN_IP_ADDRESSES = env.list("ALLOWED_ADMIN_IP_ADDRESSES", default=list())
 if len(ALLOWED_ADMIN_IP_ADDRESSES) > 0:
@@ -482,10 +520,63 @@ CHARGEBEE_CACHE_LOCATION = "chargebee-objects"
 
 CACHE_PROJECT_SEGMENTS_SECONDS = env.int("CACHE_PROJECT_SEGMENTS_SECONDS", 0)
 PROJECT_SEGMENTS_CACHE_LOCATION = "project-segments"
+# Each process keeps the compiled segments of a project (see segments.evaluator)
+# for up to this long, independently of CACHE_PROJECT_SEGMENTS_SECONDS. Changes to
+# a project's segments are picked up by every process on its next request, using a
+# revision held in the shared tier of the environment document cache.
+CACHE_COMPILED_SEGMENTS_SECONDS = env.int("CACHE_COMPILED_SEGMENTS_SECONDS", 10)
+
+CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS = env.int(
+    "CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS", 0
+)
+ENVIRONMENT_FEATURE_STATES_CACHE_LOCATION = "environment-feature-states"
+
+# Used to validate the flag analytics sent by the SDKs, see app_analytics.cache
+CACHE_ENVIRONMENT_FEATURE_NAMES_SECONDS = env.int(
+    "CACHE_ENVIRONMENT_FEATURE_NAMES_SECONDS", 60
+)
+ENVIRONMENT_FEATURE_NAMES_CACHE_LOCATION = "environment-feature-names"
+
+# Used for the organisation usage chart, see app_analytics.cache
+CACHE_ORGANISATION_EVENT_LIST_SECONDS = env.int(
+    "CACHE_ORGANISATION_EVENT_LIST_SECONDS", 300
+)
+ORGANISATION_EVENT_LIST_CACHE_LOCATION = "organisation-event-lists"
+
+# Used to rate limit webhook deliveries and failure emails, see webhooks.outbox.
+# The limits apply across all of the task processor's processes, so this must be a
+# shared cache. It uses the database by default but can be any django cache
+# backend, e.g. redis.
+WEBHOOKS_CACHE_LOCATION = "webhooks"
+WEBHOOKS_CACHE_BACKEND = env.str(
+    "WEBHOOKS_CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+)
+WEBHOOKS_CACHE_BACKEND_LOCATION = env.str(
+    "WEBHOOKS_CACHE_BACKEND_LOCATION", WEBHOOKS_CACHE_LOCATION
+)
 
 CACHE_ENVIRONMENT_DOCUMENT_SECONDS = env.int("CACHE_ENVIRONMENT_DOCUMENT_SECONDS", 0)
 ENVIRONMENT_DOCUMENT_CACHE_LOCATION = "environment-documents"
 
+# Environment documents are kept in a per process LRU cache (bounded by size in
+# bytes) in front of a shared cache. The shared cache uses the database by default
+# but can be any django cache backend, e.g. a file based or redis cache.
+ENVIRONMENT_DOCUMENT_SHARED_CACHE_LOCATION = "environment-documents-shared"
+ENVIRONMENT_DOCUMENT_SHARED_CACHE_BACKEND = env.str(
+    "ENVIRONMENT_DOCUMENT_SHARED_CACHE_BACKEND",
+    "django.core.cache.backends.db.DatabaseCache",
+)
+ENVIRONMENT_DOCUMENT_SHARED_CACHE_BACKEND_LOCATION = env.str(
+    "ENVIRONMENT_DOCUMENT_SHARED_CACHE_BACKEND_LOCATION",
+    ENVIRONMENT_DOCUMENT_CACHE_LOCATION,
+)
+ENVIRONMENT_DOCUMENT_LOCAL_CACHE_MAX_BYTES = env.int(
+    "ENVIRONMENT_DOCUMENT_LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024
+)
+ENVIRONMENT_DOCUMENT_LOCAL_CACHE_SECONDS = env.int(
+    "ENVIRONMENT_DOCUMENT_LOCAL_CACHE_SECONDS", 10
+)
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
@@ -495,23 +586,58 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": ENVIRONMENT_CACHE_LOCATION,
     },
+    # the flags payloads share the shared tier of the environment document cache,
+    # see features.flags_payload
     FLAGS_CACHE_LOCATION: {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": FLAGS_CACHE_LOCATION,
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": ENVIRONMENT_DOCUMENT_SHARED_CACHE_LOCATION,
+        "OPTIONS": {
+            "LOCAL_MAX_BYTES": ENVIRONMENT_DOCUMENT_LOCAL_CACHE_MAX_BYTES,
+            "LOCAL_TIMEOUT": ENVIRONMENT_DOCUMENT_LOCAL_CACHE_SECONDS,
+        },
     },
     PROJECT_SEGMENTS_CACHE_LOCATION: {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": PROJECT_SEGMENTS_CACHE_LOCATION,
     },
+    ENVIRONMENT_FEATURE_STATES_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": ENVIRONMENT_FEATURE_STATES_CACHE_LOCATION,
+    },
+    ENVIRONMENT_FEATURE_NAMES_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": ENVIRONMENT_FEATURE_NAMES_CACHE_LOCATION,
+        "TIMEOUT": CACHE_ENVIRONMENT_FEATURE_NAMES_SECONDS,
+    },
+    ORGANISATION_EVENT_LIST_CACHE_LOCATION: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": ORGANISATION_EVENT_LIST_CACHE_LOCATION,
+        "TIMEOUT": CACHE_ORGANISATION_EVENT_LIST_SECONDS,
+    },
+    WEBHOOKS_CACHE_LOCATION: {
+        "BACKEND": WEBHOOKS_CACHE_BACKEND,
+        "LOCATION": WEBHOOKS_CACHE_BACKEND_LOCATION,
+    },
     CHARGEBEE_CACHE_LOCATION: {
         "BACKEND": "django.core.cache.backends.db.DatabaseCache",
         "LOCATION": CHARGEBEE_CACHE_LOCATION,
         "TIMEOUT": 12 * 60 * 60,  # 12 hours
     },
+    # the environment document cache, and the caches that share its shared tier,
+    # don't set a TIMEOUT since CACHE_ENVIRONMENT_DOCUMENT_SECONDS defaults to 0
+    # (i.e. expire immediately) and each entry has its own lifetime, so callers
+    # always pass an explicit timeout
     ENVIRONMENT_DOCUMENT_CACHE_LOCATION: {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
-        "LOCATION": ENVIRONMENT_DOCUMENT_CACHE_LOCATION,
-        "timeout": CACHE_ENVIRONMENT_DOCUMENT_SECONDS,
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": ENVIRONMENT_DOCUMENT_SHARED_CACHE_LOCATION,
+        "OPTIONS": {
+            "LOCAL_MAX_BYTES": ENVIRONMENT_DOCUMENT_LOCAL_CACHE_MAX_BYTES,
+            "LOCAL_TIMEOUT": ENVIRONMENT_DOCUMENT_LOCAL_CACHE_SECONDS,
+        },
+    },
+    ENVIRONMENT_DOCUMENT_SHARED_CACHE_LOCATION: {
+        "BACKEND": ENVIRONMENT_DOCUMENT_SHARED_CACHE_BACKEND,
+        "LOCATION": ENVIRONMENT_DOCUMENT_SHARED_CACHE_BACKEND_LOCATION,
     },
 }
 
@@ -639,6 +765,11 @@ AMPLITUDE_API_KEY = env("AMPLITUDE_API_KEY", default=None)
 
 # Set this to enable create organisation for only superusers
 RESTRICT_ORG_CREATE_TO_SUPERUSERS = env.bool("RESTRICT_ORG_CREATE_TO_SUPERUSERS", False)
+
+# Periodically alert admin users about organisations which are using more seats
+# than their plan allows. Requires the task processor.
+ENABLE_PLAN_LIMIT_CHECKS = env.bool("ENABLE_PLAN_LIMIT_CHECKS", False)
+
 # Slack Integration
 SLACK_CLIENT_ID = env.str("SLACK_CLIENT_ID", default="")
 SLACK_CLIENT_SECRET = env.str("SLACK_CLIENT_SECRET", default="")
@@ -705,6 +836,36 @@ EDGE_ENABLED = (
 
 DISABLE_WEBHOOKS = env.bool("DISABLE_WEBHOOKS", False)
 
+# Webhooks are delivered by a pool of up to WEBHOOK_MAX_WORKERS threads in each
+# process, over a session that keeps connections open to up to
+# WEBHOOK_CONNECTION_POOL_HOSTS hosts. Deliveries are dropped if
+# WEBHOOK_MAX_PENDING_DELIVERIES are already waiting for, or being made by, the
+# pool. See webhooks.delivery
+WEBHOOK_MAX_WORKERS = env.int("WEBHOOK_MAX_WORKERS", 10)
+WEBHOOK_MAX_PENDING_DELIVERIES = env.int("WEBHOOK_MAX_PENDING_DELIVERIES", 1000)
+WEBHOOK_CONNECTION_POOL_HOSTS = env.int("WEBHOOK_CONNECTION_POOL_HOSTS", 50)
+WEBHOOK_CONNECT_TIMEOUT_SECONDS = env.float("WEBHOOK_CONNECT_TIMEOUT_SECONDS", 5)
+WEBHOOK_READ_TIMEOUT_SECONDS = env.float("WEBHOOK_READ_TIMEOUT_SECONDS", 10)
+
+# When using the task processor, webhooks are written to an outbox table and
+# delivered from there, see webhooks.outbox. Events for the same webhook are sent
+# together, as a list, if WEBHOOK_OUTBOX_BATCH_SIZE is more than 1.
+WEBHOOK_OUTBOX_BATCH_SIZE = env.int("WEBHOOK_OUTBOX_BATCH_SIZE", 1)
+WEBHOOK_OUTBOX_MAX_MESSAGES = env.int("WEBHOOK_OUTBOX_MAX_MESSAGES", 1000)
+WEBHOOK_MAX_CONCURRENT_DELIVERIES_PER_URL = env.int(
+    "WEBHOOK_MAX_CONCURRENT_DELIVERIES_PER_URL", 2
+)
+# 0 means no limit. The limit is shared by all processes through the webhooks cache,
+# and is only exact if its backend increments atomically, e.g. redis.
+WEBHOOK_MAX_DELIVERIES_PER_URL_PER_MINUTE = env.int(
+    "WEBHOOK_MAX_DELIVERIES_PER_URL_PER_MINUTE", 600
+)
+WEBHOOK_MAX_ATTEMPTS = env.int("WEBHOOK_MAX_ATTEMPTS", 5)
+WEBHOOK_RETRY_BACKOFF_SECONDS = env.int("WEBHOOK_RETRY_BACKOFF_SECONDS", 30)
+WEBHOOK_FAILURE_EMAIL_THROTTLE_SECONDS = env.int(
+    "WEBHOOK_FAILURE_EMAIL_THROTTLE_SECONDS", 60 * 60
+)
+
 SERVE_FE_ASSETS = os.path.exists(BASE_DIR + "/app/templates/webpack/index.html")
 
 # Used to configure the number of application proxies that the API runs behind
@@ -724,6 +885,35 @@ ENABLE_TASK_PROCESSOR_HEALTH_CHECK = env.bool(
     "ENABLE_TASK_PROCESSOR_HEALTH_CHECK", default=False
 )
 
+# Completed tasks (and their task runs) are deleted after this many days, dead
+# lettered tasks are kept for longer so that they can be investigated. See
+# task_processor.cleanup
+TASK_DELETE_RETENTION_DAYS = env.int("TASK_DELETE_RETENTION_DAYS", 15)
+DEAD_LETTER_TASK_DELETE_RETENTION_DAYS = env.int(
+    "DEAD_LETTER_TASK_DELETE_RETENTION_DAYS", 60
+)
+TASK_DELETE_BATCH_SIZE = env.int("TASK_DELETE_BATCH_SIZE", 1000)
+
+# Changes to an environment within this many seconds of each other are coalesced
+# into a single dynamodb write and SSE message (see environments.tasks)
+ENVIRONMENT_UPDATE_DEBOUNCE_SECONDS = env.int("ENVIRONMENT_UPDATE_DEBOUNCE_SECONDS", 2)
+
 # Real time(server sent events) settings
 SSE_SERVER_BASE_URL = env.str("SSE_SERVER_BASE_URL", None)
 SSE_AUTHENTICATION_TOKEN = env.str("SSE_AUTHENTICATION_TOKEN", None)
+# Number of environment keys or identifiers sent to the SSE server per request.
+# Set to 1 for SSE servers that don't support batches, although this is also
+# detected automatically. See sse.tasks
+SSE_BATCH_SIZE = env.int("SSE_BATCH_SIZE", 100)
+# Stream server sent events to the SDKs directly from the API, when it is run
+# under an ASGI server (using app.asgi:application), rather than from a separate
+# SSE server. See sse.asgi
+SSE_STREAMING_ENABLED = env.bool("SSE_STREAMING_ENABLED", False)
+# How environment updates reach the processes serving the streams. The default
+# uses postgres LISTEN/NOTIFY to reach every process. On other databases, it only
+# reaches streams served by the process that handled the update, which can't be
+# used with the task processor. See sse.streaming
+SSE_STREAMING_BACKEND = env.str(
+    "SSE_STREAMING_BACKEND", "sse.streaming.PostgresStreamingBackend"
+)
+SSE_STREAMING_KEEPALIVE_SECONDS = env.int("SSE_STREAMING_KEEPALIVE_SECONDS", 15)
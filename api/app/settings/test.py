@@ -19,3 +19,14 @@ REST_FRAMEWORK = {
     },
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
 }
+
+# Keep the shared tier of the environment document cache, and the webhooks cache,
+# out of the database so that they don't affect the number of queries made by the
+# tests.
+for cache_location in (
+    ENVIRONMENT_DOCUMENT_SHARED_CACHE_LOCATION,  # noqa: F405
+    WEBHOOKS_CACHE_LOCATION,  # noqa: F405
+):
+    CACHES[cache_location][  # noqa: F405
+        "BACKEND"
+    ] = "django.core.cache.backends.locmem.LocMemCache"
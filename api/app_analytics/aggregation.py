@@ -0,0 +1,91 @@
+import atexit
+import logging
+import threading
+import typing
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+Counts = typing.Dict[typing.Hashable, int]
+
+
+class CountAggregator:
+    """
+    Count occurrences of keys in memory and pass the counts to write, in batches,
+    from a single background thread.
+
+    The counts are written every flush_interval_seconds, or sooner once there are
+    flush_size distinct keys. If writing falls behind, so that there are max_size
+    distinct keys waiting to be written, counts for any new keys are dropped rather
+    than using unbounded memory.
+    """
+
+    def __init__(
+        self,
+        write: typing.Callable[[Counts], None],
+        *,
+        flush_interval_seconds: float,
+        flush_size: int,
+        max_size: int,
+    ):
+        self.write = write
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_size = flush_size
+        self.max_size = max_size
+
+        self._counts: Counts = {}
+        self._num_dropped = 0
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def add(self, key: typing.Hashable, count: int = 1) -> None:
+        with self._lock:
+            if key in self._counts:
+                self._counts[key] += count
+            elif len(self._counts) < self.max_size:
+                self._counts[key] = count
+                if len(self._counts) >= self.flush_size:
+                    self._flush_requested.set()
+            else:
+                self._num_dropped += count
+
+            self._ensure_writer_running()
+
+    def flush(self) -> None:
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            num_dropped, self._num_dropped = self._num_dropped, 0
+
+        if num_dropped:
+            logger.warning("Buffer full, dropped %d count(s).", num_dropped)
+
+        if not counts:
+            return
+
+        try:
+            self.write(counts)
+        except Exception:
+            logger.exception("Failed to write %d count(s).", len(counts))
+
+    def _ensure_writer_running(self) -> None:
+        # the writer is started lazily so that it is started in each process when
+        # running under a pre-forking server
+        if self._thread and self._thread.is_alive():
+            return
+
+        if not self._thread:
+            # write any remaining counts on shutdown
+            atexit.register(self.flush)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._flush_requested.wait(self.flush_interval_seconds)
+            self._flush_requested.clear()
+            self.flush()
+            # write may use the database, e.g. to look up environments
+            close_old_connections()
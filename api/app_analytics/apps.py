@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class AppAnalyticsConfig(AppConfig):
+    name = "app_analytics"
+
+    def ready(self):
+        from . import tasks  # noqa
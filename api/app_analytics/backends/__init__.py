@@ -0,0 +1,18 @@
+import functools
+
+from app_analytics.backends.base import BaseAnalyticsBackend
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def get_analytics_backend() -> BaseAnalyticsBackend:
+    """
+    Get the backend used to store and query API usage and flag analytics, as
+    configured by the ANALYTICS_BACKEND setting.
+    """
+    return _load_analytics_backend(settings.ANALYTICS_BACKEND)
+
+
+@functools.lru_cache()
+def _load_analytics_backend(path: str) -> BaseAnalyticsBackend:
+    return import_string(path)()
@@ -0,0 +1,88 @@
+import typing
+from abc import ABC, abstractmethod
+
+if typing.TYPE_CHECKING:
+    from environments.models import Environment
+
+
+class APIUsage(typing.NamedTuple):
+    environment: "Environment"
+    resource: str
+    host: str
+    count: int
+
+
+class FeatureEvaluations(typing.NamedTuple):
+    environment_id: int
+    feature_name: str
+    count: int
+
+
+class BaseAnalyticsBackend(ABC):
+    """
+    Stores API usage and flag analytics, which are written in batches by
+    app_analytics.track, and answers the queries used by the usage views and the
+    sales dashboard.
+
+    Time ranges are given as durations, e.g. 24h, 7d, 30d.
+    """
+
+    @abstractmethod
+    def write_api_usage(self, api_usage: typing.List[APIUsage]) -> None:
+        """Store a batch of API request counts"""
+
+    @abstractmethod
+    def write_feature_evaluations(
+        self, feature_evaluations: typing.List[FeatureEvaluations]
+    ) -> None:
+        """Store a batch of flag evaluation counts"""
+
+    @abstractmethod
+    def get_events_for_organisation(
+        self, organisation_id: int, date_range: str = "30d"
+    ) -> int:
+        """Get the total number of API requests made by the organisation"""
+
+    @abstractmethod
+    def get_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+        """
+        Get the daily number of API requests made by the organisation to each
+        resource over the last 30 days, along with the date labels for each day.
+        """
+
+    @abstractmethod
+    def get_multiple_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.List[dict]:
+        """
+        Get the daily number of API requests made by the organisation to each
+        resource over the last 30 days, e.g.
+
+        [{"Flags": 10, "Identities": 2, "name": "2022-11-01"}, ...]
+        """
+
+    @abstractmethod
+    def get_multiple_event_list_for_feature(
+        self,
+        environment_id: int,
+        feature_name: str,
+        period: str = "30d",
+        aggregate_every: str = "24h",
+    ) -> typing.List[dict]:
+        """
+        Get the number of evaluations of the feature in the environment over the
+        given period, in windows of aggregate_every, e.g.
+
+        [{"my_feature": 10, "datetime": "2022-11-01"}, ...]
+        """
+
+    @abstractmethod
+    def get_top_organisations(
+        self, date_range: str, limit: str = ""
+    ) -> typing.Dict[int, int]:
+        """
+        Get the number of API requests made by each organisation, in descending
+        order, keyed by organisation id.
+        """
@@ -0,0 +1,301 @@
+import re
+import typing
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from app_analytics.backends.base import (
+    APIUsage,
+    BaseAnalyticsBackend,
+    FeatureEvaluations,
+)
+from app_analytics.models import (
+    APIUsageBucket,
+    BucketSize,
+    FeatureEvaluationBucket,
+)
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+DURATION_REGEX = re.compile(r"^(\d+)([mhdw])$")
+DURATION_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+# hourly buckets are used for time ranges up to this long, daily buckets otherwise
+MAX_HOURLY_BUCKETS_RANGE = timedelta(days=2)
+
+EVENT_LIST_DAYS = 30
+DATE_FORMAT = "%Y-%m-%d"
+
+UPSERT_BATCH_SIZE = 100
+
+
+class DatabaseAnalyticsBackend(BaseAnalyticsBackend):
+    """
+    Stores hourly and daily totals in the database so that queries only need to
+    read one row per bucket, rather than per request.
+
+    The host of API requests isn't stored.
+    """
+
+    def write_api_usage(self, api_usage: typing.List[APIUsage]) -> None:
+        _increment_buckets(
+            APIUsageBucket,
+            ("organisation_id", "environment_id", "resource"),
+            [
+                (
+                    (
+                        usage.environment.project.organisation_id,
+                        usage.environment.id,
+                        usage.resource,
+                    ),
+                    usage.count,
+                )
+                for usage in api_usage
+            ],
+        )
+
+    def write_feature_evaluations(
+        self, feature_evaluations: typing.List[FeatureEvaluations]
+    ) -> None:
+        _increment_buckets(
+            FeatureEvaluationBucket,
+            ("environment_id", "feature_name"),
+            [
+                (
+                    (evaluations.environment_id, evaluations.feature_name),
+                    evaluations.count,
+                )
+                for evaluations in feature_evaluations
+            ],
+        )
+
+    def get_events_for_organisation(
+        self, organisation_id: int, date_range: str = "30d"
+    ) -> int:
+        buckets = _get_buckets(APIUsageBucket, _parse_duration(date_range))
+        return (
+            buckets.filter(organisation_id=organisation_id).aggregate(
+                total=Sum("total_count")
+            )["total"]
+            or 0
+        )
+
+    def get_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+        days = _get_event_list_days()
+        daily_api_usage = _get_daily_api_usage(organisation_id, since=days[0])
+
+        dataset = defaultdict(list)
+        for resource, counts in daily_api_usage.items():
+            dataset[resource] = [counts.get(day, 0) for day in days]
+        labels = [day.strftime(DATE_FORMAT) for day in days]
+        return dataset, labels
+
+    def get_multiple_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.List[dict]:
+        days = _get_event_list_days()
+        daily_api_usage = _get_daily_api_usage(organisation_id, since=days[0])
+        if not daily_api_usage:
+            return []
+
+        return [
+            {
+                **{
+                    resource.capitalize(): counts.get(day, 0)
+                    for resource, counts in daily_api_usage.items()
+                },
+                "name": day.strftime(DATE_FORMAT),
+            }
+            for day in days
+        ]
+
+    def get_multiple_event_list_for_feature(
+        self,
+        environment_id: int,
+        feature_name: str,
+        period: str = "30d",
+        aggregate_every: str = "24h",
+    ) -> typing.List[dict]:
+        window_size = _parse_duration(aggregate_every)
+        if window_size % timedelta(days=1):
+            bucket_size = BucketSize.HOUR
+        else:
+            bucket_size = BucketSize.DAY
+
+        since = timezone.now() - _parse_duration(period)
+        buckets = FeatureEvaluationBucket.objects.filter(
+            environment_id=environment_id,
+            feature_name=feature_name,
+            bucket_size=bucket_size,
+            started_at__gte=_get_bucket_start(since, bucket_size),
+        )
+
+        windows = defaultdict(int)
+        for started_at, total_count in buckets.values_list("started_at", "total_count"):
+            window_start = _get_bucket_start(started_at, window_size.total_seconds())
+            windows[window_start] += total_count
+
+        return [
+            {
+                feature_name: windows[window_start],
+                "datetime": window_start.strftime(DATE_FORMAT),
+            }
+            for window_start in sorted(windows)
+        ]
+
+    def get_top_organisations(
+        self, date_range: str, limit: str = ""
+    ) -> typing.Dict[int, int]:
+        buckets = _get_buckets(APIUsageBucket, _parse_duration(date_range))
+        top_organisations = (
+            buckets.values("organisation_id")
+            .annotate(total=Sum("total_count"))
+            .order_by("-total")
+        )
+        if limit:
+            top_organisations = top_organisations[: int(limit)]
+
+        return {row["organisation_id"]: row["total"] for row in top_organisations}
+
+
+def delete_old_buckets() -> None:
+    now = timezone.now()
+    for bucket_size, retention_days in (
+        (BucketSize.HOUR, settings.ANALYTICS_HOURLY_BUCKET_RETENTION_DAYS),
+        (BucketSize.DAY, settings.ANALYTICS_DAILY_BUCKET_RETENTION_DAYS),
+    ):
+        for model in (APIUsageBucket, FeatureEvaluationBucket):
+            model.objects.filter(
+                bucket_size=bucket_size,
+                started_at__lt=now - timedelta(days=retention_days),
+            ).delete()
+
+
+def _parse_duration(duration: str) -> timedelta:
+    match = DURATION_REGEX.match(duration)
+    if not match:
+        raise ValueError(f"Invalid duration '{duration}'")
+
+    value, unit = match.groups()
+    return timedelta(**{DURATION_UNITS[unit]: int(value)})
+
+
+def _get_bucket_start(dt: datetime, bucket_size: float) -> datetime:
+    timestamp = dt.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % bucket_size, tz=timezone.utc)
+
+
+def _get_buckets(
+    model: typing.Type[models.Model], duration: timedelta
+) -> models.QuerySet:
+    if duration <= MAX_HOURLY_BUCKETS_RANGE:
+        bucket_size = BucketSize.HOUR
+    else:
+        bucket_size = BucketSize.DAY
+
+    return model.objects.filter(
+        bucket_size=bucket_size,
+        started_at__gte=_get_bucket_start(timezone.now() - duration, bucket_size),
+    )
+
+
+def _get_event_list_days() -> typing.List[datetime]:
+    today = _get_bucket_start(timezone.now(), BucketSize.DAY)
+    return [today - timedelta(days=days) for days in range(EVENT_LIST_DAYS, -1, -1)]
+
+
+def _get_daily_api_usage(
+    organisation_id: int, since: datetime
+) -> typing.Dict[str, typing.Dict[datetime, int]]:
+    rows = (
+        APIUsageBucket.objects.filter(
+            organisation_id=organisation_id,
+            bucket_size=BucketSize.DAY,
+            started_at__gte=since,
+        )
+        .values("resource", "started_at")
+        .annotate(total=Sum("total_count"))
+    )
+
+    daily_api_usage = defaultdict(dict)
+    for row in rows:
+        daily_api_usage[row["resource"]][row["started_at"]] = row["total"]
+    return daily_api_usage
+
+
+def _increment_buckets(
+    model: typing.Type[models.Model],
+    fields: typing.Tuple[str, ...],
+    counts: typing.List[typing.Tuple[tuple, int]],
+) -> None:
+    """
+    Add the counts, keyed by the values of fields, to the current hourly and daily
+    buckets of model.
+    """
+    now = timezone.now()
+    bucket_counts = defaultdict(int)
+    for key, count in counts:
+        for bucket_size in BucketSize:
+            bucket_start = _get_bucket_start(now, bucket_size)
+            bucket_counts[(*key, bucket_size.value, bucket_start)] += count
+
+    fields = (*fields, "bucket_size", "started_at")
+    rows = list(bucket_counts.items())
+
+    if connection.vendor in ("postgresql", "sqlite"):
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            end = start + UPSERT_BATCH_SIZE
+            _upsert_buckets(model, fields, rows[start:end])
+        return
+
+    for key, count in rows:
+        _increment_bucket(model, dict(zip(fields, key)), count)
+
+
+def _upsert_buckets(
+    model: typing.Type[models.Model],
+    fields: typing.Tuple[str, ...],
+    rows: typing.List[typing.Tuple[tuple, int]],
+) -> None:
+    # insert the buckets, or increment the totals of any that already exist, in a
+    # single statement
+    quote_name = connection.ops.quote_name
+    model_fields = [model._meta.get_field(field) for field in fields]
+    total_count_field = model._meta.get_field("total_count")
+
+    table = quote_name(model._meta.db_table)
+    key_columns = ", ".join(quote_name(field.column) for field in model_fields)
+    total_count = quote_name(total_count_field.column)
+    values = ", ".join(["(" + ", ".join(["%s"] * (len(fields) + 1)) + ")"] * len(rows))
+    sql = (
+        f"INSERT INTO {table} ({key_columns}, {total_count}) VALUES {values} "
+        f"ON CONFLICT ({key_columns}) DO UPDATE "
+        f"SET {total_count} = {table}.{total_count} + EXCLUDED.{total_count}"
+    )
+
+    params = []
+    for key, count in rows:
+        for field, value in zip(model_fields, key):
+            params.append(field.get_db_prep_save(value, connection))
+        params.append(count)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _increment_bucket(
+    model: typing.Type[models.Model], key: typing.Dict[str, typing.Any], count: int
+) -> None:
+    buckets = model.objects.filter(**key)
+    if buckets.update(total_count=F("total_count") + count):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, total_count=count)
+    except IntegrityError:
+        # the bucket was created concurrently
+        buckets.update(total_count=F("total_count") + count)
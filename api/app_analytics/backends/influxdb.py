@@ -0,0 +1,78 @@
+import typing
+
+from app_analytics import influxdb_wrapper
+from app_analytics.backends.base import (
+    APIUsage,
+    BaseAnalyticsBackend,
+    FeatureEvaluations,
+)
+from app_analytics.influxdb_wrapper import InfluxDBWrapper
+
+
+class InfluxDBAnalyticsBackend(BaseAnalyticsBackend):
+    def write_api_usage(self, api_usage: typing.List[APIUsage]) -> None:
+        influxdb = InfluxDBWrapper("api_call")
+
+        for environment, resource, host, request_count in api_usage:
+            tags = {
+                "resource": resource,
+                "organisation": environment.project.organisation.get_unique_slug(),
+                "organisation_id": environment.project.organisation_id,
+                "project": environment.project.name,
+                "project_id": environment.project_id,
+                "environment": environment.name,
+                "environment_id": environment.id,
+                "host": host,
+            }
+            influxdb.add_data_point("request_count", request_count, tags=tags)
+
+        influxdb.write()
+
+    def write_feature_evaluations(
+        self, feature_evaluations: typing.List[FeatureEvaluations]
+    ) -> None:
+        influxdb = InfluxDBWrapper("feature_evaluation")
+
+        for environment_id, feature_name, evaluation_count in feature_evaluations:
+            tags = {"feature_id": feature_name, "environment_id": environment_id}
+            influxdb.add_data_point("request_count", evaluation_count, tags=tags)
+
+        influxdb.write()
+
+    def get_events_for_organisation(
+        self, organisation_id: int, date_range: str = "30d"
+    ) -> int:
+        return influxdb_wrapper.get_events_for_organisation(
+            organisation_id, date_range=date_range
+        )
+
+    def get_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.Tuple[typing.Dict[str, typing.List[int]], typing.List[str]]:
+        return influxdb_wrapper.get_event_list_for_organisation(organisation_id)
+
+    def get_multiple_event_list_for_organisation(
+        self, organisation_id: int
+    ) -> typing.List[dict]:
+        return influxdb_wrapper.get_multiple_event_list_for_organisation(
+            organisation_id
+        )
+
+    def get_multiple_event_list_for_feature(
+        self,
+        environment_id: int,
+        feature_name: str,
+        period: str = "30d",
+        aggregate_every: str = "24h",
+    ) -> typing.List[dict]:
+        return influxdb_wrapper.get_multiple_event_list_for_feature(
+            environment_id,
+            feature_name,
+            period=period,
+            aggregate_every=aggregate_every,
+        )
+
+    def get_top_organisations(
+        self, date_range: str, limit: str = ""
+    ) -> typing.Dict[int, int]:
+        return influxdb_wrapper.get_top_organisations(date_range, limit=limit)
@@ -0,0 +1,58 @@
+import typing
+
+from app_analytics.backends import get_analytics_backend
+from django.conf import settings
+from django.core.cache import caches
+
+from features.models import FeatureState
+
+environment_feature_names_cache = caches[
+    settings.ENVIRONMENT_FEATURE_NAMES_CACHE_LOCATION
+]
+organisation_event_list_cache = caches[settings.ORGANISATION_EVENT_LIST_CACHE_LOCATION]
+
+
+def get_environment_feature_names(
+    environment_id: int, refresh: bool = False
+) -> typing.Set[str]:
+    """
+    Get the names of the features in the given environment, used to validate the
+    flag analytics sent by the SDKs.
+
+    The names are cached until a feature is created, renamed or deleted (see
+    features.signals). Since the cache is local to each process, pass refresh=True
+    to make sure that a feature created in another process is included.
+    """
+    feature_names = (
+        None if refresh else environment_feature_names_cache.get(environment_id)
+    )
+    if feature_names is None:
+        feature_names = set(
+            FeatureState.objects.filter(
+                environment_id=environment_id,
+                feature_segment=None,
+                identity=None,
+            ).values_list("feature__name", flat=True)
+        )
+        environment_feature_names_cache.set(environment_id, feature_names)
+    return feature_names
+
+
+def clear_environment_feature_names(environment_ids: typing.Iterable[int]) -> None:
+    environment_feature_names_cache.delete_many(list(environment_ids))
+
+
+def get_organisation_event_list(organisation_id: int) -> typing.List[dict]:
+    """
+    Get the daily API usage of the organisation, by resource, for the usage chart.
+
+    The result is cached for CACHE_ORGANISATION_EVENT_LIST_SECONDS since the chart
+    is made up of daily totals and doesn't need to be up to the second.
+    """
+    event_list = organisation_event_list_cache.get(organisation_id)
+    if event_list is None:
+        event_list = get_analytics_backend().get_multiple_event_list_for_organisation(
+            organisation_id
+        )
+        organisation_event_list_cache.set(organisation_id, event_list)
+    return event_list
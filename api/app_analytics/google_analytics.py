@@ -0,0 +1,106 @@
+import atexit
+import logging
+import queue
+import threading
+import typing
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ANALYTICS_BASE_URL = "https://www.google-analytics.com"
+GOOGLE_ANALYTICS_COLLECT_URL = GOOGLE_ANALYTICS_BASE_URL + "/collect"
+GOOGLE_ANALYTICS_BATCH_URL = GOOGLE_ANALYTICS_BASE_URL + "/batch"
+
+# the maximum number of hits that the batch endpoint accepts in a single request
+MAX_BATCH_SIZE = 20
+
+REQUEST_TIMEOUT_SECONDS = 5
+
+
+class GoogleAnalyticsCollector:
+    """
+    Send hits (url encoded measurement protocol payloads) to Google Analytics in
+    batches, over a single HTTP session, from a background thread.
+
+    Hits are queued until they are sent. If sending falls behind, so that there
+    are max_queue_size hits waiting, new hits are dropped rather than blocking the
+    request being tracked.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue_size: int,
+        batch_url: str = GOOGLE_ANALYTICS_BATCH_URL,
+        batch_size: int = MAX_BATCH_SIZE,
+    ):
+        self.batch_url = batch_url
+        self.batch_size = batch_size
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._session = requests.Session()
+        self._num_dropped = 0
+        self._lock = threading.Lock()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def add(self, hit: str) -> None:
+        try:
+            self._queue.put_nowait(hit)
+        except queue.Full:
+            with self._lock:
+                self._num_dropped += 1
+
+        with self._lock:
+            self._ensure_sender_running()
+
+    def flush(self) -> None:
+        while True:
+            hits = self._get_batch(block=False)
+            if not hits:
+                return
+            self._send(hits)
+
+    def _ensure_sender_running(self) -> None:
+        # the sender is started lazily so that it is started in each process when
+        # running under a pre-forking server
+        if self._thread and self._thread.is_alive():
+            return
+
+        if not self._thread:
+            # send any remaining hits on shutdown
+            atexit.register(self.flush)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._send(self._get_batch(block=True))
+
+    def _get_batch(self, block: bool) -> typing.List[str]:
+        # wait for the first hit (if block), then take any others that are
+        # already queued, up to the batch size
+        hits = []
+        try:
+            hits.append(self._queue.get(block=block))
+            while len(hits) < self.batch_size:
+                hits.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return hits
+
+    def _send(self, hits: typing.List[str]) -> None:
+        with self._lock:
+            num_dropped, self._num_dropped = self._num_dropped, 0
+
+        if num_dropped:
+            logger.warning("Queue full, dropped %d hit(s).", num_dropped)
+
+        try:
+            response = self._session.post(
+                self.batch_url, data="\n".join(hits), timeout=REQUEST_TIMEOUT_SECONDS
+            )
+            response.raise_for_status()
+        except Exception:
+            logger.exception("Failed to send %d hit(s).", len(hits))
@@ -1,7 +1,4 @@
-from .track import (
-    track_request_googleanalytics_async,
-    track_request_influxdb_async,
-)
+from .track import track_request_api_usage, track_request_googleanalytics
 
 
 class GoogleAnalyticsMiddleware:
@@ -9,21 +6,23 @@ class GoogleAnalyticsMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # for each API request, trigger a call to Google Analytics to track the request
-        track_request_googleanalytics_async(request)
+        # for each API request, queue hits to send to Google Analytics to track
+        # the request
+        track_request_googleanalytics(request)
 
         response = self.get_response(request)
 
         return response
 
 
-class InfluxDBMiddleware:
+class APIUsageMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # for each API request, trigger a call to InfluxDB to track the request
-        track_request_influxdb_async(request)
+        # for each API request, count the request so that it is sent to the
+        # analytics backend with the next batch of API usage data
+        track_request_api_usage(request)
 
         response = self.get_response(request)
 
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.15 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIUsageBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_size', models.IntegerField(choices=[(3600, 'Hour'), (86400, 'Day')])),
+                ('started_at', models.DateTimeField()),
+                ('total_count', models.BigIntegerField(default=0)),
+                ('organisation_id', models.IntegerField()),
+                ('environment_id', models.IntegerField()),
+                ('resource', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeatureEvaluationBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_size', models.IntegerField(choices=[(3600, 'Hour'), (86400, 'Day')])),
+                ('started_at', models.DateTimeField()),
+                ('total_count', models.BigIntegerField(default=0)),
+                ('environment_id', models.IntegerField()),
+                ('feature_name', models.CharField(max_length=2000)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='featureevaluationbucket',
+            index=models.Index(fields=['bucket_size', 'started_at'], name='feature_eval_bucket_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='featureevaluationbucket',
+            constraint=models.UniqueConstraint(fields=('environment_id', 'feature_name', 'bucket_size', 'started_at'), name='unique_feature_evaluation_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='apiusagebucket',
+            index=models.Index(fields=['bucket_size', 'started_at'], name='api_usage_bucket_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='apiusagebucket',
+            constraint=models.UniqueConstraint(fields=('organisation_id', 'bucket_size', 'started_at', 'environment_id', 'resource'), name='unique_api_usage_bucket'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-18 06:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0032_add_uuid_fields'),
+        ('app_analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganisationAPIUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('api_calls_24h', models.BigIntegerField(default=0)),
+                ('api_calls_7d', models.BigIntegerField(default=0)),
+                ('api_calls_30d', models.BigIntegerField(default=0)),
+                ('organisation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='api_usage', to='organisations.organisation')),
+            ],
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import models
+
+
+class BucketSize(models.IntegerChoices):
+    # in seconds
+    HOUR = 60 * 60
+    DAY = 24 * 60 * 60
+
+
+class AbstractBucket(models.Model):
+    """
+    Total count over the bucket_size seconds from started_at, used by
+    app_analytics.backends.database.DatabaseAnalyticsBackend.
+    """
+
+    bucket_size = models.IntegerField(choices=BucketSize.choices)
+    started_at = models.DateTimeField()
+    total_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class APIUsageBucket(AbstractBucket):
+    # not foreign keys so that usage is kept (until it expires) if the
+    # environment is deleted
+    organisation_id = models.IntegerField()
+    environment_id = models.IntegerField()
+    resource = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name="unique_api_usage_bucket",
+                fields=[
+                    "organisation_id",
+                    "bucket_size",
+                    "started_at",
+                    "environment_id",
+                    "resource",
+                ],
+            )
+        ]
+        indexes = [
+            # used to find the top organisations, and delete old buckets
+            models.Index(
+                name="api_usage_bucket_start_idx",
+                fields=["bucket_size", "started_at"],
+            )
+        ]
+
+
+class FeatureEvaluationBucket(AbstractBucket):
+    environment_id = models.IntegerField()
+    feature_name = models.CharField(max_length=2000)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name="unique_feature_evaluation_bucket",
+                fields=["environment_id", "feature_name", "bucket_size", "started_at"],
+            )
+        ]
+        indexes = [
+            # used to delete old buckets
+            models.Index(
+                name="feature_eval_bucket_start_idx",
+                fields=["bucket_size", "started_at"],
+            )
+        ]
+
+
+class OrganisationAPIUsage(models.Model):
+    """
+    The number of API calls made by an organisation over the last 24 hours, 7 days
+    and 30 days. Updated periodically by app_analytics.tasks so that they can be
+    read, and sorted on, without querying the analytics backend.
+    """
+
+    organisation = models.OneToOneField(
+        "organisations.Organisation",
+        on_delete=models.CASCADE,
+        related_name="api_usage",
+    )
+    api_calls_24h = models.BigIntegerField(default=0)
+    api_calls_7d = models.BigIntegerField(default=0)
+    api_calls_30d = models.BigIntegerField(default=0)
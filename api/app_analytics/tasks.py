@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from app_analytics.backends.database import delete_old_buckets
+from app_analytics.usage import update_organisation_api_usage
+from django.conf import settings
+
+from task_processor.decorators import register_recurring_task
+from task_processor.models import TaskPriority
+
+
+@register_recurring_task(run_every=timedelta(hours=24), priority=TaskPriority.LOWEST)
+def clean_up_old_analytics_buckets():
+    delete_old_buckets()
+
+
+@register_recurring_task(
+    run_every=timedelta(
+        minutes=settings.ORGANISATION_API_USAGE_UPDATE_INTERVAL_MINUTES
+    ),
+    priority=TaskPriority.LOW,
+)
+def update_organisation_api_usage_periodically():
+    if settings.ANALYTICS_ENABLED:
+        update_organisation_api_usage()
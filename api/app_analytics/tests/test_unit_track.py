@@ -1,9 +1,14 @@
 from unittest import mock
 
 import pytest
+from app_analytics.backends.base import APIUsage, FeatureEvaluations
 from app_analytics.track import (
+    track_event,
+    track_feature_evaluations,
+    track_request_api_usage,
     track_request_googleanalytics,
-    track_request_influxdb,
+    write_api_usage,
+    write_feature_evaluations,
 )
 
 
@@ -17,13 +22,13 @@ from app_analytics.track import (
         ("/health", 1),
     ),
 )
-@mock.patch("app_analytics.track.requests")
+@mock.patch("app_analytics.track.google_analytics_collector")
 @mock.patch("app_analytics.track.Environment")
 def test_track_request_googleanalytics(
-    MockEnvironment, mock_requests, request_uri, expected_ga_requests
+    MockEnvironment, mock_google_analytics_collector, request_uri, expected_ga_requests
 ):
     """
-    Verify that the correct number of calls are made to GA for the various uris.
+    Verify that the correct number of hits are sent to GA for the various uris.
 
     All SDK endpoints should send 2 requests as they send a page view and an event (for managing number of API
     requests made by an organisation). All API requests made to the 'admin' API, for managing flags, etc. should
@@ -39,7 +44,39 @@ def test_track_request_googleanalytics(
     track_request_googleanalytics(request)
 
     # Then
-    assert mock_requests.post.call_count == expected_ga_requests
+    assert mock_google_analytics_collector.add.call_count == expected_ga_requests
+
+
+@mock.patch("app_analytics.track.google_analytics_collector")
+def test_track_request_googleanalytics_samples_requests(
+    mock_google_analytics_collector, settings
+):
+    # Given
+    settings.GOOGLE_ANALYTICS_SAMPLE_RATE = 0
+    request = mock.MagicMock()
+    request.path = "/api/v1/flags/"
+
+    # When
+    track_request_googleanalytics(request)
+
+    # Then
+    mock_google_analytics_collector.add.assert_not_called()
+
+
+@mock.patch("app_analytics.track.google_analytics_collector")
+@mock.patch("app_analytics.track.uuid")
+def test_track_event(mock_uuid, mock_google_analytics_collector, settings):
+    # Given
+    settings.GOOGLE_ANALYTICS_KEY = "UA-123"
+    mock_uuid.uuid4.return_value = "client-id"
+
+    # When
+    track_event("org slug", "flags", label="a&b")
+
+    # Then
+    mock_google_analytics_collector.add.assert_called_once_with(
+        "v=1&tid=UA-123&cid=client-id&t=event&ec=org+slug&ea=flags&el=a%26b"
+    )
 
 
 @pytest.mark.parametrize(
@@ -51,69 +88,54 @@ def test_track_request_googleanalytics(
         ("/api/v1/environment-document/", "environment-document"),
     ),
 )
-@mock.patch("app_analytics.track.InfluxDBWrapper")
-@mock.patch("app_analytics.track.Environment")
-def test_track_request_sends_data_to_influxdb_for_tracked_uris(
-    MockEnvironment, MockInfluxDBWrapper, request_uri, expected_resource
+@mock.patch("app_analytics.track.api_usage_aggregator")
+def test_track_request_api_usage_counts_tracked_uris(
+    mock_api_usage_aggregator, request_uri, expected_resource
 ):
     """
-    Verify that the correct number of calls are made to InfluxDB for the various uris.
+    Verify that requests to the various uris are counted to send to the analytics
+    backend.
     """
     # Given
     request = mock.MagicMock()
     request.path = request_uri
     environment_api_key = "test"
     request.headers = {"X-Environment-Key": environment_api_key}
-
-    mock_influxdb = mock.MagicMock()
-    MockInfluxDBWrapper.return_value = mock_influxdb
+    request.get_host.return_value = "testserver"
 
     # When
-    track_request_influxdb(request)
+    track_request_api_usage(request)
 
     # Then
-    call_list = MockInfluxDBWrapper.call_args_list
-    assert len(call_list) == 1
-    assert (
-        mock_influxdb.add_data_point.call_args_list[0][1]["tags"]["resource"]
-        == expected_resource
+    mock_api_usage_aggregator.add.assert_called_once_with(
+        (expected_resource, environment_api_key, "testserver")
     )
 
 
-@mock.patch("app_analytics.track.InfluxDBWrapper")
-@mock.patch("app_analytics.track.Environment")
-def test_track_request_sends_host_data_to_influxdb(
-    MockEnvironment, MockInfluxDBWrapper, rf
-):
+@mock.patch("app_analytics.track.api_usage_aggregator")
+def test_track_request_api_usage_counts_host(mock_api_usage_aggregator, rf):
     """
-    Verify that host is part of the data send to influxDB
+    Verify that host is part of the data sent to the analytics backend
     """
     # Given
     environment_api_key = "test"
-    headers = {"X-Environment-Key": environment_api_key}
-
-    request = rf.get("/api/v1/flags/", headers=headers)
-
-    mock_influxdb = mock.MagicMock()
-    MockInfluxDBWrapper.return_value = mock_influxdb
+    request = rf.get("/api/v1/flags/", HTTP_X_ENVIRONMENT_KEY=environment_api_key)
 
     # When
-    track_request_influxdb(request)
+    track_request_api_usage(request)
 
     # Then
-    assert (
-        mock_influxdb.add_data_point.call_args_list[0][1]["tags"]["host"]
-        == "testserver"
+    mock_api_usage_aggregator.add.assert_called_once_with(
+        ("flags", environment_api_key, "testserver")
     )
 
 
-@mock.patch("app_analytics.track.InfluxDBWrapper")
-@mock.patch("app_analytics.track.Environment")
-def test_track_request_does_not_send_data_to_influxdb_for_not_tracked_uris(
-    MockEnvironment, MockInfluxDBWrapper
+@mock.patch("app_analytics.track.api_usage_aggregator")
+def test_track_request_api_usage_does_not_count_not_tracked_uris(
+    mock_api_usage_aggregator,
 ):
     """
-    Verify that the correct number of calls are made to InfluxDB for the various uris.
+    Verify that requests to uris which aren't tracked aren't counted.
     """
     # Given
     request = mock.MagicMock()
@@ -121,11 +143,74 @@ def test_track_request_does_not_send_data_to_influxdb_for_not_tracked_uris(
     environment_api_key = "test"
     request.headers = {"X-Environment-Key": environment_api_key}
 
-    mock_influxdb = mock.MagicMock()
-    MockInfluxDBWrapper.return_value = mock_influxdb
+    # When
+    track_request_api_usage(request)
+
+    # Then
+    mock_api_usage_aggregator.add.assert_not_called()
+
+
+@mock.patch("app_analytics.track.get_analytics_backend")
+@mock.patch("app_analytics.track.Environment")
+def test_write_api_usage(MockEnvironment, mock_get_analytics_backend):
+    """
+    Verify that the counts are written to the analytics backend, looking up each
+    environment once and skipping any environments which don't exist.
+    """
+    # Given
+    environment = mock.MagicMock()
+    MockEnvironment.get_from_cache.side_effect = lambda key: (
+        environment if key == "test" else None
+    )
+
+    counts = {
+        ("flags", "test", "testserver"): 10,
+        ("identities", "test", "testserver"): 2,
+        ("flags", "unknown", "testserver"): 1,
+    }
+
+    # When
+    write_api_usage(counts)
+
+    # Then
+    assert MockEnvironment.get_from_cache.call_count == 2
+    mock_get_analytics_backend.return_value.write_api_usage.assert_called_once_with(
+        [
+            APIUsage(environment, "flags", "testserver", 10),
+            APIUsage(environment, "identities", "testserver", 2),
+        ]
+    )
+
+
+@mock.patch("app_analytics.track.feature_evaluation_aggregator")
+def test_track_feature_evaluations(mock_feature_evaluation_aggregator):
+    # Given
+    environment_id = 1
+    feature_evaluations = {"feature_1": 10, "feature_2": 2}
 
     # When
-    track_request_influxdb(request)
+    track_feature_evaluations(environment_id, feature_evaluations)
 
     # Then
-    MockInfluxDBWrapper.assert_not_called()
+    assert mock_feature_evaluation_aggregator.add.call_args_list == [
+        mock.call((environment_id, "feature_1"), count=10),
+        mock.call((environment_id, "feature_2"), count=2),
+    ]
+
+
+@mock.patch("app_analytics.track.get_analytics_backend")
+def test_write_feature_evaluations(mock_get_analytics_backend):
+    # Given
+    counts = {(1, "feature_1"): 10, (2, "feature_1"): 2}
+
+    # When
+    write_feature_evaluations(counts)
+
+    # Then
+    mock_analytics_backend = mock_get_analytics_backend.return_value
+    mock_analytics_backend.write_feature_evaluations.assert_called_once_with(
+        [
+            FeatureEvaluations(1, "feature_1", 10),
+            FeatureEvaluations(2, "feature_1", 2),
+        ]
+    )
@@ -1,23 +1,24 @@
 import logging
+import random
 import uuid
+from urllib.parse import urlencode
 
-import requests
-from app_analytics.influxdb_wrapper import InfluxDBWrapper
+from app_analytics.aggregation import CountAggregator
+from app_analytics.backends import get_analytics_backend
+from app_analytics.backends.base import APIUsage, FeatureEvaluations
+from app_analytics.google_analytics import GoogleAnalyticsCollector
 from django.conf import settings
 from django.core.cache import caches
-from six.moves.urllib.parse import quote  # python 2/3 compatible urllib import
 
 from environments.models import Environment
-from util.util import postpone
 
 logger = logging.getLogger(__name__)
 
 environment_cache = caches[settings.ENVIRONMENT_CACHE_LOCATION]
 
-GOOGLE_ANALYTICS_BASE_URL = "https://www.google-analytics.com"
-GOOGLE_ANALYTICS_COLLECT_URL = GOOGLE_ANALYTICS_BASE_URL + "/collect"
-GOOGLE_ANALYTICS_BATCH_URL = GOOGLE_ANALYTICS_BASE_URL + "/batch"
-DEFAULT_DATA = "v=1&tid=" + settings.GOOGLE_ANALYTICS_KEY
+google_analytics_collector = GoogleAnalyticsCollector(
+    max_queue_size=settings.GOOGLE_ANALYTICS_MAX_QUEUE_SIZE
+)
 
 # dictionary of resources to their corresponding actions
 # when tracking events in GA / Influx
@@ -29,16 +30,6 @@ TRACKED_RESOURCE_ACTIONS = {
 }
 
 
-@postpone
-def track_request_googleanalytics_async(request):
-    return track_request_googleanalytics(request)
-
-
-@postpone
-def track_request_influxdb_async(request):
-    return track_request_influxdb(request)
-
-
 def get_resource_from_uri(request_uri):
     """
     Split the uri so we can determine the resource that is being requested
@@ -58,13 +49,15 @@ def get_resource_from_uri(request_uri):
 
 def track_request_googleanalytics(request):
     """
-    Utility function to track a request to the API with the specified URI
+    Utility function to track a request to the API with the specified URI. The
+    hits are queued and sent to GA in batches, so no requests are made here.
 
     :param request: (HttpRequest) the request being made
     """
-    pageview_data = DEFAULT_DATA + "t=pageview&dp=" + quote(request.path, safe="")
-    # send pageview request
-    requests.post(GOOGLE_ANALYTICS_COLLECT_URL, data=pageview_data)
+    if random.random() >= settings.GOOGLE_ANALYTICS_SAMPLE_RATE:
+        return
+
+    track_pageview(request.path)
 
     resource = get_resource_from_uri(request.path)
 
@@ -78,64 +71,110 @@ def track_request_googleanalytics(request):
         track_event(environment.project.organisation.get_unique_slug(), resource)
 
 
+def track_pageview(path):
+    _track_hit(t="pageview", dp=path)
+
+
 def track_event(category, action, label="", value=""):
-    data = (
-        DEFAULT_DATA
-        + "&t=event"
-        + "&ec="
-        + category
-        + "&ea="
-        + action
-        + "&cid="
-        + str(uuid.uuid4())
+    data = {"t": "event", "ec": category, "ea": action}
+    if label:
+        data["el"] = label
+    if value:
+        data["ev"] = value
+    _track_hit(**data)
+
+
+def _track_hit(**data):
+    google_analytics_collector.add(
+        urlencode(
+            {
+                "v": 1,
+                "tid": settings.GOOGLE_ANALYTICS_KEY,
+                "cid": str(uuid.uuid4()),
+                **data,
+            }
+        )
     )
-    data = data + "&el=" + label if label else data
-    data = data + "&ev=" + value if value else data
-    requests.post(GOOGLE_ANALYTICS_COLLECT_URL, data=data)
 
 
-def track_request_influxdb(request):
+def track_request_api_usage(request):
     """
-    Sends API event data to InfluxDB
+    Count the request so that it can be sent to the analytics backend with the
+    next batch of API usage data (see write_api_usage)
 
     :param request: (HttpRequest) the request being made
     """
     resource = get_resource_from_uri(request.path)
 
     if resource and resource in TRACKED_RESOURCE_ACTIONS:
-        environment = Environment.get_from_cache(
-            request.headers.get("X-Environment-Key")
-        )
-        if environment is None:
+        environment_key = request.headers.get("X-Environment-Key")
+        if not environment_key:
             return
 
-        tags = {
-            "resource": resource,
-            "organisation": environment.project.organisation.get_unique_slug(),
-            "organisation_id": environment.project.organisation_id,
-            "project": environment.project.name,
-            "project_id": environment.project_id,
-            "environment": environment.name,
-            "environment_id": environment.id,
-            "host": request.get_host(),
-        }
+        api_usage_aggregator.add((resource, environment_key, request.get_host()))
 
-        influxdb = InfluxDBWrapper("api_call")
-        influxdb.add_data_point("request_count", 1, tags=tags)
-        influxdb.write()
 
+def write_api_usage(counts):
+    """
+    Sends API usage data to the analytics backend
 
-def track_feature_evaluation_influxdb(environment_id, feature_evaluations):
+    :param counts: (dict) request counts keyed by resource, environment key and host
     """
-    Sends Feature analytics event data to InfluxDB
+    api_usage = []
+    environments = {}
+
+    for (resource, environment_key, host), request_count in counts.items():
+        if environment_key not in environments:
+            environments[environment_key] = Environment.get_from_cache(environment_key)
+        environment = environments[environment_key]
+        if environment is None:
+            continue
+
+        api_usage.append(APIUsage(environment, resource, host, request_count))
+
+    if api_usage:
+        get_analytics_backend().write_api_usage(api_usage)
+
+
+api_usage_aggregator = CountAggregator(
+    write_api_usage,
+    flush_interval_seconds=settings.ANALYTICS_FLUSH_INTERVAL_SECONDS,
+    flush_size=settings.ANALYTICS_FLUSH_SIZE,
+    max_size=settings.ANALYTICS_MAX_BUFFER_SIZE,
+)
+
+
+def track_feature_evaluations(environment_id, feature_evaluations):
+    """
+    Count feature evaluations so that they can be sent to the analytics backend
+    with the next batch of feature analytics data (see write_feature_evaluations)
 
     :param environment_id: (int) the id of the environment the feature is being evaluated within
-    :param feature_evaluations: (dict) A collection of key id / evaluation counts
+    :param feature_evaluations: (dict) A collection of feature name / evaluation counts
     """
-    influxdb = InfluxDBWrapper("feature_evaluation")
+    for feature_name, evaluation_count in feature_evaluations.items():
+        feature_evaluation_aggregator.add(
+            (environment_id, feature_name), count=evaluation_count
+        )
+
+
+def write_feature_evaluations(counts):
+    """
+    Sends Feature analytics event data to the analytics backend
+
+    :param counts: (dict) evaluation counts keyed by environment id and feature name
+    """
+    get_analytics_backend().write_feature_evaluations(
+        [
+            FeatureEvaluations(environment_id, feature_name, evaluation_count)
+            for (environment_id, feature_name), evaluation_count in counts.items()
+        ]
+    )
 
-    for feature_id, evaluation_count in feature_evaluations.items():
-        tags = {"feature_id": feature_id, "environment_id": environment_id}
-        influxdb.add_data_point("request_count", evaluation_count, tags=tags)
 
-    influxdb.write()
+feature_evaluation_aggregator = CountAggregator(
+    write_feature_evaluations,
+    flush_interval_seconds=settings.ANALYTICS_FLUSH_INTERVAL_SECONDS,
+    flush_size=settings.ANALYTICS_FLUSH_SIZE,
+    max_size=settings.ANALYTICS_MAX_BUFFER_SIZE,
+)
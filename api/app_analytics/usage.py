@@ -0,0 +1,94 @@
+from app_analytics.backends import get_analytics_backend
+from app_analytics.models import OrganisationAPIUsage
+from django.conf import settings
+
+from organisations.models import Organisation
+from task_processor.task_run_method import TaskRunMethod
+
+# the date ranges that API usage is precomputed for, and the fields it's stored in
+API_USAGE_FIELDS = {
+    "24h": "api_calls_24h",
+    "7d": "api_calls_7d",
+    "30d": "api_calls_30d",
+}
+
+BATCH_SIZE = 1000
+
+
+def is_api_usage_precomputed() -> bool:
+    """
+    Whether OrganisationAPIUsage is kept up to date, which is only done by the
+    recurring task in app_analytics.tasks, so requires the task processor.
+    """
+    return settings.TASK_RUN_METHOD == TaskRunMethod.TASK_PROCESSOR
+
+
+def update_organisation_api_usage() -> None:
+    """
+    Store the API usage of every organisation, using a single query per date range
+    for all organisations, rather than per organisation.
+
+    Only organisations that have made API calls get a row, and rows are only
+    written if the usage has changed.
+    """
+    analytics_backend = get_analytics_backend()
+    api_calls = {
+        field: analytics_backend.get_top_organisations(date_range)
+        for date_range, field in API_USAGE_FIELDS.items()
+    }
+
+    existing_api_usage = {
+        api_usage.organisation_id: api_usage
+        for api_usage in OrganisationAPIUsage.objects.all()
+    }
+    # the analytics backend may still have usage for deleted organisations
+    organisation_ids = set(
+        Organisation.objects.filter(
+            id__in=set().union(*api_calls.values())
+        ).values_list("id", flat=True)
+    )
+
+    api_usage_to_create = []
+    api_usage_to_update = []
+    for organisation_id in organisation_ids | existing_api_usage.keys():
+        values = {
+            field: organisation_api_calls.get(organisation_id, 0)
+            for field, organisation_api_calls in api_calls.items()
+        }
+        api_usage = existing_api_usage.get(organisation_id)
+        if api_usage is None:
+            api_usage_to_create.append(
+                OrganisationAPIUsage(organisation_id=organisation_id, **values)
+            )
+        elif any(getattr(api_usage, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(api_usage, field, value)
+            api_usage_to_update.append(api_usage)
+
+    OrganisationAPIUsage.objects.bulk_create(
+        api_usage_to_create, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    OrganisationAPIUsage.objects.bulk_update(
+        api_usage_to_update, fields=list(api_calls), batch_size=BATCH_SIZE
+    )
+
+
+def get_organisation_api_calls(organisation_id: int, date_range: str = "30d") -> int:
+    """
+    Get the number of API calls made by the organisation over date_range (one of
+    API_USAGE_FIELDS).
+
+    The precomputed usage is only kept up to date by the task processor, so the
+    analytics backend is queried directly when it isn't in use.
+    """
+    if not is_api_usage_precomputed():
+        return get_analytics_backend().get_events_for_organisation(
+            organisation_id, date_range=date_range
+        )
+
+    api_calls = (
+        OrganisationAPIUsage.objects.filter(organisation_id=organisation_id)
+        .values_list(API_USAGE_FIELDS[date_range], flat=True)
+        .first()
+    )
+    return api_calls or 0
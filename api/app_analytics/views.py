@@ -1,6 +1,7 @@
 import logging
 
-from app_analytics.track import track_feature_evaluation_influxdb
+from app_analytics.cache import get_environment_feature_names
+from app_analytics.track import track_feature_evaluations
 from django.conf import settings
 from rest_framework import status
 from rest_framework.generics import CreateAPIView, GenericAPIView
@@ -9,7 +10,6 @@ from telemetry.serializers import TelemetrySerializer
 
 from environments.authentication import EnvironmentKeyAuthentication
 from environments.permissions.permissions import EnvironmentKeyPermissions
-from features.models import FeatureState
 
 logger = logging.getLogger(__name__)
 
@@ -39,20 +39,24 @@ class SDKAnalyticsFlags(GenericAPIView):
                 status=status.HTTP_200_OK,
             )
 
-        if settings.INFLUXDB_TOKEN:
-            track_feature_evaluation_influxdb(request.environment.id, request.data)
+        if settings.ANALYTICS_ENABLED:
+            track_feature_evaluations(request.environment.id, request.data)
 
         return Response(status=status.HTTP_200_OK)
 
     def _is_data_valid(self):
-        environment_feature_names = set(
-            FeatureState.objects.filter(
-                environment=self.request.environment,
-                feature_segment=None,
-                identity=None,
-            ).values_list("feature__name", flat=True)
-        )
+        environment_id = self.request.environment.id
+        environment_feature_names = get_environment_feature_names(environment_id)
+        if not self._is_valid_for_feature_names(environment_feature_names):
+            # the cached names may not include a feature that was just created
+            environment_feature_names = get_environment_feature_names(
+                environment_id, refresh=True
+            )
+            return self._is_valid_for_feature_names(environment_feature_names)
+
+        return True
 
+    def _is_valid_for_feature_names(self, environment_feature_names):
         is_valid = True
         for feature_name, request_count in self.request.data.items():
             if not (
@@ -1,6 +1,7 @@
 import logging
 
-from django.db.models import Q
+from django.conf import settings
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -8,14 +9,18 @@ from audit.decorators import handle_skipped_signals
 from audit.models import AuditLog, RelatedObjectType
 from audit.serializers import AuditLogSerializer
 from environments.models import Environment
+from environments.tasks import (
+    patch_environment_document,
+    schedule_environment_updates,
+)
+from features.flags_payload import clear_environment_flags_payload
+from features.models import FeatureState
+from features.snapshots import EnvironmentFeatureStatesSnapshot
+from features.tasks import rebuild_environment_flags_payloads
 from integrations.datadog.datadog import DataDogWrapper
 from integrations.dynatrace.dynatrace import DynatraceWrapper
 from integrations.new_relic.new_relic import NewRelicWrapper
 from integrations.slack.slack import SlackWrapper
-from sse import (
-    send_environment_update_message,
-    send_environment_update_messages,
-)
 from webhooks.webhooks import WebhookEventType, call_organisation_webhooks
 
 logger = logging.getLogger(__name__)
@@ -124,26 +129,83 @@ def send_audit_log_event_to_dynatrace(sender, instance, **kwargs):
 
 @receiver(post_save, sender=AuditLog)
 @handle_skipped_signals
-def send_environments_to_dynamodb(sender, instance, **kwargs):
-    environments_filter = (
-        Q(id=instance.environment_id)
+def clear_environment_feature_states_snapshots(sender, instance, **kwargs):
+    if instance.environment_id:
+        EnvironmentFeatureStatesSnapshot.clear(instance.environment_id)
+        return
+
+    if instance.project_id:
+        for environment_id in instance.project.environments.values_list(
+            "id", flat=True
+        ):
+            EnvironmentFeatureStatesSnapshot.clear(environment_id)
+
+
+@receiver(post_save, sender=AuditLog)
+@handle_skipped_signals
+def update_environment_flags_payloads(sender, instance, **kwargs):
+    if settings.CACHE_FLAGS_SECONDS <= 0:
+        return
+
+    environments = (
+        [instance.environment]
         if instance.environment_id
-        else Q(project=instance.project)
+        else list(instance.project.environments.all())
+    )
+
+    # clear the payloads straight away so that any subsequent requests (e.g. those
+    # triggered by the update messages below) don't receive stale flags, then
+    # rebuild them in the background.
+    for environment in environments:
+        clear_environment_flags_payload(environment.api_key)
+    rebuild_environment_flags_payloads.delay(
+        args=([environment.id for environment in environments],)
     )
-    Environment.write_environments_to_dynamodb(environments_filter)
 
 
 @receiver(post_save, sender=AuditLog)
 @handle_skipped_signals
-def trigger_environment_update_messages(sender, instance, **kwargs):
-    if instance.environment_id:
-        send_environment_update_message.delay(args=(instance.environment.api_key,))
+def update_environment_documents(sender, instance, **kwargs):
+    if settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS <= 0:
+        return
+
+    if not instance.environment_id:
+        for api_key in instance.project.environments.values_list("api_key", flat=True):
+            Environment.invalidate_environment_document(api_key)
+        return
+
+    api_key = instance.environment.api_key
+    if instance.related_object_type != RelatedObjectType.FEATURE_STATE.name:
+        Environment.invalidate_environment_document(api_key)
         return
 
-    environment_keys = list(
-        instance.project.environments.all().values_list("api_key", flat=True)
+    feature_state = (
+        FeatureState.objects.filter(id=instance.related_object_id)
+        .values("feature_id", "identity_id")
+        .first()
+    )
+    if not feature_state:
+        # the feature state has been deleted
+        Environment.invalidate_environment_document(api_key)
+    elif not feature_state["identity_id"]:
+        # identity overrides are not included in the environment document. The
+        # document is patched in the background, once the change is committed, so
+        # that the request doesn't wait for concurrent patches.
+        feature_id = feature_state["feature_id"]
+        transaction.on_commit(
+            lambda: patch_environment_document.delay(args=(api_key, feature_id))
+        )
+
+
+@receiver(post_save, sender=AuditLog)
+@handle_skipped_signals
+def schedule_environment_updates_from_audit_log(sender, instance, **kwargs):
+    environment_ids = (
+        [instance.environment_id]
+        if instance.environment_id
+        else list(instance.project.environments.values_list("id", flat=True))
     )
-    send_environment_update_messages.delay(args=(environment_keys,))
+    schedule_environment_updates(environment_ids)
 
 
 @receiver(post_save, sender=AuditLog)
@@ -0,0 +1,193 @@
+import pickle
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """
+    Thread safe, in process, least recently used cache that is bounded by the
+    (pickled) size of the values that it holds rather than the number of entries.
+
+    Values are not copied, so callers must treat them as immutable.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+
+        # key -> (expires_at, size, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            expires_at, _, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: typing.Any, timeout: typing.Optional[float]) -> None:
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (expires_at, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend that keeps a per process LRU cache in front of a shared cache.
+
+    LOCATION is the alias of the shared cache in settings.CACHES (e.g. the
+    database, a file based cache or redis). Reads are served from the local cache
+    where possible and writes go to both tiers. Since other processes can't clear
+    the local tier, local entries are kept for at most OPTIONS['LOCAL_TIMEOUT']
+    seconds, which bounds how long a process can serve a value after it has changed
+    in the shared cache. Callers that need stronger guarantees should version their
+    keys (see Environment.get_environment_document).
+    """
+
+    def __init__(self, location: str, params: dict):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_cache_alias = location
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 10)
+        self._local_cache = LocalLRUCache(
+            max_bytes=options.get("LOCAL_MAX_BYTES", 64 * 1024 * 1024)
+        )
+
+    @property
+    def shared_cache(self) -> BaseCache:
+        return caches[self._shared_cache_alias]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared_cache.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._set_local(key, value, timeout, version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version=version)
+        value = self._local_cache.get(local_key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = self.shared_cache.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+
+        self._local_cache.set(local_key, value, self._local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        values = {}
+        missing_keys = []
+        for key in keys:
+            value = self._local_cache.get(self.make_key(key, version=version), _MISSING)
+            if value is _MISSING:
+                missing_keys.append(key)
+            else:
+                values[key] = value
+
+        if missing_keys:
+            shared_values = self.shared_cache.get_many(missing_keys, version=version)
+            for key, value in shared_values.items():
+                self._local_cache.set(
+                    self.make_key(key, version=version), value, self._local_timeout
+                )
+            values.update(shared_values)
+
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared_cache.set(key, value, timeout=timeout, version=version)
+        self._set_local(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self.shared_cache.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed_keys:
+                self._set_local(key, value, timeout, version)
+        return failed_keys
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_cache.delete(self.make_key(key, version=version))
+        return self.shared_cache.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_cache.delete(self.make_key(key, version=version))
+        return self.shared_cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_cache.delete(self.make_key(key, version=version))
+        self.shared_cache.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._local_cache.delete(self.make_key(key, version=version))
+        return self.shared_cache.incr(key, delta=delta, version=version)
+
+    def clear(self):
+        self._local_cache.clear()
+        self.shared_cache.clear()
+
+    def _set_local(self, key, value, timeout, version) -> None:
+        local_key = self.make_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            timeout = min(timeout - time.time(), self._local_timeout)
+        else:
+            timeout = self._local_timeout
+
+        if timeout <= 0:
+            self._local_cache.delete(local_key)
+        else:
+            self._local_cache.set(local_key, value, timeout)
+
+
+def get_shared_cache(cache: BaseCache) -> BaseCache:
+    """
+    Get the shared tier of the given cache, bypassing any per process tier. For
+    caches that aren't tiered, this is the cache itself.
+    """
+    if isinstance(cache, TieredCache):
+        return cache.shared_cache
+    return cache
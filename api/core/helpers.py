@@ -1,3 +1,5 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.sites.models import Site
 
@@ -17,3 +19,8 @@ def get_ip_address_from_request(request):
         if x_forwarded_for
         else request.META.get("REMOTE_ADDR")
     )
+
+
+def generate_etag(content: bytes) -> str:
+    """Generate a strong ETag for the given (rendered) response content"""
+    return f'"{hashlib.md5(content).hexdigest()}"'
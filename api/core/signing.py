@@ -1,8 +1,9 @@
 import hashlib
 import hmac
+import typing
 
 
-def sign_payload(payload: str, key: str):
-    return hmac.new(
-        key=key.encode(), msg=payload.encode(), digestmod=hashlib.sha256
-    ).hexdigest()
+def sign_payload(payload: typing.Union[str, bytes], key: str):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return hmac.new(key=key.encode(), msg=payload, digestmod=hashlib.sha256).hexdigest()
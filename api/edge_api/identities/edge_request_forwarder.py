@@ -7,6 +7,7 @@ from django.conf import settings
 
 from environments.dynamodb.migrator import IdentityMigrator
 from task_processor.decorators import register_task_handler
+from task_processor.models import TaskPriority
 
 
 def _should_forward(project_id: int) -> bool:
@@ -61,7 +62,7 @@ def forward_trait_request_sync(
     )
 
 
-@register_task_handler()
+@register_task_handler(priority=TaskPriority.LOW)
 def forward_trait_requests(
     request_method: str,
     headers: str,
@@ -169,7 +169,8 @@ class EdgeIdentityViewSet(viewsets.ModelViewSet):
         Identity.dynamo_wrapper.put_item(build_identity_dict(identity))
         data = trait_schema.dump(trait)
         send_identity_update_message.delay(
-            args=(environment.api_key, identity.identifier)
+            args=(environment.api_key, identity.identifier),
+            dedup_key=f"{environment.api_key}:{identity.identifier}",
         )
         return Response(data, status=status.HTTP_200_OK)
 
@@ -213,7 +214,10 @@ class EdgeIdentityFeatureStateViewSet(viewsets.ModelViewSet):
         identity_feature_names = {fs.feature.name for fs in identity.identity_features}
         if not identity_feature_names.issubset(valid_feature_names):
             identity.prune_features(valid_feature_names)
-            sync_identity_document_features.delay(args=(str(identity.identity_uuid),))
+            sync_identity_document_features.delay(
+                args=(str(identity.identity_uuid),),
+                dedup_key=str(identity.identity_uuid),
+            )
         self.identity = identity
 
     def get_object(self):
@@ -0,0 +1,80 @@
+"""
+Incremental updates to environment documents.
+
+Building an environment document from scratch loads every feature, feature state,
+segment and segment override in the project. When a single feature state changes,
+we can instead take the cached document and replace only the feature states for the
+affected feature (the environment default and any segment overrides). If the change
+affects the structure of the document (e.g. a new feature or segment), the document
+can't be patched and needs to be rebuilt in full.
+"""
+import typing
+
+from django.db.models import Q
+from flag_engine.api.schemas import DjangoFeatureStateSchema
+
+from features.snapshots import get_live_feature_states
+
+
+def patch_environment_document(
+    document: dict, environment_id: int, feature_id: int
+) -> typing.Optional[dict]:
+    """
+    Get a copy of the given environment document with the feature states for the
+    given feature replaced with their latest live versions.
+
+    Returns None if the document can't be patched and must be rebuilt instead. The
+    given document is not modified.
+    """
+    environment_feature_state = None
+    segment_feature_states = {}
+    for feature_state in get_live_feature_states(
+        environment_id, Q(feature_id=feature_id, identity__isnull=True)
+    ):
+        if feature_state.feature_segment_id:
+            segment_id = feature_state.feature_segment.segment_id
+            segment_feature_states[segment_id] = feature_state
+        else:
+            environment_feature_state = feature_state
+
+    feature_state_schema = DjangoFeatureStateSchema()
+
+    feature_states = list(document["feature_states"])
+    index = _get_feature_state_index(feature_states, feature_id)
+    if environment_feature_state is None or index is None:
+        # the feature has been added or removed
+        return None
+    feature_states[index] = feature_state_schema.dump(environment_feature_state)
+
+    segments = []
+    for segment in document["project"]["segments"]:
+        segment_feature_states_data = [
+            feature_state_data
+            for feature_state_data in segment["feature_states"]
+            if feature_state_data["feature"]["id"] != feature_id
+        ]
+        segment_feature_state = segment_feature_states.pop(segment["id"], None)
+        if segment_feature_state:
+            segment_feature_states_data.append(
+                feature_state_schema.dump(segment_feature_state)
+            )
+        segments.append({**segment, "feature_states": segment_feature_states_data})
+
+    if segment_feature_states:
+        # the feature is overridden for a segment that isn't in the document
+        return None
+
+    return {
+        **document,
+        "feature_states": feature_states,
+        "project": {**document["project"], "segments": segments},
+    }
+
+
+def _get_feature_state_index(
+    feature_states: typing.List[dict], feature_id: int
+) -> typing.Optional[int]:
+    for index, feature_state_data in enumerate(feature_states):
+        if feature_state_data["feature"]["id"] == feature_id:
+            return index
+    return None
@@ -1,15 +1,13 @@
 import typing
 
 from django.db import models
-from django.db.models import Prefetch, Q
-from django.utils import timezone
 
 from environments.dynamodb import DynamoIdentityWrapper
 from environments.identities.managers import IdentityManager
 from environments.identities.traits.models import Trait
 from environments.models import Environment
-from features.models import FeatureState
-from features.multivariate.models import MultivariateFeatureStateValue
+from features.snapshots import get_identity_feature_states
+from segments.evaluator import get_compiled_segments
 
 
 class Identity(models.Model):
@@ -47,78 +45,19 @@ class Identity(models.Model):
             identity / segment priorities
         """
         segments = self.get_segments(traits=traits)
-
-        # define sub queries
-        belongs_to_environment_query = Q(environment=self.environment)
-        overridden_for_identity_query = Q(identity=self)
-        overridden_for_segment_query = Q(
-            feature_segment__segment__in=segments,
-            feature_segment__environment=self.environment,
-        )
-        environment_default_query = Q(identity=None, feature_segment=None)
-        only_live_versions_query = Q(
-            live_from__lte=timezone.now(), version__isnull=False
-        )
-
-        # define the full query
-        full_query = (
-            only_live_versions_query
-            & belongs_to_environment_query
-            & (
-                overridden_for_identity_query
-                | overridden_for_segment_query
-                | environment_default_query
-            )
-        )
-
-        select_related_args = [
-            "feature",
-            "feature_state_value",
-            "feature_segment",
-            "feature_segment__segment",
-            "identity",
-        ]
-
-        all_flags = (
-            FeatureState.objects.select_related(*select_related_args)
-            .prefetch_related(
-                Prefetch(
-                    "multivariate_feature_state_values",
-                    queryset=MultivariateFeatureStateValue.objects.select_related(
-                        "multivariate_feature_option"
-                    ),
-                )
-            )
-            .filter(full_query)
-        )
-
-        # iterate over all the flags and build a dictionary keyed on feature with the highest priority flag
-        # for the given identity as the value.
-        identity_flags = {}
-        for flag in all_flags:
-            if flag.feature_id not in identity_flags:
-                identity_flags[flag.feature_id] = flag
-            else:
-                current_flag = identity_flags[flag.feature_id]
-                if flag > current_flag:
-                    identity_flags[flag.feature_id] = flag
+        all_flags = get_identity_feature_states(self, segments)
 
         if self.environment.project.hide_disabled_flags:
             # filter out any flags that are disabled if configured on the project
             # Note: done here instead of the DB because of CH1245
-            return [value for value in identity_flags.values() if value.enabled]
+            return [flag for flag in all_flags if flag.enabled]
 
-        return list(identity_flags.values())
+        return all_flags
 
     def get_segments(self, traits: typing.List[Trait] = None):
-        segments = []
         traits = self.identity_traits.all() if traits is None else traits
-
-        for segment in self.environment.project.get_segments_from_cache():
-            if segment.does_identity_match(self, traits=traits):
-                segments.append(segment)
-
-        return segments
+        compiled_segments = get_compiled_segments(self.environment.project)
+        return compiled_segments.get_matching_segments(self, traits)
 
     def get_all_user_traits(self):
         # this is pointless, we should probably replace all uses with the below code
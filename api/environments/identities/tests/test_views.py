@@ -671,7 +671,8 @@ class SDKIdentitiesTestCase(APITestCase):
         assert self.identity.identity_traits.count() == 2
         # and send_identity_update_message is called
         mock_send_identity_update_message.delay.assert_called_once_with(
-            args=(self.environment.api_key, self.identity.identifier)
+            args=(self.environment.api_key, self.identity.identifier),
+            dedup_key=f"{self.environment.api_key}:{self.identity.identifier}",
         )
 
     @mock.patch("sse.decorators.send_identity_update_message")
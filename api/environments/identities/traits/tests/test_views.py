@@ -56,7 +56,8 @@ class SDKTraitsTest(APITestCase):
             identity=self.identity, trait_key=self.trait_key
         ).exists()
         mock_send_identity_update_message.delay.assert_called_once_with(
-            args=(self.environment.api_key, self.identity.identifier)
+            args=(self.environment.api_key, self.identity.identifier),
+            dedup_key=f"{self.environment.api_key}:{self.identity.identifier}",
         )
 
     @mock.patch("sse.decorators.send_identity_update_message")
@@ -233,7 +234,8 @@ class SDKTraitsTest(APITestCase):
         trait.refresh_from_db()
         assert trait.get_trait_value() == initial_value + increment_by
         mock_send_identity_update_message.delay.assert_called_once_with(
-            args=(self.environment.api_key, self.identity.identifier)
+            args=(self.environment.api_key, self.identity.identifier),
+            dedup_key=f"{self.environment.api_key}:{self.identity.identifier}",
         )
 
     def test_increment_value_decrements_trait_value_if_value_negative_integer(self):
@@ -29,7 +29,7 @@ from integrations.integration import (
     identify_integrations,
 )
 from sse.decorators import generate_identity_update_message
-from util.views import SDKAPIView
+from util.views import ConditionalGetMixin, SDKAPIView
 
 
 class IdentityViewSet(viewsets.ModelViewSet):
@@ -133,7 +133,7 @@ class SDKIdentitiesDeprecated(SDKAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class SDKIdentities(SDKAPIView):
+class SDKIdentities(ConditionalGetMixin, SDKAPIView):
     serializer_class = IdentifyWithTraitsSerializer
     pagination_class = None  # set here to ensure documentation is correct
 
@@ -3,9 +3,13 @@ from __future__ import unicode_literals
 
 import logging
 import typing
+import uuid
+from contextlib import contextmanager
 from copy import deepcopy
 
 import boto3
+from core.cache import get_shared_cache
+from core.helpers import generate_etag
 from core.request_origin import RequestOrigin
 from django.conf import settings
 from django.core.cache import caches
@@ -18,6 +22,7 @@ from flag_engine.api.document_builders import (
     build_environment_api_key_document,
     build_environment_document,
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 
 from app.utils import create_hash
@@ -25,6 +30,7 @@ from environments.api_keys import (
     generate_client_api_key,
     generate_server_api_key,
 )
+from environments.documents import patch_environment_document
 from environments.dynamodb import DynamoEnvironmentWrapper
 from environments.exceptions import EnvironmentHeaderNotPresentError
 from environments.managers import EnvironmentManager
@@ -37,6 +43,8 @@ logger = logging.getLogger(__name__)
 environment_cache = caches[settings.ENVIRONMENT_CACHE_LOCATION]
 environment_document_cache = caches[settings.ENVIRONMENT_DOCUMENT_CACHE_LOCATION]
 
+ENVIRONMENT_DOCUMENT_LOCK_TIMEOUT = 5
+
 # Intialize the dynamo environment wrapper globaly
 environment_wrapper = DynamoEnvironmentWrapper()
 
@@ -158,6 +166,9 @@ class Environment(LifecycleModel):
 
     @classmethod
     def write_environments_to_dynamodb(cls, environments_filter: Q) -> None:
+        if not environment_wrapper.is_enabled:
+            return
+
         # use a list to make sure the entire qs is evaluated up front
         environments = list(
             Environment.objects.filter_for_document_builder(environments_filter)
@@ -174,7 +185,7 @@ class Environment(LifecycleModel):
             if not environment.project == project:
                 raise RuntimeError("Environments must all belong to the same project.")
 
-        if not all([project, project.enable_dynamo_db, environment_wrapper.is_enabled]):
+        if not (project and project.enable_dynamo_db):
             return
 
         environment_wrapper.write_environments(environments)
@@ -211,14 +222,172 @@ class Environment(LifecycleModel):
             return cls._get_environment_document_from_cache(api_key)
         return cls._get_environment_document_from_db(api_key)
 
+    @classmethod
+    def get_environment_document_etag(cls, api_key: str) -> typing.Optional[str]:
+        """
+        Get the ETag of the cached environment document (if there is one) without
+        retrieving the document itself.
+        """
+        if settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS > 0:
+            revision = cls._get_environment_document_revision(api_key)
+            return environment_document_cache.get(f"{api_key}:{revision}:etag")
+        return None
+
+    @classmethod
+    def invalidate_environment_document(cls, api_key: str) -> None:
+        """
+        Invalidate the cached environment document by moving the environment on to
+        a new revision. Since cached documents are keyed by revision, a document
+        built from stale data (e.g. by a request that was in flight during the
+        change) can never be served under the new revision.
+
+        The revision being replaced is marked as invalidated first, so that a
+        patch of that revision that is in flight can't replace the new revision
+        with its own (see patch_environment_document).
+        """
+        shared_cache = get_shared_cache(environment_document_cache)
+        revision = shared_cache.get(
+            cls._get_environment_document_revision_cache_key(api_key)
+        )
+        if revision is not None:
+            environment_document_cache.set(
+                cls._get_environment_document_invalidated_cache_key(api_key, revision),
+                True,
+                timeout=ENVIRONMENT_DOCUMENT_LOCK_TIMEOUT,
+            )
+        cls._set_environment_document_revision(api_key, uuid.uuid4().hex)
+
+    @classmethod
+    def patch_environment_document(cls, api_key: str, feature_id: int) -> None:
+        """
+        Update the feature states of the given feature in the cached environment
+        document and move the environment on to a new revision containing the
+        patched document. If the document is not cached, the change can't be
+        applied incrementally, or another patch is holding the lock, the document
+        is invalidated instead.
+        """
+        with cls._environment_document_lock(api_key) as acquired:
+            if not acquired:
+                cls.invalidate_environment_document(api_key)
+                return
+
+            # read the revision from the shared cache since the revision held by
+            # this process may be out of date
+            shared_cache = get_shared_cache(environment_document_cache)
+            revision_key = cls._get_environment_document_revision_cache_key(api_key)
+            revision = shared_cache.get(revision_key)
+            document = revision and environment_document_cache.get(
+                f"{api_key}:{revision}"
+            )
+            patched_document = document and patch_environment_document(
+                document, environment_id=document["id"], feature_id=feature_id
+            )
+            if not patched_document:
+                cls.invalidate_environment_document(api_key)
+                return
+
+            patched_revision = uuid.uuid4().hex
+            cls._set_environment_document(api_key, patched_revision, patched_document)
+            if not cls._is_environment_document_revision_invalidated(api_key, revision):
+                cls._set_environment_document_revision(api_key, patched_revision)
+
+            # invalidations don't take the lock, so one may have replaced the
+            # revision after the check above, only to be replaced by the patched
+            # revision, which doesn't include its change. Since invalidations mark
+            # the revision that they replace before replacing it, checking again
+            # (now that the patched revision is published) catches that case.
+            if cls._is_environment_document_revision_invalidated(api_key, revision):
+                cls.invalidate_environment_document(api_key)
+
     @classmethod
     def _get_environment_document_from_cache(cls, api_key: str) -> dict:
-        environment_document = environment_document_cache.get(api_key)
+        revision = cls._get_environment_document_revision(api_key)
+        environment_document = environment_document_cache.get(f"{api_key}:{revision}")
         if not environment_document:
             environment_document = cls._get_environment_document_from_db(api_key)
-            environment_document_cache.set(api_key, environment_document)
+            cls._set_environment_document(api_key, revision, environment_document)
         return environment_document
 
+    @classmethod
+    def _set_environment_document(
+        cls, api_key: str, revision: str, environment_document: dict
+    ) -> None:
+        document_key = f"{api_key}:{revision}"
+        etag = generate_etag(JSONRenderer().render(environment_document))
+        environment_document_cache.set_many(
+            {document_key: environment_document, f"{document_key}:etag": etag},
+            timeout=settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS,
+        )
+
+    @classmethod
+    @contextmanager
+    def _environment_document_lock(cls, api_key: str) -> typing.Iterator[bool]:
+        """
+        Serialize patches to an environment document so that a patched document
+        can't overwrite a concurrent patch. Yields whether the lock was acquired.
+
+        The lock isn't waited for, since patches run in the task processor's
+        workers, and a burst of changes to an environment could otherwise keep
+        them all waiting. It expires after ENVIRONMENT_DOCUMENT_LOCK_TIMEOUT
+        seconds (e.g. if the process holding it died), and is only released by
+        the caller that acquired it.
+        """
+        lock_key = f"{api_key}:lock"
+        token = uuid.uuid4().hex
+        acquired = environment_document_cache.add(
+            lock_key, token, timeout=ENVIRONMENT_DOCUMENT_LOCK_TIMEOUT
+        )
+
+        try:
+            yield acquired
+        finally:
+            # the lock may have expired, and been acquired by someone else, while
+            # we were holding it
+            shared_cache = get_shared_cache(environment_document_cache)
+            if acquired and shared_cache.get(lock_key) == token:
+                environment_document_cache.delete(lock_key)
+
+    @classmethod
+    def _get_environment_document_revision(cls, api_key: str) -> str:
+        revision_key = cls._get_environment_document_revision_cache_key(api_key)
+        revision = environment_document_cache.get(revision_key)
+        if revision is None:
+            # use a random revision rather than a counter so that, if the revision
+            # is evicted from the cache, we can't revert to an old revision.
+            revision = uuid.uuid4().hex
+            if not environment_document_cache.add(revision_key, revision, timeout=None):
+                revision = environment_document_cache.get(revision_key, revision)
+        return revision
+
+    @classmethod
+    def _set_environment_document_revision(cls, api_key: str, revision: str) -> None:
+        environment_document_cache.set(
+            cls._get_environment_document_revision_cache_key(api_key),
+            revision,
+            timeout=None,
+        )
+
+    @classmethod
+    def _is_environment_document_revision_invalidated(
+        cls, api_key: str, revision: str
+    ) -> bool:
+        shared_cache = get_shared_cache(environment_document_cache)
+        return bool(
+            shared_cache.get(
+                cls._get_environment_document_invalidated_cache_key(api_key, revision)
+            )
+        )
+
+    @staticmethod
+    def _get_environment_document_revision_cache_key(api_key: str) -> str:
+        return f"{api_key}:revision"
+
+    @staticmethod
+    def _get_environment_document_invalidated_cache_key(
+        api_key: str, revision: str
+    ) -> str:
+        return f"{api_key}:{revision}:invalidated"
+
     @classmethod
     def _get_environment_document_from_db(cls, api_key: str) -> dict:
         environment = cls.objects.filter_for_document_builder(api_key=api_key).get()
@@ -5,16 +5,24 @@ from rest_framework.views import APIView
 from environments.authentication import EnvironmentKeyAuthentication
 from environments.models import Environment
 from environments.permissions.permissions import EnvironmentKeyPermissions
+from util.views import ConditionalGetMixin
 
 
-class SDKEnvironmentAPIView(APIView):
+class SDKEnvironmentAPIView(ConditionalGetMixin, APIView):
     permission_classes = (EnvironmentKeyPermissions,)
 
     def get_authenticators(self):
         return [EnvironmentKeyAuthentication(required_key_prefix="ser.")]
 
     def get(self, request: HttpRequest) -> Response:
-        environment_document = Environment.get_environment_document(
-            request.environment.api_key
-        )
-        return Response(environment_document)
+        api_key = request.environment.api_key
+
+        etag = Environment.get_environment_document_etag(api_key)
+        not_modified_response = self.get_not_modified_response(request, etag)
+        if not_modified_response:
+            return not_modified_response
+
+        response = Response(Environment.get_environment_document(api_key))
+        if etag:
+            response["ETag"] = etag
+        return response
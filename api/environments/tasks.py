@@ -1,11 +1,126 @@
+import logging
+import threading
+import typing
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
 from environments.dynamodb import DynamoEnvironmentWrapper
-from environments.models import Environment
+from environments.models import Environment, environment_wrapper
+from sse import send_environment_update_message
+from sse.streaming import publish_environment_update
 from task_processor.decorators import register_task_handler
+from task_processor.models import ENVIRONMENT_UPDATES_QUEUE, TaskPriority
+from task_processor.task_run_method import TaskRunMethod
+
+logger = logging.getLogger(__name__)
 
 
-@register_task_handler()
+@register_task_handler(queue=ENVIRONMENT_UPDATES_QUEUE, priority=TaskPriority.HIGH)
 def rebuild_environment_document(environment_id: int):
     wrapper = DynamoEnvironmentWrapper()
     if wrapper.is_enabled:
         environment = Environment.objects.get(id=environment_id)
         wrapper.write_environment(environment)
+
+
+@register_task_handler(queue=ENVIRONMENT_UPDATES_QUEUE, priority=TaskPriority.HIGH)
+def patch_environment_document(api_key: str, feature_id: int):
+    Environment.patch_environment_document(api_key, feature_id)
+
+
+@register_task_handler(queue=ENVIRONMENT_UPDATES_QUEUE, priority=TaskPriority.HIGH)
+def process_environment_update(environment_id: int):
+    """
+    Write the environment document to dynamodb (if enabled) and notify any SSE
+    subscribers (of the SSE server, or the API's own stream) that the environment
+    has changed.
+    """
+    api_key = (
+        Environment.objects.filter(id=environment_id)
+        .values_list("api_key", flat=True)
+        .first()
+    )
+    if not api_key:
+        logger.debug("Environment %d no longer exists.", environment_id)
+        return
+
+    Environment.write_environments_to_dynamodb(Q(id=environment_id))
+    send_environment_update_message(api_key)
+    publish_environment_update(api_key)
+
+
+def schedule_environment_updates(environment_ids: typing.Iterable[int]) -> None:
+    """
+    Schedule process_environment_update for each of the given environments.
+
+    Changes to the same environment within ENVIRONMENT_UPDATE_DEBOUNCE_SECONDS
+    of each other are coalesced into a single update, so that e.g. a bulk edit of
+    many flags results in a single dynamodb write and SSE message per environment.
+    """
+    if not (
+        environment_wrapper.is_enabled
+        or settings.SSE_SERVER_BASE_URL
+        or settings.SSE_STREAMING_ENABLED
+    ):
+        return
+
+    debounce_seconds = settings.ENVIRONMENT_UPDATE_DEBOUNCE_SECONDS
+    for environment_id in environment_ids:
+        if debounce_seconds <= 0:
+            process_environment_update.delay(args=(environment_id,))
+        elif settings.TASK_RUN_METHOD == TaskRunMethod.TASK_PROCESSOR:
+            _schedule_environment_update_task(environment_id, debounce_seconds)
+        elif settings.TASK_RUN_METHOD == TaskRunMethod.SEPARATE_THREAD:
+            _environment_update_debouncer.schedule(environment_id, debounce_seconds)
+        else:
+            process_environment_update(environment_id)
+
+
+def _schedule_environment_update_task(
+    environment_id: int, debounce_seconds: int
+) -> None:
+    # if there is already an update waiting to be processed, it will pick up this
+    # change. Once the task has started, any further changes need a new task.
+    process_environment_update.delay(
+        delay_until=timezone.now() + timedelta(seconds=debounce_seconds),
+        args=(environment_id,),
+        dedup_key=str(environment_id),
+    )
+
+
+class _EnvironmentUpdateDebouncer:
+    """
+    In process equivalent of _schedule_environment_update_task for when the task
+    processor isn't in use.
+    """
+
+    def __init__(self):
+        self._pending_environment_ids = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, environment_id: int, debounce_seconds: int) -> None:
+        with self._lock:
+            if environment_id in self._pending_environment_ids:
+                return
+            self._pending_environment_ids.add(environment_id)
+
+        timer = threading.Timer(debounce_seconds, self._run, args=(environment_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _run(self, environment_id: int) -> None:
+        with self._lock:
+            self._pending_environment_ids.discard(environment_id)
+
+        try:
+            process_environment_update(environment_id)
+        except Exception:
+            logger.exception(
+                "Failed to process update for environment %d", environment_id
+            )
+
+
+_environment_update_debouncer = _EnvironmentUpdateDebouncer()
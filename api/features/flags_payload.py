@@ -0,0 +1,134 @@
+import typing
+import uuid
+
+from core.cache import get_shared_cache
+from core.helpers import generate_etag
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from features.models import FeatureState
+from features.serializers import FeatureStateSerializerFull
+
+if typing.TYPE_CHECKING:
+    from environments.models import Environment
+
+flags_cache = caches[settings.FLAGS_CACHE_LOCATION]
+
+
+class FlagsPayload(typing.NamedTuple):
+    """
+    The rendered JSON response for the SDK flags endpoint of an environment.
+    """
+
+    content: bytes
+    etag: str
+
+    @classmethod
+    def from_content(cls, content: bytes) -> "FlagsPayload":
+        return cls(content=content, etag=generate_etag(content))
+
+
+def get_environment_flags_filter() -> Q:
+    exclude_hide_disabled = Q(feature__project__hide_disabled_flags=True, enabled=False)
+    return Q(feature_segment=None, identity=None) & ~exclude_hide_disabled
+
+
+def build_environment_flags_payload(environment_id: int) -> FlagsPayload:
+    feature_states = FeatureState.get_environment_flags_list(
+        environment_id=environment_id,
+        additional_filters=get_environment_flags_filter(),
+    )
+    data = FeatureStateSerializerFull(feature_states, many=True).data
+    return FlagsPayload.from_content(JSONRenderer().render(data))
+
+
+def get_environment_flags_payload(environment: "Environment") -> FlagsPayload:
+    """
+    Get the rendered flags for the given environment. When CACHE_FLAGS_SECONDS is
+    set, the payload is cached until something in the environment changes (see
+    audit.signals) so that serving it requires no work from the ORM or serializers.
+
+    Payloads are kept in a shared cache, with a per process tier in front of it,
+    under the current revision of the environment's flags. Changing the revision
+    invalidates the payload in every process, once their copy of the revision
+    expires from the per process tier.
+    """
+    if settings.CACHE_FLAGS_SECONDS <= 0:
+        return build_environment_flags_payload(environment.id)
+
+    revision = _get_revision(environment.api_key)
+    payload = flags_cache.get(_get_payload_cache_key(environment.api_key, revision))
+    if payload is None:
+        payload = _build_and_cache_payload(environment, revision)
+    return payload
+
+
+def rebuild_environment_flags_payload(environment: "Environment") -> FlagsPayload:
+    """
+    Build the payload for the current revision of the environment's flags and
+    store it in the shared cache, ready for the next request from any process.
+    """
+    # read the revision from the shared cache since the revision held by this
+    # process may be out of date
+    revision = get_shared_cache(flags_cache).get(
+        _get_revision_cache_key(environment.api_key)
+    )
+    if revision is None:
+        revision = _get_revision(environment.api_key)
+    return _build_and_cache_payload(environment, revision)
+
+
+def clear_environment_flags_payload(environment_api_key: str) -> None:
+    """
+    Move the environment's flags on to a new revision. Since payloads are keyed by
+    revision, a payload built from stale data (e.g. by a request that was in
+    flight during the change) can never be served under the new revision.
+    """
+    flags_cache.set(
+        _get_revision_cache_key(environment_api_key), uuid.uuid4().hex, timeout=None
+    )
+
+
+def _build_and_cache_payload(environment: "Environment", revision: str) -> FlagsPayload:
+    payload = build_environment_flags_payload(environment.id)
+
+    # never keep the payload past the point at which a scheduled change goes live
+    timeout = settings.CACHE_FLAGS_SECONDS
+    next_live_from = FeatureState.objects.get_next_live_from(
+        environment.id, additional_filters=Q(feature_segment=None, identity=None)
+    )
+    if next_live_from:
+        seconds_until_live = (next_live_from - timezone.now()).total_seconds()
+        timeout = min(timeout, int(seconds_until_live))
+
+    if timeout > 0:
+        flags_cache.set(
+            _get_payload_cache_key(environment.api_key, revision),
+            payload,
+            timeout=timeout,
+        )
+
+    return payload
+
+
+def _get_revision(environment_api_key: str) -> str:
+    revision_key = _get_revision_cache_key(environment_api_key)
+    revision = flags_cache.get(revision_key)
+    if revision is None:
+        # use a random revision rather than a counter so that, if the revision is
+        # evicted from the cache, we can't revert to an old revision.
+        revision = uuid.uuid4().hex
+        if not flags_cache.add(revision_key, revision, timeout=None):
+            revision = flags_cache.get(revision_key, revision)
+    return revision
+
+
+def _get_revision_cache_key(environment_api_key: str) -> str:
+    return f"flags:{environment_api_key}:revision"
+
+
+def _get_payload_cache_key(environment_api_key: str, revision: str) -> str:
+    return f"flags:{environment_api_key}:{revision}"
@@ -1,6 +1,53 @@
+import datetime
+import typing
+
 from core.models import UUIDNaturalKeyManagerMixin
+from django.db.models import Manager, Min, Q, QuerySet
+from django.utils import timezone
 from ordered_model.models import OrderedModelManager
 
 
 class FeatureSegmentManager(UUIDNaturalKeyManagerMixin, OrderedModelManager):
     pass
+
+
+class FeatureStateManager(UUIDNaturalKeyManagerMixin, Manager):
+    def get_live_feature_states(
+        self, environment_id: int, additional_filters: typing.Optional[Q] = None
+    ) -> QuerySet:
+        """
+        Get a queryset containing only the latest live version of each feature
+        state (i.e. one row per feature, feature segment and identity combination)
+        for the given environment.
+
+        Note: the selection of the latest version is performed by the database using
+        DISTINCT ON so that older versions are never loaded into memory.
+        """
+        queryset = self.filter(
+            environment_id=environment_id,
+            live_from__isnull=False,
+            live_from__lte=timezone.now(),
+            version__isnull=False,
+        )
+        if additional_filters:
+            queryset = queryset.filter(additional_filters)
+
+        key_fields = ("feature_id", "feature_segment_id", "identity_id")
+        return queryset.order_by(*key_fields, "-version").distinct(*key_fields)
+
+    def get_next_live_from(
+        self, environment_id: int, additional_filters: typing.Optional[Q] = None
+    ) -> typing.Optional[datetime.datetime]:
+        """
+        Get the datetime at which the next scheduled feature state in the given
+        environment goes live (if any).
+        """
+        queryset = self.filter(
+            environment_id=environment_id,
+            live_from__gt=timezone.now(),
+            version__isnull=False,
+        )
+        if additional_filters:
+            queryset = queryset.filter(additional_filters)
+
+        return queryset.aggregate(next_live_from=Min("live_from"))["next_live_from"]
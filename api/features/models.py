@@ -33,7 +33,7 @@ from features.custom_lifecycle import CustomLifecycleModelMixin
 from features.feature_states.models import AbstractBaseFeatureValueModel
 from features.feature_types import MULTIVARIATE, STANDARD
 from features.helpers import get_correctly_typed_value
-from features.managers import FeatureSegmentManager
+from features.managers import FeatureSegmentManager, FeatureStateManager
 from features.multivariate.models import MultivariateFeatureStateValue
 from features.utils import (
     get_boolean_from_string,
@@ -259,6 +259,8 @@ class FeatureState(LifecycleModelMixin, AbstractBaseExportableModel):
         related_name="feature_states",
     )
 
+    objects = FeatureStateManager()
+
     class Meta:
         ordering = ["id"]
 
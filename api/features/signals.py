@@ -1,6 +1,7 @@
 import logging
 
-from django.db.models.signals import post_save
+from app_analytics.cache import clear_environment_feature_names
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from simple_history.signals import post_create_historical_record
 
@@ -9,9 +10,17 @@ from audit.models import (
     AuditLog,
     RelatedObjectType,
 )
+from environments.models import Environment
 
 # noinspection PyUnresolvedReferences
-from .models import FeatureState, HistoricalFeatureSegment
+from .models import (
+    Feature,
+    FeatureSegment,
+    FeatureState,
+    FeatureStateValue,
+    HistoricalFeatureSegment,
+)
+from .snapshots import EnvironmentFeatureStatesSnapshot
 from .tasks import trigger_feature_state_change_webhooks
 
 logger = logging.getLogger(__name__)
@@ -43,3 +52,51 @@ def create_feature_segment_audit_log(
 @receiver(post_save, sender=FeatureState)
 def trigger_feature_state_change_webhooks_signal(instance, **kwargs):
     trigger_feature_state_change_webhooks(instance)
+
+
+@receiver(post_save, sender=FeatureState)
+@receiver(post_delete, sender=FeatureState)
+def clear_environment_feature_states_snapshot(instance, **kwargs):
+    # identity overrides are not included in the environment snapshot
+    if instance.identity_id is None:
+        EnvironmentFeatureStatesSnapshot.clear(instance.environment_id)
+
+
+@receiver(post_save, sender=FeatureStateValue)
+def clear_environment_feature_states_snapshot_on_value_change(instance, **kwargs):
+    feature_state = instance.feature_state
+    if feature_state.identity_id is None:
+        EnvironmentFeatureStatesSnapshot.clear(feature_state.environment_id)
+
+
+@receiver(post_save, sender=FeatureSegment)
+@receiver(post_delete, sender=FeatureSegment)
+def clear_environment_feature_states_snapshot_on_feature_segment_change(
+    instance, **kwargs
+):
+    EnvironmentFeatureStatesSnapshot.clear(instance.environment_id)
+
+
+@receiver(post_save, sender=FeatureState)
+@receiver(post_delete, sender=FeatureState)
+def clear_environment_feature_names_on_feature_state_change(
+    instance, created=False, **kwargs
+):
+    # the feature names only depend on which environment default feature states
+    # exist, so updates to existing feature states don't affect them
+    if kwargs["signal"] is post_save and not created:
+        return
+
+    if instance.identity_id is None and instance.feature_segment_id is None:
+        clear_environment_feature_names([instance.environment_id])
+
+
+@receiver(post_save, sender=Feature)
+def clear_environment_feature_names_on_feature_change(instance, created, **kwargs):
+    # new features are handled when their feature states are created
+    if not created:
+        clear_environment_feature_names(
+            Environment.objects.filter(project_id=instance.project_id).values_list(
+                "id", flat=True
+            )
+        )
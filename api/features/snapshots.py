@@ -0,0 +1,166 @@
+import typing
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Prefetch, Q, QuerySet
+from django.utils import timezone
+
+from features.models import FeatureState
+from features.multivariate.models import MultivariateFeatureStateValue
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from environments.models import Environment
+    from segments.models import Segment
+
+environment_feature_states_cache = caches[
+    settings.ENVIRONMENT_FEATURE_STATES_CACHE_LOCATION
+]
+
+FEATURE_STATE_SELECT_RELATED_ARGS = (
+    "feature",
+    "feature_state_value",
+    "feature_segment",
+    "feature_segment__segment",
+    "identity",
+)
+
+
+def get_live_feature_states(environment_id: int, filters: Q) -> QuerySet:
+    return (
+        FeatureState.objects.get_live_feature_states(environment_id, filters)
+        .select_related(*FEATURE_STATE_SELECT_RELATED_ARGS)
+        .prefetch_related(
+            Prefetch(
+                "multivariate_feature_state_values",
+                queryset=MultivariateFeatureStateValue.objects.select_related(
+                    "multivariate_feature_option"
+                ),
+            )
+        )
+    )
+
+
+def get_identity_feature_states(
+    identity: "Identity", segments: typing.Iterable["Segment"]
+) -> typing.List[FeatureState]:
+    """
+    Get the highest priority feature state of each feature for the given identity.
+
+    If the environment snapshot is cached, then only the identity's own overrides
+    are retrieved from the database. Otherwise, we retrieve the snapshot and the
+    identity's overrides in a single query.
+    """
+    if settings.CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS > 0:
+        snapshot = EnvironmentFeatureStatesSnapshot.get(identity.environment)
+        identity_feature_states = get_live_feature_states(
+            identity.environment_id, Q(identity=identity)
+        )
+    else:
+        snapshot = EnvironmentFeatureStatesSnapshot.build(
+            identity.environment, identity=identity
+        )
+        identity_feature_states = snapshot.identity_feature_states
+
+    return snapshot.get_feature_states(segments, identity_feature_states)
+
+
+class EnvironmentFeatureStatesSnapshot:
+    """
+    Pre-computed view of the latest live environment default and segment override
+    feature states for an environment. This allows us to resolve the flags for an
+    identity by only querying the database for the identity's own overrides.
+    """
+
+    def __init__(self, feature_states: typing.Iterable[FeatureState]):
+        self.environment_feature_states = {}
+        self.segment_feature_states = []
+        self.identity_feature_states = []
+
+        for feature_state in feature_states:
+            if feature_state.identity_id:
+                self.identity_feature_states.append(feature_state)
+            elif feature_state.feature_segment_id:
+                self.segment_feature_states.append(feature_state)
+            else:
+                self.environment_feature_states[
+                    feature_state.feature_id
+                ] = feature_state
+
+        # a lower priority value means that the segment override takes precedence
+        self.segment_feature_states.sort(
+            key=lambda fs: (fs.feature_id, fs.feature_segment.priority)
+        )
+
+    @classmethod
+    def get(cls, environment: "Environment") -> "EnvironmentFeatureStatesSnapshot":
+        snapshot = environment_feature_states_cache.get(environment.id)
+        if snapshot is None:
+            snapshot = cls.build(environment)
+            timeout = cls._get_cache_timeout(environment)
+            if timeout > 0:
+                environment_feature_states_cache.set(
+                    environment.id, snapshot, timeout=timeout
+                )
+        return snapshot
+
+    @classmethod
+    def build(
+        cls, environment: "Environment", identity: "Identity" = None
+    ) -> "EnvironmentFeatureStatesSnapshot":
+        """
+        Build the snapshot from the database. If an identity is given, the
+        identity's overrides are retrieved in the same query and are available in
+        snapshot.identity_feature_states.
+        """
+        filters = Q(identity__isnull=True)
+        if identity:
+            filters |= Q(identity=identity)
+        return cls(get_live_feature_states(environment.id, filters))
+
+    @classmethod
+    def clear(cls, environment_id: int) -> None:
+        environment_feature_states_cache.delete(environment_id)
+
+    @staticmethod
+    def _get_cache_timeout(environment: "Environment") -> int:
+        timeout = settings.CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS
+        if timeout <= 0:
+            return 0
+
+        # make sure that we don't serve a stale snapshot once a scheduled change
+        # goes live
+        next_live_from = FeatureState.objects.get_next_live_from(
+            environment.id, additional_filters=Q(identity__isnull=True)
+        )
+        if next_live_from:
+            seconds_until_live = (next_live_from - timezone.now()).total_seconds()
+            timeout = min(timeout, int(seconds_until_live))
+
+        return timeout
+
+    def get_feature_states(
+        self,
+        segments: typing.Iterable["Segment"],
+        identity_feature_states: typing.Iterable[FeatureState] = (),
+    ) -> typing.List[FeatureState]:
+        """
+        Get the highest priority feature state for each feature given the segments
+        that an identity belongs to and the identity's own overrides.
+        """
+        feature_states = dict(self.environment_feature_states)
+
+        segment_ids = {segment.id for segment in segments}
+        overridden_feature_ids = set()
+        for feature_state in self.segment_feature_states:
+            if (
+                feature_state.feature_id not in overridden_feature_ids
+                and feature_state.feature_segment.segment_id in segment_ids
+            ):
+                feature_states[feature_state.feature_id] = feature_state
+                overridden_feature_ids.add(feature_state.feature_id)
+
+        for feature_state in identity_feature_states:
+            feature_states[feature_state.feature_id] = feature_state
+
+        return list(feature_states.values())
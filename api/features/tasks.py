@@ -1,7 +1,10 @@
-from threading import Thread
+import typing
 
-from environments.models import Webhook
+from environments.models import Environment, Webhook
+from features.flags_payload import rebuild_environment_flags_payload
 from features.models import FeatureState
+from task_processor.decorators import register_task_handler
+from task_processor.models import ENVIRONMENT_UPDATES_QUEUE, TaskPriority
 from webhooks.constants import WEBHOOK_DATETIME_FORMAT
 from webhooks.webhooks import (
     WebhookEventType,
@@ -12,6 +15,12 @@ from webhooks.webhooks import (
 from .models import HistoricalFeatureState
 
 
+@register_task_handler(queue=ENVIRONMENT_UPDATES_QUEUE, priority=TaskPriority.HIGH)
+def rebuild_environment_flags_payloads(environment_ids: typing.List[int]):
+    for environment in Environment.objects.filter(id__in=environment_ids):
+        rebuild_environment_flags_payload(environment)
+
+
 def trigger_feature_state_change_webhooks(
     instance: FeatureState, event_type: WebhookEventType = WebhookEventType.FLAG_UPDATED
 ):
@@ -38,19 +47,11 @@ def trigger_feature_state_change_webhooks(
     previous_state = _get_previous_state(history_instance, event_type)
     if previous_state:
         data.update(previous_state=previous_state)
-    Thread(
-        target=call_environment_webhooks,
-        args=(instance.environment, data, event_type),
-    ).start()
-
-    Thread(
-        target=call_organisation_webhooks,
-        args=(
-            instance.environment.project.organisation,
-            data,
-            event_type,
-        ),
-    ).start()
+    # the webhooks are delivered in the background, see webhooks.delivery
+    call_environment_webhooks(instance.environment, data, event_type)
+    call_organisation_webhooks(
+        instance.environment.project.organisation, data, event_type
+    )
 
 
 def _get_previous_state(
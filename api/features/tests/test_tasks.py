@@ -11,8 +11,11 @@ from webhooks.webhooks import WebhookEventType
 
 
 @pytest.mark.django_db
-@mock.patch("features.tasks.Thread")
-def test_trigger_feature_state_change_webhooks(MockThread):
+@mock.patch("features.tasks.call_organisation_webhooks")
+@mock.patch("features.tasks.call_environment_webhooks")
+def test_trigger_feature_state_change_webhooks(
+    mock_call_environment_webhooks, mock_call_organisation_webhooks
+):
     # Given
     initial_value = "initial"
     new_value = "new"
@@ -30,34 +33,40 @@ def test_trigger_feature_state_change_webhooks(MockThread):
     feature_state.feature_state_value.save()
     feature_state.save()
 
-    MockThread.reset_mock()  # reset mock as it will have been called when setting up the data
+    # reset mocks as they will have been called when setting up the data
+    mock_call_environment_webhooks.reset_mock()
+    mock_call_organisation_webhooks.reset_mock()
 
     # When
     trigger_feature_state_change_webhooks(feature_state)
 
     # Then
-    call_list = MockThread.call_args_list
+    environment_webhook_call_args, _ = mock_call_environment_webhooks.call_args
+    organisation_webhook_call_args, _ = mock_call_organisation_webhooks.call_args
 
-    environment_webhook_call_args = call_list[0]
-    organisation_webhook_call_args = call_list[1]
+    assert environment_webhook_call_args[0] == environment
+    assert organisation_webhook_call_args[0] == organisation
 
     # verify that the data for both calls is the same
-    assert (
-        environment_webhook_call_args[1]["args"][1]
-        == organisation_webhook_call_args[1]["args"][1]
-    )
+    assert environment_webhook_call_args[1] == organisation_webhook_call_args[1]
 
-    data = environment_webhook_call_args[1]["args"][1]
-    event_type = environment_webhook_call_args[1]["args"][2]
+    data = environment_webhook_call_args[1]
+    event_type = environment_webhook_call_args[2]
     assert data["new_state"]["feature_state_value"] == new_value
     assert data["previous_state"]["feature_state_value"] == initial_value
     assert event_type == WebhookEventType.FLAG_UPDATED
 
 
 @pytest.mark.django_db
-@mock.patch("features.tasks.Thread")
+@mock.patch("features.tasks.call_organisation_webhooks")
+@mock.patch("features.tasks.call_environment_webhooks")
 def test_trigger_feature_state_change_webhooks_for_deleted_flag(
-    MockThread, organisation, project, environment, feature
+    mock_call_environment_webhooks,
+    mock_call_organisation_webhooks,
+    organisation,
+    project,
+    environment,
+    feature,
 ):
     # Given
     new_value = "new"
@@ -68,23 +77,23 @@ def test_trigger_feature_state_change_webhooks_for_deleted_flag(
     feature_state.feature_state_value.save()
     feature_state.save()
 
-    MockThread.reset_mock()  # reset mock as it will have been called when setting up the data
+    # reset mocks as they will have been called when setting up the data
+    mock_call_environment_webhooks.reset_mock()
+    mock_call_organisation_webhooks.reset_mock()
     trigger_feature_state_change_webhooks(feature_state, WebhookEventType.FLAG_DELETED)
 
     # Then
-    call_list = MockThread.call_args_list
+    environment_webhook_call_args, _ = mock_call_environment_webhooks.call_args
+    organisation_webhook_call_args, _ = mock_call_organisation_webhooks.call_args
 
-    environment_webhook_call_args = call_list[0]
-    organisation_webhook_call_args = call_list[1]
+    assert environment_webhook_call_args[0] == environment
+    assert organisation_webhook_call_args[0] == organisation
 
     # verify that the data for both calls is the same
-    assert (
-        environment_webhook_call_args[1]["args"][1]
-        == organisation_webhook_call_args[1]["args"][1]
-    )
+    assert environment_webhook_call_args[1] == organisation_webhook_call_args[1]
 
-    data = environment_webhook_call_args[1]["args"][1]
-    event_type = environment_webhook_call_args[1]["args"][2]
+    data = environment_webhook_call_args[1]
+    event_type = environment_webhook_call_args[2]
     assert data["new_state"] is None
     assert data["previous_state"]["feature_state_value"] == new_value
     assert event_type == WebhookEventType.FLAG_DELETED
@@ -5,6 +5,7 @@ from unittest import TestCase, mock
 import pytest
 import pytz
 from django.forms import model_to_dict
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
@@ -17,6 +18,7 @@ from audit.models import (
 )
 from environments.identities.models import Identity
 from environments.models import Environment
+from environments.tasks import process_environment_update
 from features.models import (
     Feature,
     FeatureSegment,
@@ -28,6 +30,8 @@ from permissions.models import PermissionModel
 from projects.models import Project, UserProjectPermission
 from projects.tags.models import Tag
 from segments.models import Segment
+from task_processor.models import Task
+from task_processor.task_run_method import TaskRunMethod
 from users.models import FFAdminUser
 from util.tests import Helper
 from webhooks.webhooks import WebhookEventType
@@ -386,8 +390,8 @@ class ProjectFeatureTestCase(TestCase):
 
         assert all(fs.enabled is False for fs in feature.feature_states.all())
 
-    @mock.patch("features.views.get_multiple_event_list_for_feature")
-    def test_get_influx_data(self, mock_get_event_list):
+    @mock.patch("features.views.get_analytics_backend")
+    def test_get_influx_data(self, mock_get_analytics_backend):
         # Given
         feature = Feature.objects.create(name="test_feature", project=self.project)
         base_url = reverse(
@@ -396,6 +400,9 @@ class ProjectFeatureTestCase(TestCase):
         )
         url = f"{base_url}?environment_id={self.environment_1.id}"
 
+        mock_get_event_list = (
+            mock_get_analytics_backend.return_value.get_multiple_event_list_for_feature
+        )
         mock_get_event_list.return_value = [
             {
                 feature.name: 1,
@@ -522,7 +529,7 @@ class ProjectFeatureTestCase(TestCase):
         feature.refresh_from_db()
         assert feature.description == data["description"]
 
-    @mock.patch("environments.models.environment_wrapper")
+    @mock.patch("environments.tasks.environment_wrapper")
     def test_create_feature_only_triggers_write_to_dynamodb_once_per_environment(
         self, mock_dynamo_environment_wrapper
     ):
@@ -534,13 +541,19 @@ class ProjectFeatureTestCase(TestCase):
         self.project.save()
 
         mock_dynamo_environment_wrapper.is_enabled = True
-        mock_dynamo_environment_wrapper.reset_mock()
 
         # When
-        self.client.post(url, data=data)
+        with override_settings(TASK_RUN_METHOD=TaskRunMethod.TASK_PROCESSOR):
+            self.client.post(url, data=data)
 
         # Then
-        mock_dynamo_environment_wrapper.write_environments.assert_called_once()
+        # the dynamodb writes are coalesced into a single task per environment
+        tasks = Task.objects.filter(
+            task_identifier=process_environment_update.task_identifier
+        )
+        assert sorted(task.args[0] for task in tasks) == sorted(
+            [self.environment_1.id, self.environment_2.id]
+        )
 
 
 @pytest.mark.django_db
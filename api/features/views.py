@@ -2,11 +2,10 @@ import logging
 import typing
 from functools import reduce
 
-from app_analytics.influxdb_wrapper import get_multiple_event_list_for_feature
+from app_analytics.backends import get_analytics_backend
 from core.permissions import HasMasterAPIKey
-from django.conf import settings
-from django.core.cache import caches
 from django.db.models import Q, QuerySet
+from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from drf_yasg2 import openapi
 from drf_yasg2.utils import swagger_auto_schema
@@ -38,8 +37,13 @@ from environments.permissions.permissions import (
     NestedEnvironmentPermissions,
 )
 from projects.models import Project
+from util.views import ConditionalGetMixin
 from webhooks.webhooks import WebhookEventType
 
+from .flags_payload import (
+    get_environment_flags_filter,
+    get_environment_flags_payload,
+)
 from .models import Feature, FeatureState
 from .permissions import (
     EnvironmentFeatureStatePermissions,
@@ -71,8 +75,6 @@ from .tasks import trigger_feature_state_change_webhooks
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-flags_cache = caches[settings.FLAGS_CACHE_LOCATION]
-
 
 @swagger_auto_schema(responses={200: ListCreateFeatureSerializer()}, method="get")
 @api_view(["GET"])
@@ -207,7 +209,7 @@ class FeatureViewSet(viewsets.ModelViewSet):
         query_serializer = GetInfluxDataQuerySerializer(data=request.query_params)
         query_serializer.is_valid(raise_exception=True)
 
-        events_list = get_multiple_event_list_for_feature(
+        events_list = get_analytics_backend().get_multiple_event_list_for_feature(
             feature_name=feature.name, **query_serializer.data
         )
         serializer = FeatureInfluxDataSerializer(instance={"events_list": events_list})
@@ -251,8 +253,9 @@ class FeatureViewSet(viewsets.ModelViewSet):
             master_api_key=master_api_key,
         )
         for feature_state in feature_states:
-            # for each of these, we skip sending the environments to dynamodb since
-            # we have already sent all the environments for the project audit log above
+            # for each of these, we skip scheduling the environment updates since
+            # we have already scheduled them for all environments for the project
+            # audit log above
             AuditLog.objects.create(
                 author=author,
                 project=feature.project,
@@ -260,7 +263,7 @@ class FeatureViewSet(viewsets.ModelViewSet):
                 related_object_type=RelatedObjectType.FEATURE_STATE.name,
                 related_object_id=feature_state.id,
                 log=message,
-                skip_signals="send_environments_to_dynamodb",
+                skip_signals="schedule_environment_updates_from_audit_log",
                 master_api_key=master_api_key,
             )
 
@@ -586,7 +589,7 @@ class SimpleFeatureStateViewSet(
             raise NotFound("Environment not found.")
 
 
-class SDKFeatureStates(GenericAPIView):
+class SDKFeatureStates(ConditionalGetMixin, GenericAPIView):
     serializer_class = FeatureStateSerializerFull
     permission_classes = (EnvironmentKeyPermissions,)
     authentication_classes = (EnvironmentKeyAuthentication,)
@@ -625,39 +628,14 @@ class SDKFeatureStates(GenericAPIView):
 
             return Response(self.get_serializer(feature_states[0]).data)
 
-        if settings.CACHE_FLAGS_SECONDS > 0:
-            data = self._get_flags_from_cache(request.environment)
-        else:
-            data = self.get_serializer(
-                FeatureState.get_environment_flags_list(
-                    environment_id=request.environment.id,
-                    additional_filters=self._additional_filters,
-                ),
-                many=True,
-            ).data
-
-        return Response(data)
+        payload = get_environment_flags_payload(request.environment)
+        response = HttpResponse(payload.content, content_type="application/json")
+        response["ETag"] = payload.etag
+        return response
 
     @property
     def _additional_filters(self) -> Q:
-        exclude_hide_disabled = Q(
-            feature__project__hide_disabled_flags=True, enabled=False
-        )
-        return Q(feature_segment=None, identity=None) & ~exclude_hide_disabled
-
-    def _get_flags_from_cache(self, environment):
-        data = flags_cache.get(environment.api_key)
-        if not data:
-            data = self.get_serializer(
-                FeatureState.get_environment_flags_list(
-                    environment_id=environment.id,
-                    additional_filters=self._additional_filters,
-                ),
-                many=True,
-            ).data
-            flags_cache.set(environment.api_key, data, settings.CACHE_FLAGS_SECONDS)
-
-        return data
+        return get_environment_flags_filter()
 
     def _get_flags_response_with_identifier(self, request, identifier):
         identity, _ = Identity.objects.get_or_create(
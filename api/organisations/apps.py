@@ -10,3 +10,4 @@ class OrganisationsConfig(AppConfig):
     def ready(self):
         # noinspection PyUnresolvedReferences
         import organisations.signals  # noqa
+        import organisations.tasks  # noqa
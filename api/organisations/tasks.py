@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+
+from organisations.models import Organisation
+from organisations.subscriptions.subscription_service import (
+    get_subscription_metadata,
+)
+from task_processor.decorators import register_recurring_task
+from task_processor.models import TaskPriority
+from users.models import FFAdminUser
+
+
+@register_recurring_task(run_every=timedelta(hours=12), priority=TaskPriority.LOW)
+def check_organisations_over_plan_limit_periodically():
+    if settings.ENABLE_PLAN_LIMIT_CHECKS:
+        check_if_organisations_over_plan_limit()
+
+
+def check_if_organisations_over_plan_limit():
+    # there's no need to check organisations which have already been alerted
+    for org in Organisation.objects.filter(
+        alerted_over_plan_limit=False
+    ).select_related("subscription"):
+        if org.over_plan_seats_limit():
+            send_alert(org)
+            org.alerted_over_plan_limit = True
+            org.save()
+
+
+def send_alert(organisation):
+    subscription_metadata = get_subscription_metadata(organisation)
+    FFAdminUser.send_alert_to_admin_users(
+        subject="Organisation over number of seats",
+        message="Organisation %s has used %d seats which is over their plan limit of %d "
+        "(plan: %s)"
+        % (
+            str(organisation.name),
+            organisation.num_seats,
+            subscription_metadata.seats,
+            organisation.subscription.plan,
+        ),
+    )
@@ -4,10 +4,8 @@ from __future__ import unicode_literals
 import logging
 from datetime import datetime
 
-from app_analytics.influxdb_wrapper import (
-    get_events_for_organisation,
-    get_multiple_event_list_for_organisation,
-)
+from app_analytics.cache import get_organisation_event_list
+from app_analytics.usage import get_organisation_api_calls
 from django.contrib.sites.shortcuts import get_current_site
 from drf_yasg2.utils import swagger_auto_schema
 from rest_framework import status, viewsets
@@ -139,7 +137,7 @@ class OrganisationViewSet(viewsets.ModelViewSet):
         organisation = self.get_object()
 
         try:
-            events = get_events_for_organisation(organisation.id)
+            events = get_organisation_api_calls(organisation.id)
         except (TypeError, ValueError):
             # TypeError can be thrown when getting service account if not configured
             # ValueError can be thrown if GA returns a value that cannot be converted to integer
@@ -208,9 +206,8 @@ class OrganisationViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["GET"], url_path="influx-data")
     def get_influx_data(self, request, pk):
-        serializer = self.get_serializer(
-            data={"events_list": get_multiple_event_list_for_organisation(pk)}
-        )
+        events_list = get_organisation_event_list(pk)
+        serializer = self.get_serializer(data={"events_list": events_list})
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data)
 
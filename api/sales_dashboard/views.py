@@ -1,14 +1,16 @@
 import json
 
-from app_analytics.influxdb_wrapper import (
-    get_event_list_for_organisation,
-    get_events_for_organisation,
-    get_top_organisations,
+from app_analytics.backends import get_analytics_backend
+from app_analytics.usage import (
+    API_USAGE_FIELDS,
+    get_organisation_api_calls,
+    is_api_usage_precomputed,
 )
 from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
 from django.http import (
     HttpResponse,
     HttpResponseBadRequest,
@@ -64,13 +66,25 @@ class OrganisationList(ListView):
             else:
                 queryset = queryset.filter(subscription__plan__icontains=filter_plan)
 
-        # Annotate the queryset with the organisations usage for the given time periods
-        # and order the queryset with it. Note: this is done as late as possible to
-        # reduce the impact of the query.
-        if settings.INFLUXDB_TOKEN:
+        # Annotate the queryset with the organisations usage for the given time
+        # periods and order the queryset with it.
+        if is_api_usage_precomputed():
+            # precomputed by app_analytics.tasks
+            queryset = queryset.annotate(
+                **{
+                    f"num_{date_range}_calls": Coalesce(f"api_usage__{field}", 0)
+                    for date_range, field in API_USAGE_FIELDS.items()
+                }
+            )
+            if settings.ANALYTICS_ENABLED:
+                queryset = queryset.order_by("-num_24h_calls")
+        elif settings.ANALYTICS_ENABLED:
+            # Note: this is done as late as possible to reduce the impact of the
+            # query.
+            analytics_backend = get_analytics_backend()
             for date_range, limit in (("30d", ""), ("7d", ""), ("24h", "100")):
                 key = f"num_{date_range}_calls"
-                org_calls = get_top_organisations(date_range, limit)
+                org_calls = analytics_backend.get_top_organisations(date_range, limit)
                 if org_calls:
                     whens = [When(id=k, then=Value(v)) for k, v in org_calls.items()]
                     queryset = queryset.annotate(
@@ -114,8 +128,11 @@ def organisation_info(request, organisation_id):
     )
     template = loader.get_template("sales_dashboard/organisation.html")
     subscription_metadata = get_subscription_metadata(organisation)
+    analytics_backend = get_analytics_backend()
 
-    event_list, labels = get_event_list_for_organisation(organisation_id)
+    event_list, labels = analytics_backend.get_event_list_for_organisation(
+        organisation_id
+    )
 
     identity_count_dict = {}
     identity_migration_status_dict = {}
@@ -142,27 +159,13 @@ def organisation_info(request, organisation_id):
         ),
         "labels": mark_safe(json.dumps(labels)),
         "api_calls": {
-            # TODO: this could probably be reduced to a single influx request
-            #  rather than 3
-            range_: get_events_for_organisation(organisation_id, date_range=range_)
-            for range_ in ("24h", "7d", "30d")
+            date_range: get_organisation_api_calls(organisation_id, date_range)
+            for date_range in API_USAGE_FIELDS
         },
         "identity_count_dict": identity_count_dict,
         "identity_migration_status_dict": identity_migration_status_dict,
     }
 
-    # If self hosted and running without an Influx DB data store, we dont want to/cant show usage
-    if settings.INFLUXDB_TOKEN:
-        event_list, labels = get_event_list_for_organisation(organisation_id)
-        context["event_list"] = event_list
-        context["traits"] = mark_safe(json.dumps(event_list["traits"]))
-        context["identities"] = mark_safe(json.dumps(event_list["identities"]))
-        context["flags"] = mark_safe(json.dumps(event_list["flags"]))
-        context["environment_documents"] = mark_safe(
-            json.dumps(event_list["environment-document"])
-        )
-        context["labels"] = mark_safe(json.dumps(labels))
-
     return HttpResponse(template.render(context, request))
 
 
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SegmentsConfig(AppConfig):
     name = "segments"
+
+    def ready(self):
+        # noinspection PyUnresolvedReferences
+        import segments.signals  # noqa
@@ -0,0 +1,363 @@
+"""
+Compiled segment evaluation.
+
+Evaluating segments through the Segment -> SegmentRule -> Condition models means
+that, for every identity request, each condition re-parses its value and scans the
+full list of traits. Here we compile a project's segments once into a flat program
+of plain python objects (with values pre-cast and regexes pre-compiled) so that
+evaluation only needs a single dictionary lookup per condition.
+
+Each process keeps the compiled program in memory for up to
+CACHE_COMPILED_SEGMENTS_SECONDS, under the revision of the project's segments held
+in the environment document cache. Changing a segment, rule or condition moves the
+project on to a new revision (see segments.signals), so every process recompiles
+its segments once the revision held in its local tier expires (after at most
+ENVIRONMENT_DOCUMENT_LOCAL_CACHE_SECONDS).
+"""
+import logging
+import operator
+import threading
+import time
+import typing
+import uuid
+
+import semver
+from core.constants import BOOLEAN, FLOAT, INTEGER
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from flag_engine.utils.semver import is_semver, remove_semver_suffix
+
+from environments.identities.helpers import (
+    get_hashed_percentage_for_object_ids,
+)
+from segments.models import (
+    CONTAINS,
+    EQUAL,
+    GREATER_THAN,
+    GREATER_THAN_INCLUSIVE,
+    LESS_THAN,
+    LESS_THAN_INCLUSIVE,
+    MODULO,
+    NOT_CONTAINS,
+    NOT_EQUAL,
+    PERCENTAGE_SPLIT,
+    REGEX,
+    Condition,
+    Segment,
+    SegmentRule,
+    re,
+)
+
+if typing.TYPE_CHECKING:
+    from environments.identities.models import Identity
+    from environments.identities.traits.models import Trait
+    from projects.models import Project
+
+logger = logging.getLogger(__name__)
+
+# the revisions are read on every identity request, so are read through the local
+# tier of the environment document cache rather than from the shared cache
+segments_revision_cache = caches[settings.ENVIRONMENT_DOCUMENT_CACHE_LOCATION]
+
+TraitIndex = typing.Dict[str, typing.List["Trait"]]
+
+_NUMERIC_OPERATORS = {
+    EQUAL: operator.eq,
+    GREATER_THAN: operator.gt,
+    GREATER_THAN_INCLUSIVE: operator.ge,
+    LESS_THAN: operator.lt,
+    LESS_THAN_INCLUSIVE: operator.le,
+    NOT_EQUAL: operator.ne,
+}
+_BOOLEAN_OPERATORS = {EQUAL: operator.eq, NOT_EQUAL: operator.ne}
+_STRING_OPERATORS = {
+    EQUAL: operator.eq,
+    NOT_EQUAL: operator.ne,
+    CONTAINS: lambda value, condition_value: condition_value in value,
+    NOT_CONTAINS: lambda value, condition_value: condition_value not in value,
+}
+
+
+def _cast(cast: typing.Callable, value: str) -> typing.Any:
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+
+def _parse_boolean(value: str) -> typing.Optional[bool]:
+    if value in ("False", "false", "0"):
+        return False
+    elif value in ("True", "true", "1"):
+        return True
+    return None
+
+
+def _parse_modulo(value: str) -> typing.Optional[typing.Tuple[float, float]]:
+    try:
+        divisor, remainder = value.split("|")
+        return float(divisor), float(remainder)
+    except ValueError:
+        return None
+
+
+def _parse_semver(value: str) -> typing.Optional[semver.VersionInfo]:
+    if not is_semver(value):
+        return None
+    return _cast(semver.VersionInfo.parse, remove_semver_suffix(value))
+
+
+def _compile_regex(value: str):
+    try:
+        return re.compile(value)
+    except re.error:
+        logger.warning("Unable to compile segment condition regex '%s'.", value)
+        return None
+
+
+def build_trait_index(traits: typing.Iterable["Trait"]) -> TraitIndex:
+    """
+    Group the given traits by key, preserving their original order so that
+    evaluation picks the same trait as Condition.does_identity_match would.
+    """
+    trait_index = {}
+    for trait in traits:
+        trait_index.setdefault(trait.trait_key, []).append(trait)
+    return trait_index
+
+
+class CompiledCondition:
+    """
+    Pre-parsed equivalent of Condition.does_identity_match.
+    """
+
+    __slots__ = (
+        "operator",
+        "property",
+        "segment_id",
+        "integer_value",
+        "float_value",
+        "boolean_value",
+        "semver_value",
+        "string_value",
+        "modulo_value",
+        "percentage_value",
+        "regex",
+        "is_semver",
+    )
+
+    def __init__(self, condition: Condition, segment_id: int):
+        value = str(condition.value)
+
+        self.operator = condition.operator
+        self.property = condition.property
+        self.segment_id = segment_id
+        self.string_value = value
+        self.integer_value = _cast(int, value)
+        self.float_value = _cast(float, value)
+        self.boolean_value = _parse_boolean(value)
+        self.is_semver = is_semver(value)
+        self.semver_value = _parse_semver(value)
+        self.modulo_value = (
+            _parse_modulo(value) if condition.operator == MODULO else None
+        )
+        self.percentage_value = (
+            self.float_value / 100.0
+            if condition.operator == PERCENTAGE_SPLIT and self.float_value is not None
+            else None
+        )
+        self.regex = _compile_regex(value) if condition.operator == REGEX else None
+
+    def matches(self, identity_id: int, trait_index: TraitIndex) -> bool:
+        if self.operator == PERCENTAGE_SPLIT:
+            return self.percentage_value is not None and (
+                get_hashed_percentage_for_object_ids(
+                    object_ids=[self.segment_id, identity_id]
+                )
+                <= self.percentage_value
+            )
+
+        traits = trait_index.get(self.property)
+        if not traits:
+            return False
+
+        if self.operator == MODULO:
+            for trait in traits:
+                if trait.value_type in (INTEGER, FLOAT):
+                    return self._match_modulo(trait.trait_value)
+            return False
+
+        return self._match_trait(traits[0])
+
+    def _match_trait(self, trait: "Trait") -> bool:
+        if trait.value_type == INTEGER:
+            return self._compare(
+                _NUMERIC_OPERATORS, trait.integer_value, self.integer_value
+            )
+        elif trait.value_type == FLOAT:
+            return self._compare(
+                _NUMERIC_OPERATORS, trait.float_value, self.float_value
+            )
+        elif trait.value_type == BOOLEAN:
+            return self._compare(
+                _BOOLEAN_OPERATORS, trait.boolean_value, self.boolean_value
+            )
+        elif self.is_semver:
+            return self._compare(
+                _NUMERIC_OPERATORS, trait.string_value, self.semver_value
+            )
+        elif self.operator == REGEX:
+            return (
+                self.regex is not None
+                and self.regex.match(trait.string_value) is not None
+            )
+
+        return self._compare(_STRING_OPERATORS, trait.string_value, self.string_value)
+
+    def _compare(
+        self, operators: dict, trait_value: typing.Any, condition_value: typing.Any
+    ) -> bool:
+        compare = operators.get(self.operator)
+        if compare is None or condition_value is None:
+            return False
+        return compare(trait_value, condition_value)
+
+    def _match_modulo(self, value: typing.Union[int, float]) -> bool:
+        if self.modulo_value is None:
+            return False
+        divisor, remainder = self.modulo_value
+        return value % divisor == remainder
+
+
+class CompiledRule:
+    __slots__ = ("type", "conditions", "rules")
+
+    def __init__(self, rule: SegmentRule, segment_id: int):
+        self.type = rule.type
+        self.conditions = tuple(
+            CompiledCondition(condition, segment_id)
+            for condition in rule.conditions.all()
+        )
+        self.rules = tuple(
+            CompiledRule(child_rule, segment_id) for child_rule in rule.rules.all()
+        )
+
+    def matches(self, identity_id: int, trait_index: TraitIndex) -> bool:
+        if not self._matches_conditions(identity_id, trait_index):
+            return False
+        return all(rule.matches(identity_id, trait_index) for rule in self.rules)
+
+    def _matches_conditions(self, identity_id: int, trait_index: TraitIndex) -> bool:
+        if not self.conditions:
+            return True
+
+        results = (
+            condition.matches(identity_id, trait_index) for condition in self.conditions
+        )
+        if self.type == SegmentRule.ALL_RULE:
+            return all(results)
+        elif self.type == SegmentRule.ANY_RULE:
+            return any(results)
+        elif self.type == SegmentRule.NONE_RULE:
+            return not any(results)
+
+        return False
+
+
+class CompiledSegment:
+    __slots__ = ("segment", "rules")
+
+    def __init__(self, segment: Segment):
+        self.segment = segment
+        self.rules = tuple(
+            CompiledRule(rule, segment.id) for rule in segment.rules.all()
+        )
+
+    def matches(self, identity_id: int, trait_index: TraitIndex) -> bool:
+        return bool(self.rules) and all(
+            rule.matches(identity_id, trait_index) for rule in self.rules
+        )
+
+
+class CompiledSegments:
+    def __init__(self, segments: typing.Iterable[Segment]):
+        self.segments = tuple(CompiledSegment(segment) for segment in segments)
+
+    def get_matching_segments(
+        self, identity: "Identity", traits: typing.Iterable["Trait"]
+    ) -> typing.List[Segment]:
+        trait_index = build_trait_index(traits)
+        return [
+            compiled_segment.segment
+            for compiled_segment in self.segments
+            if compiled_segment.matches(identity.id, trait_index)
+        ]
+
+
+class _CachedCompiledSegments(typing.NamedTuple):
+    revision: str
+    expires_at: float
+    compiled_segments: CompiledSegments
+
+
+_compiled_segments_cache: typing.Dict[int, _CachedCompiledSegments] = {}
+_compiled_segments_cache_lock = threading.Lock()
+
+
+def get_compiled_segments(project: "Project") -> CompiledSegments:
+    # read the revision before the segments, so that segments loaded before a
+    # change are never cached under the revision that follows it
+    revision = _get_revision(project.id)
+
+    cached = _compiled_segments_cache.get(project.id)
+    if cached and cached.revision == revision and cached.expires_at > time.monotonic():
+        return cached.compiled_segments
+
+    compiled_segments = CompiledSegments(project.get_segments_from_cache())
+
+    timeout = settings.CACHE_COMPILED_SEGMENTS_SECONDS
+    if timeout > 0:
+        with _compiled_segments_cache_lock:
+            _compiled_segments_cache[project.id] = _CachedCompiledSegments(
+                revision=revision,
+                expires_at=time.monotonic() + timeout,
+                compiled_segments=compiled_segments,
+            )
+
+    return compiled_segments
+
+
+def invalidate_compiled_segments(project_id: int) -> None:
+    """
+    Move the project's segments on to a new revision, so that every process
+    recompiles them. This is done again once the change is committed, since
+    another process could otherwise compile the segments as they were before the
+    change, under the new revision, while the change is still uncommitted.
+    """
+    _set_revision(project_id)
+    transaction.on_commit(lambda: _set_revision(project_id))
+
+
+def _set_revision(project_id: int) -> None:
+    segments_revision_cache.set(
+        _get_revision_cache_key(project_id), uuid.uuid4().hex, timeout=None
+    )
+    with _compiled_segments_cache_lock:
+        _compiled_segments_cache.pop(project_id, None)
+
+
+def _get_revision(project_id: int) -> str:
+    revision_key = _get_revision_cache_key(project_id)
+    revision = segments_revision_cache.get(revision_key)
+    if revision is None:
+        # use a random revision rather than a counter so that, if the revision is
+        # evicted from the cache, we can't revert to an old revision.
+        revision = uuid.uuid4().hex
+        if not segments_revision_cache.add(revision_key, revision, timeout=None):
+            revision = segments_revision_cache.get(revision_key, revision)
+    return revision
+
+
+def _get_revision_cache_key(project_id: int) -> str:
+    return f"compiled-segments:{project_id}:revision"
@@ -0,0 +1,48 @@
+import typing
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from projects.models import project_segments_cache
+from segments.evaluator import invalidate_compiled_segments
+from segments.models import Condition, Segment, SegmentRule
+
+
+def _get_project_id(rule: SegmentRule) -> typing.Optional[int]:
+    try:
+        return rule.get_segment().project_id
+    except ObjectDoesNotExist:
+        # the parent objects have already been removed as part of a cascade
+        # delete, in which case the segment's own signal handles invalidation.
+        return None
+
+
+def _invalidate_project_segments(project_id: typing.Optional[int]) -> None:
+    if project_id is None:
+        return
+
+    project_segments_cache.delete(project_id)
+    invalidate_compiled_segments(project_id)
+
+
+@receiver(post_save, sender=Segment)
+@receiver(post_delete, sender=Segment)
+def invalidate_segments_on_segment_change(sender, instance, **kwargs):
+    _invalidate_project_segments(instance.project_id)
+
+
+@receiver(post_save, sender=SegmentRule)
+@receiver(post_delete, sender=SegmentRule)
+def invalidate_segments_on_rule_change(sender, instance, **kwargs):
+    _invalidate_project_segments(_get_project_id(instance))
+
+
+@receiver(post_save, sender=Condition)
+@receiver(post_delete, sender=Condition)
+def invalidate_segments_on_condition_change(sender, instance, **kwargs):
+    try:
+        rule = instance.rule
+    except ObjectDoesNotExist:
+        return
+    _invalidate_project_segments(_get_project_id(rule))
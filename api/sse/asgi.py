@@ -0,0 +1,139 @@
+import asyncio
+import json
+import re
+import typing
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from environments.models import Environment
+
+from .streaming import Subscription, subscribe
+
+STREAM_PATH_REGEX = re.compile(
+    r"^/sse/environments/(?P<environment_key>[^/]+)/stream/?$"
+)
+
+ENVIRONMENT_UPDATED_EVENT = "environment_updated"
+
+
+class EnvironmentStreamApplication:
+    """
+    ASGI application that streams server sent events to the SDKs subscribed to an
+    environment (by its client side key) at /sse/environments/<key>/stream, in the
+    same format as the SSE server, and passes all other requests on to the
+    wrapped application.
+
+    Each time the environment is updated, an environment_updated event is sent
+    with the time of the update, e.g.
+
+        event: environment_updated
+        data: {"updated_at": 1665075283.421}
+
+    A comment is sent every SSE_STREAMING_KEEPALIVE_SECONDS when there are no
+    updates, so that idle connections aren't closed by proxies.
+    """
+
+    def __init__(self, application: typing.Callable):
+        self.application = application
+
+    async def __call__(
+        self, scope: dict, receive: typing.Callable, send: typing.Callable
+    ):
+        match = scope["type"] == "http" and STREAM_PATH_REGEX.match(scope["path"])
+        if not match:
+            return await self.application(scope, receive, send)
+
+        if scope["method"] != "GET":
+            return await self._send_error(send, 405, "Method not allowed.")
+
+        environment_key = match.group("environment_key")
+        if not await _environment_exists(environment_key):
+            return await self._send_error(send, 404, "Not found.")
+
+        # subscribe before responding, so that the client doesn't miss the updates
+        # made after it connects. For the first subscription in a process, this
+        # waits (briefly) for the process to start receiving updates, see
+        # PostgresStreamingBackend.start
+        with await subscribe(environment_key) as subscription:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"access-control-allow-origin", b"*"),
+                        # stop nginx from buffering the events
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            await self._stream(subscription, receive, send)
+
+    async def _stream(
+        self,
+        subscription: Subscription,
+        receive: typing.Callable,
+        send: typing.Callable,
+    ) -> None:
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        update = asyncio.ensure_future(subscription.get())
+        try:
+            while True:
+                await asyncio.wait(
+                    {disconnected, update},
+                    timeout=settings.SSE_STREAMING_KEEPALIVE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected.done():
+                    return
+
+                if update.done():
+                    body = _get_event(
+                        ENVIRONMENT_UPDATED_EVENT, {"updated_at": update.result()}
+                    )
+                    update = asyncio.ensure_future(subscription.get())
+                else:
+                    body = b": keepalive\n\n"
+
+                await send(
+                    {"type": "http.response.body", "body": body, "more_body": True}
+                )
+        finally:
+            disconnected.cancel()
+            update.cancel()
+
+    @staticmethod
+    async def _send_error(send: typing.Callable, status: int, detail: str) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": json.dumps({"detail": detail}).encode(),
+            }
+        )
+
+
+@sync_to_async
+def _environment_exists(environment_key: str) -> bool:
+    # as done by django at the start of each request, since these requests
+    # aren't handled by django
+    close_old_connections()
+    return Environment.objects.filter(api_key=environment_key).exists()
+
+
+async def _wait_for_disconnect(receive: typing.Callable) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def _get_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
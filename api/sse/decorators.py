@@ -30,7 +30,8 @@ def generate_identity_update_message(
                 environment, identifier = get_data_from_req_callable(request)
                 if environment.project.organisation.persist_trait_data:
                     send_identity_update_message.delay(
-                        args=(environment.api_key, identifier)
+                        args=(environment.api_key, identifier),
+                        dedup_key=f"{environment.api_key}:{identifier}",
                     )
             return result
 
@@ -0,0 +1,305 @@
+"""
+Publish environment updates to the SDKs subscribed to the API's own stream (see
+sse.asgi), as an alternative to running a separate SSE server.
+
+Subscribers are registered with the EnvironmentUpdateBroker of the process that
+serves their stream. Updates are published through the SSE_STREAMING_BACKEND,
+which delivers them to the broker of each process that has subscribers:
+
+ - PostgresStreamingBackend (the default) sends updates to every process using
+   NOTIFY, which each process serving streams picks up using LISTEN. On other
+   databases, it behaves like LocalStreamingBackend.
+ - LocalStreamingBackend delivers updates to the broker of the publishing process
+   only, so it can only be used when environment updates are processed by the
+   process serving the stream, i.e. when TASK_RUN_METHOD isn't TASK_PROCESSOR and
+   the API runs in a single process.
+
+check_backend is run when the API starts (see app.asgi), so that a backend that
+can't reach the streams from the task processor fails fast rather than serving
+streams that never receive any updates.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+import typing
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from task_processor.notifications import NotificationListener
+from task_processor.task_run_method import TaskRunMethod
+
+logger = logging.getLogger(__name__)
+
+ENVIRONMENT_UPDATED_CHANNEL = "sse_environment_updated"
+
+# how long the first subscription in a process waits for the listener to start
+# listening, so that the updates published meanwhile aren't missed
+LISTEN_TIMEOUT_SECONDS = 1
+
+DispatchCallable = typing.Callable[[str, float], None]
+DispatchAllCallable = typing.Callable[[float], None]
+
+
+class Subscription:
+    """
+    The updates to an environment for a single subscriber, which are consumed by
+    the subscriber's event loop.
+
+    Updates are coalesced, so that a subscriber that falls behind only receives
+    the latest update rather than a backlog of them.
+    """
+
+    def __init__(
+        self,
+        broker: "EnvironmentUpdateBroker",
+        environment_key: str,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        self.broker = broker
+        self.environment_key = environment_key
+        self.loop = loop
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def get(self) -> float:
+        return await self._queue.get()
+
+    def put(self, updated_at: float) -> None:
+        # must be called in the subscriber's event loop
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(updated_at)
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class EnvironmentUpdateBroker:
+    """
+    Keeps track of the subscribers in this process, and dispatches the updates to
+    each environment to its subscribers. Updates can be dispatched from any thread.
+    """
+
+    def __init__(self):
+        self._subscriptions: typing.Dict[str, typing.Set[Subscription]] = defaultdict(
+            set
+        )
+        self._lock = threading.Lock()
+
+    def subscribe(self, environment_key: str) -> Subscription:
+        # must be called in the subscriber's event loop
+        subscription = Subscription(self, environment_key, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[environment_key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.environment_key)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.environment_key]
+
+    def dispatch(self, environment_key: str, updated_at: float) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(environment_key, ()))
+
+        self._put(subscriptions, updated_at)
+
+    def dispatch_all(self, updated_at: float) -> None:
+        """
+        Dispatch an update to the subscribers of every environment, e.g. when
+        updates may have been missed.
+        """
+        with self._lock:
+            subscriptions = [
+                subscription
+                for environment_subscriptions in self._subscriptions.values()
+                for subscription in environment_subscriptions
+            ]
+
+        self._put(subscriptions, updated_at)
+
+    @staticmethod
+    def _put(subscriptions: typing.List[Subscription], updated_at: float) -> None:
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, updated_at)
+            except RuntimeError:
+                # the subscriber's event loop has been closed
+                subscription.close()
+
+    def get_num_subscriptions(self) -> int:
+        with self._lock:
+            return sum(map(len, self._subscriptions.values()))
+
+
+class BaseStreamingBackend(ABC):
+    def __init__(self, dispatch: DispatchCallable, dispatch_all: DispatchAllCallable):
+        self.dispatch = dispatch
+        self.dispatch_all = dispatch_all
+
+    @abstractmethod
+    def publish(self, environment_key: str, updated_at: float) -> None:
+        """
+        Deliver the update to the subscribers of every process (including this
+        one), by calling dispatch in each process.
+        """
+
+    @abstractmethod
+    def start(self) -> None:
+        """
+        Start receiving the updates published by other processes. Called before
+        each subscription, so must be idempotent, and must only return once the
+        updates published from then on will be received.
+        """
+
+    def reaches_other_processes(self) -> bool:
+        return True
+
+
+class LocalStreamingBackend(BaseStreamingBackend):
+    def publish(self, environment_key: str, updated_at: float) -> None:
+        self.dispatch(environment_key, updated_at)
+
+    def start(self) -> None:
+        pass
+
+    def reaches_other_processes(self) -> bool:
+        return False
+
+
+class PostgresStreamingBackend(BaseStreamingBackend):
+    def __init__(self, dispatch: DispatchCallable, dispatch_all: DispatchAllCallable):
+        super().__init__(dispatch, dispatch_all)
+        self._listener: typing.Optional[EnvironmentUpdateListener] = None
+        self._lock = threading.Lock()
+
+    def publish(self, environment_key: str, updated_at: float) -> None:
+        if connection.vendor != "postgresql":
+            self.dispatch(environment_key, updated_at)
+            return
+
+        payload = json.dumps(
+            {"environment_key": environment_key, "updated_at": updated_at}
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)", [ENVIRONMENT_UPDATED_CHANNEL, payload]
+            )
+
+    def start(self) -> None:
+        with self._lock:
+            if self._listener is not None:
+                return
+
+            self._listener = EnvironmentUpdateListener(
+                dispatch=self.dispatch, dispatch_all=self.dispatch_all
+            )
+            self._listener.start()
+
+            # LISTEN runs in the listener's thread, so wait for it before the first
+            # subscription is made, or the updates published meanwhile would never
+            # reach the stream. This only delays the first subscription in each
+            # process, and for no longer than LISTEN_TIMEOUT_SECONDS.
+            if connection.vendor == "postgresql" and not self._listener.listening.wait(
+                timeout=LISTEN_TIMEOUT_SECONDS
+            ):
+                logger.warning(
+                    "Not listening for environment updates after %ss, streams may "
+                    "miss updates until it is.",
+                    LISTEN_TIMEOUT_SECONDS,
+                )
+
+    def reaches_other_processes(self) -> bool:
+        return connection.vendor == "postgresql"
+
+
+class EnvironmentUpdateListener(NotificationListener):
+    channel = ENVIRONMENT_UPDATED_CHANNEL
+    unsupported_message = (
+        "LISTEN/NOTIFY not supported, only updates published by this process will "
+        "be streamed."
+    )
+
+    def __init__(
+        self,
+        *args,
+        dispatch: DispatchCallable,
+        dispatch_all: DispatchAllCallable,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.dispatch = dispatch
+        self.dispatch_all = dispatch_all
+
+    def on_notifications(self, notifies: typing.List[typing.Any]) -> None:
+        for notify in notifies:
+            try:
+                payload = json.loads(notify.payload)
+                self.dispatch(payload["environment_key"], payload["updated_at"])
+            except (ValueError, KeyError):
+                logger.warning("Invalid environment update: %s", notify.payload)
+
+    def on_reconnect(self) -> None:
+        # updates may have been published while the listener was down, so make
+        # the SDKs subscribed to any environment refetch
+        self.dispatch_all(time.time())
+
+
+broker = EnvironmentUpdateBroker()
+
+
+@lru_cache()
+def get_backend() -> BaseStreamingBackend:
+    return import_string(settings.SSE_STREAMING_BACKEND)(
+        dispatch=broker.dispatch, dispatch_all=broker.dispatch_all
+    )
+
+
+def check_backend() -> None:
+    """
+    Raise ImproperlyConfigured if environment updates are processed by the task
+    processor but the backend can't deliver them to the processes serving the
+    streams.
+    """
+    if (
+        settings.TASK_RUN_METHOD == TaskRunMethod.TASK_PROCESSOR
+        and not get_backend().reaches_other_processes()
+    ):
+        raise ImproperlyConfigured(
+            f"{settings.SSE_STREAMING_BACKEND} can't deliver environment updates "
+            "from the task processor to the streams. Use "
+            "sse.streaming.PostgresStreamingBackend, with a postgres database."
+        )
+
+
+def publish_environment_update(environment_key: str) -> None:
+    if not settings.SSE_STREAMING_ENABLED:
+        return
+
+    get_backend().publish(environment_key, time.time())
+
+
+async def subscribe(environment_key: str) -> Subscription:
+    # starting the backend can block (see PostgresStreamingBackend.start), so do it
+    # outside of the event loop, which is serving the other streams
+    await sync_to_async(get_backend().start, thread_sensitive=False)()
+    return broker.subscribe(environment_key)
@@ -1,26 +1,54 @@
-from typing import List
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
 
 import requests
 from django.conf import settings
 
 from task_processor.decorators import register_task_handler
+from task_processor.models import ENVIRONMENT_UPDATES_QUEUE, TaskPriority
 
 from .exceptions import SSEAuthTokenNotSet
 
+logger = logging.getLogger(__name__)
 
-@register_task_handler()
+REQUEST_TIMEOUT_SECONDS = 10
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# batch requests that get one of these status codes are sent one message at a time
+# instead
+BATCH_FALLBACK_STATUS_CODES = (404, 405)
+
+# once the SSE server has shown that it doesn't support batches, messages are sent
+# one at a time until this (monotonic) time, after which batches are tried again
+_batches_unsupported_until = 0.0
+BATCHES_UNSUPPORTED_RETRY_SECONDS = 300
+
+
+@register_task_handler(queue=ENVIRONMENT_UPDATES_QUEUE, priority=TaskPriority.HIGH)
 def send_environment_update_messages(environment_keys: List[str]):
-    for environment_key in environment_keys:
-        send_environment_update_message(environment_key)
+    if not settings.SSE_SERVER_BASE_URL:
+        return
 
+    _send_batched(
+        f"{settings.SSE_SERVER_BASE_URL}/sse/environments/bulk-queue-change",
+        "environment_keys",
+        environment_keys,
+        send_environment_update_message,
+        unsupported_status_codes=(404, 405),
+    )
 
-@register_task_handler()
+
+@register_task_handler(queue=ENVIRONMENT_UPDATES_QUEUE, priority=TaskPriority.HIGH)
 def send_environment_update_message(environment_key: str):
     if not settings.SSE_SERVER_BASE_URL:
         return
 
     url = f"{settings.SSE_SERVER_BASE_URL}/sse/environments/{environment_key}/queue-change"
-    response = requests.post(url, headers=get_auth_header())
+    response = _post(url)
     response.raise_for_status()
 
 
@@ -32,14 +60,26 @@ def send_identity_update_message(environment_key: str, identifier: str):
     url = f"{settings.SSE_SERVER_BASE_URL}/sse/environments/{environment_key}/identities/queue-change"
     payload = {"identifier": identifier}
 
-    response = requests.post(url, headers=get_auth_header(), json=payload)
+    response = _post(url, json=payload)
     response.raise_for_status()
 
 
-@register_task_handler()
+@register_task_handler(priority=TaskPriority.LOW)
 def send_identity_update_messages(environment_key: str, identifiers: List[str]):
-    for identifier in identifiers:
-        send_identity_update_message(environment_key, identifier)
+    if not settings.SSE_SERVER_BASE_URL:
+        return
+
+    _send_batched(
+        f"{settings.SSE_SERVER_BASE_URL}/sse/environments/{environment_key}"
+        "/identities/bulk-queue-change",
+        "identifiers",
+        identifiers,
+        lambda identifier: send_identity_update_message(environment_key, identifier),
+        # the url includes the environment key, so a 404 may mean that the SSE
+        # server doesn't know the environment rather than batches not being
+        # supported
+        unsupported_status_codes=(405,),
+    )
 
 
 def get_auth_header():
@@ -47,3 +87,63 @@ def get_auth_header():
         raise SSEAuthTokenNotSet()
 
     return {"Authorization": f"Token {settings.SSE_AUTHENTICATION_TOKEN}"}
+
+
+def get_session() -> requests.Session:
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+def _post(url: str, **kwargs) -> requests.Response:
+    return get_session().post(
+        url, headers=get_auth_header(), timeout=REQUEST_TIMEOUT_SECONDS, **kwargs
+    )
+
+
+def _send_batched(
+    url: str,
+    field: str,
+    keys: List[str],
+    send_one: Callable[[str], None],
+    unsupported_status_codes: Tuple[int, ...],
+) -> None:
+    """
+    Send the keys to the SSE server in batches of up to SSE_BATCH_SIZE, or one at
+    a time, using send_one, if a batch request fails with one of the
+    BATCH_FALLBACK_STATUS_CODES.
+
+    If the status code is one of unsupported_status_codes, i.e. the SSE server
+    doesn't support batches, messages are sent one at a time for the next
+    BATCHES_UNSUPPORTED_RETRY_SECONDS.
+    """
+    global _batches_unsupported_until
+
+    keys = list(dict.fromkeys(keys))
+    batch_size = settings.SSE_BATCH_SIZE
+
+    if batch_size > 1 and time.monotonic() >= _batches_unsupported_until:
+        for start in range(0, len(keys), batch_size):
+            end = start + batch_size
+            response = _post(url, json={field: keys[start:end]})
+            if response.status_code in BATCH_FALLBACK_STATUS_CODES:
+                if response.status_code in unsupported_status_codes:
+                    logger.info(
+                        "SSE server doesn't support batches, sending messages one "
+                        "at a time for %ss.",
+                        BATCHES_UNSUPPORTED_RETRY_SECONDS,
+                    )
+                    _batches_unsupported_until = (
+                        time.monotonic() + BATCHES_UNSUPPORTED_RETRY_SECONDS
+                    )
+                keys = keys[start:]
+                break
+            response.raise_for_status()
+        else:
+            return
+
+    for key in keys:
+        send_one(key)
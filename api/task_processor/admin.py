@@ -19,6 +19,7 @@ class TaskAdmin(admin.ModelAdmin):
         "scheduled_for",
         "num_failures",
         "completed",
+        "dead_lettered_at",
     )
     readonly_fields = ("args", "kwargs")
 
@@ -0,0 +1,15 @@
+"""
+Synthetic task used by the benchmarktaskprocessor command. It is only registered
+by the task processor (see runprocessor) and the benchmark command itself, rather
+than with the tasks that every deployment registers.
+"""
+import time
+
+from task_processor.decorators import register_task_handler
+
+
+@register_task_handler(max_retries=0)
+def benchmark_task(duration_millis: int = 0):
+    """Synthetic task created by the benchmarktaskprocessor command"""
+    if duration_millis:
+        time.sleep(duration_millis / 1000)
@@ -0,0 +1,47 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from task_processor.models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def delete_old_tasks() -> int:
+    """
+    Delete completed tasks older than TASK_DELETE_RETENTION_DAYS and dead lettered
+    tasks older than DEAD_LETTER_TASK_DELETE_RETENTION_DAYS, along with their task
+    runs.
+
+    Tasks are deleted in batches of TASK_DELETE_BATCH_SIZE, each in its own
+    transaction, to avoid holding locks on a large number of rows at once.
+    Returns the number of tasks deleted.
+    """
+    now = timezone.now()
+    old_tasks = Task.objects.filter(
+        Q(
+            completed=True,
+            created_at__lt=now - timedelta(days=settings.TASK_DELETE_RETENTION_DAYS),
+        )
+        | Q(
+            dead_lettered_at__lt=now
+            - timedelta(days=settings.DEAD_LETTER_TASK_DELETE_RETENTION_DAYS),
+        )
+    )
+
+    num_deleted = 0
+    while True:
+        task_ids = list(
+            old_tasks.values_list("id", flat=True)[: settings.TASK_DELETE_BATCH_SIZE]
+        )
+        if not task_ids:
+            break
+
+        Task.objects.filter(id__in=task_ids).delete()
+        num_deleted += len(task_ids)
+
+    logger.info("Deleted %d old tasks.", num_deleted)
+    return num_deleted
@@ -1,20 +1,48 @@
 import logging
 import typing
-from datetime import datetime
+from datetime import datetime, timedelta
 from inspect import getmodule
 from threading import Thread
 
 from django.conf import settings
 from django.utils import timezone
 
-from task_processor.models import Task
-from task_processor.task_registry import register_task
+from task_processor.models import (
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_QUEUE,
+    DEFAULT_RETRY_BACKOFF_SECONDS,
+    Task,
+    TaskPriority,
+)
+from task_processor.task_registry import (
+    register_recurring_task_schedule,
+    register_task,
+)
 from task_processor.task_run_method import TaskRunMethod
 
 logger = logging.getLogger(__name__)
 
 
-def register_task_handler(task_name: str = None):
+def register_task_handler(
+    task_name: str = None,
+    *,
+    queue: str = DEFAULT_QUEUE,
+    priority: int = TaskPriority.NORMAL,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
+):
+    """
+    Register the decorated function as a task handler.
+
+    When using the task processor, tasks are created on the given queue (see the
+    --queuethreads option of runprocessor) and tasks with a higher priority (i.e. a
+    lower value) are run before any others that are due.
+
+    Failed tasks are retried up to max_retries times, waiting retry_backoff_seconds
+    before the first retry and twice as long before each one after that. Tasks
+    which fail on every retry are moved to the dead letter state.
+    """
+
     def decorator(f: typing.Callable):
         nonlocal task_name
 
@@ -29,6 +57,7 @@ def register_task_handler(task_name: str = None):
             delay_until: datetime = None,
             args: typing.Tuple = None,
             kwargs: typing.Dict = None,
+            dedup_key: str = None,
         ) -> typing.Optional[Task]:
             logger.debug("Request to run task '%s' asynchronously.", task_identifier)
 
@@ -54,9 +83,13 @@ def register_task_handler(task_name: str = None):
                     task_identifier=task_identifier,
                     args=args,
                     kwargs=kwargs,
+                    queue=queue,
+                    priority=priority,
+                    dedup_key=dedup_key,
                 )
-                task.save()
-                return task
+                # if there is already a pending task with the same dedup key, this
+                # returns that task rather than creating a new one
+                return task.save_deduplicated()
 
         def run_in_thread(*args, **kwargs):
             logger.info("Running function %s in unmanaged thread.", f.__name__)
@@ -65,7 +98,32 @@ def register_task_handler(task_name: str = None):
         f.delay = delay
         f.run_in_thread = run_in_thread
         f.task_identifier = task_identifier
+        f.queue = queue
+        f.priority = priority
+        f.max_retries = max_retries
+        f.retry_backoff_seconds = retry_backoff_seconds
 
         return f
 
     return decorator
+
+
+def register_recurring_task(
+    run_every: timedelta, task_name: str = None, **task_handler_kwargs
+):
+    """
+    Register the decorated function as a task handler which the task processor
+    runs every run_every, e.g. instead of running a management command from cron.
+    The function must not take any arguments.
+
+    Only one instance of each recurring task is scheduled at a time, regardless of
+    the number of task processors running (see task_processor.recurring).
+    """
+
+    def decorator(f: typing.Callable):
+        f = register_task_handler(task_name, **task_handler_kwargs)(f)
+        register_recurring_task_schedule(f.task_identifier, run_every)
+        f.run_every = run_every
+        return f
+
+    return decorator
@@ -0,0 +1,60 @@
+import logging
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from task_processor.models import Task
+
+logger = logging.getLogger(__name__)
+
+T = typing.TypeVar("T")
+
+
+class TaskExecutor:
+    """
+    Runs a batch of tasks concurrently in a pool of threads.
+
+    Most tasks are I/O bound (e.g. a single HTTP request) so running them
+    concurrently means that a batch takes as long as its slowest task rather than
+    the sum of all of them. The number of tasks with a given identifier that can
+    run at once can be limited, e.g. to avoid overwhelming a single endpoint.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        concurrency_limits: typing.Dict[str, int] = None,
+    ):
+        self.max_workers = max_workers
+        self.concurrency_limits = concurrency_limits or {}
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="task-executor"
+        )
+        self._semaphores = {
+            task_identifier: threading.BoundedSemaphore(limit)
+            for task_identifier, limit in self.concurrency_limits.items()
+        }
+
+    def map(
+        self, run_task: typing.Callable[[Task], T], tasks: typing.Iterable[Task]
+    ) -> typing.List[T]:
+        futures = [self._pool.submit(self._run_task, run_task, task) for task in tasks]
+        return [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def _run_task(self, run_task: typing.Callable[[Task], T], task: Task) -> T:
+        semaphore = self._semaphores.get(task.task_identifier)
+        try:
+            if semaphore:
+                with semaphore:
+                    return run_task(task)
+            return run_task(task)
+        finally:
+            # each thread in the pool has its own database connection so make
+            # sure that they are cleaned up as they would be after a request
+            close_old_connections()
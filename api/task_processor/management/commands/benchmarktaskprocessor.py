@@ -0,0 +1,99 @@
+import statistics
+import time
+from argparse import ArgumentParser
+
+from django.core.management import BaseCommand, CommandError
+
+from task_processor.benchmark import benchmark_task
+from task_processor.models import DEFAULT_QUEUE, Task, TaskRun
+from task_processor.notifications import notify_new_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Flood the task processor with synthetic tasks and report how long they "
+        "took to be processed. Requires runprocessor to be running separately."
+    )
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "--numtasks",
+            type=int,
+            help="Number of synthetic tasks to create.",
+            default=1000,
+        )
+        parser.add_argument(
+            "--taskdurationms",
+            type=int,
+            help="Number of millis each synthetic task sleeps for, e.g. to simulate "
+            "an HTTP request.",
+            default=0,
+        )
+        parser.add_argument(
+            "--queue",
+            type=str,
+            help="Queue to create the synthetic tasks on.",
+            default=DEFAULT_QUEUE,
+        )
+        parser.add_argument(
+            "--timeoutseconds",
+            type=int,
+            help="Number of seconds to wait for the synthetic tasks to complete.",
+            default=600,
+        )
+
+    def handle(self, *args, **options):
+        num_tasks = options["numtasks"]
+        timeout_seconds = options["timeoutseconds"]
+
+        tasks = Task.objects.bulk_create(
+            [
+                Task.create(
+                    benchmark_task.task_identifier,
+                    kwargs={"duration_millis": options["taskdurationms"]},
+                    queue=options["queue"],
+                )
+                for _ in range(num_tasks)
+            ],
+            batch_size=1000,
+        )
+        # bulk_create doesn't call Task.save, so wake the task runners up here
+        notify_new_task()
+        task_ids = [task.id for task in tasks]
+        start_time = time.monotonic()
+        self.stdout.write(f"Created {num_tasks} tasks.")
+
+        remaining_tasks = Task.objects.filter(
+            id__in=task_ids, completed=False, dead_lettered_at__isnull=True
+        )
+        num_remaining = remaining_tasks.count()
+        while num_remaining > 0:
+            if time.monotonic() - start_time > timeout_seconds:
+                raise CommandError(
+                    f"Timed out with {num_remaining} tasks still to complete."
+                )
+            time.sleep(0.5)
+            num_remaining = remaining_tasks.count()
+
+        elapsed_seconds = time.monotonic() - start_time
+        self.stdout.write(
+            f"Processed {num_tasks} tasks in {elapsed_seconds:.2f}s "
+            f"({num_tasks / elapsed_seconds:.1f} tasks/s)."
+        )
+        self._write_lag_statistics(task_ids)
+
+    def _write_lag_statistics(self, task_ids):
+        lags = sorted(
+            (started_at - scheduled_for).total_seconds()
+            for started_at, scheduled_for in TaskRun.objects.filter(
+                task_id__in=task_ids
+            ).values_list("started_at", "task__scheduled_for")
+        )
+        if len(lags) < 2:
+            return
+
+        percentiles = statistics.quantiles(lags, n=100)
+        self.stdout.write(
+            f"Lag (enqueue to start): p50={percentiles[49]:.3f}s "
+            f"p95={percentiles[94]:.3f}s max={lags[-1]:.3f}s."
+        )
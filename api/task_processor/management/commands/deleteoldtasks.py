@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from task_processor.cleanup import delete_old_tasks
+
+
+class Command(BaseCommand):
+    help = "Delete old completed and dead lettered tasks, and their task runs."
+
+    def handle(self, *args, **options):
+        num_deleted = delete_old_tasks()
+        self.stdout.write(f"Deleted {num_deleted} tasks.")
@@ -2,18 +2,23 @@ import logging
 import signal
 import time
 import typing
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from datetime import timedelta
 
 from django.core.management import BaseCommand
 from django.utils import timezone
 
+# register the synthetic task created by the benchmarktaskprocessor command
+from task_processor import benchmark  # noqa
+from task_processor.executor import TaskExecutor
+from task_processor.metrics import start_metrics_server
+from task_processor.notifications import TaskListener, WakeUpSignal
 from task_processor.task_registry import registered_tasks
 from task_processor.thread_monitoring import (
     clear_unhealthy_threads,
     write_unhealthy_threads,
 )
-from task_processor.threads import TaskRunner
+from task_processor.threads import RecurringTaskScheduler, TaskRunner
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,8 @@ class Command(BaseCommand):
         signal.signal(signal.SIGTERM, self._exit_gracefully)
 
         self._threads: typing.List[TaskRunner] = []
+        self._listener: typing.Optional[TaskListener] = None
+        self._recurring_task_scheduler: typing.Optional[RecurringTaskScheduler] = None
         self._monitor_threads = True
 
     def add_arguments(self, parser: ArgumentParser):
@@ -38,7 +45,8 @@ class Command(BaseCommand):
         parser.add_argument(
             "--sleepintervalms",
             type=int,
-            help="Number of millis each worker waits before checking for new tasks",
+            help="Number of millis each worker waits before checking for new tasks. "
+            "On postgres, workers are also woken up as soon as a new task is created.",
             default=2000,
         )
         parser.add_argument(
@@ -53,28 +61,96 @@ class Command(BaseCommand):
             help="Number of tasks each worker will pop from the queue on each cycle.",
             default=10,
         )
+        parser.add_argument(
+            "--leaseseconds",
+            type=int,
+            help="Number of seconds each worker claims the tasks it pops for. Tasks "
+            "are run outside of a transaction and are run again by another worker if "
+            "the lease expires. If 0, tasks are locked in a transaction while they "
+            "are run instead.",
+            default=0,
+        )
+        parser.add_argument(
+            "--taskthreads",
+            type=int,
+            help="Number of threads each worker uses to run the tasks it pops "
+            "concurrently. Each thread uses its own database connection. If 1, "
+            "the tasks are run one after another in the worker thread.",
+            default=1,
+        )
+        parser.add_argument(
+            "--taskconcurrencylimit",
+            type=_name_and_count,
+            action="append",
+            metavar="TASK_IDENTIFIER=LIMIT",
+            help="Maximum number of tasks with the given identifier that each worker "
+            "will run at once when using --taskthreads. Can be given more than once.",
+            default=[],
+        )
+        parser.add_argument(
+            "--queuethreads",
+            type=_name_and_count,
+            action="append",
+            metavar="QUEUE=NUM_THREADS",
+            help="Number of additional worker threads dedicated to the given queue, "
+            "e.g. so that latency sensitive tasks never wait behind bulk jobs. The "
+            "workers started by --numthreads process all queues. Can be given more "
+            "than once.",
+            default=[],
+        )
+        parser.add_argument(
+            "--metricsport",
+            type=int,
+            help="Port on which to serve metrics in the Prometheus text format. If 0, "
+            "metrics aren't served.",
+            default=0,
+        )
 
     def handle(self, *args, **options):
         num_threads = options["numthreads"]
         sleep_interval_ms = options["sleepintervalms"]
         grace_period_ms = options["graceperiodms"]
         queue_pop_size = options["queuepopsize"]
+        lease_seconds = options["leaseseconds"]
+        task_threads = options["taskthreads"]
+        concurrency_limits = dict(options["taskconcurrencylimit"])
+        queue_threads = options["queuethreads"]
+        metrics_port = options["metricsport"]
+
+        wake_up_signal = WakeUpSignal()
+        self._listener = TaskListener(wake_up_signal=wake_up_signal)
+        self._recurring_task_scheduler = RecurringTaskScheduler()
+
+        def create_task_runner(queues: typing.List[str] = None) -> TaskRunner:
+            return TaskRunner(
+                sleep_interval_millis=sleep_interval_ms,
+                queue_pop_size=queue_pop_size,
+                wake_up_signal=wake_up_signal,
+                lease_seconds=lease_seconds,
+                executor=(
+                    TaskExecutor(task_threads, concurrency_limits)
+                    if task_threads > 1
+                    else None
+                ),
+                queues=queues,
+            )
 
-        self._threads.extend(
-            [
-                TaskRunner(
-                    sleep_interval_millis=sleep_interval_ms,
-                    queue_pop_size=queue_pop_size,
-                )
-                for _ in range(num_threads)
-            ]
-        )
+        self._threads.extend([create_task_runner() for _ in range(num_threads)])
+        for queue, num_queue_threads in queue_threads:
+            self._threads.extend(
+                [create_task_runner(queues=[queue]) for _ in range(num_queue_threads)]
+            )
 
         logger.info(
             "Processor starting. Registered tasks are: %s",
             list(registered_tasks.keys()),
         )
 
+        if metrics_port:
+            start_metrics_server(metrics_port)
+
+        self._listener.start()
+        self._recurring_task_scheduler.start()
         for thread in self._threads:
             thread.start()
 
@@ -93,6 +169,12 @@ class Command(BaseCommand):
         self._monitor_threads = False
         for t in self._threads:
             t.stop()
+        if self._recurring_task_scheduler:
+            self._recurring_task_scheduler.stop()
+        if self._listener:
+            self._listener.stop()
+            # wake up any idle runners so that they exit straight away
+            self._listener.wake_up_signal.notify()
 
     def _get_unhealthy_threads(
         self, ms_before_unhealthy: int
@@ -108,3 +190,12 @@ class Command(BaseCommand):
             ):
                 unhealthy_threads.append(thread)
         return unhealthy_threads
+
+
+def _name_and_count(value: str) -> typing.Tuple[str, int]:
+    name, _, count = value.rpartition("=")
+    if not (name and count.isdigit() and int(count) > 0):
+        raise ArgumentTypeError(
+            f"'{value}' is not of the form NAME=COUNT, e.g. 'tasks.my_task=2'."
+        )
+    return name, int(count)
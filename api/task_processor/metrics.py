@@ -0,0 +1,77 @@
+"""
+Prometheus metrics for the task processor, served by runprocessor --metricsport.
+
+These make it possible to tell whether tasks are slow to complete because they
+spend a long time waiting in the queue (see task_processor_task_lag_seconds and
+task_processor_queue_depth) or because they are slow to run (see
+task_processor_task_duration_seconds).
+"""
+import typing
+
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from task_processor.models import Task
+
+task_lag_seconds = Histogram(
+    "task_processor_task_lag_seconds",
+    "Time between a task being due and it starting to run.",
+    ["task_identifier"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+task_duration_seconds = Histogram(
+    "task_processor_task_duration_seconds",
+    "Time taken to run a task.",
+    ["task_identifier", "result"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+task_runs_total = Counter(
+    "task_processor_task_runs",
+    "Number of task runs.",
+    ["task_identifier", "result"],
+)
+claim_duration_seconds = Histogram(
+    "task_processor_claim_duration_seconds",
+    "Time taken to select (and lock or lease) a batch of tasks to run.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+class QueueDepthCollector(Collector):
+    """
+    Collects the number of tasks which are due to run, per queue and task
+    identifier, from the database when the metrics are scraped.
+    """
+
+    def collect(self) -> typing.Iterable[GaugeMetricFamily]:
+        queue_depth = GaugeMetricFamily(
+            "task_processor_queue_depth",
+            "Number of tasks which are due to run but haven't completed.",
+            labels=["queue", "task_identifier"],
+        )
+        try:
+            for row in (
+                Task.objects.filter(
+                    completed=False,
+                    dead_lettered_at__isnull=True,
+                    scheduled_for__lte=timezone.now(),
+                )
+                .values("queue", "task_identifier")
+                .annotate(count=Count("id"))
+            ):
+                queue_depth.add_metric(
+                    [row["queue"], row["task_identifier"]], row["count"]
+                )
+        finally:
+            close_old_connections()
+
+        yield queue_depth
+
+
+def start_metrics_server(port: int) -> None:
+    REGISTRY.register(QueueDepthCollector())
+    start_http_server(port)
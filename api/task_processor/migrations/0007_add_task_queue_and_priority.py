@@ -0,0 +1,70 @@
+# Generated by Django 3.2.15 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+from core.migration_helpers import PostgresOnlyRunSQL
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("task_processor", "0006_add_task_lease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="priority",
+            field=models.SmallIntegerField(
+                choices=[
+                    (0, "Highest"),
+                    (10, "High"),
+                    (20, "Normal"),
+                    (30, "Low"),
+                    (40, "Lowest"),
+                ],
+                default=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="queue",
+            field=models.CharField(default="default", max_length=100),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="task",
+                    index=models.Index(
+                        condition=models.Q(
+                            ("completed", False), ("num_failures__lt", 3)
+                        ),
+                        fields=["priority", "scheduled_for"],
+                        name="incomplete_tasks_priority_idx",
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="task",
+                    index=models.Index(
+                        condition=models.Q(
+                            ("completed", False), ("num_failures__lt", 3)
+                        ),
+                        fields=["queue", "priority", "scheduled_for"],
+                        name="incomplete_tasks_queue_idx",
+                    ),
+                ),
+            ],
+            database_operations=[
+                PostgresOnlyRunSQL(
+                    'CREATE INDEX CONCURRENTLY "incomplete_tasks_priority_idx" ON "task_processor_task" ("priority", "scheduled_for") WHERE (NOT "completed" and "num_failures" < 3);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "incomplete_tasks_priority_idx";',
+                ),
+                PostgresOnlyRunSQL(
+                    'CREATE INDEX CONCURRENTLY "incomplete_tasks_queue_idx" ON "task_processor_task" ("queue", "priority", "scheduled_for") WHERE (NOT "completed" and "num_failures" < 3);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "incomplete_tasks_queue_idx";',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.15 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+from core.migration_helpers import PostgresOnlyRunSQL
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("task_processor", "0007_add_task_queue_and_priority"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="dedup_key",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="num_duplicates",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="task",
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(
+                            ("completed", False),
+                            ("dedup_key__isnull", False),
+                            ("num_failures__lt", 3),
+                        ),
+                        fields=("task_identifier", "dedup_key"),
+                        name="unique_pending_task_dedup_key",
+                    ),
+                ),
+            ],
+            database_operations=[
+                PostgresOnlyRunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY "unique_pending_task_dedup_key" ON "task_processor_task" ("task_identifier", "dedup_key") WHERE (NOT "completed" AND "dedup_key" IS NOT NULL AND "num_failures" < 3);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "unique_pending_task_dedup_key";',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 3.2.15 on 2026-10-18 06:02
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from core.migration_helpers import PostgresOnlyRunSQL
+
+
+def dead_letter_failed_tasks(apps, schema_editor):
+    # previously, tasks weren't retried after their third failure
+    Task = apps.get_model("task_processor", "Task")
+    Task.objects.filter(completed=False, num_failures__gte=3).update(
+        dead_lettered_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("task_processor", "0008_add_task_dedup_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="dead_lettered_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            dead_letter_failed_tasks, reverse_code=migrations.RunPython.noop
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name="task",
+                    name="incomplete_tasks_idx",
+                ),
+                migrations.AddIndex(
+                    model_name="task",
+                    index=models.Index(
+                        condition=models.Q(
+                            ("completed", False), ("dead_lettered_at__isnull", True)
+                        ),
+                        fields=["scheduled_for"],
+                        name="incomplete_tasks_idx",
+                    ),
+                ),
+                migrations.RemoveIndex(
+                    model_name="task",
+                    name="incomplete_tasks_priority_idx",
+                ),
+                migrations.AddIndex(
+                    model_name="task",
+                    index=models.Index(
+                        condition=models.Q(
+                            ("completed", False), ("dead_lettered_at__isnull", True)
+                        ),
+                        fields=["priority", "scheduled_for"],
+                        name="incomplete_tasks_priority_idx",
+                    ),
+                ),
+                migrations.RemoveIndex(
+                    model_name="task",
+                    name="incomplete_tasks_queue_idx",
+                ),
+                migrations.AddIndex(
+                    model_name="task",
+                    index=models.Index(
+                        condition=models.Q(
+                            ("completed", False), ("dead_lettered_at__isnull", True)
+                        ),
+                        fields=["queue", "priority", "scheduled_for"],
+                        name="incomplete_tasks_queue_idx",
+                    ),
+                ),
+                migrations.RemoveConstraint(
+                    model_name="task",
+                    name="unique_pending_task_dedup_key",
+                ),
+                migrations.AddConstraint(
+                    model_name="task",
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(
+                            ("completed", False),
+                            ("dead_lettered_at__isnull", True),
+                            ("dedup_key__isnull", False),
+                        ),
+                        fields=("task_identifier", "dedup_key"),
+                        name="unique_pending_task_dedup_key",
+                    ),
+                ),
+            ],
+            database_operations=[
+                PostgresOnlyRunSQL(
+                    'DROP INDEX CONCURRENTLY "incomplete_tasks_idx";',
+                    reverse_sql='CREATE INDEX CONCURRENTLY "incomplete_tasks_idx" ON "task_processor_task" ("scheduled_for") WHERE (NOT "completed" and "num_failures" < 3);',
+                ),
+                PostgresOnlyRunSQL(
+                    'CREATE INDEX CONCURRENTLY "incomplete_tasks_idx" ON "task_processor_task" ("scheduled_for") WHERE (NOT "completed" AND "dead_lettered_at" IS NULL);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "incomplete_tasks_idx";',
+                ),
+                PostgresOnlyRunSQL(
+                    'DROP INDEX CONCURRENTLY "incomplete_tasks_priority_idx";',
+                    reverse_sql='CREATE INDEX CONCURRENTLY "incomplete_tasks_priority_idx" ON "task_processor_task" ("priority", "scheduled_for") WHERE (NOT "completed" and "num_failures" < 3);',
+                ),
+                PostgresOnlyRunSQL(
+                    'CREATE INDEX CONCURRENTLY "incomplete_tasks_priority_idx" ON "task_processor_task" ("priority", "scheduled_for") WHERE (NOT "completed" AND "dead_lettered_at" IS NULL);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "incomplete_tasks_priority_idx";',
+                ),
+                PostgresOnlyRunSQL(
+                    'DROP INDEX CONCURRENTLY "incomplete_tasks_queue_idx";',
+                    reverse_sql='CREATE INDEX CONCURRENTLY "incomplete_tasks_queue_idx" ON "task_processor_task" ("queue", "priority", "scheduled_for") WHERE (NOT "completed" and "num_failures" < 3);',
+                ),
+                PostgresOnlyRunSQL(
+                    'CREATE INDEX CONCURRENTLY "incomplete_tasks_queue_idx" ON "task_processor_task" ("queue", "priority", "scheduled_for") WHERE (NOT "completed" AND "dead_lettered_at" IS NULL);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "incomplete_tasks_queue_idx";',
+                ),
+                PostgresOnlyRunSQL(
+                    'DROP INDEX CONCURRENTLY "unique_pending_task_dedup_key";',
+                    reverse_sql='CREATE UNIQUE INDEX CONCURRENTLY "unique_pending_task_dedup_key" ON "task_processor_task" ("task_identifier", "dedup_key") WHERE (NOT "completed" AND "dedup_key" IS NOT NULL AND "num_failures" < 3);',
+                ),
+                PostgresOnlyRunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY "unique_pending_task_dedup_key" ON "task_processor_task" ("task_identifier", "dedup_key") WHERE (NOT "completed" AND "dead_lettered_at" IS NULL AND "dedup_key" IS NOT NULL);',
+                    reverse_sql='DROP INDEX CONCURRENTLY "unique_pending_task_dedup_key";',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_processor', '0009_add_task_dead_letter_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTaskSchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_identifier', models.CharField(max_length=200, unique=True)),
+                ('run_every', models.DurationField()),
+                ('next_run_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,14 +1,40 @@
 import json
+import logging
 import typing
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Least
 from django.utils import timezone
 
 from task_processor.exceptions import TaskProcessingError
+from task_processor.notifications import notify_new_task
 from task_processor.task_registry import registered_tasks
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = "default"
+
+# by default, a failed task is retried twice, after 5 and 10 seconds
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BACKOFF_SECONDS = 5
+MAX_RETRY_BACKOFF_SECONDS = 60 * 60
+
+# tasks which propagate flag changes to the SDKs, so that workers can be dedicated
+# to them using runprocessor --queuethreads
+ENVIRONMENT_UPDATES_QUEUE = "environment-updates"
+
+
+class TaskPriority(models.IntegerChoices):
+    # tasks with a lower value are run first
+    HIGHEST = 0
+    HIGH = 10
+    NORMAL = 20
+    LOW = 30
+    LOWEST = 40
+
 
 class Task(models.Model):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4)
@@ -19,18 +45,62 @@ class Task(models.Model):
     serialized_args = models.TextField(blank=True, null=True)
     serialized_kwargs = models.TextField(blank=True, null=True)
 
+    queue = models.CharField(max_length=100, default=DEFAULT_QUEUE)
+    priority = models.SmallIntegerField(
+        choices=TaskPriority.choices, default=TaskPriority.NORMAL
+    )
+
     # denormalise failures and completion so that we can use select_for_update
     num_failures = models.IntegerField(default=0)
     completed = models.BooleanField(default=False)
+    # set once a task has failed more times than its handler allows
+    dead_lettered_at = models.DateTimeField(blank=True, null=True)
+
+    # task runners running in lease mode claim tasks until lease_expires_at
+    # rather than holding a lock on them while they are run
+    claimed_by = models.CharField(max_length=255, blank=True, null=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+
+    # pending tasks with the same identifier and dedup key are merged into one,
+    # see save_deduplicated
+    dedup_key = models.CharField(max_length=255, blank=True, null=True)
+    num_duplicates = models.IntegerField(default=0)
 
     class Meta:
-        # We have customised the migration in 0004 to only apply this change to postgres databases
+        # We have customised the migrations in 0004, 0007 and 0009 to only apply
+        # these indexes to postgres databases
         # TODO: work out how to index the taskprocessor_task table for Oracle and MySQL
         indexes = [
             models.Index(
                 name="incomplete_tasks_idx",
                 fields=["scheduled_for"],
-                condition=models.Q(completed=False, num_failures__lt=3),
+                condition=models.Q(completed=False, dead_lettered_at__isnull=True),
+            ),
+            # used by task runners processing all queues, and those dedicated
+            # to specific queues, respectively
+            models.Index(
+                name="incomplete_tasks_priority_idx",
+                fields=["priority", "scheduled_for"],
+                condition=models.Q(completed=False, dead_lettered_at__isnull=True),
+            ),
+            models.Index(
+                name="incomplete_tasks_queue_idx",
+                fields=["queue", "priority", "scheduled_for"],
+                condition=models.Q(completed=False, dead_lettered_at__isnull=True),
+            ),
+        ]
+        # Also only created on postgres, in 0008 and 0009. The dedup key is cleared when a
+        # task is claimed (in lease mode) or run so that it can't clash with any new,
+        # pending, duplicates.
+        constraints = [
+            models.UniqueConstraint(
+                name="unique_pending_task_dedup_key",
+                fields=["task_identifier", "dedup_key"],
+                condition=models.Q(
+                    completed=False,
+                    dead_lettered_at__isnull=True,
+                    dedup_key__isnull=False,
+                ),
             )
         ]
 
@@ -41,11 +111,17 @@ class Task(models.Model):
         *,
         args: typing.Tuple[typing.Any] = None,
         kwargs: typing.Dict[str, typing.Any] = None,
+        queue: str = DEFAULT_QUEUE,
+        priority: int = TaskPriority.NORMAL,
+        dedup_key: str = None,
     ) -> "Task":
         return Task(
             task_identifier=task_identifier,
             serialized_args=cls._serialize_data(args or tuple()),
             serialized_kwargs=cls._serialize_data(kwargs or dict()),
+            queue=queue,
+            priority=priority,
+            dedup_key=dedup_key,
         )
 
     @classmethod
@@ -56,14 +132,136 @@ class Task(models.Model):
         *,
         args: typing.Tuple[typing.Any] = None,
         kwargs: typing.Dict[str, typing.Any] = None,
+        queue: str = DEFAULT_QUEUE,
+        priority: int = TaskPriority.NORMAL,
+        dedup_key: str = None,
     ) -> "Task":
-        task = cls.create(task_identifier=task_identifier, args=args, kwargs=kwargs)
+        task = cls.create(
+            task_identifier=task_identifier,
+            args=args,
+            kwargs=kwargs,
+            queue=queue,
+            priority=priority,
+            dedup_key=dedup_key,
+        )
         task.scheduled_for = schedule_for
         return task
 
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+
+        if created and self._is_due:
+            # wake up any idle task runners rather than waiting for them to poll
+            notify_new_task()
+
+    def save_deduplicated(self) -> "Task":
+        """
+        Save the task, unless there is already a pending task with the same
+        identifier and dedup key, in which case that task is brought forward (if
+        necessary, and it isn't waiting to be retried) and its duplicate count
+        incremented instead.
+
+        Tasks with the same dedup key are expected to be interchangeable, the
+        arguments of the pending task are kept. Returns the task that will run.
+        """
+        if not self.dedup_key:
+            self.save()
+            return self
+
+        for _ in range(2):
+            pending_task = self._merge_into_pending_task()
+            if pending_task:
+                return pending_task
+
+            try:
+                with transaction.atomic():
+                    self.save()
+                return self
+            except IntegrityError:
+                # either another pending duplicate was created concurrently, in
+                # which case we can merge into it, or the existing duplicate is
+                # currently being run.
+                pass
+
+        logger.debug(
+            "Duplicate of task '%s' with dedup key '%s' is running, saving anyway.",
+            self.task_identifier,
+            self.dedup_key,
+        )
+        self.dedup_key = None
+        self.save()
+        return self
+
+    def _merge_into_pending_task(self) -> typing.Optional["Task"]:
+        with transaction.atomic():
+            # tasks which are locked are being run by a task runner
+            pending_task = (
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(
+                    task_identifier=self.task_identifier,
+                    dedup_key=self.dedup_key,
+                    completed=False,
+                    dead_lettered_at__isnull=True,
+                )
+                .first()
+            )
+            if not pending_task:
+                return None
+
+            updates = {"num_duplicates": F("num_duplicates") + 1}
+            if not pending_task.num_failures:
+                # a pending retry keeps its backoff (see mark_failure)
+                updates["scheduled_for"] = Least(
+                    "scheduled_for",
+                    Value(self.scheduled_for, output_field=models.DateTimeField()),
+                )
+            Task.objects.filter(id=pending_task.id).update(**updates)
+
+        logger.debug(
+            "Merged task '%s' into pending task %d with dedup key '%s'.",
+            self.task_identifier,
+            pending_task.id,
+            self.dedup_key,
+        )
+        pending_task.refresh_from_db(fields=["num_duplicates", "scheduled_for"])
+        if self._is_due and pending_task.scheduled_for == self.scheduled_for:
+            # the pending task has been brought forward
+            notify_new_task()
+        return pending_task
+
     def run(self):
         return self.callable(*self.args, **self.kwargs)
 
+    def mark_failure(self) -> None:
+        """
+        Schedule the task to be retried, using exponential backoff, or move it to
+        the dead letter state if it has used up all of the retries allowed by its
+        handler (see register_task_handler).
+        """
+        self.num_failures += 1
+        now = timezone.now()
+
+        handler = registered_tasks.get(self.task_identifier)
+        max_retries = getattr(handler, "max_retries", DEFAULT_MAX_RETRIES)
+        if self.num_failures > max_retries:
+            logger.warning(
+                "Task %s failed %d times, moving to dead letter state.",
+                self.uuid,
+                self.num_failures,
+            )
+            self.dead_lettered_at = now
+            return
+
+        retry_backoff_seconds = getattr(
+            handler, "retry_backoff_seconds", DEFAULT_RETRY_BACKOFF_SECONDS
+        )
+        backoff_seconds = min(
+            retry_backoff_seconds * 2 ** (self.num_failures - 1),
+            MAX_RETRY_BACKOFF_SECONDS,
+        )
+        self.scheduled_for = now + timedelta(seconds=backoff_seconds)
+
     @property
     def callable(self) -> typing.Callable:
         try:
@@ -75,6 +273,10 @@ class Task(models.Model):
                 self.task_identifier,
             ) from e
 
+    @property
+    def _is_due(self) -> bool:
+        return not self.scheduled_for or self.scheduled_for <= timezone.now()
+
     @property
     def args(self) -> typing.List[typing.Any]:
         if self.serialized_args:
@@ -112,6 +314,12 @@ class TaskRun(models.Model):
     error_details = models.TextField(blank=True, null=True)
 
 
+class RecurringTaskSchedule(models.Model):
+    task_identifier = models.CharField(max_length=200, unique=True)
+    run_every = models.DurationField()
+    next_run_at = models.DateTimeField()
+
+
 class HealthCheckModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     uuid = models.UUIDField(unique=True, blank=False, null=False)
@@ -0,0 +1,147 @@
+"""
+Wake up idle task runners as soon as a new task is created.
+
+On postgres, creating a task sends a notification (using NOTIFY) which is picked up
+by a TaskListener thread in the task processor (using LISTEN). Since NOTIFY is
+transactional, the notification is only delivered once the task has been committed.
+On other databases, task runners fall back to polling for new tasks.
+"""
+import logging
+import select
+import threading
+import typing
+from abc import ABC, abstractmethod
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+NEW_TASK_CHANNEL = "task_processor_new_task"
+
+
+def notify_new_task() -> None:
+    if connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, '')", [NEW_TASK_CHANNEL])
+
+
+class WakeUpSignal:
+    """
+    Signal shared between a TaskListener and the task runners that it wakes up.
+
+    Runners take the generation before checking for tasks and wait for it to
+    change, so that a notification received while they were busy isn't missed.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def notify(self) -> None:
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> bool:
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._generation != generation, timeout=timeout
+            )
+
+
+class NotificationListener(threading.Thread, ABC):
+    """
+    Listen for notifications on a postgres channel, in a daemon thread with its
+    own database connection, reconnecting if the connection is lost.
+
+    Subclasses set the channel and handle the notifications that are received.
+    """
+
+    channel: str
+    unsupported_message = "LISTEN/NOTIFY not supported."
+
+    def __init__(self, *args, reconnect_interval_seconds: float = 5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.daemon = True
+        self.reconnect_interval_seconds = reconnect_interval_seconds
+        self.listening = threading.Event()
+
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        if connection.vendor != "postgresql":
+            logger.info(self.unsupported_message)
+            return
+
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception(
+                    "Error listening for notifications on %s, reconnecting.",
+                    self.channel,
+                )
+                self.listening.clear()
+                self.on_reconnect()
+                connection.close()
+                self._stopped.wait(self.reconnect_interval_seconds)
+
+        connection.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    @abstractmethod
+    def on_notifications(self, notifies: typing.List[typing.Any]) -> None:
+        """
+        Handle the notifications received on the channel since the last call.
+        """
+
+    def on_reconnect(self) -> None:
+        """
+        Called when the connection is lost, since notifications may have been
+        missed while reconnecting.
+        """
+
+    def _listen(self) -> None:
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self.listening.set()
+
+        pg_connection = connection.connection
+        while not self._stopped.is_set():
+            if self._select(pg_connection, timeout=1):
+                pg_connection.poll()
+                if pg_connection.notifies:
+                    notifies = list(pg_connection.notifies)
+                    pg_connection.notifies.clear()
+                    self.on_notifications(notifies)
+
+    @staticmethod
+    def _select(pg_connection: typing.Any, timeout: float) -> bool:
+        readable, _, _ = select.select([pg_connection], [], [], timeout)
+        return bool(readable)
+
+
+class TaskListener(NotificationListener):
+    channel = NEW_TASK_CHANNEL
+    unsupported_message = "LISTEN/NOTIFY not supported, task runners will poll."
+
+    def __init__(self, *args, wake_up_signal: WakeUpSignal, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wake_up_signal = wake_up_signal
+
+    def on_notifications(self, notifies: typing.List[typing.Any]) -> None:
+        self.wake_up_signal.notify()
+
+    def on_reconnect(self) -> None:
+        # make sure that the runners don't wait for a notification that may have
+        # been missed
+        self.wake_up_signal.notify()
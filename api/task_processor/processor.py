@@ -1,37 +1,59 @@
 import logging
+import time
 import traceback
 import typing
+from datetime import datetime, timedelta
 
 from django.db import transaction
+from django.db.models import Q, QuerySet
 from django.utils import timezone
 
+from task_processor import metrics
+from task_processor.executor import TaskExecutor
 from task_processor.models import Task, TaskResult, TaskRun
 
 logger = logging.getLogger(__name__)
 
 
 @transaction.atomic
-def run_tasks(num_tasks: int = 1) -> typing.List[TaskRun]:
+def run_tasks(
+    num_tasks: int = 1,
+    executor: TaskExecutor = None,
+    queues: typing.Optional[typing.List[str]] = None,
+) -> typing.List[TaskRun]:
     if num_tasks < 1:
         raise ValueError("Number of tasks to process must be at least one")
 
-    tasks = (
-        Task.objects.select_for_update(skip_locked=True)
-        .filter(num_failures__lt=3, scheduled_for__lte=timezone.now(), completed=False)
-        .order_by("scheduled_for")[:num_tasks]
-    )
+    with metrics.claim_duration_seconds.time():
+        tasks = list(_get_due_tasks(timezone.now(), queues)[:num_tasks])
+
     if tasks:
         executed_tasks = []
         task_runs = []
 
-        for task in tasks:
-            executed_task, task_run = _run_task(task)
+        for executed_task, task_run in _run_tasks(tasks, executor):
+            # the task may have been claimed by a task runner in lease mode whose
+            # lease has since expired
+            executed_task.claimed_by = None
+            executed_task.lease_expires_at = None
+            # once run, a task is no longer pending so new duplicates of it
+            # (e.g. while it waits to be retried) shouldn't be merged into it
+            executed_task.dedup_key = None
             executed_tasks.append(executed_task)
             task_runs.append(task_run)
 
         if executed_tasks:
             Task.objects.bulk_update(
-                executed_tasks, fields=["completed", "num_failures"]
+                executed_tasks,
+                fields=[
+                    "completed",
+                    "num_failures",
+                    "scheduled_for",
+                    "dead_lettered_at",
+                    "claimed_by",
+                    "lease_expires_at",
+                    "dedup_key",
+                ],
             )
 
         if task_runs:
@@ -43,16 +65,209 @@ def run_tasks(num_tasks: int = 1) -> typing.List[TaskRun]:
     return []
 
 
-def _run_task(task: Task) -> typing.Optional[typing.Tuple[Task, TaskRun]]:
-    if task.task_runs.filter(result=TaskResult.SUCCESS).exists():
-        # This should never happen due to the use of select_for_update above, but it's
-        # best to guard against it rather than try and execute the task twice.
+def run_tasks_with_lease(
+    num_tasks: int = 1,
+    *,
+    claimed_by: str,
+    lease_seconds: int = 300,
+    executor: TaskExecutor = None,
+    queues: typing.Optional[typing.List[str]] = None,
+) -> typing.List[TaskRun]:
+    """
+    Alternative to run_tasks which doesn't hold a transaction open while the tasks
+    are running.
+
+    Tasks are claimed for lease_seconds in a short transaction and then run outside
+    of it. If the lease expires before the results are recorded (e.g. because the
+    task runner died) the tasks can be claimed again by another task runner.
+    """
+    if num_tasks < 1:
+        raise ValueError("Number of tasks to process must be at least one")
+
+    tasks = claim_tasks(
+        num_tasks, claimed_by=claimed_by, lease_seconds=lease_seconds, queues=queues
+    )
+    if not tasks:
+        logger.debug("No tasks to process.")
+        return []
+
+    task_runs = [task_run for _, task_run in _run_tasks(tasks, executor)]
+    return _record_task_runs(task_runs, claimed_by=claimed_by)
+
+
+def claim_tasks(
+    num_tasks: int,
+    *,
+    claimed_by: str,
+    lease_seconds: int,
+    queues: typing.Optional[typing.List[str]] = None,
+) -> typing.List[Task]:
+    """
+    Claim up to num_tasks due tasks for lease_seconds.
+
+    A task whose lease has expired (e.g. because its task runner was killed while
+    running it) is counted as a failed attempt, and retried or dead lettered
+    accordingly, rather than being claimed straight away. Otherwise a task that
+    kills its task runner would be run forever.
+    """
+    now = timezone.now()
+
+    with metrics.claim_duration_seconds.time(), transaction.atomic():
+        tasks = list(_get_due_tasks(now, queues)[:num_tasks])
+        expired_tasks = [task for task in tasks if task.claimed_by]
+        tasks = [task for task in tasks if not task.claimed_by]
+        _fail_tasks_with_expired_lease(expired_tasks, now)
+
+        if not tasks:
+            return []
+
+        lease_expires_at = now + timedelta(seconds=lease_seconds)
+        # once claimed, a task is no longer pending so new duplicates of it
+        # shouldn't be merged into it (see Task.save_deduplicated)
+        Task.objects.filter(id__in=[task.id for task in tasks]).update(
+            claimed_by=claimed_by, lease_expires_at=lease_expires_at, dedup_key=None
+        )
+
+    for task in tasks:
+        task.claimed_by = claimed_by
+        task.lease_expires_at = lease_expires_at
+        task.dedup_key = None
+
+    return tasks
+
+
+def _fail_tasks_with_expired_lease(tasks: typing.List[Task], now: datetime) -> None:
+    task_runs = []
+    for task in tasks:
+        logger.warning(
+            "Lease held by %s on task %d expired, recording it as a failure.",
+            task.claimed_by,
+            task.id,
+        )
+        task_runs.append(
+            TaskRun(
+                task=task,
+                started_at=now,
+                finished_at=now,
+                result=TaskResult.FAILURE,
+                error_details=f"Lease held by {task.claimed_by} expired.",
+            )
+        )
+        task.mark_failure()
+        task.claimed_by = None
+        task.lease_expires_at = None
+
+    if tasks:
+        Task.objects.bulk_update(
+            tasks,
+            fields=[
+                "num_failures",
+                "scheduled_for",
+                "dead_lettered_at",
+                "claimed_by",
+                "lease_expires_at",
+            ],
+        )
+        TaskRun.objects.bulk_create(task_runs)
+
+
+def _get_due_tasks(
+    now: datetime, queues: typing.Optional[typing.List[str]]
+) -> "QuerySet[Task]":
+    """
+    Get the tasks that are due to run, highest priority first, locking the rows
+    when evaluated. If queues is given, only tasks on those queues are included.
+
+    Tasks claimed under a lease that hasn't expired are excluded, since the claim
+    doesn't hold a lock on the row while the task is run (see claim_tasks).
+    """
+    tasks = (
+        Task.objects.select_for_update(skip_locked=True)
+        .filter(scheduled_for__lte=now, completed=False, dead_lettered_at__isnull=True)
+        .filter(Q(claimed_by__isnull=True) | Q(lease_expires_at__lt=now))
+    )
+    if queues:
+        tasks = tasks.filter(queue__in=queues)
+    return tasks.order_by("priority", "scheduled_for")
+
+
+def _record_task_runs(
+    task_runs: typing.List[TaskRun], *, claimed_by: str
+) -> typing.List[TaskRun]:
+    """
+    Record the results of the given task runs and release the claims on their tasks.
+
+    Results are only recorded for tasks that are still claimed by claimed_by, i.e.
+    tasks whose lease hasn't expired and been claimed by another task runner.
+    """
+    succeeded_task_ids = [
+        task_run.task_id
+        for task_run in task_runs
+        if task_run.result == TaskResult.SUCCESS
+    ]
+    failed_tasks = [
+        task_run.task for task_run in task_runs if task_run.result == TaskResult.FAILURE
+    ]
+
+    with transaction.atomic():
+        release_claim = {"claimed_by": None, "lease_expires_at": None}
+        claimed_tasks = Task.objects.filter(claimed_by=claimed_by)
+        recorded_task_ids = set(
+            claimed_tasks.select_for_update()
+            .filter(id__in=[task_run.task_id for task_run in task_runs])
+            .values_list("id", flat=True)
+        )
+        if succeeded_task_ids:
+            claimed_tasks.filter(id__in=succeeded_task_ids).update(
+                completed=True, **release_claim
+            )
+
+        # the rows for these tasks are locked above, so it's safe to write the
+        # retry schedule (or dead letter state) set by _run_task
+        failed_tasks = [task for task in failed_tasks if task.id in recorded_task_ids]
+        for task in failed_tasks:
+            for field, value in release_claim.items():
+                setattr(task, field, value)
+        if failed_tasks:
+            Task.objects.bulk_update(
+                failed_tasks,
+                fields=[
+                    "num_failures",
+                    "scheduled_for",
+                    "dead_lettered_at",
+                    *release_claim,
+                ],
+            )
+
+        recorded_task_runs = [
+            task_run for task_run in task_runs if task_run.task_id in recorded_task_ids
+        ]
+        TaskRun.objects.bulk_create(recorded_task_runs)
+
+    if len(recorded_task_runs) < len(task_runs):
         logger.warning(
-            "Task has already been processed successfully, not processing again."
+            "Lost lease on %d task(s), not recording results.",
+            len(task_runs) - len(recorded_task_runs),
         )
-        return
 
+    return recorded_task_runs
+
+
+def _run_tasks(
+    tasks: typing.Iterable[Task], executor: typing.Optional[TaskExecutor]
+) -> typing.List[typing.Tuple[Task, TaskRun]]:
+    if executor:
+        return executor.map(_run_task, tasks)
+    return [_run_task(task) for task in tasks]
+
+
+def _run_task(task: Task) -> typing.Tuple[Task, TaskRun]:
     task_run = TaskRun(started_at=timezone.now(), task=task)
+    if task.scheduled_for:
+        metrics.task_lag_seconds.labels(task.task_identifier).observe(
+            (task_run.started_at - task.scheduled_for).total_seconds()
+        )
+    start_time = time.perf_counter()
 
     try:
         task.run()
@@ -61,9 +276,15 @@ def _run_task(task: Task) -> typing.Optional[typing.Tuple[Task, TaskRun]]:
         task_run.finished_at = timezone.now()
         task.completed = True
     except Exception:
-        task.num_failures += 1
+        task.mark_failure()
 
         task_run.result = TaskResult.FAILURE
         task_run.error_details = str(traceback.format_exc())
 
+    result = task_run.result.value
+    metrics.task_duration_seconds.labels(task.task_identifier, result).observe(
+        time.perf_counter() - start_time
+    )
+    metrics.task_runs_total.labels(task.task_identifier, result).inc()
+
     return task, task_run
@@ -0,0 +1,76 @@
+"""
+Scheduling of recurring tasks (see register_recurring_task).
+
+Every task processor periodically checks for recurring tasks that are due and
+creates a Task for each of them. The RecurringTaskSchedule rows are locked while
+doing so, and locked rows are skipped, so that only one task processor (the leader
+for that run) schedules each run, however many are running.
+"""
+import logging
+import typing
+
+from django.db import transaction
+from django.utils import timezone
+
+from task_processor.models import RecurringTaskSchedule, Task
+from task_processor.task_registry import (
+    registered_recurring_tasks,
+    registered_tasks,
+)
+
+logger = logging.getLogger(__name__)
+
+RECURRING_TASK_DEDUP_KEY = "recurring"
+
+
+def sync_recurring_task_schedules() -> None:
+    """
+    Create or update the schedules of the registered recurring tasks. Recurring
+    tasks are first run as soon as they are registered.
+    """
+    now = timezone.now()
+    for task_identifier, run_every in registered_recurring_tasks.items():
+        schedule, created = RecurringTaskSchedule.objects.get_or_create(
+            task_identifier=task_identifier,
+            defaults={"run_every": run_every, "next_run_at": now},
+        )
+        if not created and schedule.run_every != run_every:
+            schedule.run_every = run_every
+            schedule.next_run_at = min(schedule.next_run_at, now + run_every)
+            schedule.save()
+
+
+def schedule_recurring_tasks() -> typing.List[Task]:
+    now = timezone.now()
+
+    with transaction.atomic():
+        schedules = list(
+            RecurringTaskSchedule.objects.select_for_update(skip_locked=True).filter(
+                task_identifier__in=registered_recurring_tasks.keys(),
+                next_run_at__lte=now,
+            )
+        )
+        if not schedules:
+            return []
+
+        tasks = []
+        for schedule in schedules:
+            handler = registered_tasks[schedule.task_identifier]
+            task = Task.create(
+                schedule.task_identifier,
+                queue=handler.queue,
+                priority=handler.priority,
+                # if the previous run is still waiting (e.g. because the task
+                # processor is busy), don't schedule another one
+                dedup_key=RECURRING_TASK_DEDUP_KEY,
+            )
+            tasks.append(task.save_deduplicated())
+            schedule.next_run_at = now + schedule.run_every
+
+        RecurringTaskSchedule.objects.bulk_update(schedules, fields=["next_run_at"])
+
+    logger.debug(
+        "Scheduled recurring tasks: %s",
+        [schedule.task_identifier for schedule in schedules],
+    )
+    return tasks
@@ -1,10 +1,14 @@
 import logging
 import typing
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
 registered_tasks: typing.Dict[str, typing.Callable] = {}
 
+# how often each recurring task should run, keyed on task identifier
+registered_recurring_tasks: typing.Dict[str, timedelta] = {}
+
 
 def register_task(task_identifier: str, callable_: typing.Callable):
     global registered_tasks
@@ -21,3 +25,9 @@ def register_task(task_identifier: str, callable_: typing.Callable):
 
 def get_task(task_identifier: str) -> typing.Callable:
     return registered_tasks[task_identifier]
+
+
+def register_recurring_task_schedule(task_identifier: str, run_every: timedelta):
+    logger.debug("Registering recurring task '%s'", task_identifier)
+
+    registered_recurring_tasks[task_identifier] = run_every
@@ -1,7 +1,12 @@
 import logging
+from datetime import timedelta
 
-from task_processor.decorators import register_task_handler
-from task_processor.models import HealthCheckModel
+from task_processor.cleanup import delete_old_tasks
+from task_processor.decorators import (
+    register_recurring_task,
+    register_task_handler,
+)
+from task_processor.models import HealthCheckModel, TaskPriority
 
 logger = logging.getLogger(__name__)
 
@@ -10,3 +15,8 @@ logger = logging.getLogger(__name__)
 def create_health_check_model(health_check_model_uuid: str):
     logger.info("Creating health check model.")
     HealthCheckModel.objects.create(uuid=health_check_model_uuid)
+
+
+@register_recurring_task(run_every=timedelta(hours=1), priority=TaskPriority.LOWEST)
+def clean_up_old_tasks():
+    delete_old_tasks()
@@ -1,9 +1,22 @@
+import logging
+import os
+import socket
 import time
-from threading import Thread
+import typing
+import uuid
+from threading import Event, Thread
 
 from django.utils import timezone
 
-from task_processor.processor import run_tasks
+from task_processor.executor import TaskExecutor
+from task_processor.notifications import WakeUpSignal
+from task_processor.processor import run_tasks, run_tasks_with_lease
+from task_processor.recurring import (
+    schedule_recurring_tasks,
+    sync_recurring_task_schedules,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class TaskRunner(Thread):
@@ -12,20 +25,89 @@ class TaskRunner(Thread):
         *args,
         sleep_interval_millis: int = 2000,
         queue_pop_size: int = 1,
+        wake_up_signal: typing.Optional[WakeUpSignal] = None,
+        lease_seconds: typing.Optional[int] = None,
+        executor: typing.Optional[TaskExecutor] = None,
+        queues: typing.Optional[typing.List[str]] = None,
         **kwargs,
     ):
         super(TaskRunner, self).__init__(*args, **kwargs)
         self.sleep_interval_millis = sleep_interval_millis
         self.queue_pop_size = queue_pop_size
+        self.wake_up_signal = wake_up_signal
+        self.lease_seconds = lease_seconds
+        self.executor = executor
+        self.queues = queues
         self.last_checked_for_tasks = None
 
+        self.runner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
         self._stopped = False
 
     def run(self) -> None:
-        while not self._stopped:
-            self.last_checked_for_tasks = timezone.now()
-            run_tasks(self.queue_pop_size)
-            time.sleep(self.sleep_interval_millis / 1000)
+        try:
+            while not self._stopped:
+                self.run_iteration()
+        finally:
+            if self.executor:
+                self.executor.shutdown()
+
+    def run_iteration(self) -> None:
+        generation = self.wake_up_signal.generation if self.wake_up_signal else None
+
+        self.last_checked_for_tasks = timezone.now()
+        if self.lease_seconds:
+            task_runs = run_tasks_with_lease(
+                self.queue_pop_size,
+                claimed_by=self.runner_id,
+                lease_seconds=self.lease_seconds,
+                executor=self.executor,
+                queues=self.queues,
+            )
+        else:
+            task_runs = run_tasks(
+                self.queue_pop_size, executor=self.executor, queues=self.queues
+            )
+
+        if len(task_runs) < self.queue_pop_size:
+            # the queue is empty, so wait until we're told about a new task or
+            # fall back to polling. Tasks scheduled for the future are only ever
+            # picked up by polling.
+            self._wait(generation)
 
     def stop(self):
         self._stopped = True
+
+    def _wait(self, generation: typing.Optional[int]) -> None:
+        timeout = self.sleep_interval_millis / 1000
+        if self.wake_up_signal:
+            self.wake_up_signal.wait(generation, timeout=timeout)
+        else:
+            time.sleep(timeout)
+
+
+class RecurringTaskScheduler(Thread):
+    def __init__(self, *args, interval_seconds: float = 10, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.daemon = True
+        self.interval_seconds = interval_seconds
+
+        self._stopped = Event()
+
+    def run(self) -> None:
+        synced = False
+        while not self._stopped.is_set():
+            # errors, including when syncing the schedules (e.g. if the database
+            # isn't available at startup), are retried after the interval rather
+            # than killing the thread, since nothing would restart it
+            try:
+                if not synced:
+                    sync_recurring_task_schedules()
+                    synced = True
+                schedule_recurring_tasks()
+            except Exception:
+                logger.exception("Failed to schedule recurring tasks.")
+            self._stopped.wait(self.interval_seconds)
+
+    def stop(self) -> None:
+        self._stopped.set()
@@ -11,7 +11,9 @@ from task_processor.serializers import MonitoringSerializer
 @api_view(http_method_names=["GET"])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def monitoring(request, **kwargs):
-    waiting_tasks = Task.objects.filter(num_failures__lt=3, completed=False).count()
+    waiting_tasks = Task.objects.filter(
+        completed=False, dead_lettered_at__isnull=True
+    ).count()
     return Response(
         data={"waiting": waiting_tasks}, headers={"Content-Type": "application/json"}
     )
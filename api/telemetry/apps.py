@@ -3,6 +3,8 @@ import logging
 from django.apps import AppConfig
 from django.conf import settings
 
+from task_processor.task_run_method import TaskRunMethod
+
 logger = logging.getLogger(__name__)
 
 
@@ -10,7 +12,14 @@ class TelemetryConfig(AppConfig):
     name = "telemetry"
 
     def ready(self):
-        if settings.ENABLE_TELEMETRY:
+        from . import tasks  # noqa
+
+        # when using the task processor, the heartbeat is sent daily by the
+        # send_telemetry_heartbeat recurring task instead
+        if (
+            settings.ENABLE_TELEMETRY
+            and settings.TASK_RUN_METHOD != TaskRunMethod.TASK_PROCESSOR
+        ):
             try:
                 from .telemetry import SelfHostedTelemetryWrapper
 
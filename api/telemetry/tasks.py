@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+from django.conf import settings
+from telemetry.telemetry import SelfHostedTelemetryWrapper
+
+from task_processor.decorators import register_recurring_task
+from task_processor.models import TaskPriority
+
+
+@register_recurring_task(run_every=timedelta(hours=24), priority=TaskPriority.LOWEST)
+def send_telemetry_heartbeat():
+    if settings.ENABLE_TELEMETRY:
+        SelfHostedTelemetryWrapper().send_heartbeat()
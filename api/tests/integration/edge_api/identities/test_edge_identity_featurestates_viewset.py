@@ -86,7 +86,9 @@ def test_edge_identities_feature_states_list_calls_sync_identity_document_featur
         )
     )
 
-    sync_identity_document_features.delay.assert_called_once_with(args=(identity_uuid,))
+    sync_identity_document_features.delay.assert_called_once_with(
+        args=(identity_uuid,), dedup_key=identity_uuid
+    )
 
 
 def test_edge_identities_feature_states_list_can_be_filtered_using_feature_id(
@@ -200,7 +202,9 @@ def test_edge_identities_featurestate_detail_calls_sync_identity_if_deleted_feat
     dynamo_wrapper_mock.get_item_from_uuid_or_404.assert_called_with(identity_uuid)
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
-    sync_identity_document_features.delay.assert_called_once_with(args=(identity_uuid,))
+    sync_identity_document_features.delay.assert_called_once_with(
+        args=(identity_uuid,), dedup_key=identity_uuid
+    )
 
 
 def test_edge_identities_featurestate_delete(
@@ -450,7 +450,8 @@ def test_edge_identities_update_trait(
         )
     )
     send_identity_update_message_mock.delay.assert_called_once_with(
-        args=(environment_api_key, identity_document["identifier"])
+        args=(environment_api_key, identity_document["identifier"]),
+        dedup_key=f"{environment_api_key}:{identity_document['identifier']}",
     )
 
 
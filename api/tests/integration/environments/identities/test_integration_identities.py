@@ -207,8 +207,10 @@ def test_get_feature_states_for_identity_only_makes_one_query_to_get_mv_feature_
         variant_2_value,
     )
 
-    # Then one fewer db queries are made (since the environment is now cached)
-    with django_assert_num_queries(5):
+    # Then two fewer db queries are made (since the environment and the project's
+    # compiled segments are now cached, and the tests keep the shared cache, which
+    # holds the revision of the project's segments, out of the database)
+    with django_assert_num_queries(4):
         second_identity_response = sdk_client.get(url)
 
     # Finally, we check that the requests were successful and we got the correct number
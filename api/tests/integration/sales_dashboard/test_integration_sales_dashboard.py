@@ -1,7 +1,10 @@
+from app_analytics.models import OrganisationAPIUsage
 from django.urls import reverse
 from rest_framework import status
 
 from environments.dynamodb.migrator import IdentityMigrator
+from organisations.models import Organisation
+from task_processor.task_run_method import TaskRunMethod
 
 
 def test_sales_dashboard_index(superuser_authenticated_client):
@@ -19,6 +22,62 @@ def test_sales_dashboard_index(superuser_authenticated_client):
     assert response.status_code == 200
 
 
+def test_sales_dashboard_index_orders_organisations_by_api_usage(
+    superuser_authenticated_client, settings
+):
+    # Given
+    settings.ANALYTICS_ENABLED = True
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    organisations = [Organisation.objects.create(name=f"Org {i}") for i in range(3)]
+    OrganisationAPIUsage.objects.create(
+        organisation=organisations[1], api_calls_24h=10, api_calls_30d=100
+    )
+    OrganisationAPIUsage.objects.create(
+        organisation=organisations[2], api_calls_24h=20, api_calls_30d=50
+    )
+    url = reverse("sales_dashboard:index")
+
+    # When
+    response = superuser_authenticated_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [
+        (organisation.id, organisation.num_24h_calls, organisation.num_30d_calls)
+        for organisation in response.context["object_list"]
+    ] == [
+        (organisations[2].id, 20, 50),
+        (organisations[1].id, 10, 100),
+        (organisations[0].id, 0, 0),
+    ]
+
+
+def test_sales_dashboard_index_queries_api_usage_if_not_precomputed(
+    superuser_authenticated_client, settings, mocker
+):
+    # Given
+    settings.ANALYTICS_ENABLED = True
+    settings.TASK_RUN_METHOD = TaskRunMethod.SEPARATE_THREAD
+    organisations = [Organisation.objects.create(name=f"Org {i}") for i in range(2)]
+    mocked_analytics_backend = mocker.patch(
+        "sales_dashboard.views.get_analytics_backend"
+    ).return_value
+    mocked_analytics_backend.get_top_organisations.side_effect = (
+        lambda date_range, limit: {organisations[1].id: 10}
+    )
+    url = reverse("sales_dashboard:index")
+
+    # When
+    response = superuser_authenticated_client.get(url)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert [
+        (organisation.id, organisation.num_24h_calls)
+        for organisation in response.context["object_list"]
+    ] == [(organisations[1].id, 10), (organisations[0].id, 0)]
+
+
 def test_migrate_identities_to_edge_calls_identity_migrator_with_correct_arguments_if_migration_is_not_done(
     superuser_authenticated_client, mocker, project, settings
 ):
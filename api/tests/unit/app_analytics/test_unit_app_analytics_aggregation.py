@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+from app_analytics.aggregation import CountAggregator
+
+
+@pytest.fixture()
+def written_counts():
+    return []
+
+
+@pytest.fixture()
+def aggregator(mocker, written_counts):
+    # don't start the background writer, the tests flush explicitly
+    mocker.patch.object(CountAggregator, "_ensure_writer_running")
+    return CountAggregator(
+        written_counts.append, flush_interval_seconds=10, flush_size=2, max_size=3
+    )
+
+
+def test_count_aggregator_writes_aggregated_counts_on_flush(aggregator, written_counts):
+    # Given
+    aggregator.add("a")
+    aggregator.add("a")
+    aggregator.add("b", count=5)
+
+    # When
+    aggregator.flush()
+
+    # Then
+    assert written_counts == [{"a": 2, "b": 5}]
+
+    # and nothing is written until there are more counts
+    aggregator.flush()
+    assert len(written_counts) == 1
+
+
+def test_count_aggregator_requests_flush_once_flush_size_reached(aggregator):
+    # When
+    aggregator.add("a")
+    aggregator.add("a")
+
+    # Then
+    assert not aggregator._flush_requested.is_set()
+
+    # When
+    aggregator.add("b")
+
+    # Then
+    assert aggregator._flush_requested.is_set()
+
+
+def test_count_aggregator_drops_counts_for_new_keys_when_full(
+    aggregator, written_counts, mocker
+):
+    # Given
+    mocked_logger = mocker.patch("app_analytics.aggregation.logger")
+    for key in ("a", "b", "c"):
+        aggregator.add(key)
+
+    # When
+    aggregator.add("d")
+    aggregator.add("a")
+
+    aggregator.flush()
+
+    # Then
+    assert written_counts == [{"a": 2, "b": 1, "c": 1}]
+    mocked_logger.warning.assert_called_once_with(
+        "Buffer full, dropped %d count(s).", 1
+    )
+
+
+def test_count_aggregator_handles_write_errors(mocker):
+    # Given
+    mocked_logger = mocker.patch("app_analytics.aggregation.logger")
+    mocker.patch.object(CountAggregator, "_ensure_writer_running")
+    write = mocker.MagicMock(side_effect=Exception("Influx is down"))
+    aggregator = CountAggregator(
+        write, flush_interval_seconds=10, flush_size=10, max_size=10
+    )
+    aggregator.add("a")
+
+    # When
+    aggregator.flush()
+
+    # Then
+    write.assert_called_once_with({"a": 1})
+    mocked_logger.exception.assert_called_once_with("Failed to write %d count(s).", 1)
+
+
+def test_count_aggregator_writes_from_background_thread(mocker):
+    # Given
+    mocker.patch("app_analytics.aggregation.atexit")
+    written = threading.Event()
+    write = mocker.MagicMock(side_effect=lambda counts: written.set())
+    aggregator = CountAggregator(
+        write, flush_interval_seconds=10, flush_size=1, max_size=10
+    )
+
+    # When
+    aggregator.add("a")
+
+    # Then
+    # the flush size has been reached so the writer doesn't wait for the interval
+    assert written.wait(timeout=1)
+    write.assert_called_once_with({"a": 1})
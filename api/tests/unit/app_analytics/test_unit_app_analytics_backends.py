@@ -0,0 +1,21 @@
+from app_analytics.backends import get_analytics_backend
+from app_analytics.backends.database import DatabaseAnalyticsBackend
+from app_analytics.backends.influxdb import InfluxDBAnalyticsBackend
+
+
+def test_get_analytics_backend(settings):
+    # Given
+    settings.ANALYTICS_BACKEND = (
+        "app_analytics.backends.database.DatabaseAnalyticsBackend"
+    )
+
+    # When
+    analytics_backend = get_analytics_backend()
+
+    # Then
+    assert isinstance(analytics_backend, DatabaseAnalyticsBackend)
+    assert get_analytics_backend() is analytics_backend
+
+
+def test_get_analytics_backend_defaults_to_influxdb():
+    assert isinstance(get_analytics_backend(), InfluxDBAnalyticsBackend)
@@ -0,0 +1,121 @@
+import pytest
+from app_analytics.cache import (
+    environment_feature_names_cache,
+    get_environment_feature_names,
+    get_organisation_event_list,
+    organisation_event_list_cache,
+)
+
+from features.models import Feature
+
+
+@pytest.fixture(autouse=True)
+def clear_environment_feature_names_cache():
+    environment_feature_names_cache.clear()
+    yield
+    environment_feature_names_cache.clear()
+
+
+def test_get_environment_feature_names_caches_names(
+    environment, feature, django_assert_num_queries
+):
+    # Given
+    get_environment_feature_names(environment.id)
+
+    # When
+    with django_assert_num_queries(0):
+        feature_names = get_environment_feature_names(environment.id)
+
+    # Then
+    assert feature_names == {feature.name}
+
+
+def test_get_environment_feature_names_refresh(environment, feature):
+    # Given
+    get_environment_feature_names(environment.id)
+    # e.g. a feature created in another process, which can't clear this cache
+    environment_feature_names_cache.set(environment.id, set())
+
+    # When
+    feature_names = get_environment_feature_names(environment.id, refresh=True)
+
+    # Then
+    assert feature_names == {feature.name}
+    assert get_environment_feature_names(environment.id) == {feature.name}
+
+
+def test_environment_feature_names_cleared_when_feature_created(
+    environment, project, feature
+):
+    # Given
+    get_environment_feature_names(environment.id)
+
+    # When
+    new_feature = Feature.objects.create(name="new_feature", project=project)
+
+    # Then
+    assert get_environment_feature_names(environment.id) == {
+        feature.name,
+        new_feature.name,
+    }
+
+
+def test_environment_feature_names_cleared_when_feature_renamed(environment, feature):
+    # Given
+    get_environment_feature_names(environment.id)
+
+    # When
+    feature.name = "renamed_feature"
+    feature.save()
+
+    # Then
+    assert get_environment_feature_names(environment.id) == {"renamed_feature"}
+
+
+def test_environment_feature_names_cleared_when_feature_deleted(environment, feature):
+    # Given
+    get_environment_feature_names(environment.id)
+
+    # When
+    feature.delete()
+
+    # Then
+    assert get_environment_feature_names(environment.id) == set()
+
+
+def test_environment_feature_names_not_cleared_when_feature_state_updated(
+    environment, feature, django_assert_num_queries
+):
+    # Given
+    get_environment_feature_names(environment.id)
+    feature_state = feature.feature_states.get(environment=environment)
+
+    # When
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+
+    # Then
+    with django_assert_num_queries(0):
+        get_environment_feature_names(environment.id)
+
+
+def test_get_organisation_event_list_caches_event_list(mocker, organisation):
+    # Given
+    organisation_event_list_cache.clear()
+    mock_analytics_backend = mocker.patch(
+        "app_analytics.cache.get_analytics_backend"
+    ).return_value
+    event_list = [{"Flags": 1, "name": "2022-01-01"}]
+    mock_analytics_backend.get_multiple_event_list_for_organisation.return_value = (
+        event_list
+    )
+
+    # When
+    get_organisation_event_list(organisation.id)
+    cached_event_list = get_organisation_event_list(organisation.id)
+
+    # Then
+    assert cached_event_list == event_list
+    mock_analytics_backend.get_multiple_event_list_for_organisation.assert_called_once_with(
+        organisation.id
+    )
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app_analytics.backends.base import APIUsage, FeatureEvaluations
+from app_analytics.backends.database import (
+    DatabaseAnalyticsBackend,
+    _increment_bucket,
+    delete_old_buckets,
+)
+from app_analytics.models import (
+    APIUsageBucket,
+    BucketSize,
+    FeatureEvaluationBucket,
+)
+from django.utils import timezone
+
+from environments.models import Environment
+from organisations.models import Organisation
+from projects.models import Project
+
+now = datetime(2022, 11, 15, 12, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def mock_now(mocker):
+    def _mock_now(dt: datetime):
+        mocker.patch.object(timezone, "now", return_value=dt)
+
+    _mock_now(now)
+    return _mock_now
+
+
+@pytest.fixture()
+def analytics_backend():
+    return DatabaseAnalyticsBackend()
+
+
+def test_write_api_usage_increments_hourly_and_daily_buckets(
+    analytics_backend, environment, mock_now
+):
+    # Given
+    api_usage = [
+        APIUsage(environment, "flags", "testserver", 10),
+        APIUsage(environment, "identities", "testserver", 2),
+        APIUsage(environment, "flags", "otherserver", 1),
+    ]
+
+    # When
+    analytics_backend.write_api_usage(api_usage)
+    analytics_backend.write_api_usage(api_usage)
+
+    # Then
+    assert {
+        (bucket.bucket_size, bucket.started_at, bucket.resource, bucket.total_count)
+        for bucket in APIUsageBucket.objects.filter(environment_id=environment.id)
+    } == {
+        (BucketSize.HOUR, datetime(2022, 11, 15, 12, tzinfo=timezone.utc), "flags", 22),
+        (BucketSize.DAY, datetime(2022, 11, 15, tzinfo=timezone.utc), "flags", 22),
+        (
+            BucketSize.HOUR,
+            datetime(2022, 11, 15, 12, tzinfo=timezone.utc),
+            "identities",
+            4,
+        ),
+        (BucketSize.DAY, datetime(2022, 11, 15, tzinfo=timezone.utc), "identities", 4),
+    }
+    assert (
+        APIUsageBucket.objects.filter(
+            organisation_id=environment.project.organisation_id
+        ).count()
+        == 4
+    )
+
+
+def test_get_events_for_organisation(
+    analytics_backend, environment, organisation, mock_now
+):
+    # Given
+    mock_now(now - timedelta(days=3))
+    analytics_backend.write_api_usage([APIUsage(environment, "flags", "host", 5)])
+    mock_now(now - timedelta(hours=2))
+    analytics_backend.write_api_usage([APIUsage(environment, "flags", "host", 3)])
+    mock_now(now)
+    analytics_backend.write_api_usage([APIUsage(environment, "traits", "host", 1)])
+
+    # When
+    events_24h = analytics_backend.get_events_for_organisation(
+        organisation.id, date_range="24h"
+    )
+    events_30d = analytics_backend.get_events_for_organisation(organisation.id)
+
+    # Then
+    assert events_24h == 4
+    assert events_30d == 9
+
+
+def test_get_events_for_organisation_without_usage(analytics_backend, organisation):
+    assert analytics_backend.get_events_for_organisation(organisation.id) == 0
+
+
+def test_get_events_for_organisation_invalid_date_range(
+    analytics_backend, organisation
+):
+    with pytest.raises(ValueError):
+        analytics_backend.get_events_for_organisation(organisation.id, "forever")
+
+
+def test_get_event_list_for_organisation(
+    analytics_backend, environment, organisation, mock_now
+):
+    # Given
+    mock_now(now - timedelta(days=1))
+    analytics_backend.write_api_usage([APIUsage(environment, "flags", "host", 5)])
+    mock_now(now)
+    analytics_backend.write_api_usage(
+        [
+            APIUsage(environment, "flags", "host", 3),
+            APIUsage(environment, "identities", "host", 1),
+        ]
+    )
+
+    # When
+    dataset, labels = analytics_backend.get_event_list_for_organisation(organisation.id)
+
+    # Then
+    assert len(labels) == 31
+    assert labels[0] == "2022-10-16"
+    assert labels[-1] == "2022-11-15"
+    assert dataset["flags"] == [0] * 29 + [5, 3]
+    assert dataset["identities"] == [0] * 30 + [1]
+    assert dataset["traits"] == []
+
+
+def test_get_multiple_event_list_for_organisation(
+    analytics_backend, environment, organisation, mock_now
+):
+    # Given
+    analytics_backend.write_api_usage(
+        [
+            APIUsage(environment, "flags", "host", 3),
+            APIUsage(environment, "identities", "host", 1),
+        ]
+    )
+
+    # When
+    events_list = analytics_backend.get_multiple_event_list_for_organisation(
+        organisation.id
+    )
+
+    # Then
+    assert len(events_list) == 31
+    assert events_list[0] == {"Flags": 0, "Identities": 0, "name": "2022-10-16"}
+    assert events_list[-1] == {"Flags": 3, "Identities": 1, "name": "2022-11-15"}
+
+
+def test_get_multiple_event_list_for_organisation_without_usage(
+    analytics_backend, organisation
+):
+    assert (
+        analytics_backend.get_multiple_event_list_for_organisation(organisation.id)
+        == []
+    )
+
+
+@pytest.mark.parametrize(
+    "period, aggregate_every, expected_events_list",
+    (
+        (
+            "30d",
+            "24h",
+            [
+                {"my_feature": 5, "datetime": "2022-11-13"},
+                {"my_feature": 3, "datetime": "2022-11-15"},
+            ],
+        ),
+        (
+            "30d",
+            "7d",
+            # windows are aligned to the epoch, which was a Thursday
+            [{"my_feature": 8, "datetime": "2022-11-10"}],
+        ),
+        ("24h", "1h", [{"my_feature": 3, "datetime": "2022-11-15"}]),
+    ),
+)
+def test_get_multiple_event_list_for_feature(
+    db, analytics_backend, mock_now, period, aggregate_every, expected_events_list
+):
+    # Given
+    mock_now(now - timedelta(days=2))
+    analytics_backend.write_feature_evaluations(
+        [
+            FeatureEvaluations(1, "my_feature", 5),
+            FeatureEvaluations(2, "my_feature", 100),
+            FeatureEvaluations(1, "other_feature", 100),
+        ]
+    )
+    mock_now(now)
+    analytics_backend.write_feature_evaluations(
+        [FeatureEvaluations(1, "my_feature", 3)]
+    )
+
+    # When
+    events_list = analytics_backend.get_multiple_event_list_for_feature(
+        environment_id=1,
+        feature_name="my_feature",
+        period=period,
+        aggregate_every=aggregate_every,
+    )
+
+    # Then
+    assert events_list == expected_events_list
+
+
+def test_get_top_organisations(analytics_backend, environment, mock_now):
+    # Given
+    other_organisation = Organisation.objects.create(name="Other Org")
+    other_project = Project.objects.create(
+        name="Other Project", organisation=other_organisation
+    )
+    other_environment = Environment.objects.create(
+        name="Other Environment", project=other_project
+    )
+
+    analytics_backend.write_api_usage(
+        [
+            APIUsage(environment, "flags", "host", 3),
+            APIUsage(other_environment, "flags", "host", 5),
+            APIUsage(other_environment, "traits", "host", 1),
+        ]
+    )
+
+    # When
+    top_organisations = analytics_backend.get_top_organisations("30d")
+    limited_top_organisations = analytics_backend.get_top_organisations("24h", "1")
+
+    # Then
+    assert list(top_organisations.items()) == [
+        (other_organisation.id, 6),
+        (environment.project.organisation_id, 3),
+    ]
+    assert limited_top_organisations == {other_organisation.id: 6}
+
+
+def test_delete_old_buckets(analytics_backend, environment, settings, mock_now):
+    # Given
+    settings.ANALYTICS_HOURLY_BUCKET_RETENTION_DAYS = 7
+    settings.ANALYTICS_DAILY_BUCKET_RETENTION_DAYS = 365
+
+    mock_now(now - timedelta(days=366))
+    analytics_backend.write_api_usage([APIUsage(environment, "flags", "host", 1)])
+    analytics_backend.write_feature_evaluations(
+        [FeatureEvaluations(environment.id, "my_feature", 1)]
+    )
+    mock_now(now - timedelta(days=8))
+    analytics_backend.write_api_usage([APIUsage(environment, "flags", "host", 1)])
+    mock_now(now)
+
+    # When
+    delete_old_buckets()
+
+    # Then
+    assert list(APIUsageBucket.objects.values_list("bucket_size", "started_at")) == [
+        (BucketSize.DAY, datetime(2022, 11, 7, tzinfo=timezone.utc))
+    ]
+    assert not FeatureEvaluationBucket.objects.exists()
+
+
+def test_increment_bucket(db):
+    # Given
+    key = {
+        "environment_id": 1,
+        "feature_name": "my_feature",
+        "bucket_size": BucketSize.HOUR,
+        "started_at": now,
+    }
+
+    # When
+    _increment_bucket(FeatureEvaluationBucket, key, 2)
+    _increment_bucket(FeatureEvaluationBucket, key, 3)
+
+    # Then
+    assert FeatureEvaluationBucket.objects.get(**key).total_count == 5
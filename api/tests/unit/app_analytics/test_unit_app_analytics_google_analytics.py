@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+import requests
+from app_analytics.google_analytics import GoogleAnalyticsCollector
+
+
+@pytest.fixture()
+def collector(mocker):
+    # don't start the background sender, the tests flush explicitly
+    mocker.patch.object(GoogleAnalyticsCollector, "_ensure_sender_running")
+    collector = GoogleAnalyticsCollector(
+        max_queue_size=3, batch_url="https://ga.test/batch", batch_size=2
+    )
+    collector._session = mocker.MagicMock()
+    return collector
+
+
+def test_google_analytics_collector_sends_hits_in_batches(collector, mocker):
+    # Given
+    for hit in ("a", "b", "c"):
+        collector.add(hit)
+
+    # When
+    collector.flush()
+
+    # Then
+    assert collector._session.post.call_args_list == [
+        mocker.call("https://ga.test/batch", data="a\nb", timeout=5),
+        mocker.call("https://ga.test/batch", data="c", timeout=5),
+    ]
+
+
+def test_google_analytics_collector_drops_hits_when_queue_full(collector, mocker):
+    # Given
+    mocked_logger = mocker.patch("app_analytics.google_analytics.logger")
+    for hit in ("a", "b", "c", "d"):
+        collector.add(hit)
+
+    # When
+    collector.flush()
+
+    # Then
+    assert [call.kwargs["data"] for call in collector._session.post.call_args_list] == [
+        "a\nb",
+        "c",
+    ]
+    mocked_logger.warning.assert_called_once_with("Queue full, dropped %d hit(s).", 1)
+
+
+def test_google_analytics_collector_handles_request_errors(collector, mocker):
+    # Given
+    mocked_logger = mocker.patch("app_analytics.google_analytics.logger")
+    collector._session.post.side_effect = requests.ConnectionError()
+    collector.add("a")
+
+    # When
+    collector.flush()
+
+    # Then
+    mocked_logger.exception.assert_called_once_with("Failed to send %d hit(s).", 1)
+
+
+def test_google_analytics_collector_sends_from_background_thread(mocker):
+    # Given
+    mocker.patch("app_analytics.google_analytics.atexit")
+    sent = threading.Event()
+
+    def post(*args, **kwargs):
+        sent.set()
+        return mocker.MagicMock()
+
+    collector = GoogleAnalyticsCollector(max_queue_size=10)
+    collector._session = mocker.MagicMock()
+    collector._session.post.side_effect = post
+
+    # When
+    collector.add("a")
+
+    # Then
+    assert sent.wait(timeout=1)
+    collector._session.post.assert_called_once_with(
+        "https://www.google-analytics.com/batch", data="a", timeout=5
+    )
@@ -0,0 +1,76 @@
+from app_analytics.backends.base import APIUsage, FeatureEvaluations
+from app_analytics.backends.influxdb import InfluxDBAnalyticsBackend
+
+
+def test_write_api_usage(mocker, environment):
+    # Given
+    mock_influxdb_wrapper = mocker.patch(
+        "app_analytics.backends.influxdb.InfluxDBWrapper"
+    )
+    mock_influxdb = mock_influxdb_wrapper.return_value
+
+    # When
+    InfluxDBAnalyticsBackend().write_api_usage(
+        [APIUsage(environment, "flags", "testserver", 10)]
+    )
+
+    # Then
+    mock_influxdb_wrapper.assert_called_once_with("api_call")
+    mock_influxdb.add_data_point.assert_called_once_with(
+        "request_count",
+        10,
+        tags={
+            "resource": "flags",
+            "organisation": environment.project.organisation.get_unique_slug(),
+            "organisation_id": environment.project.organisation_id,
+            "project": environment.project.name,
+            "project_id": environment.project_id,
+            "environment": environment.name,
+            "environment_id": environment.id,
+            "host": "testserver",
+        },
+    )
+    mock_influxdb.write.assert_called_once_with()
+
+
+def test_write_feature_evaluations(mocker):
+    # Given
+    mock_influxdb_wrapper = mocker.patch(
+        "app_analytics.backends.influxdb.InfluxDBWrapper"
+    )
+    mock_influxdb = mock_influxdb_wrapper.return_value
+
+    # When
+    InfluxDBAnalyticsBackend().write_feature_evaluations(
+        [
+            FeatureEvaluations(1, "feature_1", 10),
+            FeatureEvaluations(2, "feature_1", 2),
+        ]
+    )
+
+    # Then
+    mock_influxdb_wrapper.assert_called_once_with("feature_evaluation")
+    assert mock_influxdb.add_data_point.call_args_list == [
+        mocker.call(
+            "request_count", 10, tags={"feature_id": "feature_1", "environment_id": 1}
+        ),
+        mocker.call(
+            "request_count", 2, tags={"feature_id": "feature_1", "environment_id": 2}
+        ),
+    ]
+    mock_influxdb.write.assert_called_once_with()
+
+
+def test_get_top_organisations(mocker):
+    # Given
+    mock_get_top_organisations = mocker.patch(
+        "app_analytics.influxdb_wrapper.get_top_organisations",
+        return_value={1: 100},
+    )
+
+    # When
+    top_organisations = InfluxDBAnalyticsBackend().get_top_organisations("24h", "10")
+
+    # Then
+    assert top_organisations == {1: 100}
+    mock_get_top_organisations.assert_called_once_with("24h", limit="10")
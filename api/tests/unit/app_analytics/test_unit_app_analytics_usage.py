@@ -0,0 +1,118 @@
+import pytest
+from app_analytics.models import OrganisationAPIUsage
+from app_analytics.usage import (
+    get_organisation_api_calls,
+    update_organisation_api_usage,
+)
+
+from organisations.models import Organisation
+from task_processor.task_run_method import TaskRunMethod
+
+
+@pytest.fixture()
+def mock_analytics_backend(mocker):
+    return mocker.patch("app_analytics.usage.get_analytics_backend").return_value
+
+
+def test_update_organisation_api_usage(mock_analytics_backend, organisation):
+    # Given
+    other_organisation = Organisation.objects.create(name="Other Org")
+    unused_organisation = Organisation.objects.create(name="Unused Org")
+    deleted_organisation_id = unused_organisation.id + 1
+    top_organisations = {
+        "24h": {organisation.id: 1},
+        "7d": {organisation.id: 7, deleted_organisation_id: 3},
+        "30d": {organisation.id: 30, other_organisation.id: 5},
+    }
+    mock_analytics_backend.get_top_organisations.side_effect = (
+        lambda date_range: top_organisations[date_range]
+    )
+
+    # When
+    update_organisation_api_usage()
+
+    # Then
+    assert set(
+        OrganisationAPIUsage.objects.values_list(
+            "organisation_id", "api_calls_24h", "api_calls_7d", "api_calls_30d"
+        )
+    ) == {(organisation.id, 1, 7, 30), (other_organisation.id, 0, 0, 5)}
+
+
+def test_update_organisation_api_usage_updates_existing_usage(
+    mock_analytics_backend, organisation, django_assert_num_queries
+):
+    # Given
+    other_organisation = Organisation.objects.create(name="Other Org")
+    OrganisationAPIUsage.objects.create(
+        organisation=organisation, api_calls_24h=1, api_calls_7d=7, api_calls_30d=30
+    )
+    OrganisationAPIUsage.objects.create(
+        organisation=other_organisation, api_calls_30d=5
+    )
+    mock_analytics_backend.get_top_organisations.return_value = {organisation.id: 10}
+
+    # When
+    update_organisation_api_usage()
+
+    # Then
+    assert set(
+        OrganisationAPIUsage.objects.values_list(
+            "organisation_id", "api_calls_24h", "api_calls_7d", "api_calls_30d"
+        )
+    ) == {(organisation.id, 10, 10, 10), (other_organisation.id, 0, 0, 0)}
+
+    # and nothing is written if the usage hasn't changed
+    # (existing usage, organisations)
+    with django_assert_num_queries(2):
+        update_organisation_api_usage()
+
+
+def test_get_organisation_api_calls_reads_precomputed_usage(
+    mock_analytics_backend, organisation, settings
+):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    OrganisationAPIUsage.objects.create(
+        organisation=organisation, api_calls_24h=1, api_calls_7d=7, api_calls_30d=30
+    )
+
+    # When
+    api_calls = {
+        date_range: get_organisation_api_calls(organisation.id, date_range)
+        for date_range in ("24h", "7d", "30d")
+    }
+
+    # Then
+    assert api_calls == {"24h": 1, "7d": 7, "30d": 30}
+    mock_analytics_backend.get_events_for_organisation.assert_not_called()
+
+
+def test_get_organisation_api_calls_without_precomputed_usage(
+    mock_analytics_backend, organisation, settings
+):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+
+    # When
+    api_calls = get_organisation_api_calls(organisation.id)
+
+    # Then
+    assert api_calls == 0
+
+
+def test_get_organisation_api_calls_queries_backend_without_task_processor(
+    mock_analytics_backend, organisation, settings
+):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.SYNCHRONOUSLY
+    mock_analytics_backend.get_events_for_organisation.return_value = 7
+
+    # When
+    api_calls = get_organisation_api_calls(organisation.id, "7d")
+
+    # Then
+    assert api_calls == 7
+    mock_analytics_backend.get_events_for_organisation.assert_called_once_with(
+        organisation.id, date_range="7d"
+    )
@@ -1,10 +1,11 @@
+from app_analytics.cache import environment_feature_names_cache
 from app_analytics.views import SDKAnalyticsFlags
 from rest_framework import status
 
 
 def test_sdk_analytics_does_not_allow_bad_data(mocker, settings, environment):
     # Given
-    settings.INFLUXDB_TOKEN = "some-token"
+    settings.ANALYTICS_ENABLED = True
 
     data = {"bad": "data"}
     request = mocker.MagicMock(data=data, environment=environment)
@@ -12,7 +13,7 @@ def test_sdk_analytics_does_not_allow_bad_data(mocker, settings, environment):
     view = SDKAnalyticsFlags(request=request)
 
     mocked_track_feature_eval = mocker.patch(
-        "app_analytics.views.track_feature_evaluation_influxdb"
+        "app_analytics.views.track_feature_evaluations"
     )
 
     # When
@@ -25,7 +26,7 @@ def test_sdk_analytics_does_not_allow_bad_data(mocker, settings, environment):
 
 def test_sdk_analytics_allows_valid_data(mocker, settings, environment, feature):
     # Given
-    settings.INFLUXDB_TOKEN = "some-token"
+    settings.ANALYTICS_ENABLED = True
 
     data = {feature.name: 12}
     request = mocker.MagicMock(data=data, environment=environment)
@@ -33,7 +34,58 @@ def test_sdk_analytics_allows_valid_data(mocker, settings, environment, feature)
     view = SDKAnalyticsFlags(request=request)
 
     mocked_track_feature_eval = mocker.patch(
-        "app_analytics.views.track_feature_evaluation_influxdb"
+        "app_analytics.views.track_feature_evaluations"
+    )
+
+    # When
+    response = view.post(request)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    mocked_track_feature_eval.assert_called_once_with(environment.id, data)
+
+
+def test_sdk_analytics_caches_feature_names(
+    mocker, settings, environment, feature, django_assert_num_queries
+):
+    # Given
+    settings.ANALYTICS_ENABLED = True
+    environment_feature_names_cache.clear()
+
+    data = {feature.name: 12}
+    request = mocker.MagicMock(data=data, environment=environment)
+
+    view = SDKAnalyticsFlags(request=request)
+
+    mocked_track_feature_eval = mocker.patch(
+        "app_analytics.views.track_feature_evaluations"
+    )
+    view.post(request)
+
+    # When
+    with django_assert_num_queries(0):
+        response = view.post(request)
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    mocked_track_feature_eval.assert_called_with(environment.id, data)
+
+
+def test_sdk_analytics_refreshes_stale_feature_names(
+    mocker, settings, environment, feature
+):
+    # Given
+    settings.ANALYTICS_ENABLED = True
+    # e.g. the feature was created in another process, which can't clear this cache
+    environment_feature_names_cache.set(environment.id, set())
+
+    data = {feature.name: 12}
+    request = mocker.MagicMock(data=data, environment=environment)
+
+    view = SDKAnalyticsFlags(request=request)
+
+    mocked_track_feature_eval = mocker.patch(
+        "app_analytics.views.track_feature_evaluations"
     )
 
     # When
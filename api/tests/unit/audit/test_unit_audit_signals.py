@@ -1,122 +1,199 @@
-from django.db.models import Q
-
-from audit.models import AuditLog
+from audit.models import AuditLog, RelatedObjectType
 from audit.signals import (
-    send_environments_to_dynamodb,
-    trigger_environment_update_messages,
+    schedule_environment_updates_from_audit_log,
+    update_environment_documents,
+    update_environment_flags_payloads,
 )
+from features.models import FeatureState
 
 
-def test_send_env_to_dynamodb_from_audit_log_with_environment(
-    dynamo_enabled_project_environment_one, mocker
+def test_schedule_environment_updates_from_audit_log_with_environment(
+    environment, mocker
 ):
     # Given
-    mock_environment_model_class = mocker.patch("audit.signals.Environment")
-    audit_log = AuditLog(environment=dynamo_enabled_project_environment_one)
+    schedule_environment_updates = mocker.patch(
+        "audit.signals.schedule_environment_updates"
+    )
+    audit_log = AuditLog(environment=environment, project=environment.project)
 
     # When
-    send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
+    schedule_environment_updates_from_audit_log(sender=AuditLog, instance=audit_log)
 
     # Then
-    mock_environment_model_class.write_environments_to_dynamodb.assert_called_once_with(
-        Q(id=dynamo_enabled_project_environment_one.id)
-    )
+    schedule_environment_updates.assert_called_once_with([environment.id])
 
 
-def test_trigger_environment_update_messages_from_audit_log_with_environment(
-    dynamo_enabled_project_environment_one, mocker
+def test_schedule_environment_updates_from_audit_log_with_project(
+    dynamo_enabled_project,
+    dynamo_enabled_project_environment_one,
+    dynamo_enabled_project_environment_two,
+    mocker,
 ):
     # Given
-    send_environment_update_message = mocker.patch(
-        "audit.signals.send_environment_update_message"
+    schedule_environment_updates = mocker.patch(
+        "audit.signals.schedule_environment_updates"
     )
-    audit_log = AuditLog(environment=dynamo_enabled_project_environment_one)
+    audit_log = AuditLog(project=dynamo_enabled_project)
 
     # When
-    trigger_environment_update_messages(sender=AuditLog, instance=audit_log)
+    schedule_environment_updates_from_audit_log(sender=AuditLog, instance=audit_log)
 
     # Then
-    send_environment_update_message.delay.assert_called_once_with(
-        args=(dynamo_enabled_project_environment_one.api_key,)
+    schedule_environment_updates.assert_called_once()
+    assert sorted(schedule_environment_updates.call_args[0][0]) == sorted(
+        [
+            dynamo_enabled_project_environment_one.id,
+            dynamo_enabled_project_environment_two.id,
+        ]
     )
 
 
-def test_send_env_to_dynamodb_from_audit_log_with_project(
-    dynamo_enabled_project, mocker
+def test_update_environment_flags_payloads_from_audit_log_with_environment(
+    environment, mocker, settings
 ):
     # Given
-    mock_environment_model_class = mocker.patch("audit.signals.Environment")
-    audit_log = AuditLog(project=dynamo_enabled_project)
+    settings.CACHE_FLAGS_SECONDS = 60
+    clear_environment_flags_payload = mocker.patch(
+        "audit.signals.clear_environment_flags_payload"
+    )
+    rebuild_environment_flags_payloads = mocker.patch(
+        "audit.signals.rebuild_environment_flags_payloads"
+    )
+    audit_log = AuditLog(environment=environment)
 
     # When
-    send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
+    update_environment_flags_payloads(sender=AuditLog, instance=audit_log)
 
     # Then
-    mock_environment_model_class.write_environments_to_dynamodb.assert_called_once_with(
-        Q(project=dynamo_enabled_project)
+    clear_environment_flags_payload.assert_called_once_with(environment.api_key)
+    rebuild_environment_flags_payloads.delay.assert_called_once_with(
+        args=([environment.id],)
     )
 
 
-def test_trigger_environment_update_messages_from_audit_log_with_project(
-    dynamo_enabled_project,
-    dynamo_enabled_project_environment_one,
-    dynamo_enabled_project_environment_two,
-    mocker,
+def test_update_environment_flags_payloads_does_nothing_if_cache_disabled(
+    environment, mocker, settings
 ):
     # Given
-    send_environment_update_messages = mocker.patch(
-        "audit.signals.send_environment_update_messages"
+    settings.CACHE_FLAGS_SECONDS = 0
+    rebuild_environment_flags_payloads = mocker.patch(
+        "audit.signals.rebuild_environment_flags_payloads"
     )
-    audit_log = AuditLog(project=dynamo_enabled_project)
+    audit_log = AuditLog(environment=environment)
 
     # When
-    trigger_environment_update_messages(sender=AuditLog, instance=audit_log)
+    update_environment_flags_payloads(sender=AuditLog, instance=audit_log)
 
     # Then
-    environment_api_keys = [
-        dynamo_enabled_project_environment_one.api_key,
-        dynamo_enabled_project_environment_two.api_key,
-    ]
-    send_environment_update_messages.delay.assert_called_once_with(
-        args=(environment_api_keys,)
+    rebuild_environment_flags_payloads.delay.assert_not_called()
+
+
+def test_update_environment_documents_from_audit_log_with_project(
+    project, environment, mocker, settings
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    mocked_environment = mocker.patch("audit.signals.Environment")
+    audit_log = AuditLog(project=project)
+
+    # When
+    update_environment_documents(sender=AuditLog, instance=audit_log)
+
+    # Then
+    mocked_environment.invalidate_environment_document.assert_called_once_with(
+        environment.api_key
     )
 
 
-def test_send_env_to_dynamodb_from_audit_log_with_environment_and_project(
-    dynamo_enabled_project, dynamo_enabled_project_environment_one, mocker
+def test_update_environment_documents_does_nothing_if_cache_disabled(
+    environment, mocker, settings
 ):
     # Given
-    mock_environment_model_class = mocker.patch("audit.signals.Environment")
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 0
+    mocked_environment = mocker.patch("audit.signals.Environment")
+    audit_log = AuditLog(environment=environment)
+
+    # When
+    update_environment_documents(sender=AuditLog, instance=audit_log)
+
+    # Then
+    mocked_environment.invalidate_environment_document.assert_not_called()
+
+
+def test_update_environment_documents_patches_document_for_feature_state_change(
+    environment, feature, mocker, settings, django_capture_on_commit_callbacks
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    mocked_environment = mocker.patch("audit.signals.Environment")
+    mocked_patch_environment_document = mocker.patch(
+        "audit.signals.patch_environment_document"
+    )
+    feature_state = feature.feature_states.get(environment=environment)
     audit_log = AuditLog(
-        environment=dynamo_enabled_project_environment_one,
-        project=dynamo_enabled_project,
+        environment=environment,
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+        related_object_id=feature_state.id,
     )
 
     # When
-    send_environments_to_dynamodb(sender=AuditLog, instance=audit_log)
+    with django_capture_on_commit_callbacks() as callbacks:
+        update_environment_documents(sender=AuditLog, instance=audit_log)
 
     # Then
-    mock_environment_model_class.write_environments_to_dynamodb.assert_called_once_with(
-        Q(id=dynamo_enabled_project_environment_one.id)
+    # the document is only patched once the change is committed
+    mocked_patch_environment_document.delay.assert_not_called()
+    for callback in callbacks:
+        callback()
+    mocked_patch_environment_document.delay.assert_called_once_with(
+        args=(environment.api_key, feature.id)
     )
+    mocked_environment.invalidate_environment_document.assert_not_called()
 
 
-def test_trigger_environment_update_messages_from_audit_log_with_environment_and_project(
-    dynamo_enabled_project, dynamo_enabled_project_environment_one, mocker
+def test_update_environment_documents_ignores_identity_overrides(
+    environment, feature, identity, mocker, settings
 ):
     # Given
-    send_environment_update_message = mocker.patch(
-        "audit.signals.send_environment_update_message"
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    identity_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, identity=identity
+    )
+    mocked_environment = mocker.patch("audit.signals.Environment")
+    audit_log = AuditLog(
+        environment=environment,
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+        related_object_id=identity_feature_state.id,
+    )
+
+    mocked_patch_environment_document = mocker.patch(
+        "audit.signals.patch_environment_document"
     )
+
+    # When
+    update_environment_documents(sender=AuditLog, instance=audit_log)
+
+    # Then
+    mocked_patch_environment_document.delay.assert_not_called()
+    mocked_environment.invalidate_environment_document.assert_not_called()
+
+
+def test_update_environment_documents_invalidates_document_for_deleted_feature_state(
+    environment, mocker, settings
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    mocked_environment = mocker.patch("audit.signals.Environment")
     audit_log = AuditLog(
-        environment=dynamo_enabled_project_environment_one,
-        project=dynamo_enabled_project,
+        environment=environment,
+        related_object_type=RelatedObjectType.FEATURE_STATE.name,
+        related_object_id=999999,
     )
 
     # When
-    trigger_environment_update_messages(sender=AuditLog, instance=audit_log)
+    update_environment_documents(sender=AuditLog, instance=audit_log)
 
     # Then
-    send_environment_update_message.delay.assert_called_once_with(
-        args=(dynamo_enabled_project_environment_one.api_key,)
+    mocked_environment.invalidate_environment_document.assert_called_once_with(
+        environment.api_key
     )
@@ -0,0 +1,136 @@
+import pytest
+from core.cache import LocalLRUCache, TieredCache
+from django.core.cache import caches
+
+SHARED_CACHE_ALIAS = "test-shared-cache"
+
+
+@pytest.fixture()
+def shared_cache(settings, tmp_path):
+    # a file based cache is a reasonable stand in for a cache that is shared
+    # between processes
+    settings.CACHES = {
+        **settings.CACHES,
+        SHARED_CACHE_ALIAS: {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path),
+        },
+    }
+    return caches[SHARED_CACHE_ALIAS]
+
+
+def _get_tiered_cache(**options) -> TieredCache:
+    return TieredCache(location=SHARED_CACHE_ALIAS, params={"OPTIONS": options})
+
+
+def test_local_lru_cache_evicts_least_recently_used_when_full():
+    # Given
+    value = "x" * 100
+    cache = LocalLRUCache(max_bytes=250)
+    cache.set("a", value, timeout=None)
+    cache.set("b", value, timeout=None)
+
+    # When
+    cache.get("a")
+    cache.set("c", value, timeout=None)
+
+    # Then
+    assert cache.get("a") == value
+    assert cache.get("b") is None
+    assert cache.get("c") == value
+    assert cache.size <= cache.max_bytes
+
+
+def test_local_lru_cache_does_not_store_values_larger_than_max_bytes():
+    # Given
+    cache = LocalLRUCache(max_bytes=10)
+
+    # When
+    cache.set("a", "x" * 100, timeout=None)
+
+    # Then
+    assert cache.get("a") is None
+    assert cache.size == 0
+
+
+def test_local_lru_cache_expires_values(mocker):
+    # Given
+    mocked_time = mocker.patch("core.cache.time")
+    mocked_time.monotonic.return_value = 100
+    cache = LocalLRUCache(max_bytes=1000)
+    cache.set("a", "value", timeout=10)
+
+    # When
+    mocked_time.monotonic.return_value = 111
+
+    # Then
+    assert cache.get("a") is None
+    assert cache.size == 0
+
+
+def test_tiered_cache_reads_from_shared_cache_and_keeps_value_locally(shared_cache):
+    # Given
+    cache = _get_tiered_cache()
+    shared_cache.set("key", "value")
+
+    # When
+    value = cache.get("key")
+    shared_cache.delete("key")
+
+    # Then
+    assert value == "value"
+    assert cache.get("key") == "value"
+
+
+def test_tiered_cache_writes_to_both_tiers(shared_cache):
+    # Given
+    cache = _get_tiered_cache()
+
+    # When
+    cache.set("key", "value")
+    cache.set_many({"key-2": "value-2"})
+
+    # Then
+    assert shared_cache.get_many(["key", "key-2"]) == {
+        "key": "value",
+        "key-2": "value-2",
+    }
+
+
+def test_tiered_cache_delete_clears_both_tiers(shared_cache):
+    # Given
+    cache = _get_tiered_cache()
+    cache.set("key", "value")
+
+    # When
+    cache.delete("key")
+
+    # Then
+    assert cache.get("key") is None
+    assert shared_cache.get("key") is None
+
+
+def test_tiered_cache_local_timeout_bounds_staleness(shared_cache):
+    # Given
+    cache = _get_tiered_cache(LOCAL_TIMEOUT=0)
+    cache.set("key", "value")
+
+    # When
+    # another process updates the shared cache
+    shared_cache.set("key", "updated")
+
+    # Then
+    assert cache.get("key") == "updated"
+
+
+def test_tiered_cache_add_only_sets_missing_keys(shared_cache):
+    # Given
+    cache = _get_tiered_cache()
+    shared_cache.set("key", "value")
+
+    # When
+    added = cache.add("key", "other value")
+
+    # Then
+    assert added is False
+    assert cache.get("key") == "value"
@@ -49,3 +49,53 @@ def test_identity_get_all_feature_states_gets_latest_committed_version(environme
         filter(lambda fs: fs.feature == feature, identity_feature_states)
     )
     assert identity_feature_state.get_feature_state_value() == "v2"
+
+
+def test_identity_get_all_feature_states_gets_latest_segment_override_version(
+    environment, feature, feature_segment, identity, identity_matching_segment
+):
+    # Given
+    feature_segment.segment = identity_matching_segment
+    feature_segment.save()
+
+    segment_feature_state_v1 = FeatureState.objects.create(
+        feature=feature,
+        environment=environment,
+        feature_segment=feature_segment,
+        enabled=False,
+    )
+    segment_feature_state_v2 = segment_feature_state_v1.clone(
+        env=environment, live_from=timezone.now(), version=2
+    )
+    segment_feature_state_v2.enabled = True
+    segment_feature_state_v2.save()
+
+    # When
+    identity_feature_states = identity.get_all_feature_states()
+
+    # Then
+    assert identity_feature_states == [segment_feature_state_v2]
+
+
+def test_identity_get_all_feature_states_only_queries_identity_overrides_with_snapshot(
+    environment, feature, identity, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS = 60
+    settings.CACHE_PROJECT_SEGMENTS_SECONDS = 60
+
+    identity_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, identity=identity, enabled=True
+    )
+
+    # prime the caches
+    identity.get_all_feature_states(traits=[])
+
+    # When
+    # we expect 2 queries to retrieve the identity's feature states and the
+    # related multivariate values
+    with django_assert_num_queries(2):
+        identity_feature_states = identity.get_all_feature_states(traits=[])
+
+    # Then
+    assert identity_feature_states == [identity_feature_state]
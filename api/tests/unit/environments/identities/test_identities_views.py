@@ -54,3 +54,41 @@ def test_identity_view_set_get_permissions():
         "list": VIEW_ENVIRONMENT,
         "retrieve": MANAGE_IDENTITIES,
     }
+
+
+def test_sdk_identities_returns_not_modified_if_etag_matches(
+    environment, identity, api_client
+):
+    # Given
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = "%s?identifier=%s" % (reverse("api-v1:sdk-identities"), identity.identifier)
+
+    first_response = api_client.get(url)
+    assert first_response.status_code == status.HTTP_200_OK
+
+    # When
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=first_response["ETag"])
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == first_response["ETag"]
+
+
+def test_sdk_identities_post_does_not_return_not_modified(
+    environment, identity, api_client
+):
+    # Given
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=environment.api_key)
+    url = reverse("api-v1:sdk-identities")
+    data = {"identifier": identity.identifier, "traits": []}
+
+    first_response = api_client.post(url, data=data, format="json")
+
+    # When
+    response = api_client.post(
+        url, data=data, format="json", HTTP_IF_NONE_MATCH=first_response.get("ETag")
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    assert not response.has_header("ETag")
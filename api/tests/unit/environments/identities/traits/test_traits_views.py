@@ -68,7 +68,8 @@ def test_trait_view_post_calls_send_identity_update_message_correctly(
         url, data={"trait_key": "foo", "value_type": "unicode", "string_value": "foo"}
     )
     send_identity_update_message.delay.assert_called_once_with(
-        args=(environment.api_key, identity.identifier)
+        args=(environment.api_key, identity.identifier),
+        dedup_key=f"{environment.api_key}:{identity.identifier}",
     )
 
 
@@ -92,7 +93,8 @@ def test_trait_view_delete_trait(environment, admin_client, identity, trait, moc
     assert not Trait.objects.filter(pk=trait.id).exists()
 
     send_identity_update_message.delay.assert_called_once_with(
-        args=(environment.api_key, identity.identifier)
+        args=(environment.api_key, identity.identifier),
+        dedup_key=f"{environment.api_key}:{identity.identifier}",
     )
 
 
@@ -114,7 +116,8 @@ def test_trait_view_set_update(environment, admin_client, identity, trait, mocke
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["string_value"] == new_value
     send_identity_update_message.delay.assert_called_once_with(
-        args=(environment.api_key, identity.identifier)
+        args=(environment.api_key, identity.identifier),
+        dedup_key=f"{environment.api_key}:{identity.identifier}",
     )
 
 
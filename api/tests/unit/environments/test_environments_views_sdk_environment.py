@@ -77,3 +77,44 @@ def test_get_environment_document_fails_with_invalid_key(
     # We get a 403 since only the server side API keys are able to access the
     # environment document
     assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_get_environment_document_returns_not_modified_if_etag_matches(
+    environment, environment_api_key
+):
+    # Given
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    url = reverse("api-v1:environment-document")
+
+    etag = client.get(url)["ETag"]
+
+    # When
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+
+
+def test_get_environment_document_uses_cached_etag_without_retrieving_document(
+    environment, environment_api_key, settings, mocker
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    Environment.get_environment_document(environment.api_key)
+    etag = Environment.get_environment_document_etag(environment.api_key)
+
+    get_environment_document_spy = mocker.spy(Environment, "get_environment_document")
+
+    client = APIClient()
+    client.credentials(HTTP_X_ENVIRONMENT_KEY=environment_api_key.key)
+    url = reverse("api-v1:environment-document")
+
+    # When
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    get_environment_document_spy.assert_not_called()
@@ -1,4 +1,14 @@
-from environments.tasks import rebuild_environment_document
+from django.db.models import Q
+
+from environments.tasks import (
+    _EnvironmentUpdateDebouncer,
+    patch_environment_document,
+    process_environment_update,
+    rebuild_environment_document,
+    schedule_environment_updates,
+)
+from task_processor.models import ENVIRONMENT_UPDATES_QUEUE, Task, TaskPriority
+from task_processor.task_run_method import TaskRunMethod
 
 
 def test_rebuild_environment_document(environment, mocker):
@@ -13,3 +23,111 @@ def test_rebuild_environment_document(environment, mocker):
 
     # Then
     mock_dynamo_wrapper.write_environment.assert_called_once_with(environment)
+
+
+def test_patch_environment_document(environment, feature, mocker):
+    # Given
+    mocked_environment_class = mocker.patch("environments.tasks.Environment")
+
+    # When
+    patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    mocked_environment_class.patch_environment_document.assert_called_once_with(
+        environment.api_key, feature.id
+    )
+
+
+def test_process_environment_update(environment, mocker):
+    # Given
+    mocked_environment_class = mocker.patch("environments.tasks.Environment")
+    mocked_environment_class.objects = environment.__class__.objects
+    send_environment_update_message = mocker.patch(
+        "environments.tasks.send_environment_update_message"
+    )
+    publish_environment_update = mocker.patch(
+        "environments.tasks.publish_environment_update"
+    )
+
+    # When
+    process_environment_update(environment.id)
+
+    # Then
+    mocked_environment_class.write_environments_to_dynamodb.assert_called_once_with(
+        Q(id=environment.id)
+    )
+    send_environment_update_message.assert_called_once_with(environment.api_key)
+    publish_environment_update.assert_called_once_with(environment.api_key)
+
+
+def test_schedule_environment_updates_does_nothing_if_nothing_to_update(
+    environment, settings, mocker
+):
+    # Given
+    settings.SSE_SERVER_BASE_URL = None
+    settings.SSE_STREAMING_ENABLED = False
+    mocker.patch("environments.tasks.environment_wrapper", is_enabled=False)
+    process_environment_update = mocker.patch(
+        "environments.tasks.process_environment_update"
+    )
+
+    # When
+    schedule_environment_updates([environment.id])
+
+    # Then
+    process_environment_update.assert_not_called()
+    process_environment_update.delay.assert_not_called()
+
+
+def test_schedule_environment_updates_coalesces_tasks(environment, settings):
+    # Given
+    settings.SSE_SERVER_BASE_URL = "http://sse.flagsmith.com"
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    settings.ENVIRONMENT_UPDATE_DEBOUNCE_SECONDS = 2
+
+    # When
+    schedule_environment_updates([environment.id])
+    schedule_environment_updates([environment.id])
+
+    # Then
+    task = Task.objects.get(task_identifier=process_environment_update.task_identifier)
+    assert task.args == [environment.id]
+    assert task.queue == ENVIRONMENT_UPDATES_QUEUE
+    assert task.priority == TaskPriority.HIGH
+
+
+def test_schedule_environment_updates_without_debounce(environment, settings, mocker):
+    # Given
+    settings.SSE_SERVER_BASE_URL = "http://sse.flagsmith.com"
+    settings.ENVIRONMENT_UPDATE_DEBOUNCE_SECONDS = 0
+    process_environment_update = mocker.patch(
+        "environments.tasks.process_environment_update"
+    )
+
+    # When
+    schedule_environment_updates([environment.id])
+
+    # Then
+    process_environment_update.delay.assert_called_once_with(args=(environment.id,))
+
+
+def test_environment_update_debouncer_coalesces_updates(mocker):
+    # Given
+    mocked_timer = mocker.patch("environments.tasks.threading.Timer")
+    process_environment_update = mocker.patch(
+        "environments.tasks.process_environment_update"
+    )
+    debouncer = _EnvironmentUpdateDebouncer()
+
+    # When
+    debouncer.schedule(1, debounce_seconds=2)
+    debouncer.schedule(1, debounce_seconds=2)
+
+    # Then
+    mocked_timer.assert_called_once_with(2, debouncer._run, args=(1,))
+
+    # and, once the timer has fired, further updates are scheduled again
+    debouncer._run(1)
+    process_environment_update.assert_called_once_with(1)
+    debouncer.schedule(1, debounce_seconds=2)
+    assert mocked_timer.call_count == 2
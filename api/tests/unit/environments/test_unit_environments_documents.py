@@ -0,0 +1,232 @@
+from flag_engine.api.document_builders import build_environment_document
+
+from environments.documents import patch_environment_document
+from environments.models import Environment, environment_document_cache
+from features.models import Feature, FeatureSegment, FeatureState
+from segments.models import Segment
+
+
+def _normalise(document: dict) -> dict:
+    # the flag engine generates a new featurestate_uuid each time that a document
+    # is built and segment overrides can be in any order
+    feature_states = [*document["feature_states"]]
+    for segment in document["project"]["segments"]:
+        segment["feature_states"].sort(key=lambda fs: fs["feature"]["id"])
+        feature_states.extend(segment["feature_states"])
+
+    for feature_state in feature_states:
+        del feature_state["featurestate_uuid"]
+
+    return document
+
+
+def test_patch_environment_document_matches_full_rebuild(
+    environment, feature, segment, feature_segment, segment_featurestate
+):
+    # Given
+    other_feature = Feature.objects.create(
+        name="other_feature", project=environment.project
+    )
+    FeatureState.objects.create(
+        feature=other_feature,
+        environment=environment,
+        feature_segment=feature_segment,
+    )
+    document = build_environment_document(
+        Environment.objects.filter_for_document_builder(id=environment.id).get()
+    )
+
+    feature_state = feature.feature_states.get(
+        environment=environment, feature_segment=None, identity=None
+    )
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+
+    segment_featurestate.enabled = not segment_featurestate.enabled
+    segment_featurestate.save()
+
+    # When
+    patched_document = patch_environment_document(
+        document, environment_id=environment.id, feature_id=feature.id
+    )
+
+    # Then
+    rebuilt_document = build_environment_document(
+        Environment.objects.filter_for_document_builder(id=environment.id).get()
+    )
+    assert patched_document is not document
+    assert _normalise(patched_document) == _normalise(rebuilt_document)
+
+
+def test_patch_environment_document_returns_none_for_new_feature(environment, feature):
+    # Given
+    document = build_environment_document(
+        Environment.objects.filter_for_document_builder(id=environment.id).get()
+    )
+    new_feature = Feature.objects.create(name="new", project=environment.project)
+
+    # When
+    patched_document = patch_environment_document(
+        document, environment_id=environment.id, feature_id=new_feature.id
+    )
+
+    # Then
+    assert patched_document is None
+
+
+def test_patch_environment_document_returns_none_for_new_segment(environment, feature):
+    # Given
+    document = build_environment_document(
+        Environment.objects.filter_for_document_builder(id=environment.id).get()
+    )
+    new_segment = Segment.objects.create(name="new", project=environment.project)
+    feature_segment = FeatureSegment.objects.create(
+        feature=feature, segment=new_segment, environment=environment
+    )
+    FeatureState.objects.create(
+        feature=feature, environment=environment, feature_segment=feature_segment
+    )
+
+    # When
+    patched_document = patch_environment_document(
+        document, environment_id=environment.id, feature_id=feature.id
+    )
+
+    # Then
+    assert patched_document is None
+
+
+def test_environment_patch_environment_document_updates_cached_document(
+    environment, feature, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    Environment.get_environment_document(environment.api_key)
+    etag = Environment.get_environment_document_etag(environment.api_key)
+
+    feature_state = feature.feature_states.get(environment=environment)
+    feature_state.enabled = not feature_state.enabled
+    feature_state.save()
+
+    # When
+    Environment.patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    with django_assert_num_queries(0):
+        document = Environment.get_environment_document(environment.api_key)
+    assert document["feature_states"][0]["enabled"] is feature_state.enabled
+    assert Environment.get_environment_document_etag(environment.api_key) != etag
+
+
+def test_environment_patch_environment_document_invalidates_if_not_cached(
+    environment, feature, settings
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+
+    # When
+    Environment.patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    assert Environment.get_environment_document_etag(environment.api_key) is None
+
+
+def test_environment_patch_environment_document_invalidates_if_lock_not_acquired(
+    environment, feature, settings, mocker
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    Environment.get_environment_document(environment.api_key)
+    mocked_sleep = mocker.patch("time.sleep")
+
+    # another patch is holding the lock
+    environment_document_cache.add(f"{environment.api_key}:lock", "other", 60)
+
+    # When
+    Environment.patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    # the lock isn't waited for
+    mocked_sleep.assert_not_called()
+    assert Environment.get_environment_document_etag(environment.api_key) is None
+    # and the other patch's lock is left in place
+    assert environment_document_cache.get(f"{environment.api_key}:lock") == "other"
+
+
+def test_environment_patch_environment_document_does_not_release_lock_it_no_longer_holds(
+    environment, feature, settings, mocker
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    lock_key = f"{environment.api_key}:lock"
+
+    def expire_lock_and_acquire_it_elsewhere(*args, **kwargs):
+        environment_document_cache.set(lock_key, "other", 60)
+
+    mocker.patch(
+        "environments.models.patch_environment_document",
+        side_effect=expire_lock_and_acquire_it_elsewhere,
+    )
+    Environment.get_environment_document(environment.api_key)
+
+    # When
+    Environment.patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    assert environment_document_cache.get(lock_key) == "other"
+
+
+def test_environment_patch_environment_document_does_not_replace_concurrent_invalidation(
+    environment, feature, settings, mocker
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    document = Environment.get_environment_document(environment.api_key)
+
+    def patch_during_invalidation(*args, **kwargs):
+        Environment.invalidate_environment_document(environment.api_key)
+        return document
+
+    mocker.patch(
+        "environments.models.patch_environment_document",
+        side_effect=patch_during_invalidation,
+    )
+
+    # When
+    Environment.patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    assert Environment.get_environment_document_etag(environment.api_key) is None
+
+
+def test_environment_patch_environment_document_does_not_replace_invalidation_after_check(
+    environment, feature, settings, mocker
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    Environment.get_environment_document(environment.api_key)
+
+    set_environment_document_revision = Environment._set_environment_document_revision
+    invalidated = False
+
+    def invalidate_before_publishing(api_key, revision):
+        # an invalidation lands after the patch checked that the revision hadn't
+        # moved, but before the patched revision is published
+        nonlocal invalidated
+        if not invalidated:
+            invalidated = True
+            Environment.invalidate_environment_document(api_key)
+        set_environment_document_revision(api_key, revision)
+
+    mocker.patch.object(
+        Environment,
+        "_set_environment_document_revision",
+        side_effect=invalidate_before_publishing,
+    )
+
+    # When
+    Environment.patch_environment_document(environment.api_key, feature.id)
+
+    # Then
+    assert invalidated
+    assert Environment.get_environment_document_etag(environment.api_key) is None
@@ -1,10 +1,11 @@
 from unittest.mock import MagicMock
 
 import pytest
+from core.helpers import generate_etag
 from core.request_origin import RequestOrigin
 from django.db.models import Q
-from flag_engine.api.document_builders import build_environment_document
 from pytest_django.asserts import assertQuerysetEqual as assert_queryset_equal
+from rest_framework.renderers import JSONRenderer
 
 from environments.models import Environment, Webhook
 from features.models import Feature, FeatureState
@@ -189,17 +190,11 @@ def test_environment_get_environment_document(environment, django_assert_num_que
 
 
 def test_environment_get_environment_document_with_caching_when_document_in_cache(
-    environment, django_assert_num_queries, settings, mocker
+    environment, django_assert_num_queries, settings
 ):
     # Given
     settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
-
-    mocked_environment_document_cache = mocker.patch(
-        "environments.models.environment_document_cache"
-    )
-    mocked_environment_document_cache.get.return_value = build_environment_document(
-        environment
-    )
+    Environment.get_environment_document(environment.api_key)
 
     # When
     with django_assert_num_queries(0):
@@ -211,16 +206,11 @@ def test_environment_get_environment_document_with_caching_when_document_in_cach
 
 
 def test_environment_get_environment_document_with_caching_when_document_not_in_cache(
-    environment, django_assert_num_queries, settings, mocker
+    environment, django_assert_num_queries, settings
 ):
     # Given
     settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
 
-    mocked_environment_document_cache = mocker.patch(
-        "environments.models.environment_document_cache"
-    )
-    mocked_environment_document_cache.get.return_value = None
-
     # When
     with django_assert_num_queries(4):
         environment_document = Environment.get_environment_document(environment.api_key)
@@ -228,10 +218,41 @@ def test_environment_get_environment_document_with_caching_when_document_not_in_
     # Then
     assert environment_document
     assert environment_document["api_key"] == environment.api_key
+    assert Environment.get_environment_document_etag(
+        environment.api_key
+    ) == generate_etag(JSONRenderer().render(environment_document))
 
-    mocked_environment_document_cache.set.assert_called_once_with(
-        environment.api_key, environment_document
-    )
+
+def test_environment_invalidate_environment_document(project, environment, settings):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 60
+    Environment.get_environment_document(environment.api_key)
+    etag = Environment.get_environment_document_etag(environment.api_key)
+
+    project.name = "updated"
+    project.save()
+
+    # When
+    Environment.invalidate_environment_document(environment.api_key)
+
+    # Then
+    assert Environment.get_environment_document_etag(environment.api_key) is None
+    environment_document = Environment.get_environment_document(environment.api_key)
+    assert environment_document["project"]["name"] == "updated"
+    assert Environment.get_environment_document_etag(environment.api_key) != etag
+
+
+def test_environment_get_environment_document_etag_without_caching(
+    environment, settings
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_DOCUMENT_SECONDS = 0
+
+    # When
+    etag = Environment.get_environment_document_etag(environment.api_key)
+
+    # Then
+    assert etag is None
 
 
 def test_creating_a_feature_with_defaults_does_not_set_defaults_if_disabled(project):
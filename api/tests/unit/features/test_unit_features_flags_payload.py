@@ -0,0 +1,163 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from environments.models import EnvironmentAPIKey
+from features.flags_payload import (
+    build_environment_flags_payload,
+    clear_environment_flags_payload,
+    flags_cache,
+    get_environment_flags_payload,
+    rebuild_environment_flags_payload,
+)
+from features.models import FeatureState
+from task_processor.task_run_method import TaskRunMethod
+
+
+@pytest.fixture(autouse=True)
+def clear_flags_cache():
+    flags_cache.clear()
+    yield
+    flags_cache.clear()
+
+
+def test_build_environment_flags_payload(environment, feature):
+    # When
+    payload = build_environment_flags_payload(environment.id)
+
+    # Then
+    data = json.loads(payload.content)
+    assert len(data) == 1
+    assert data[0]["feature"]["name"] == feature.name
+    assert payload.etag == build_environment_flags_payload(environment.id).etag
+
+
+def test_get_environment_flags_payload_is_cached(
+    environment, feature, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    payload = get_environment_flags_payload(environment)
+
+    # When
+    with django_assert_num_queries(0):
+        cached_payload = get_environment_flags_payload(environment)
+
+    # Then
+    assert cached_payload == payload
+
+
+def test_rebuilt_flags_payload_is_served_by_other_processes(
+    environment, feature, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    stale_payload = get_environment_flags_payload(environment)
+
+    FeatureState.objects.filter(
+        feature=feature, environment=environment, identity=None
+    ).update(enabled=True)
+    clear_environment_flags_payload(environment.api_key)
+    payload = rebuild_environment_flags_payload(environment)
+
+    # When
+    # another process, whose own copies have expired, serves the request
+    flags_cache._local_cache.clear()
+    with django_assert_num_queries(0):
+        served_payload = get_environment_flags_payload(environment)
+
+    # Then
+    assert served_payload == payload
+    assert served_payload != stale_payload
+    assert json.loads(served_payload.content)[0]["enabled"] is True
+
+
+def test_get_environment_flags_payload_is_not_cached_past_a_scheduled_change(
+    environment, feature, settings, mocker
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 600
+    feature_state = FeatureState.objects.get(
+        feature=feature, environment=environment, feature_segment=None, identity=None
+    )
+    feature_state.clone(
+        env=environment, live_from=timezone.now() + timedelta(seconds=60), version=2
+    )
+    mocked_flags_cache = mocker.patch(
+        "features.flags_payload.flags_cache", autospec=True
+    )
+    mocked_flags_cache.get.return_value = None
+
+    # When
+    get_environment_flags_payload(environment)
+
+    # Then
+    _, kwargs = mocked_flags_cache.set.call_args
+    assert 0 < kwargs["timeout"] <= 60
+
+
+def test_flags_payload_is_rebuilt_when_environment_changes(
+    environment, feature, settings, admin_client
+):
+    # Given
+    settings.CACHE_FLAGS_SECONDS = 60
+    settings.TASK_RUN_METHOD = TaskRunMethod.SYNCHRONOUSLY
+    initial_payload = get_environment_flags_payload(environment)
+
+    feature_state = FeatureState.objects.get(
+        feature=feature, environment=environment, feature_segment=None, identity=None
+    )
+    url = reverse(
+        "api-v1:environments:environment-featurestates-detail",
+        args=[environment.api_key, feature_state.id],
+    )
+
+    # When
+    response = admin_client.patch(
+        url, data=json.dumps({"enabled": True}), content_type="application/json"
+    )
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    payload = get_environment_flags_payload(environment)
+    assert payload != initial_payload
+    assert json.loads(payload.content)[0]["enabled"] is True
+
+
+def test_sdk_flags_view_returns_rendered_payload_with_etag(
+    environment, feature, api_client
+):
+    # Given
+    api_key = EnvironmentAPIKey.objects.create(environment=environment).key
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=api_key)
+
+    # When
+    response = api_client.get(reverse("api-v1:flags"))
+
+    # Then
+    assert response.status_code == status.HTTP_200_OK
+    payload = build_environment_flags_payload(environment.id)
+    assert response.content == payload.content
+    assert response["ETag"] == payload.etag
+
+
+def test_sdk_flags_view_returns_not_modified_if_etag_matches(
+    environment, feature, api_client
+):
+    # Given
+    api_key = EnvironmentAPIKey.objects.create(environment=environment).key
+    api_client.credentials(HTTP_X_ENVIRONMENT_KEY=api_key)
+
+    etag = build_environment_flags_payload(environment.id).etag
+
+    # When
+    response = api_client.get(reverse("api-v1:flags"), HTTP_IF_NONE_MATCH=etag)
+
+    # Then
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"] == etag
+    assert not response.content
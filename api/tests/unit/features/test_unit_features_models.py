@@ -125,3 +125,35 @@ def test_creating_a_feature_with_defaults_does_not_set_defaults_if_disabled(
     feature_state = FeatureState.objects.get(feature=feature, environment=environment)
     assert feature_state.enabled is False
     assert feature_state.get_feature_state_value() is None
+
+
+def test_feature_state_manager_get_live_feature_states_returns_only_latest_versions(
+    feature, environment, feature_segment, identity
+):
+    # Given
+    environment_feature_state_v1 = FeatureState.objects.get(
+        feature=feature, environment=environment, feature_segment=None, identity=None
+    )
+    environment_feature_state_v2 = environment_feature_state_v1.clone(
+        env=environment, live_from=yesterday, version=2
+    )
+    # a scheduled version and a draft which should both be ignored
+    environment_feature_state_v1.clone(env=environment, live_from=tomorrow, version=3)
+    environment_feature_state_v1.clone(env=environment, as_draft=True)
+
+    segment_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, feature_segment=feature_segment
+    )
+    identity_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, identity=identity
+    )
+
+    # When
+    feature_states = FeatureState.objects.get_live_feature_states(environment.id)
+
+    # Then
+    assert set(feature_states) == {
+        environment_feature_state_v2,
+        segment_feature_state,
+        identity_feature_state,
+    }
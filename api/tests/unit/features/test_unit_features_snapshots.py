@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from features.models import FeatureSegment, FeatureState
+from features.snapshots import (
+    EnvironmentFeatureStatesSnapshot,
+    environment_feature_states_cache,
+)
+from segments.models import Segment
+
+
+@pytest.fixture(autouse=True)
+def clear_environment_feature_states_cache():
+    environment_feature_states_cache.clear()
+    yield
+    environment_feature_states_cache.clear()
+
+
+def test_snapshot_get_feature_states_uses_highest_priority_segment_override(
+    feature, environment, project
+):
+    # Given
+    environment_feature_state = FeatureState.objects.get(
+        feature=feature, environment=environment, feature_segment=None, identity=None
+    )
+
+    segment_one = Segment.objects.create(name="segment 1", project=project)
+    segment_two = Segment.objects.create(name="segment 2", project=project)
+    feature_segment_one = FeatureSegment.objects.create(
+        feature=feature, segment=segment_one, environment=environment
+    )
+    feature_segment_two = FeatureSegment.objects.create(
+        feature=feature, segment=segment_two, environment=environment
+    )
+    segment_one_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, feature_segment=feature_segment_one
+    )
+    segment_two_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, feature_segment=feature_segment_two
+    )
+
+    # When
+    snapshot = EnvironmentFeatureStatesSnapshot.build(environment)
+
+    # Then
+    assert snapshot.get_feature_states([]) == [environment_feature_state]
+    assert snapshot.get_feature_states([segment_two]) == [segment_two_feature_state]
+    assert snapshot.get_feature_states([segment_one, segment_two]) == [
+        segment_one_feature_state
+    ]
+
+
+def test_snapshot_get_feature_states_prefers_identity_overrides(
+    feature, environment, segment, segment_featurestate, identity
+):
+    # Given
+    identity_feature_state = FeatureState.objects.create(
+        feature=feature, environment=environment, identity=identity
+    )
+    snapshot = EnvironmentFeatureStatesSnapshot.build(environment)
+
+    # When
+    feature_states = snapshot.get_feature_states([segment], [identity_feature_state])
+
+    # Then
+    assert feature_states == [identity_feature_state]
+
+
+def test_snapshot_get_is_cached_and_cleared_on_feature_state_change(
+    feature, environment, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS = 60
+    snapshot = EnvironmentFeatureStatesSnapshot.get(environment)
+
+    # When
+    with django_assert_num_queries(0):
+        cached_snapshot = EnvironmentFeatureStatesSnapshot.get(environment)
+
+    feature_state = snapshot.environment_feature_states[feature.id]
+    feature_state.enabled = True
+    feature_state.save()
+
+    # Then
+    assert cached_snapshot.environment_feature_states[feature.id].enabled is False
+    assert environment_feature_states_cache.get(environment.id) is None
+    assert (
+        EnvironmentFeatureStatesSnapshot.get(environment)
+        .environment_feature_states[feature.id]
+        .enabled
+        is True
+    )
+
+
+def test_snapshot_is_not_cached_past_the_next_scheduled_change(
+    feature, environment, settings, mocker
+):
+    # Given
+    settings.CACHE_ENVIRONMENT_FEATURE_STATES_SECONDS = 600
+    feature_state = FeatureState.objects.get(
+        feature=feature, environment=environment, feature_segment=None, identity=None
+    )
+    feature_state.clone(
+        env=environment, live_from=timezone.now() + timedelta(seconds=60), version=2
+    )
+    mocked_cache = mocker.patch(
+        "features.snapshots.environment_feature_states_cache", autospec=True
+    )
+    mocked_cache.get.return_value = None
+
+    # When
+    snapshot = EnvironmentFeatureStatesSnapshot.get(environment)
+
+    # Then
+    _, kwargs = mocked_cache.set.call_args
+    assert 0 < kwargs["timeout"] <= 60
+    assert snapshot.environment_feature_states[feature.id] == feature_state
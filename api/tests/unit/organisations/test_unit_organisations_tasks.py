@@ -0,0 +1,38 @@
+from organisations.models import Organisation
+from organisations.tasks import (
+    check_if_organisations_over_plan_limit,
+    check_organisations_over_plan_limit_periodically,
+)
+
+
+def test_check_if_organisations_over_plan_limit_alerts_once(
+    organisation, admin_user, mocker
+):
+    # Given
+    mocker.patch.object(Organisation, "over_plan_seats_limit", return_value=True)
+    mocked_send_alert = mocker.patch("organisations.tasks.send_alert")
+
+    # When
+    check_if_organisations_over_plan_limit()
+    check_if_organisations_over_plan_limit()
+
+    # Then
+    mocked_send_alert.assert_called_once_with(organisation)
+    organisation.refresh_from_db()
+    assert organisation.alerted_over_plan_limit is True
+
+
+def test_check_organisations_over_plan_limit_periodically_does_nothing_if_disabled(
+    settings, mocker
+):
+    # Given
+    settings.ENABLE_PLAN_LIMIT_CHECKS = False
+    mocked_check = mocker.patch(
+        "organisations.tasks.check_if_organisations_over_plan_limit"
+    )
+
+    # When
+    check_organisations_over_plan_limit_periodically()
+
+    # Then
+    mocked_check.assert_not_called()
@@ -0,0 +1,226 @@
+import pytest
+from core.cache import get_shared_cache
+from core.constants import BOOLEAN, FLOAT, INTEGER, STRING
+
+from environments.identities.traits.models import Trait
+from segments import evaluator
+from segments.evaluator import (
+    CompiledCondition,
+    CompiledSegments,
+    build_trait_index,
+    get_compiled_segments,
+)
+from segments.models import (
+    CONTAINS,
+    EQUAL,
+    GREATER_THAN,
+    LESS_THAN_INCLUSIVE,
+    MODULO,
+    NOT_CONTAINS,
+    NOT_EQUAL,
+    PERCENTAGE_SPLIT,
+    REGEX,
+    Condition,
+    Segment,
+    SegmentRule,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_compiled_segments_cache():
+    evaluator._compiled_segments_cache.clear()
+    yield
+    evaluator._compiled_segments_cache.clear()
+
+
+@pytest.mark.parametrize(
+    "operator, condition_value, trait_value_type, trait_value",
+    [
+        (EQUAL, "10", INTEGER, 10),
+        (GREATER_THAN, "10", INTEGER, 10),
+        (LESS_THAN_INCLUSIVE, "not-an-int", INTEGER, 10),
+        (NOT_EQUAL, "1.5", FLOAT, 1.5),
+        (GREATER_THAN, "1.5", FLOAT, 2.5),
+        (EQUAL, "true", BOOLEAN, True),
+        (NOT_EQUAL, "false", BOOLEAN, True),
+        (EQUAL, "maybe", BOOLEAN, True),
+        (GREATER_THAN, "1.0.0:semver", STRING, "1.0.1"),
+        (EQUAL, "1.0.0:semver", STRING, "1.0.1"),
+        (EQUAL, "foo", STRING, "foo"),
+        (CONTAINS, "oo", STRING, "foo"),
+        (NOT_CONTAINS, "oo", STRING, "foo"),
+        (REGEX, r"[a-z]+\d", STRING, "abc1"),
+        (REGEX, r"[a-z]+\d", STRING, "123"),
+        (GREATER_THAN, "foo", STRING, "foo"),
+        (MODULO, "2|0", INTEGER, 4),
+        (MODULO, "2|0", FLOAT, 3.0),
+        (MODULO, "invalid", INTEGER, 4),
+        (MODULO, "2|0", STRING, "4"),
+    ],
+)
+def test_compiled_condition_matches_condition_model(
+    identity, operator, condition_value, trait_value_type, trait_value
+):
+    # Given
+    condition = Condition(operator=operator, property="key", value=condition_value)
+    traits = [
+        Trait(
+            identity=identity,
+            trait_key="key",
+            value_type=trait_value_type,
+            **{Trait.get_trait_value_key_name(trait_value_type): trait_value},
+        )
+    ]
+
+    # When
+    compiled_condition = CompiledCondition(condition, segment_id=1)
+
+    # Then
+    assert compiled_condition.matches(identity.id, build_trait_index(traits)) is bool(
+        condition.does_identity_match(identity, traits)
+    )
+
+
+def test_compiled_condition_does_not_match_missing_trait(identity):
+    # Given
+    condition = Condition(operator=EQUAL, property="key", value="value")
+
+    # When
+    compiled_condition = CompiledCondition(condition, segment_id=1)
+
+    # Then
+    assert compiled_condition.matches(identity.id, build_trait_index([])) is False
+
+
+def test_compiled_condition_invalid_regex_does_not_match(identity):
+    # Given
+    condition = Condition(operator=REGEX, property="key", value="[")
+    traits = [Trait(identity=identity, trait_key="key", string_value="[")]
+
+    # When
+    compiled_condition = CompiledCondition(condition, segment_id=1)
+
+    # Then
+    assert compiled_condition.matches(identity.id, build_trait_index(traits)) is False
+
+
+@pytest.mark.parametrize(
+    "percentage_value, expected_result", (("0", False), ("100", True))
+)
+def test_compiled_percentage_split_condition(
+    segment, identity, percentage_value, expected_result
+):
+    # Given
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    condition = Condition.objects.create(
+        rule=rule, operator=PERCENTAGE_SPLIT, value=percentage_value
+    )
+
+    # When
+    compiled_condition = CompiledCondition(condition, segment_id=segment.id)
+
+    # Then
+    assert compiled_condition.matches(identity.id, {}) is expected_result
+    assert condition.does_identity_match(identity) is expected_result
+
+
+def test_compiled_segments_get_matching_segments(project, identity):
+    # Given
+    matching_segment = Segment.objects.create(name="matching", project=project)
+    any_rule = SegmentRule.objects.create(
+        segment=matching_segment, type=SegmentRule.ANY_RULE
+    )
+    Condition.objects.create(rule=any_rule, operator=EQUAL, property="foo", value="x")
+    Condition.objects.create(rule=any_rule, operator=EQUAL, property="foo", value="bar")
+    nested_rule = SegmentRule.objects.create(rule=any_rule, type=SegmentRule.NONE_RULE)
+    Condition.objects.create(
+        rule=nested_rule, operator=EQUAL, property="foo", value="baz"
+    )
+
+    non_matching_segment = Segment.objects.create(name="non-matching", project=project)
+    all_rule = SegmentRule.objects.create(
+        segment=non_matching_segment, type=SegmentRule.ALL_RULE
+    )
+    Condition.objects.create(rule=all_rule, operator=EQUAL, property="foo", value="bar")
+    Condition.objects.create(
+        rule=all_rule, operator=EQUAL, property="missing", value="bar"
+    )
+
+    # a segment without rules should never match
+    Segment.objects.create(name="empty", project=project)
+
+    traits = [Trait(identity=identity, trait_key="foo", string_value="bar")]
+
+    # When
+    compiled_segments = CompiledSegments(project.segments.all())
+    matching_segments = compiled_segments.get_matching_segments(identity, traits)
+
+    # Then
+    assert matching_segments == [matching_segment]
+
+
+def test_get_compiled_segments_is_cached_and_invalidated_on_change(
+    project, identity, settings, django_assert_num_queries
+):
+    # Given
+    settings.CACHE_PROJECT_SEGMENTS_SECONDS = 0
+    settings.CACHE_COMPILED_SEGMENTS_SECONDS = 60
+
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    condition = Condition.objects.create(
+        rule=rule, operator=EQUAL, property="foo", value="bar"
+    )
+    traits = [Trait(identity=identity, trait_key="foo", string_value="bar")]
+
+    compiled_segments = get_compiled_segments(project)
+    assert compiled_segments.get_matching_segments(identity, traits) == [segment]
+
+    # When
+    with django_assert_num_queries(0):
+        cached_compiled_segments = get_compiled_segments(project)
+
+    condition.value = "baz"
+    condition.save()
+
+    # Then
+    assert cached_compiled_segments is compiled_segments
+    assert get_compiled_segments(project).get_matching_segments(identity, traits) == []
+
+
+def test_get_compiled_segments_recompiles_segments_changed_by_other_processes(
+    project, identity, settings
+):
+    # Given
+    settings.CACHE_COMPILED_SEGMENTS_SECONDS = 60
+
+    segment = Segment.objects.create(name="segment", project=project)
+    rule = SegmentRule.objects.create(segment=segment, type=SegmentRule.ALL_RULE)
+    Condition.objects.create(rule=rule, operator=EQUAL, property="foo", value="bar")
+
+    compiled_segments = get_compiled_segments(project)
+
+    # When
+    # another process changes the segments, which only updates the shared cache
+    # from this process's point of view
+    get_shared_cache(evaluator.segments_revision_cache).set(
+        evaluator._get_revision_cache_key(project.id), "new-revision", timeout=None
+    )
+
+    # Then
+    # the revision held by this process is used until its local tier expires
+    assert get_compiled_segments(project) is compiled_segments
+
+    evaluator.segments_revision_cache._local_cache.clear()
+    assert get_compiled_segments(project) is not compiled_segments
+
+
+def test_get_compiled_segments_not_cached_without_timeout(project, settings):
+    # Given
+    settings.CACHE_COMPILED_SEGMENTS_SECONDS = 0
+
+    # When
+    get_compiled_segments(project)
+
+    # Then
+    assert project.id not in evaluator._compiled_segments_cache
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from sse import streaming
+from sse.asgi import EnvironmentStreamApplication
+
+
+@pytest.fixture()
+def streaming_settings(settings):
+    settings.SSE_STREAMING_ENABLED = True
+    settings.SSE_STREAMING_BACKEND = "sse.streaming.LocalStreamingBackend"
+    settings.SSE_STREAMING_KEEPALIVE_SECONDS = 0.05
+    streaming.get_backend.cache_clear()
+    yield settings
+    streaming.get_backend.cache_clear()
+
+
+@pytest.fixture()
+def mocked_environment_exists(mocker):
+    return mocker.patch(
+        "sse.asgi._environment_exists", new_callable=mocker.AsyncMock, return_value=True
+    )
+
+
+def _get_scope(path, method="GET"):
+    return {"type": "http", "path": path, "method": method}
+
+
+async def _call(application, scope, on_start=None, disconnect_after=1):
+    """
+    Call the application, disconnecting once it has sent disconnect_after bodies.
+    """
+    messages = []
+    disconnect = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.start" and on_start:
+            on_start()
+        bodies = [m for m in messages if m["type"] == "http.response.body"]
+        if len(bodies) >= disconnect_after:
+            disconnect.set()
+
+    await asyncio.wait_for(application(scope, receive, send), timeout=5)
+    return messages
+
+
+def test_environment_stream_sends_event_when_environment_is_updated(
+    streaming_settings, mocked_environment_exists, mocker
+):
+    # Given
+    mocker.patch("sse.streaming.time.time", return_value=1.0)
+    application = EnvironmentStreamApplication(mocker.AsyncMock())
+
+    # When
+    messages = asyncio.run(
+        _call(
+            application,
+            _get_scope("/sse/environments/key/stream"),
+            on_start=lambda: streaming.publish_environment_update("key"),
+        )
+    )
+
+    # Then
+    start, body = messages
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream") in start["headers"]
+    assert body["body"] == b'event: environment_updated\ndata: {"updated_at": 1.0}\n\n'
+    assert body["more_body"] is True
+
+    mocked_environment_exists.assert_called_once_with("key")
+    assert streaming.broker.get_num_subscriptions() == 0
+
+
+def test_environment_stream_sends_keepalive_when_there_are_no_updates(
+    streaming_settings, mocked_environment_exists, mocker
+):
+    # Given
+    application = EnvironmentStreamApplication(mocker.AsyncMock())
+
+    # When
+    messages = asyncio.run(
+        _call(
+            application,
+            _get_scope("/sse/environments/key/stream"),
+            # an update to another environment
+            on_start=lambda: streaming.publish_environment_update("other-key"),
+            disconnect_after=2,
+        )
+    )
+
+    # Then
+    assert [message.get("body") for message in messages[1:]] == [
+        b": keepalive\n\n",
+        b": keepalive\n\n",
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_environment_stream_returns_404_if_environment_does_not_exist(
+    streaming_settings, mocker
+):
+    # Given
+    application = EnvironmentStreamApplication(mocker.AsyncMock())
+
+    # When
+    start, body = asyncio.run(
+        _call(application, _get_scope("/sse/environments/unknown/stream"))
+    )
+
+    # Then
+    assert start["status"] == 404
+    assert body["body"] == b'{"detail": "Not found."}'
+
+
+def test_environment_stream_returns_405_for_other_methods(
+    streaming_settings, mocked_environment_exists, mocker
+):
+    # Given
+    application = EnvironmentStreamApplication(mocker.AsyncMock())
+
+    # When
+    start, _ = asyncio.run(
+        _call(application, _get_scope("/sse/environments/key/stream", "POST"))
+    )
+
+    # Then
+    assert start["status"] == 405
+    mocked_environment_exists.assert_not_called()
+
+
+def test_environment_stream_passes_other_requests_to_application(
+    streaming_settings, mocker
+):
+    # Given
+    wrapped_application = mocker.AsyncMock()
+    application = EnvironmentStreamApplication(wrapped_application)
+    scope = _get_scope("/api/v1/flags/")
+    receive, send = mocker.AsyncMock(), mocker.AsyncMock()
+
+    # When
+    asyncio.run(application(scope, receive, send))
+
+    # Then
+    wrapped_application.assert_awaited_once_with(scope, receive, send)
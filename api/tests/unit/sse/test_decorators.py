@@ -26,7 +26,8 @@ def test_generate_identity_update_message_decorator_make_correct_call(
 
     # Then
     mocked_send_identity_update_message.delay.assert_called_once_with(
-        args=(environment.api_key, identifier)
+        args=(environment.api_key, identifier),
+        dedup_key=f"{environment.api_key}:{identifier}",
     )
 
 
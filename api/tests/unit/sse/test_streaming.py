@@ -0,0 +1,270 @@
+import asyncio
+import threading
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from sse import streaming
+from sse.streaming import (
+    EnvironmentUpdateBroker,
+    EnvironmentUpdateListener,
+    LocalStreamingBackend,
+    PostgresStreamingBackend,
+    check_backend,
+    publish_environment_update,
+    subscribe,
+)
+from task_processor.task_run_method import TaskRunMethod
+
+
+@pytest.fixture()
+def streaming_settings(settings):
+    settings.SSE_STREAMING_ENABLED = True
+    settings.SSE_STREAMING_BACKEND = "sse.streaming.LocalStreamingBackend"
+    streaming.get_backend.cache_clear()
+    yield settings
+    streaming.get_backend.cache_clear()
+
+
+def test_broker_dispatches_updates_to_subscribers_of_the_environment():
+    # Given
+    broker = EnvironmentUpdateBroker()
+
+    async def subscribe_and_dispatch():
+        with broker.subscribe("key") as subscription, broker.subscribe("other-key"):
+            # updates are dispatched from other threads, e.g. the task runners
+            thread = threading.Thread(target=broker.dispatch, args=("key", 1.0))
+            thread.start()
+            thread.join()
+            return await asyncio.wait_for(subscription.get(), timeout=1)
+
+    # When
+    updated_at = asyncio.run(subscribe_and_dispatch())
+
+    # Then
+    assert updated_at == 1.0
+    assert broker.get_num_subscriptions() == 0
+
+
+def test_broker_coalesces_updates_for_subscribers_that_fall_behind():
+    # Given
+    broker = EnvironmentUpdateBroker()
+
+    async def subscribe_and_dispatch():
+        with broker.subscribe("key") as subscription:
+            broker.dispatch("key", 1.0)
+            broker.dispatch("key", 2.0)
+            # let the dispatched updates run
+            await asyncio.sleep(0)
+            updated_at = await subscription.get()
+            assert subscription._queue.empty()
+            return updated_at
+
+    # When
+    updated_at = asyncio.run(subscribe_and_dispatch())
+
+    # Then
+    assert updated_at == 2.0
+
+
+def test_broker_removes_subscribers_whose_event_loop_is_closed():
+    # Given
+    broker = EnvironmentUpdateBroker()
+
+    async def subscribe():
+        return broker.subscribe("key")
+
+    asyncio.run(subscribe())
+    assert broker.get_num_subscriptions() == 1
+
+    # When
+    broker.dispatch("key", 1.0)
+
+    # Then
+    assert broker.get_num_subscriptions() == 0
+
+
+def test_broker_dispatch_all_dispatches_update_to_subscribers_of_every_environment():
+    # Given
+    broker = EnvironmentUpdateBroker()
+
+    async def subscribe_and_dispatch_all():
+        with broker.subscribe("key") as subscription, broker.subscribe(
+            "other-key"
+        ) as other_subscription:
+            broker.dispatch_all(1.0)
+            return await asyncio.wait_for(
+                asyncio.gather(subscription.get(), other_subscription.get()),
+                timeout=1,
+            )
+
+    # When
+    updates = asyncio.run(subscribe_and_dispatch_all())
+
+    # Then
+    assert updates == [1.0, 1.0]
+
+
+def test_environment_update_listener_dispatches_update_to_all_when_reconnecting(
+    mocker,
+):
+    # Given
+    mocker.patch("task_processor.notifications.connection", vendor="postgresql")
+    mocker.patch("sse.streaming.time.time", return_value=1.0)
+    mocked_dispatch_all = mocker.MagicMock()
+    listener = EnvironmentUpdateListener(
+        dispatch=mocker.MagicMock(), dispatch_all=mocked_dispatch_all
+    )
+
+    def lose_connection():
+        # stop, so that the listener doesn't reconnect
+        listener.stop()
+        raise Exception("connection lost")
+
+    mocker.patch.object(listener, "_listen", side_effect=lose_connection)
+
+    # When
+    listener.run()
+
+    # Then
+    mocked_dispatch_all.assert_called_once_with(1.0)
+
+
+def test_publish_environment_update_does_nothing_if_streaming_not_enabled(
+    settings, mocker
+):
+    # Given
+    settings.SSE_STREAMING_ENABLED = False
+    mocked_get_backend = mocker.patch("sse.streaming.get_backend")
+
+    # When
+    publish_environment_update("key")
+
+    # Then
+    mocked_get_backend.assert_not_called()
+
+
+def test_publish_environment_update_dispatches_update_to_local_subscribers(
+    streaming_settings, mocker
+):
+    # Given
+    mocker.patch("sse.streaming.time.time", return_value=1.0)
+    mocked_dispatch = mocker.patch.object(streaming.broker, "dispatch")
+
+    # When
+    assert isinstance(streaming.get_backend(), LocalStreamingBackend)
+    publish_environment_update("key")
+
+    # Then
+    mocked_dispatch.assert_called_once_with("key", 1.0)
+
+
+def test_subscribe_starts_backend_outside_of_event_loop(streaming_settings, mocker):
+    # Given
+    start_thread_ids = []
+    mocker.patch.object(
+        LocalStreamingBackend,
+        "start",
+        side_effect=lambda: start_thread_ids.append(threading.get_ident()),
+    )
+
+    async def subscribe_in_event_loop():
+        with await subscribe("key"):
+            return threading.get_ident()
+
+    # When
+    event_loop_thread_id = asyncio.run(subscribe_in_event_loop())
+
+    # Then
+    assert len(start_thread_ids) == 1
+    assert start_thread_ids[0] != event_loop_thread_id
+    assert streaming.broker.get_num_subscriptions() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_postgres_streaming_backend_dispatches_updates_published_by_any_process():
+    # Given
+    dispatched = threading.Event()
+    updates = []
+
+    def dispatch(environment_key, updated_at):
+        updates.append((environment_key, updated_at))
+        dispatched.set()
+
+    backend = PostgresStreamingBackend(
+        dispatch=dispatch, dispatch_all=lambda updated_at: None
+    )
+    backend.start()
+    listener = backend._listener
+
+    # start waits for the listener, so that the first subscriber doesn't miss
+    # any updates
+    assert listener.listening.is_set()
+
+    # When
+    backend.publish("key", 1.0)
+
+    # Then
+    try:
+        assert dispatched.wait(timeout=5)
+    finally:
+        listener.stop()
+        listener.join(timeout=5)
+
+    assert updates == [("key", 1.0)]
+
+
+def test_postgres_streaming_backend_dispatches_updates_locally_if_database_is_not_postgres(
+    mocker,
+):
+    # Given
+    mocker.patch.object(connection, "vendor", "sqlite")
+    mocked_dispatch = mocker.MagicMock()
+    backend = PostgresStreamingBackend(
+        dispatch=mocked_dispatch, dispatch_all=mocker.MagicMock()
+    )
+
+    # When
+    backend.publish("key", 1.0)
+
+    # Then
+    mocked_dispatch.assert_called_once_with("key", 1.0)
+
+
+@pytest.mark.parametrize(
+    "backend, database_vendor",
+    (
+        ("sse.streaming.LocalStreamingBackend", "postgresql"),
+        ("sse.streaming.PostgresStreamingBackend", "sqlite"),
+    ),
+)
+def test_check_backend_raises_if_updates_cant_reach_streams_from_task_processor(
+    streaming_settings, mocker, backend, database_vendor
+):
+    # Given
+    streaming_settings.SSE_STREAMING_BACKEND = backend
+    streaming_settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    mocker.patch.object(connection, "vendor", database_vendor)
+
+    # When
+    with pytest.raises(ImproperlyConfigured):
+        check_backend()
+
+
+@pytest.mark.parametrize(
+    "backend, task_run_method",
+    (
+        ("sse.streaming.LocalStreamingBackend", TaskRunMethod.SEPARATE_THREAD),
+        ("sse.streaming.PostgresStreamingBackend", TaskRunMethod.TASK_PROCESSOR),
+    ),
+)
+def test_check_backend_passes_if_updates_reach_streams(
+    streaming_settings, backend, task_run_method
+):
+    # Given
+    streaming_settings.SSE_STREAMING_BACKEND = backend
+    streaming_settings.TASK_RUN_METHOD = task_run_method
+
+    # When
+    check_backend()
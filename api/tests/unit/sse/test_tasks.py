@@ -1,5 +1,6 @@
 import pytest
 
+from sse import tasks
 from sse.exceptions import SSEAuthTokenNotSet
 from sse.tasks import (
     get_auth_header,
@@ -9,6 +10,30 @@ from sse.tasks import (
     send_identity_update_messages,
 )
 
+base_url = "http://localhost:8000"
+token = "token"
+auth_header = {"Authorization": f"Token {token}"}
+
+
+@pytest.fixture(autouse=True)
+def batches_supported(monkeypatch):
+    monkeypatch.setattr(tasks, "_batches_unsupported_until", 0.0)
+
+
+@pytest.fixture()
+def sse_settings(settings):
+    settings.SSE_SERVER_BASE_URL = base_url
+    settings.SSE_AUTHENTICATION_TOKEN = token
+    settings.SSE_BATCH_SIZE = 2
+    return settings
+
+
+@pytest.fixture()
+def mocked_post(mocker):
+    mocked_post = mocker.patch("sse.tasks.get_session").return_value.post
+    mocked_post.return_value.status_code = 200
+    return mocked_post
+
 
 def test_send_environment_update_messages_returns_without_request_if_not_configured(
     mocker, settings
@@ -36,81 +61,121 @@ def test_identity_update_message_returns_without_request_if_not_configured(
     mocked_requests.post.assert_not_called()
 
 
-def test_send_environment_update_messages_make_correct_request(mocker, settings):
+def test_send_environment_update_messages_sends_batches(
+    sse_settings, mocked_post, mocker
+):
     # Given
-    base_url = "http://localhost:8000"
-    token = "token"
-    environment_keys = ["test_environment_1", "test_environment_2"]
-
-    settings.SSE_SERVER_BASE_URL = base_url
-    settings.SSE_AUTHENTICATION_TOKEN = token
-    mocked_requests = mocker.patch("sse.tasks.requests")
+    environment_keys = ["key_1", "key_2", "key_1", "key_3"]
 
     # When
     send_environment_update_messages(environment_keys)
 
     # Then
-    mocked_requests.post.has_calls(
+    url = f"{base_url}/sse/environments/bulk-queue-change"
+    assert mocked_post.call_args_list == [
         mocker.call(
-            f"{base_url}/sse/environments/{environment_keys[0]}/queue-change",
-            headers={"Authorization": f"Token {token}"},
+            url,
+            headers=auth_header,
+            timeout=10,
+            json={"environment_keys": ["key_1", "key_2"]},
         ),
         mocker.call(
-            f"{base_url}/sse/environments/{environment_keys[1]}/queue-change",
-            headers={"Authorization": f"Token {token}"},
+            url, headers=auth_header, timeout=10, json={"environment_keys": ["key_3"]}
         ),
-    )
+    ]
 
 
-def test_send_environment_update_message_make_correct_request(mocker, settings):
+def test_send_environment_update_message_make_correct_request(
+    sse_settings, mocked_post
+):
     # Given
-    base_url = "http://localhost:8000"
-    token = "token"
     environment_key = "test_environment"
 
-    settings.SSE_SERVER_BASE_URL = base_url
-    settings.SSE_AUTHENTICATION_TOKEN = token
-    mocked_requests = mocker.patch("sse.tasks.requests")
-
     # When
     send_environment_update_message(environment_key)
 
     # Then
-    mocked_requests.post.assert_called_once_with(
+    mocked_post.assert_called_once_with(
         f"{base_url}/sse/environments/{environment_key}/queue-change",
-        headers={"Authorization": f"Token {token}"},
+        headers=auth_header,
+        timeout=10,
     )
 
 
-def test_send_identity_update_message_make_correct_request(mocker, settings):
+def test_send_identity_update_message_make_correct_request(sse_settings, mocked_post):
     # Given
-    base_url = "http://localhost:8000"
-    token = "token"
     identifier = "test_identity"
     environment_key = "test_environment"
 
-    settings.SSE_SERVER_BASE_URL = base_url
-    settings.SSE_AUTHENTICATION_TOKEN = token
-    mocked_requests = mocker.patch("sse.tasks.requests")
-
     # When
     send_identity_update_message(environment_key, identifier)
 
     # Then
-    mocked_requests.post.assert_called_once_with(
+    mocked_post.assert_called_once_with(
         f"{base_url}/sse/environments/{environment_key}/identities/queue-change",
-        headers={"Authorization": f"Token {token}"},
+        headers=auth_header,
+        timeout=10,
         json={"identifier": identifier},
     )
 
 
-def test_send_identity_update_messages_calls_singular_function_correctly(
-    settings, mocker
-):
+def test_send_identity_update_messages_sends_batches(sse_settings, mocked_post):
     # Given
     environment_key = "test_environment"
     identifiers = ["test_identity_1", "test_identity_2"]
 
+    # When
+    send_identity_update_messages(environment_key, identifiers)
+
+    # Then
+    mocked_post.assert_called_once_with(
+        f"{base_url}/sse/environments/{environment_key}/identities/bulk-queue-change",
+        headers=auth_header,
+        timeout=10,
+        json={"identifiers": identifiers},
+    )
+
+
+def test_send_environment_update_messages_falls_back_to_single_messages_until_retry(
+    sse_settings, mocked_post, mocker
+):
+    # Given
+    environment_keys = ["key_1", "key_2", "key_3"]
+    mocked_post.return_value.status_code = 404
+    mocked_send_environment_update_message = mocker.patch(
+        "sse.tasks.send_environment_update_message"
+    )
+    mocked_monotonic = mocker.patch("sse.tasks.time.monotonic", return_value=1000)
+
+    # When
+    send_environment_update_messages(environment_keys)
+
+    # Then
+    mocked_post.assert_called_once()
+    assert mocked_send_environment_update_message.call_args_list == [
+        mocker.call(key) for key in environment_keys
+    ]
+
+    # and batches aren't attempted again until the retry interval has passed
+    mocked_post.reset_mock()
+    mocked_send_environment_update_message.reset_mock()
+    send_environment_update_messages(environment_keys[:1])
+    mocked_post.assert_not_called()
+    mocked_send_environment_update_message.assert_called_once_with("key_1")
+
+    mocked_post.return_value.status_code = 200
+    mocked_monotonic.return_value = 1000 + tasks.BATCHES_UNSUPPORTED_RETRY_SECONDS
+    send_environment_update_messages(environment_keys[:1])
+    mocked_post.assert_called_once()
+
+
+def test_send_identity_update_messages_falls_back_to_single_messages_for_not_found(
+    sse_settings, mocked_post, mocker
+):
+    # Given
+    environment_key = "test_environment"
+    identifiers = ["test_identity_1", "test_identity_2", "test_identity_3"]
+    mocked_post.return_value.status_code = 404
     mocked_send_identity_update_message = mocker.patch(
         "sse.tasks.send_identity_update_message"
     )
@@ -119,9 +184,58 @@ def test_send_identity_update_messages_calls_singular_function_correctly(
     send_identity_update_messages(environment_key, identifiers)
 
     # Then
-    mocked_send_identity_update_message.has_calls(
-        mocker.call(environment_key, identifiers[0]),
-        mocker.call(environment_key, identifiers[1]),
+    mocked_post.assert_called_once()
+    assert mocked_send_identity_update_message.call_args_list == [
+        mocker.call(environment_key, identifier) for identifier in identifiers
+    ]
+
+    # and, since the environment may not be known by the SSE server, batches are
+    # still attempted for the next messages
+    mocked_post.reset_mock()
+    mocked_post.return_value.status_code = 200
+    send_identity_update_messages("other_environment", identifiers[:1])
+    mocked_post.assert_called_once()
+
+
+def test_send_identity_update_messages_falls_back_to_single_messages_if_unsupported(
+    sse_settings, mocked_post, mocker
+):
+    # Given
+    environment_key = "test_environment"
+    identifiers = ["test_identity_1", "test_identity_2"]
+    mocked_post.return_value.status_code = 405
+    mocked_send_identity_update_message = mocker.patch(
+        "sse.tasks.send_identity_update_message"
+    )
+
+    # When
+    send_identity_update_messages(environment_key, identifiers)
+
+    # Then
+    assert mocked_send_identity_update_message.call_count == 2
+
+    # and batches aren't attempted again
+    mocked_post.reset_mock()
+    send_identity_update_messages(environment_key, identifiers[:1])
+    mocked_post.assert_not_called()
+
+
+def test_send_identity_update_messages_one_at_a_time_if_batches_disabled(
+    sse_settings, mocked_post, mocker
+):
+    # Given
+    sse_settings.SSE_BATCH_SIZE = 1
+    mocked_send_identity_update_message = mocker.patch(
+        "sse.tasks.send_identity_update_message"
+    )
+
+    # When
+    send_identity_update_messages("test_environment", ["test_identity"])
+
+    # Then
+    mocked_post.assert_not_called()
+    mocked_send_identity_update_message.assert_called_once_with(
+        "test_environment", "test_identity"
     )
 
 
@@ -0,0 +1,33 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from task_processor.benchmark import benchmark_task
+from task_processor.models import Task, TaskResult, TaskRun
+from task_processor.processor import run_tasks
+
+
+def test_benchmarktaskprocessor_creates_tasks_and_reports_results(db, mocker):
+    # Given
+    # simulate a task processor running while the command waits
+    mocker.patch(
+        "task_processor.management.commands.benchmarktaskprocessor.time.sleep",
+        side_effect=lambda _: run_tasks(5),
+    )
+    out = StringIO()
+
+    # When
+    call_command("benchmarktaskprocessor", "--numtasks", "10", stdout=out)
+
+    # Then
+    assert (
+        Task.objects.filter(
+            task_identifier=benchmark_task.task_identifier, completed=True
+        ).count()
+        == 10
+    )
+    assert TaskRun.objects.filter(result=TaskResult.SUCCESS).count() == 10
+
+    output = out.getvalue()
+    assert "Processed 10 tasks" in output
+    assert "p95=" in output
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from task_processor.cleanup import delete_old_tasks
+from task_processor.models import Task, TaskResult, TaskRun
+
+
+def _create_task(created_days_ago: int, **kwargs) -> Task:
+    task = Task.create("tasks.my_task")
+    for field, value in kwargs.items():
+        setattr(task, field, value)
+    task.save()
+    Task.objects.filter(id=task.id).update(
+        created_at=timezone.now() - timedelta(days=created_days_ago)
+    )
+    return task
+
+
+def test_delete_old_tasks(db, settings):
+    # Given
+    settings.TASK_DELETE_RETENTION_DAYS = 15
+    settings.DEAD_LETTER_TASK_DELETE_RETENTION_DAYS = 60
+    settings.TASK_DELETE_BATCH_SIZE = 2
+
+    old_completed_tasks = [
+        _create_task(created_days_ago=16, completed=True) for _ in range(3)
+    ]
+    TaskRun.objects.create(
+        task=old_completed_tasks[0],
+        started_at=timezone.now(),
+        result=TaskResult.SUCCESS,
+    )
+    old_dead_lettered_task = _create_task(
+        created_days_ago=61, dead_lettered_at=timezone.now() - timedelta(days=61)
+    )
+
+    recent_completed_task = _create_task(created_days_ago=1, completed=True)
+    recent_dead_lettered_task = _create_task(
+        created_days_ago=16, dead_lettered_at=timezone.now() - timedelta(days=16)
+    )
+    old_incomplete_task = _create_task(created_days_ago=16)
+
+    # When
+    num_deleted = delete_old_tasks()
+
+    # Then
+    assert num_deleted == 4
+    assert set(Task.objects.all()) == {
+        recent_completed_task,
+        recent_dead_lettered_task,
+        old_incomplete_task,
+    }
+    assert not TaskRun.objects.exists()
+    assert not Task.objects.filter(id=old_dead_lettered_task.id).exists()
@@ -1,6 +1,8 @@
 import logging
 
 from task_processor.decorators import register_task_handler
+from task_processor.models import TaskPriority
+from task_processor.task_run_method import TaskRunMethod
 
 
 def test_register_task_handler_run_in_thread(mocker, caplog):
@@ -38,3 +40,37 @@ def test_register_task_handler_run_in_thread(mocker, caplog):
     assert (
         caplog.records[0].message == "Running function my_function in unmanaged thread."
     )
+
+
+def test_delay_creates_task_on_queue_with_priority(db, settings):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+
+    @register_task_handler(queue="my-queue", priority=TaskPriority.HIGH)
+    def my_function(*args, **kwargs):
+        pass
+
+    # When
+    task = my_function.delay(args=("foo",))
+
+    # Then
+    task.refresh_from_db()
+    assert task.task_identifier == my_function.task_identifier
+    assert task.queue == "my-queue"
+    assert task.priority == TaskPriority.HIGH
+
+
+def test_delay_with_dedup_key_merges_pending_duplicates(db, settings):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+
+    @register_task_handler()
+    def my_function(*args, **kwargs):
+        pass
+
+    # When
+    tasks = [my_function.delay(args=("foo",), dedup_key="foo") for _ in range(3)]
+
+    # Then
+    assert tasks[0] == tasks[1] == tasks[2]
+    assert tasks[2].num_duplicates == 2
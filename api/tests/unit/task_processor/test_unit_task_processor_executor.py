@@ -0,0 +1,66 @@
+import threading
+import time
+
+from task_processor.executor import TaskExecutor
+from task_processor.models import Task
+
+
+def _track_concurrency():
+    lock = threading.Lock()
+    running = {"current": 0, "max": 0}
+
+    def run_task(task: Task) -> int:
+        with lock:
+            running["current"] += 1
+            running["max"] = max(running["max"], running["current"])
+        time.sleep(0.1)
+        with lock:
+            running["current"] -= 1
+        return task.args[0]
+
+    return run_task, running
+
+
+def test_task_executor_runs_tasks_concurrently_and_preserves_order():
+    # Given
+    run_task, running = _track_concurrency()
+    tasks = [Task.create("tasks.my_task", args=(i,)) for i in range(4)]
+    executor = TaskExecutor(max_workers=4)
+
+    # When
+    results = executor.map(run_task, tasks)
+    executor.shutdown()
+
+    # Then
+    assert results == [0, 1, 2, 3]
+    assert running["max"] == 4
+
+
+def test_task_executor_limits_concurrency_per_task_identifier():
+    # Given
+    run_task, running = _track_concurrency()
+    tasks = [Task.create("tasks.limited_task", args=(i,)) for i in range(4)]
+    executor = TaskExecutor(max_workers=4, concurrency_limits={"tasks.limited_task": 1})
+
+    # When
+    results = executor.map(run_task, tasks)
+    executor.shutdown()
+
+    # Then
+    assert results == [0, 1, 2, 3]
+    assert running["max"] == 1
+
+
+def test_task_executor_closes_old_database_connections(mocker):
+    # Given
+    mocked_close_old_connections = mocker.patch(
+        "task_processor.executor.close_old_connections"
+    )
+    executor = TaskExecutor(max_workers=2)
+
+    # When
+    executor.map(lambda task: None, [Task.create("tasks.my_task")])
+    executor.shutdown()
+
+    # Then
+    mocked_close_old_connections.assert_called_once_with()
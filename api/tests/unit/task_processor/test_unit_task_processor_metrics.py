@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from task_processor.decorators import register_task_handler
+from task_processor.metrics import QueueDepthCollector
+from task_processor.models import Task, TaskResult
+from task_processor.processor import run_tasks
+
+
+@register_task_handler()
+def my_metrics_task():
+    pass
+
+
+def _get_sample_value(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_run_tasks_records_metrics(db):
+    # Given
+    task_identifier = my_metrics_task.task_identifier
+    runs_before = _get_sample_value(
+        "task_processor_task_runs_total",
+        task_identifier=task_identifier,
+        result=TaskResult.SUCCESS.value,
+    )
+    lag_count_before = _get_sample_value(
+        "task_processor_task_lag_seconds_count", task_identifier=task_identifier
+    )
+    claim_count_before = _get_sample_value(
+        "task_processor_claim_duration_seconds_count"
+    )
+
+    Task.create(task_identifier).save()
+
+    # When
+    run_tasks()
+
+    # Then
+    assert (
+        _get_sample_value(
+            "task_processor_task_runs_total",
+            task_identifier=task_identifier,
+            result=TaskResult.SUCCESS.value,
+        )
+        == runs_before + 1
+    )
+    assert (
+        _get_sample_value(
+            "task_processor_task_lag_seconds_count", task_identifier=task_identifier
+        )
+        == lag_count_before + 1
+    )
+    assert (
+        _get_sample_value(
+            "task_processor_task_duration_seconds_count",
+            task_identifier=task_identifier,
+            result=TaskResult.SUCCESS.value,
+        )
+        >= 1
+    )
+    assert (
+        _get_sample_value("task_processor_claim_duration_seconds_count")
+        == claim_count_before + 1
+    )
+
+
+def test_queue_depth_collector_counts_due_tasks_per_queue_and_identifier(db):
+    # Given
+    Task.create("tasks.task_a").save()
+    Task.create("tasks.task_a").save()
+    Task.create("tasks.task_b", queue="other").save()
+
+    future_task = Task.schedule_task(
+        timezone.now() + timedelta(hours=1), "tasks.task_b"
+    )
+    future_task.save()
+
+    completed_task = Task.create("tasks.task_b")
+    completed_task.completed = True
+    completed_task.save()
+
+    # When
+    (metric,) = QueueDepthCollector().collect()
+
+    # Then
+    assert {
+        (sample.labels["queue"], sample.labels["task_identifier"]): sample.value
+        for sample in metric.samples
+    } == {("default", "tasks.task_a"): 2, ("other", "tasks.task_b"): 1}
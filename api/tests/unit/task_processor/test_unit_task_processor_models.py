@@ -1,5 +1,9 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
 from task_processor.decorators import register_task_handler
-from task_processor.models import Task
+from task_processor.models import DEFAULT_MAX_RETRIES, Task
 
 
 @register_task_handler()
@@ -20,3 +24,174 @@ def test_task_run():
 
     # Then
     assert result == my_callable(*args, **kwargs)
+
+
+def test_saving_new_task_notifies_task_runners(db, mocker):
+    # Given
+    mocked_notify_new_task = mocker.patch("task_processor.models.notify_new_task")
+    task = Task.create(my_callable.task_identifier, args=["foo"])
+
+    # When
+    task.save()
+    task.save()
+
+    # Then
+    mocked_notify_new_task.assert_called_once_with()
+
+
+def test_saving_task_scheduled_for_the_future_does_not_notify_task_runners(db, mocker):
+    # Given
+    mocked_notify_new_task = mocker.patch("task_processor.models.notify_new_task")
+    task = Task.schedule_task(
+        timezone.now() + timedelta(hours=1), my_callable.task_identifier
+    )
+
+    # When
+    task.save()
+
+    # Then
+    mocked_notify_new_task.assert_not_called()
+
+
+def test_save_deduplicated_merges_task_into_pending_duplicate(db):
+    # Given
+    pending_task = Task.create(
+        my_callable.task_identifier, args=["foo"], dedup_key="foo"
+    ).save_deduplicated()
+
+    # When
+    task = Task.create(
+        my_callable.task_identifier, args=["foo"], dedup_key="foo"
+    ).save_deduplicated()
+
+    # Then
+    assert task == pending_task
+    assert task.num_duplicates == 1
+    assert Task.objects.count() == 1
+
+
+def test_save_deduplicated_brings_forward_pending_duplicate(db):
+    # Given
+    now = timezone.now()
+    pending_task = Task.schedule_task(
+        now + timedelta(hours=1), my_callable.task_identifier, dedup_key="foo"
+    ).save_deduplicated()
+
+    # When
+    Task.schedule_task(
+        now + timedelta(minutes=1), my_callable.task_identifier, dedup_key="foo"
+    ).save_deduplicated()
+
+    # Then
+    pending_task.refresh_from_db()
+    assert pending_task.scheduled_for == now + timedelta(minutes=1)
+
+
+def test_save_deduplicated_does_not_bring_forward_pending_retry(db):
+    # Given
+    now = timezone.now()
+    retry_at = now + timedelta(seconds=10)
+    pending_task = Task.create(my_callable.task_identifier, dedup_key="foo")
+    pending_task.num_failures = 1
+    pending_task.scheduled_for = retry_at
+    pending_task.save()
+
+    # When
+    task = Task.create(my_callable.task_identifier, dedup_key="foo").save_deduplicated()
+
+    # Then
+    assert task == pending_task
+    pending_task.refresh_from_db()
+    assert pending_task.scheduled_for == retry_at
+    assert pending_task.num_duplicates == 1
+
+
+def test_save_deduplicated_does_not_merge_tasks_with_different_dedup_keys(db):
+    # Given
+    Task.create(my_callable.task_identifier, dedup_key="foo").save_deduplicated()
+
+    # When
+    Task.create(my_callable.task_identifier, dedup_key="bar").save_deduplicated()
+    Task.create(my_callable.task_identifier).save_deduplicated()
+
+    # Then
+    assert Task.objects.count() == 3
+
+
+def test_save_deduplicated_does_not_merge_into_completed_task(db):
+    # Given
+    completed_task = Task.create(my_callable.task_identifier, dedup_key="foo")
+    completed_task.completed = True
+    completed_task.save()
+
+    # When
+    task = Task.create(my_callable.task_identifier, dedup_key="foo").save_deduplicated()
+
+    # Then
+    assert task != completed_task
+    assert task.dedup_key == "foo"
+
+
+def test_save_deduplicated_saves_without_dedup_key_if_duplicate_is_running(db, mocker):
+    # Given
+    running_task = Task.create(my_callable.task_identifier, dedup_key="foo")
+    running_task.save()
+
+    # a running task is locked, so it is skipped when looking for pending duplicates
+    mocker.patch.object(Task, "_merge_into_pending_task", return_value=None)
+
+    # When
+    task = Task.create(my_callable.task_identifier, dedup_key="foo").save_deduplicated()
+
+    # Then
+    assert task.pk != running_task.pk
+    assert task.dedup_key is None
+    assert Task.objects.count() == 2
+
+
+@register_task_handler(max_retries=2, retry_backoff_seconds=10)
+def my_retried_callable():
+    pass
+
+
+def test_mark_failure_schedules_retry_with_exponential_backoff(mocker):
+    # Given
+    now = timezone.now()
+    mocker.patch("task_processor.models.timezone.now", return_value=now)
+    task = Task.create(my_retried_callable.task_identifier)
+
+    # When
+    task.mark_failure()
+    first_retry_scheduled_for = task.scheduled_for
+    task.mark_failure()
+
+    # Then
+    assert first_retry_scheduled_for == now + timedelta(seconds=10)
+    assert task.scheduled_for == now + timedelta(seconds=20)
+    assert task.num_failures == 2
+    assert task.dead_lettered_at is None
+
+
+def test_mark_failure_moves_task_to_dead_letter_state_when_out_of_retries():
+    # Given
+    task = Task.create(my_retried_callable.task_identifier)
+    task.num_failures = 2
+
+    # When
+    task.mark_failure()
+
+    # Then
+    assert task.num_failures == 3
+    assert task.dead_lettered_at is not None
+
+
+def test_mark_failure_uses_default_retry_policy_for_unregistered_task():
+    # Given
+    task = Task.create("unknown.task")
+
+    # When
+    for _ in range(DEFAULT_MAX_RETRIES + 1):
+        task.mark_failure()
+
+    # Then
+    assert task.dead_lettered_at is not None
@@ -1,14 +1,21 @@
 import time
 import uuid
+from datetime import timedelta
 from threading import Thread
 
 from django.db import transaction
 from django.test.testcases import TransactionTestCase
+from django.utils import timezone
 
 from organisations.models import Organisation
 from task_processor.decorators import register_task_handler
-from task_processor.models import Task, TaskResult, TaskRun
-from task_processor.processor import run_tasks
+from task_processor.executor import TaskExecutor
+from task_processor.models import Task, TaskPriority, TaskResult, TaskRun
+from task_processor.processor import (
+    claim_tasks,
+    run_tasks,
+    run_tasks_with_lease,
+)
 
 
 def test_run_task_runs_task_and_creates_task_run_object_when_success(db):
@@ -153,6 +160,291 @@ def test_run_more_than_one_task(db):
         assert task.completed
 
 
+def test_run_tasks_with_lease_runs_tasks_and_records_results(
+    db, django_assert_num_queries
+):
+    # Given
+    organisation_name = f"test-org-{uuid.uuid4()}"
+    succeeding_task = Task.create(
+        _create_organisation.task_identifier, args=(organisation_name,)
+    )
+    failing_task = Task.create(_raise_exception.task_identifier)
+    Task.objects.bulk_create([succeeding_task, failing_task])
+
+    # When
+    # claim (select + update), create organisation, record results (select,
+    # 2 x update, create task runs) and the savepoints for the 2 transactions
+    with django_assert_num_queries(11):
+        task_runs = run_tasks_with_lease(2, claimed_by="runner", lease_seconds=60)
+
+    # Then
+    assert Organisation.objects.filter(name=organisation_name).exists()
+    assert {(task_run.task_id, task_run.result) for task_run in task_runs} == {
+        (succeeding_task.id, TaskResult.SUCCESS),
+        (failing_task.id, TaskResult.FAILURE),
+    }
+    assert TaskRun.objects.count() == 2
+
+    succeeding_task.refresh_from_db()
+    assert succeeding_task.completed
+    assert succeeding_task.claimed_by is None
+    assert succeeding_task.lease_expires_at is None
+
+    failing_task.refresh_from_db()
+    assert not failing_task.completed
+    assert failing_task.num_failures == 1
+    assert failing_task.claimed_by is None
+
+
+def test_claim_tasks_does_not_claim_tasks_with_unexpired_lease(db):
+    # Given
+    task = Task.create(
+        _create_organisation.task_identifier, args=("org",), dedup_key="org"
+    )
+    task.save()
+    claim_tasks(1, claimed_by="runner-1", lease_seconds=60)
+
+    # When
+    claimed_tasks = claim_tasks(1, claimed_by="runner-2", lease_seconds=60)
+
+    # Then
+    assert claimed_tasks == []
+    task.refresh_from_db()
+    assert task.claimed_by == "runner-1"
+    assert task.dedup_key is None
+    assert task.lease_expires_at > timezone.now()
+
+
+def test_run_tasks_does_not_run_tasks_with_unexpired_lease(db):
+    # Given
+    task = Task.create(_create_organisation.task_identifier, args=("org",))
+    task.save()
+    claim_tasks(1, claimed_by="runner", lease_seconds=60)
+
+    # When
+    task_runs = run_tasks()
+
+    # Then
+    assert task_runs == []
+    assert not Organisation.objects.filter(name="org").exists()
+
+
+def test_run_tasks_runs_tasks_with_expired_lease_and_releases_claim(db):
+    # Given
+    task = Task.create(_create_organisation.task_identifier, args=("org",))
+    task.claimed_by = "dead-runner"
+    task.lease_expires_at = timezone.now() - timedelta(seconds=1)
+    task.save()
+
+    # When
+    task_runs = run_tasks()
+
+    # Then
+    assert len(task_runs) == 1
+    task.refresh_from_db()
+    assert task.completed
+    assert task.claimed_by is None
+    assert task.lease_expires_at is None
+
+
+def test_claim_tasks_retries_tasks_with_expired_lease_as_failures(db):
+    # Given
+    task = Task.create(_create_organisation.task_identifier, args=("org",))
+    task.claimed_by = "dead-runner"
+    task.lease_expires_at = timezone.now() - timedelta(seconds=1)
+    task.save()
+
+    # When
+    claimed_tasks = claim_tasks(1, claimed_by="runner", lease_seconds=60)
+
+    # Then
+    # the task is retried after the backoff
+    assert claimed_tasks == []
+    task.refresh_from_db()
+    assert task.claimed_by is None
+    assert task.num_failures == 1
+    assert task.scheduled_for > timezone.now()
+
+    task_run = TaskRun.objects.get(task=task)
+    assert task_run.result == TaskResult.FAILURE.value
+    assert task_run.error_details == "Lease held by dead-runner expired."
+
+    # When
+    Task.objects.filter(id=task.id).update(scheduled_for=timezone.now())
+    claimed_tasks = claim_tasks(1, claimed_by="runner", lease_seconds=60)
+
+    # Then
+    assert claimed_tasks == [task]
+    task.refresh_from_db()
+    assert task.claimed_by == "runner"
+
+
+def test_claim_tasks_dead_letters_tasks_that_repeatedly_lose_their_lease(db):
+    # Given
+    task = Task.create(_raise_exception_without_retries.task_identifier)
+    task.claimed_by = "dead-runner"
+    task.lease_expires_at = timezone.now() - timedelta(seconds=1)
+    task.save()
+
+    # When
+    claimed_tasks = claim_tasks(1, claimed_by="runner", lease_seconds=60)
+
+    # Then
+    assert claimed_tasks == []
+    task.refresh_from_db()
+    assert task.dead_lettered_at is not None
+
+
+def test_run_tasks_with_lease_does_not_record_results_if_lease_is_lost(db, mocker):
+    # Given
+    task = Task.create(_create_organisation.task_identifier, args=("org",))
+    task.save()
+
+    def _lose_lease(*args, **kwargs):
+        # simulate another runner claiming the task after our lease has expired
+        Task.objects.filter(id=task.id).update(claimed_by="other-runner")
+
+    mocker.patch.object(Task, "run", side_effect=_lose_lease, autospec=True)
+
+    # When
+    task_runs = run_tasks_with_lease(claimed_by="runner", lease_seconds=60)
+
+    # Then
+    assert task_runs == []
+    assert not TaskRun.objects.exists()
+
+    task.refresh_from_db()
+    assert not task.completed
+    assert task.claimed_by == "other-runner"
+
+
+def test_run_tasks_runs_tasks_with_executor(db, mocker):
+    # Given
+    tasks = [Task.create(_sleep.task_identifier, args=(0,)) for _ in range(2)]
+    Task.objects.bulk_create(tasks)
+    executor = TaskExecutor(max_workers=2)
+    mocker.patch("task_processor.executor.close_old_connections")
+    executor_map = mocker.spy(executor, "map")
+
+    # When
+    task_runs = run_tasks(2, executor=executor)
+    executor.shutdown()
+
+    # Then
+    executor_map.assert_called_once()
+    assert [task_run.result for task_run in task_runs] == [TaskResult.SUCCESS] * 2
+    assert Task.objects.filter(completed=True).count() == 2
+
+
+def test_run_tasks_runs_higher_priority_tasks_first(db):
+    # Given
+    low_priority_task = Task.create(
+        _create_organisation.task_identifier,
+        args=("low priority organisation",),
+        priority=TaskPriority.LOW,
+    )
+    low_priority_task.save()
+
+    high_priority_task = Task.create(
+        _create_organisation.task_identifier,
+        args=("high priority organisation",),
+        priority=TaskPriority.HIGH,
+    )
+    high_priority_task.save()
+
+    # When
+    task_runs = run_tasks()
+
+    # Then
+    assert [task_run.task for task_run in task_runs] == [high_priority_task]
+
+
+def test_run_tasks_only_runs_tasks_on_given_queues(db):
+    # Given
+    default_queue_task = Task.create(
+        _create_organisation.task_identifier, args=("default queue organisation",)
+    )
+    default_queue_task.save()
+
+    other_queue_task = Task.create(
+        _create_organisation.task_identifier,
+        args=("other queue organisation",),
+        queue="other",
+    )
+    other_queue_task.save()
+
+    # When
+    task_runs = run_tasks(2, queues=["other"])
+    leased_task_runs = run_tasks_with_lease(
+        2, claimed_by="runner", queues=["other", "empty"]
+    )
+
+    # Then
+    assert [task_run.task for task_run in task_runs] == [other_queue_task]
+    assert leased_task_runs == []
+
+    default_queue_task.refresh_from_db()
+    assert not default_queue_task.completed
+
+
+def test_run_tasks_schedules_failed_task_for_retry(db):
+    # Given
+    task = Task.create(_raise_exception.task_identifier)
+    task.save()
+
+    # When
+    run_tasks()
+    task_runs = run_tasks()
+
+    # Then
+    # the task isn't retried straight away
+    assert task_runs == []
+
+    task.refresh_from_db()
+    assert task.num_failures == 1
+    assert task.scheduled_for > timezone.now()
+    assert task.dead_lettered_at is None
+
+
+def test_run_tasks_does_not_merge_duplicates_into_failed_task(db):
+    # Given
+    task = Task.create(_raise_exception.task_identifier, dedup_key="key")
+    task.save()
+    run_tasks()
+
+    # When
+    duplicate_task = Task.create(
+        _raise_exception.task_identifier, dedup_key="key"
+    ).save_deduplicated()
+
+    # Then
+    # the failed task, which is waiting to be retried, no longer has its dedup key
+    task.refresh_from_db()
+    assert task.dedup_key is None
+    assert duplicate_task.id != task.id
+    assert duplicate_task.dedup_key == "key"
+
+
+def test_run_tasks_with_lease_moves_task_to_dead_letter_state(db):
+    # Given
+    task = Task.create(_raise_exception_without_retries.task_identifier)
+    task.save()
+
+    # When
+    run_tasks_with_lease(claimed_by="runner")
+
+    # Then
+    task.refresh_from_db()
+    assert task.num_failures == 1
+    assert task.dead_lettered_at is not None
+    assert task.claimed_by is None
+
+    # and it isn't run again
+    task.scheduled_for = timezone.now()
+    task.save()
+    assert run_tasks() == []
+
+
 @register_task_handler()
 def _create_organisation(name: str):
     """function used to test that task is being run successfully"""
@@ -167,3 +459,8 @@ def _raise_exception():
 @register_task_handler()
 def _sleep(seconds: int):
     time.sleep(seconds)
+
+
+@register_task_handler(max_retries=0)
+def _raise_exception_without_retries():
+    raise Exception()
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from task_processor.decorators import register_recurring_task
+from task_processor.models import RecurringTaskSchedule, Task, TaskPriority
+from task_processor.recurring import (
+    schedule_recurring_tasks,
+    sync_recurring_task_schedules,
+)
+from task_processor.task_registry import registered_recurring_tasks
+
+
+@register_recurring_task(run_every=timedelta(hours=1), priority=TaskPriority.LOW)
+def my_recurring_task():
+    pass
+
+
+@pytest.fixture()
+def only_my_recurring_task(mocker):
+    mocker.patch.dict(
+        registered_recurring_tasks,
+        {my_recurring_task.task_identifier: my_recurring_task.run_every},
+        clear=True,
+    )
+
+
+def test_register_recurring_task_registers_task_handler_and_schedule():
+    assert registered_recurring_tasks[my_recurring_task.task_identifier] == timedelta(
+        hours=1
+    )
+    assert my_recurring_task.priority == TaskPriority.LOW
+
+
+def test_sync_recurring_task_schedules_creates_and_updates_schedules(
+    db, only_my_recurring_task, mocker
+):
+    # Given
+    now = timezone.now()
+    mocker.patch("task_processor.recurring.timezone.now", return_value=now)
+    RecurringTaskSchedule.objects.create(
+        task_identifier=my_recurring_task.task_identifier,
+        run_every=timedelta(days=1),
+        next_run_at=now + timedelta(days=1),
+    )
+
+    # When
+    sync_recurring_task_schedules()
+
+    # Then
+    schedule = RecurringTaskSchedule.objects.get()
+    assert schedule.run_every == timedelta(hours=1)
+    assert schedule.next_run_at == now + timedelta(hours=1)
+
+
+def test_schedule_recurring_tasks_creates_task_for_due_recurring_task(
+    db, only_my_recurring_task
+):
+    # Given
+    sync_recurring_task_schedules()
+
+    # When
+    tasks = schedule_recurring_tasks()
+
+    # Then
+    assert len(tasks) == 1
+    assert tasks[0].task_identifier == my_recurring_task.task_identifier
+    assert tasks[0].priority == TaskPriority.LOW
+
+    schedule = RecurringTaskSchedule.objects.get()
+    assert schedule.next_run_at > timezone.now() + timedelta(minutes=59)
+
+    # and it isn't scheduled again until it's next due
+    assert schedule_recurring_tasks() == []
+
+
+def test_schedule_recurring_tasks_does_not_schedule_run_if_previous_is_pending(
+    db, only_my_recurring_task
+):
+    # Given
+    sync_recurring_task_schedules()
+    pending_task = schedule_recurring_tasks()[0]
+    RecurringTaskSchedule.objects.update(next_run_at=timezone.now())
+
+    # When
+    tasks = schedule_recurring_tasks()
+
+    # Then
+    assert tasks == [pending_task]
+    assert Task.objects.count() == 1
@@ -0,0 +1,205 @@
+import pytest
+
+from task_processor.decorators import register_task_handler
+from task_processor.models import Task
+from task_processor.notifications import (
+    NotificationListener,
+    TaskListener,
+    WakeUpSignal,
+)
+from task_processor.threads import RecurringTaskScheduler, TaskRunner
+
+
+@register_task_handler()
+def my_task():
+    pass
+
+
+def test_wake_up_signal_wait_returns_immediately_if_notified_since_generation():
+    # Given
+    wake_up_signal = WakeUpSignal()
+    generation = wake_up_signal.generation
+    wake_up_signal.notify()
+
+    # When
+    woken_up = wake_up_signal.wait(generation, timeout=10)
+
+    # Then
+    assert woken_up is True
+
+
+def test_wake_up_signal_wait_times_out_if_not_notified():
+    # Given
+    wake_up_signal = WakeUpSignal()
+
+    # When
+    woken_up = wake_up_signal.wait(wake_up_signal.generation, timeout=0.01)
+
+    # Then
+    assert woken_up is False
+
+
+def test_task_runner_waits_for_wake_up_signal_when_queue_is_empty(mocker):
+    # Given
+    mocker.patch("task_processor.threads.run_tasks", return_value=[])
+    wake_up_signal = mocker.MagicMock(generation=1)
+    task_runner = TaskRunner(
+        sleep_interval_millis=2000, queue_pop_size=1, wake_up_signal=wake_up_signal
+    )
+
+    # When
+    task_runner.run_iteration()
+
+    # Then
+    wake_up_signal.wait.assert_called_once_with(1, timeout=2)
+    assert task_runner.last_checked_for_tasks
+
+
+def test_task_runner_does_not_wait_when_queue_has_more_tasks(mocker):
+    # Given
+    mocker.patch("task_processor.threads.run_tasks", return_value=[mocker.MagicMock()])
+    mocked_time = mocker.patch("task_processor.threads.time")
+    wake_up_signal = mocker.MagicMock()
+    task_runner = TaskRunner(queue_pop_size=1, wake_up_signal=wake_up_signal)
+
+    # When
+    task_runner.run_iteration()
+
+    # Then
+    wake_up_signal.wait.assert_not_called()
+    mocked_time.sleep.assert_not_called()
+
+
+def test_task_runner_polls_without_wake_up_signal(mocker):
+    # Given
+    mocker.patch("task_processor.threads.run_tasks", return_value=[])
+    mocked_time = mocker.patch("task_processor.threads.time")
+    task_runner = TaskRunner(sleep_interval_millis=500)
+
+    # When
+    task_runner.run_iteration()
+
+    # Then
+    mocked_time.sleep.assert_called_once_with(0.5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_task_listener_wakes_up_task_runners_when_task_is_created():
+    # Given
+    wake_up_signal = WakeUpSignal()
+    generation = wake_up_signal.generation
+    listener = TaskListener(wake_up_signal=wake_up_signal)
+    listener.start()
+    assert listener.listening.wait(timeout=5)
+
+    # When
+    Task.create(my_task.task_identifier).save()
+
+    # Then
+    try:
+        assert wake_up_signal.wait(generation, timeout=5) is True
+    finally:
+        listener.stop()
+        listener.join(timeout=5)
+
+    assert not listener.is_alive()
+
+
+def test_task_listener_does_nothing_if_database_is_not_postgres(mocker):
+    # Given
+    mocker.patch("task_processor.notifications.connection", vendor="sqlite")
+    wake_up_signal = WakeUpSignal()
+    listener = TaskListener(wake_up_signal=wake_up_signal)
+
+    # When
+    listener.run()
+
+    # Then
+    assert not listener.listening.is_set()
+    assert wake_up_signal.generation == 0
+
+
+def test_task_listener_wakes_up_task_runners_when_reconnecting(mocker):
+    # Given
+    mocker.patch("task_processor.notifications.connection", vendor="postgresql")
+    wake_up_signal = WakeUpSignal()
+    listener = TaskListener(wake_up_signal=wake_up_signal)
+
+    def lose_connection():
+        # stop, so that the listener doesn't reconnect
+        listener.stop()
+        raise Exception("connection lost")
+
+    mocker.patch.object(listener, "_listen", side_effect=lose_connection)
+
+    # When
+    listener.run()
+
+    # Then
+    assert wake_up_signal.generation == 1
+
+
+def test_notification_listener_requires_notifications_to_be_handled():
+    # Given
+    class Listener(NotificationListener):
+        channel = "channel"
+
+    # When
+    with pytest.raises(TypeError):
+        Listener()
+
+
+def test_task_runner_runs_tasks_with_lease_when_lease_seconds_set(mocker):
+    # Given
+    mocked_run_tasks = mocker.patch("task_processor.threads.run_tasks")
+    mocked_run_tasks_with_lease = mocker.patch(
+        "task_processor.threads.run_tasks_with_lease", return_value=[]
+    )
+    mocker.patch("task_processor.threads.time")
+    task_runner = TaskRunner(queue_pop_size=5, lease_seconds=60, queues=["queue"])
+
+    # When
+    task_runner.run_iteration()
+
+    # Then
+    mocked_run_tasks_with_lease.assert_called_once_with(
+        5,
+        claimed_by=task_runner.runner_id,
+        lease_seconds=60,
+        executor=None,
+        queues=["queue"],
+    )
+    mocked_run_tasks.assert_not_called()
+
+
+def test_recurring_task_scheduler_syncs_and_schedules_recurring_tasks(mocker):
+    # Given
+    mocked_sync = mocker.patch("task_processor.threads.sync_recurring_task_schedules")
+    mocked_schedule = mocker.patch("task_processor.threads.schedule_recurring_tasks")
+    scheduler = RecurringTaskScheduler(interval_seconds=10)
+    mocked_schedule.side_effect = lambda: scheduler.stop()
+
+    # When
+    scheduler.run()
+
+    # Then
+    mocked_sync.assert_called_once_with()
+    mocked_schedule.assert_called_once_with()
+
+
+def test_recurring_task_scheduler_retries_failed_sync(mocker):
+    # Given
+    mocked_sync = mocker.patch(
+        "task_processor.threads.sync_recurring_task_schedules",
+        side_effect=[Exception("database unavailable"), None],
+    )
+    mocked_schedule = mocker.patch("task_processor.threads.schedule_recurring_tasks")
+    scheduler = RecurringTaskScheduler(interval_seconds=0)
+    mocked_schedule.side_effect = lambda: scheduler.stop()
+
+    # When
+    scheduler.run()
+
+    # Then
+    assert mocked_sync.call_count == 2
+    mocked_schedule.assert_called_once_with()
@@ -0,0 +1,25 @@
+from telemetry.tasks import send_telemetry_heartbeat
+
+
+def test_send_telemetry_heartbeat(settings, mocker):
+    # Given
+    settings.ENABLE_TELEMETRY = True
+    mocked_wrapper = mocker.patch("telemetry.tasks.SelfHostedTelemetryWrapper")
+
+    # When
+    send_telemetry_heartbeat()
+
+    # Then
+    mocked_wrapper.return_value.send_heartbeat.assert_called_once_with()
+
+
+def test_send_telemetry_heartbeat_does_nothing_if_telemetry_disabled(settings, mocker):
+    # Given
+    settings.ENABLE_TELEMETRY = False
+    mocked_wrapper = mocker.patch("telemetry.tasks.SelfHostedTelemetryWrapper")
+
+    # When
+    send_telemetry_heartbeat()
+
+    # Then
+    mocked_wrapper.assert_not_called()
@@ -0,0 +1,27 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+
+def test_benchmarkwebhooks_reports_results():
+    # Given
+    out = StringIO()
+
+    # When
+    call_command(
+        "benchmarkwebhooks",
+        "--numwebhooks",
+        "5",
+        "--numsecrets",
+        "2",
+        "--numevents",
+        "10",
+        stdout=out,
+    )
+
+    # Then
+    output = out.getvalue()
+    assert "Sending 10 events to 5 webhooks with 2 secrets." in output
+    assert "Serialized per webhook:" in output
+    assert "Serialized per event:" in output
+    assert "Speedup:" in output
@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+from task_processor.task_run_method import TaskRunMethod
+from webhooks import delivery
+from webhooks.exceptions import WebhookDeliveryQueueFull
+
+
+@pytest.fixture()
+def reset_delivery(monkeypatch):
+    monkeypatch.setattr(delivery, "_session", None)
+    monkeypatch.setattr(delivery, "_executor", None)
+    monkeypatch.setattr(delivery, "_num_dropped", 0)
+
+
+def test_get_session_reuses_session(reset_delivery, settings):
+    # Given
+    settings.WEBHOOK_MAX_WORKERS = 3
+
+    # When
+    session = delivery.get_session()
+
+    # Then
+    assert delivery.get_session() is session
+    adapter = session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 3
+
+
+def test_post_uses_timeouts(mocker, settings):
+    # Given
+    settings.WEBHOOK_CONNECT_TIMEOUT_SECONDS = 1
+    settings.WEBHOOK_READ_TIMEOUT_SECONDS = 2
+    mock_session = mocker.patch.object(delivery, "get_session").return_value
+
+    # When
+    response = delivery.post("https://example.com", data="{}", headers={})
+
+    # Then
+    assert response == mock_session.post.return_value
+    mock_session.post.assert_called_once_with(
+        "https://example.com", data="{}", headers={}, timeout=(1, 2)
+    )
+
+
+def test_submit_runs_synchronously(settings):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.SYNCHRONOUSLY
+
+    # When
+    future = delivery.submit(lambda value: value * 2, 2)
+
+    # Then
+    assert future.done()
+    assert future.result() == 4
+
+
+def test_submit_runs_in_thread_pool(reset_delivery, settings, mocker):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.SEPARATE_THREAD
+    settings.WEBHOOK_MAX_WORKERS = 2
+    mock_close_old_connections = mocker.patch.object(delivery, "close_old_connections")
+
+    # When
+    future = delivery.submit(lambda: threading.current_thread().name)
+
+    # Then
+    assert future.result(timeout=1).startswith("webhooks")
+    mock_close_old_connections.assert_called_once_with()
+    assert delivery._executor._max_workers == 2
+
+
+def test_submit_logs_exceptions(settings, mocker):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.SYNCHRONOUSLY
+    mocked_logger = mocker.patch.object(delivery, "logger")
+
+    def fail():
+        raise Exception("Webhook failed")
+
+    # When
+    future = delivery.submit(fail)
+
+    # Then
+    assert future.result() is None
+    mocked_logger.exception.assert_called_once_with("Failed to deliver webhook.")
+
+
+def test_submit_drops_deliveries_when_queue_is_full(reset_delivery, settings, mocker):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.SEPARATE_THREAD
+    settings.WEBHOOK_MAX_WORKERS = 1
+    settings.WEBHOOK_MAX_PENDING_DELIVERIES = 2
+    mocker.patch.object(delivery, "close_old_connections")
+    mocked_logger = mocker.patch.object(delivery, "logger")
+
+    blocked = threading.Event()
+    futures = [delivery.submit(blocked.wait) for _ in range(2)]
+
+    # When
+    dropped_future = delivery.submit(lambda: None)
+
+    # Then
+    with pytest.raises(WebhookDeliveryQueueFull):
+        dropped_future.result()
+
+    # and deliveries are accepted again, and the dropped ones logged, once the
+    # queue has room
+    blocked.set()
+    for future in futures:
+        future.result(timeout=1)
+
+    assert delivery.submit(lambda: "delivered").result(timeout=1) == "delivered"
+    mocked_logger.warning.assert_called_once_with(
+        "Delivery queue full, dropped %d webhook(s).", 1
+    )
@@ -0,0 +1,305 @@
+import json
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from django.utils import timezone
+
+from environments.models import Webhook
+from organisations.models import OrganisationWebhook
+from task_processor.task_run_method import TaskRunMethod
+from webhooks import delivery
+from webhooks.models import WebhookOutboxMessage
+from webhooks.outbox import deliver_outbox_messages, webhooks_cache
+from webhooks.webhooks import (
+    WebhookEventType,
+    WebhookType,
+    call_environment_webhooks,
+)
+
+now = datetime(2022, 1, 1, 12, 30, 15, tzinfo=pytz.UTC)
+
+
+@pytest.fixture(autouse=True)
+def outbox_settings(settings):
+    # run the deliveries in the test thread
+    settings.TASK_RUN_METHOD = TaskRunMethod.SYNCHRONOUSLY
+    settings.WEBHOOK_OUTBOX_BATCH_SIZE = 1
+    settings.WEBHOOK_MAX_DELIVERIES_PER_URL_PER_MINUTE = 0
+    settings.WEBHOOK_MAX_ATTEMPTS = 3
+    settings.WEBHOOK_RETRY_BACKOFF_SECONDS = 10
+    webhooks_cache.clear()
+
+
+@pytest.fixture()
+def mock_now(mocker):
+    return mocker.patch.object(timezone, "now", return_value=now)
+
+
+@pytest.fixture()
+def mock_post(mocker):
+    mock_session = mocker.patch("webhooks.delivery.get_session").return_value
+    mock_session.post.return_value.status_code = 200
+    return mock_session.post
+
+
+@pytest.fixture()
+def webhook(environment):
+    return Webhook.objects.create(url="https://example.com/1", environment=environment)
+
+
+def _create_messages(webhook, num_messages):
+    return [
+        WebhookOutboxMessage.objects.create(
+            environment_webhook=webhook, payload={"event": i}, next_attempt_at=now
+        )
+        for i in range(num_messages)
+    ]
+
+
+def test_call_environment_webhooks_adds_messages_to_outbox(
+    environment, webhook, settings, mocker, django_capture_on_commit_callbacks
+):
+    # Given
+    settings.TASK_RUN_METHOD = TaskRunMethod.TASK_PROCESSOR
+    mock_deliver_webhook_outbox = mocker.patch("webhooks.tasks.deliver_webhook_outbox")
+    mock_post = mocker.patch("webhooks.delivery.post")
+
+    # When
+    with django_capture_on_commit_callbacks(execute=True):
+        call_environment_webhooks(
+            environment, {"foo": "bar"}, WebhookEventType.FLAG_UPDATED
+        )
+
+    # Then
+    message = WebhookOutboxMessage.objects.get()
+    assert message.webhook == webhook
+    assert message.payload == {"event_type": "FLAG_UPDATED", "data": {"foo": "bar"}}
+
+    mock_post.assert_not_called()
+    mock_deliver_webhook_outbox.delay.assert_called_once_with(
+        dedup_key="webhook-outbox"
+    )
+
+
+def test_deliver_outbox_messages(webhook, organisation, mock_now, mock_post):
+    # Given
+    organisation_webhook = OrganisationWebhook.objects.create(
+        url="https://example.com/2", organisation=organisation, name="test"
+    )
+    _create_messages(webhook, 1)
+    WebhookOutboxMessage.objects.create(
+        organisation_webhook=organisation_webhook,
+        payload={"event": 2},
+        next_attempt_at=now,
+    )
+    # not due yet
+    WebhookOutboxMessage.objects.create(
+        environment_webhook=webhook,
+        payload={"event": 3},
+        next_attempt_at=now + timedelta(seconds=1),
+    )
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    assert sorted(
+        (call.args[0], json.loads(call.kwargs["data"]))
+        for call in mock_post.call_args_list
+    ) == [
+        ("https://example.com/1", {"event": 0}),
+        ("https://example.com/2", {"event": 2}),
+    ]
+    assert list(WebhookOutboxMessage.objects.values_list("payload", flat=True)) == [
+        {"event": 3}
+    ]
+
+
+def test_deliver_outbox_messages_batches_messages(
+    webhook, settings, mock_now, mock_post
+):
+    # Given
+    settings.WEBHOOK_OUTBOX_BATCH_SIZE = 2
+    _create_messages(webhook, 3)
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    assert [json.loads(call.kwargs["data"]) for call in mock_post.call_args_list] == [
+        [{"event": 0}, {"event": 1}],
+        [{"event": 2}],
+    ]
+    assert not WebhookOutboxMessage.objects.exists()
+
+
+def test_deliver_outbox_messages_retries_failed_deliveries_with_backoff(
+    webhook, mock_now, mock_post
+):
+    # Given
+    mock_post.return_value.status_code = 500
+    message, *_ = _create_messages(webhook, 1)
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    message.refresh_from_db()
+    assert message.num_attempts == 1
+    assert message.next_attempt_at == now + timedelta(seconds=10)
+
+    # When
+    mock_now.return_value = message.next_attempt_at
+    deliver_outbox_messages()
+
+    # Then
+    message.refresh_from_db()
+    assert message.num_attempts == 2
+    assert message.next_attempt_at == now + timedelta(seconds=10 + 20)
+
+
+def test_deliver_outbox_messages_drops_messages_after_max_attempts(
+    webhook, mock_now, mock_post, mocker
+):
+    # Given
+    mock_send_failure_email = mocker.patch("webhooks.outbox.send_failure_email")
+    mock_post.return_value.status_code = 500
+    message, *_ = _create_messages(webhook, 1)
+    message.num_attempts = 2
+    message.save()
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    assert not WebhookOutboxMessage.objects.exists()
+    mock_send_failure_email.assert_called_once_with(
+        webhook, {"event": 0}, WebhookType.ENVIRONMENT, 500
+    )
+
+
+def test_deliver_outbox_messages_rate_limits_deliveries_per_url(
+    webhook, environment, settings, mock_now, mock_post
+):
+    # Given
+    settings.WEBHOOK_MAX_DELIVERIES_PER_URL_PER_MINUTE = 2
+    other_webhook = Webhook.objects.create(url=webhook.url, environment=environment)
+    _create_messages(webhook, 2)
+    _create_messages(other_webhook, 1)
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    assert mock_post.call_count == 2
+    rate_limited_message = WebhookOutboxMessage.objects.get()
+    assert rate_limited_message.num_attempts == 0
+    assert rate_limited_message.next_attempt_at == datetime(
+        2022, 1, 1, 12, 31, tzinfo=pytz.UTC
+    )
+
+    # and the limit applies until the next minute
+    mock_now.return_value = now + timedelta(seconds=1)
+    WebhookOutboxMessage.objects.update(next_attempt_at=now)
+    deliver_outbox_messages()
+    assert mock_post.call_count == 2
+
+
+def test_deliver_outbox_messages_only_makes_deliveries_that_fit_in_claim(
+    webhook, settings, mock_now, mock_post
+):
+    # Given
+    # each delivery can take up to 150 seconds, so each thread can only make two
+    # deliveries in half of the claim duration
+    settings.WEBHOOK_CONNECT_TIMEOUT_SECONDS = 50
+    settings.WEBHOOK_READ_TIMEOUT_SECONDS = 100
+    settings.WEBHOOK_MAX_CONCURRENT_DELIVERIES_PER_URL = 2
+    _create_messages(webhook, 5)
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    assert mock_post.call_count == 4
+    deferred_message = WebhookOutboxMessage.objects.get()
+    assert deferred_message.payload == {"event": 4}
+    assert deferred_message.num_attempts == 0
+    assert deferred_message.next_attempt_at == now
+
+
+def test_deliver_outbox_messages_drops_messages_for_disabled_webhooks(
+    webhook, mock_now, mock_post
+):
+    # Given
+    _create_messages(webhook, 1)
+    webhook.enabled = False
+    webhook.save()
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    mock_post.assert_not_called()
+    assert not WebhookOutboxMessage.objects.exists()
+
+
+def test_deliver_outbox_messages_handles_unexpected_errors_per_delivery(
+    webhook, environment, mock_now, mock_post
+):
+    # Given
+    failing_webhook = Webhook.objects.create(
+        url="https://example.com/failing", environment=environment
+    )
+    _create_messages(webhook, 1)
+    failing_message, *_ = _create_messages(failing_webhook, 1)
+
+    response = mock_post.return_value
+
+    def post(url, *args, **kwargs):
+        if url == failing_webhook.url:
+            raise ValueError()
+        return response
+
+    mock_post.side_effect = post
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    # the successful delivery is recorded and the failed one is retried
+    assert list(WebhookOutboxMessage.objects.all()) == [failing_message]
+    failing_message.refresh_from_db()
+    assert failing_message.num_attempts == 1
+
+
+def test_deliver_outbox_messages_records_results_of_other_deliveries_if_one_fails(
+    webhook, environment, mock_now, mock_post, mocker
+):
+    # Given
+    other_webhook = Webhook.objects.create(
+        url="https://example.com/other", environment=environment
+    )
+    _create_messages(webhook, 1)
+    other_message, *_ = _create_messages(other_webhook, 1)
+
+    submit = delivery.submit
+
+    def submit_failing_for_other_webhook(f, deliveries):
+        if deliveries[0].webhook == other_webhook:
+            future = Future()
+            future.set_exception(ValueError())
+            return future
+        return submit(f, deliveries)
+
+    mocker.patch(
+        "webhooks.outbox.delivery.submit", side_effect=submit_failing_for_other_webhook
+    )
+
+    # When
+    deliver_outbox_messages()
+
+    # Then
+    # the other message is retried once its claim expires
+    assert list(WebhookOutboxMessage.objects.all()) == [other_message]
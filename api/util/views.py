@@ -1,9 +1,54 @@
+import typing
+
+from core.helpers import generate_etag
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
 from rest_framework.generics import GenericAPIView
 
 from environments.authentication import EnvironmentKeyAuthentication
 from environments.permissions.permissions import EnvironmentKeyPermissions
 
 
+class ConditionalGetMixin:
+    """
+    Adds an ETag to successful GET responses and returns a 304 Not Modified
+    response (without a body) when it matches the If-None-Match header sent by
+    the client.
+
+    Views can set the ETag header themselves when they have a cheaper way of
+    knowing the revision of the content (e.g. a cached hash), otherwise it is
+    generated from the rendered content.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ("GET", "HEAD") or response.status_code != 200:
+            return response
+
+        if not response.has_header("ETag"):
+            if hasattr(response, "render"):
+                response.render()
+            response["ETag"] = generate_etag(response.content)
+
+        return get_conditional_response(
+            request, etag=response["ETag"], response=response
+        )
+
+    def get_not_modified_response(
+        self, request: HttpRequest, etag: str
+    ) -> typing.Optional[HttpResponse]:
+        """
+        Get a 304 Not Modified response if the client already has the content
+        with the given ETag so that views can return early without building it.
+        """
+        if not etag:
+            return None
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+        return response
+
+
 class SDKAPIView(GenericAPIView):
     permission_classes = (EnvironmentKeyPermissions,)
     authentication_classes = (EnvironmentKeyAuthentication,)
@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from requests.adapters import HTTPAdapter
+
+from task_processor.task_run_method import TaskRunMethod
+from webhooks.exceptions import WebhookDeliveryQueueFull
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_session: typing.Optional[requests.Session] = None
+_executor: typing.Optional[ThreadPoolExecutor] = None
+_executor_pid: typing.Optional[int] = None
+# limits the number of deliveries waiting for, or being made by, the executor
+_pending_deliveries: typing.Optional[threading.BoundedSemaphore] = None
+_num_dropped = 0
+
+
+def get_session() -> requests.Session:
+    """
+    Get the session used to deliver webhooks, which keeps a pool of connections
+    to each host so that they can be reused between deliveries.
+    """
+    global _session
+
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=settings.WEBHOOK_CONNECTION_POOL_HOSTS,
+                pool_maxsize=settings.WEBHOOK_MAX_WORKERS,
+            )
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def post(url: str, data: typing.Union[str, bytes], headers: dict) -> requests.Response:
+    return get_session().post(
+        url,
+        data=data,
+        headers=headers,
+        timeout=(
+            settings.WEBHOOK_CONNECT_TIMEOUT_SECONDS,
+            settings.WEBHOOK_READ_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def submit(f: typing.Callable, *args, **kwargs) -> Future:
+    """
+    Run f in the webhook delivery thread pool, which is shared by all of the
+    webhooks being delivered by this process, so that a slow endpoint only ties
+    up one of a bounded number of threads.
+
+    If WEBHOOK_MAX_PENDING_DELIVERIES deliveries are already waiting for, or
+    being made by, the pool, f is dropped rather than letting the backlog grow
+    without limit, and the returned future raises WebhookDeliveryQueueFull.
+
+    f is run immediately in the calling thread if TASK_RUN_METHOD is
+    SYNCHRONOUSLY, e.g. for testing.
+    """
+    if settings.TASK_RUN_METHOD == TaskRunMethod.SYNCHRONOUSLY:
+        future = Future()
+        future.set_result(_run(f, *args, **kwargs))
+        return future
+
+    executor, pending_deliveries = _get_executor()
+    if not pending_deliveries.acquire(blocking=False):
+        _record_dropped_delivery()
+        future = Future()
+        future.set_exception(WebhookDeliveryQueueFull())
+        return future
+
+    return executor.submit(_run_in_thread, pending_deliveries, f, *args, **kwargs)
+
+
+def _get_executor() -> typing.Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _executor_pid, _pending_deliveries
+
+    with _lock:
+        # the threads of an executor created before forking, e.g. by a
+        # pre-forking server, don't exist in the child process
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.WEBHOOK_MAX_WORKERS,
+                thread_name_prefix="webhooks",
+            )
+            _executor_pid = os.getpid()
+            _pending_deliveries = threading.BoundedSemaphore(
+                settings.WEBHOOK_MAX_PENDING_DELIVERIES
+            )
+        return _executor, _pending_deliveries
+
+
+def _record_dropped_delivery() -> None:
+    global _num_dropped
+
+    with _lock:
+        _num_dropped += 1
+
+
+def _log_dropped_deliveries() -> None:
+    global _num_dropped
+
+    with _lock:
+        num_dropped, _num_dropped = _num_dropped, 0
+
+    if num_dropped:
+        logger.warning("Delivery queue full, dropped %d webhook(s).", num_dropped)
+
+
+def _run(f: typing.Callable, *args, **kwargs) -> typing.Any:
+    try:
+        return f(*args, **kwargs)
+    except Exception:
+        logger.exception("Failed to deliver webhook.")
+
+
+def _run_in_thread(
+    pending_deliveries: threading.BoundedSemaphore,
+    f: typing.Callable,
+    *args,
+    **kwargs,
+) -> typing.Any:
+    # logged by the deliveries that are made, rather than for each delivery that
+    # is dropped, so that a full queue doesn't flood the logs
+    _log_dropped_deliveries()
+    try:
+        return _run(f, *args, **kwargs)
+    finally:
+        # f may use the database, e.g. to send a failure email
+        close_old_connections()
+        pending_deliveries.release()
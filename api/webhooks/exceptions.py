@@ -1,2 +1,6 @@
 class WebhookSendError(Exception):
     pass
+
+
+class WebhookDeliveryQueueFull(Exception):
+    pass
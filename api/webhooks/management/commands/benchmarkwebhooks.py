@@ -0,0 +1,89 @@
+import time
+from argparse import ArgumentParser
+
+from django.core.management import BaseCommand
+
+from webhooks.webhooks import (
+    WEBHOOK_SAMPLE_DATA,
+    WebhookEventType,
+    WebhookPayload,
+    WebhookType,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time taken to serialize and sign the payloads when sending "
+        "events to many webhooks, with the payload serialized for each webhook or "
+        "once per event. No requests are made."
+    )
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "--numwebhooks",
+            type=int,
+            help="Number of webhooks to send each event to.",
+            default=50,
+        )
+        parser.add_argument(
+            "--numsecrets",
+            type=int,
+            help="Number of distinct secrets used by the webhooks, 0 for unsigned "
+            "webhooks.",
+            default=10,
+        )
+        parser.add_argument(
+            "--numevents",
+            type=int,
+            help="Number of events to send.",
+            default=1000,
+        )
+
+    def handle(self, *args, **options):
+        num_webhooks = options["numwebhooks"]
+        num_secrets = options["numsecrets"]
+        num_events = options["numevents"]
+
+        secrets = [
+            f"secret-{i % num_secrets}" if num_secrets else ""
+            for i in range(num_webhooks)
+        ]
+        data = {
+            "event_type": WebhookEventType.FLAG_UPDATED.value,
+            "data": WEBHOOK_SAMPLE_DATA[WebhookType.ENVIRONMENT]["data"],
+        }
+
+        def serialize_per_webhook():
+            for secret in secrets:
+                payload = WebhookPayload(data)
+                if secret:
+                    payload.get_signature(secret)
+
+        def serialize_per_event():
+            payload = WebhookPayload(data)
+            for secret in secrets:
+                if secret:
+                    payload.get_signature(secret)
+
+        self.stdout.write(
+            f"Sending {num_events} events to {num_webhooks} webhooks with "
+            f"{num_secrets} secrets."
+        )
+        per_webhook_seconds = self._time(serialize_per_webhook, num_events)
+        per_event_seconds = self._time(serialize_per_event, num_events)
+        self.stdout.write(
+            f"Serialized per webhook: {per_webhook_seconds:.3f}s "
+            f"({num_events / per_webhook_seconds:.1f} events/s)."
+        )
+        self.stdout.write(
+            f"Serialized per event: {per_event_seconds:.3f}s "
+            f"({num_events / per_event_seconds:.1f} events/s)."
+        )
+        self.stdout.write(f"Speedup: {per_webhook_seconds / per_event_seconds:.1f}x.")
+
+    @staticmethod
+    def _time(f, num_events: int) -> float:
+        start_time = time.perf_counter()
+        for _ in range(num_events):
+            f()
+        return time.perf_counter() - start_time
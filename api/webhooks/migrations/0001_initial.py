@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-18 07:15
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('organisations', '0032_add_uuid_fields'),
+        ('environments', '0022_environment_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookOutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('num_attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('environment_webhook', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='environments.webhook')),
+                ('organisation_webhook', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organisations.organisationwebhook')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='webhookoutboxmessage',
+            index=models.Index(fields=['next_attempt_at'], name='webhook_outbox_next_idx'),
+        ),
+    ]
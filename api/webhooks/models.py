@@ -1,5 +1,7 @@
 from core.models import AbstractBaseExportableModel
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 
 class AbstractBaseWebhookModel(AbstractBaseExportableModel):
@@ -8,3 +10,39 @@ class AbstractBaseWebhookModel(AbstractBaseExportableModel):
 
     class Meta:
         abstract = True
+
+
+class WebhookOutboxMessage(models.Model):
+    """
+    An event waiting to be delivered to a webhook by the task processor, see
+    webhooks.outbox.
+    """
+
+    environment_webhook = models.ForeignKey(
+        "environments.Webhook",
+        on_delete=models.CASCADE,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    organisation_webhook = models.ForeignKey(
+        "organisations.OrganisationWebhook",
+        on_delete=models.CASCADE,
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    num_attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(name="webhook_outbox_next_idx", fields=["next_attempt_at"])
+        ]
+
+    @property
+    def webhook(self) -> AbstractBaseWebhookModel:
+        return self.environment_webhook or self.organisation_webhook
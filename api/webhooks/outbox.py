@@ -0,0 +1,287 @@
+import hashlib
+import logging
+import typing
+from collections import defaultdict
+from concurrent.futures import Future, wait
+from datetime import datetime, timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from webhooks import delivery
+from webhooks.models import AbstractBaseWebhookModel, WebhookOutboxMessage
+from webhooks.webhooks import WebhookType, _call_webhook, send_failure_email
+
+logger = logging.getLogger(__name__)
+
+webhooks_cache = caches[settings.WEBHOOKS_CACHE_LOCATION]
+
+# messages are claimed for this long while they are delivered, after which they
+# are retried if the delivery didn't complete, e.g. because the task processor
+# was restarted
+CLAIM_DURATION = timedelta(minutes=10)
+
+OUTBOX_DELIVERY_DEDUP_KEY = "webhook-outbox"
+
+
+class OutboxDelivery(typing.NamedTuple):
+    webhook: AbstractBaseWebhookModel
+    webhook_type: WebhookType
+    messages: typing.List[WebhookOutboxMessage]
+
+    @property
+    def payload(self) -> typing.Union[dict, typing.List[dict]]:
+        if settings.WEBHOOK_OUTBOX_BATCH_SIZE > 1:
+            return [message.payload for message in self.messages]
+        return self.messages[0].payload
+
+
+def add_to_outbox(
+    webhooks: typing.Iterable[AbstractBaseWebhookModel],
+    payload: dict,
+    webhook_type: WebhookType,
+) -> None:
+    """
+    Store the payload to be delivered to each of the webhooks by the task
+    processor. The messages are written in the caller's transaction, so they are
+    only delivered if the change that triggered them is committed.
+    """
+    webhook_field = (
+        "organisation_webhook"
+        if webhook_type == WebhookType.ORGANISATION
+        else "environment_webhook"
+    )
+    messages = WebhookOutboxMessage.objects.bulk_create(
+        [
+            WebhookOutboxMessage(**{webhook_field: webhook}, payload=payload)
+            for webhook in webhooks
+        ]
+    )
+    if messages:
+        transaction.on_commit(_schedule_outbox_delivery)
+
+
+def deliver_outbox_messages() -> None:
+    """
+    Deliver the outbox messages that are due.
+
+    Messages for the same webhook are delivered together, up to
+    WEBHOOK_OUTBOX_BATCH_SIZE per delivery. Up to
+    WEBHOOK_MAX_CONCURRENT_DELIVERIES_PER_URL deliveries are made to each URL at a
+    time, and no more than WEBHOOK_MAX_DELIVERIES_PER_URL_PER_MINUTE (if set) are
+    made to it each minute; any others are left for the next run. Only as many
+    deliveries are made as can time out within half of the claim duration, so
+    that messages are never claimed again while they are still being delivered.
+
+    Failed deliveries are retried with exponential backoff, up to
+    WEBHOOK_MAX_ATTEMPTS times, before the messages are dropped and a failure
+    email is sent.
+    """
+    now = timezone.now()
+    url_deliveries = defaultdict(list)
+    for outbox_delivery in _get_deliveries(_claim_messages(now)):
+        url_deliveries[str(outbox_delivery.webhook.url)].append(outbox_delivery)
+
+    futures = _submit_deliveries(url_deliveries, now)
+    wait(futures)
+    for future in futures:
+        try:
+            results = future.result()
+        except Exception:
+            # the messages are retried once their claim expires
+            logger.exception("Failed to deliver webhook outbox messages.")
+            continue
+
+        for outbox_delivery, status_code in results or []:
+            _handle_result(outbox_delivery, status_code)
+
+
+def _submit_deliveries(
+    url_deliveries: typing.Dict[str, typing.List[OutboxDelivery]], now: datetime
+) -> typing.List[Future]:
+    # deliveries to the same url are split between a limited number of threads,
+    # which each make their deliveries one at a time
+    num_threads = settings.WEBHOOK_MAX_CONCURRENT_DELIVERIES_PER_URL
+    max_deliveries_per_thread = _get_max_deliveries_per_thread()
+    num_deliveries_remaining = max_deliveries_per_thread * settings.WEBHOOK_MAX_WORKERS
+
+    futures = []
+    deferred_messages = []
+    rate_limited_messages = []
+    for url, deliveries in url_deliveries.items():
+        num_to_make = min(
+            len(deliveries),
+            max_deliveries_per_thread * num_threads,
+            num_deliveries_remaining,
+        )
+        for outbox_delivery in deliveries[num_to_make:]:
+            deferred_messages.extend(outbox_delivery.messages)
+
+        num_allowed = _get_num_allowed_deliveries(url, num_to_make, now)
+        for outbox_delivery in deliveries[num_allowed:num_to_make]:
+            rate_limited_messages.extend(outbox_delivery.messages)
+
+        for i in range(num_threads):
+            deliveries_to_make = deliveries[i:num_allowed:num_threads]
+            if deliveries_to_make:
+                futures.append(delivery.submit(_make_deliveries, deliveries_to_make))
+        num_deliveries_remaining -= num_allowed
+
+    _release_messages(deferred_messages, next_attempt_at=now)
+    _release_messages(rate_limited_messages, next_attempt_at=_next_minute(now))
+
+    return futures
+
+
+def _schedule_outbox_delivery() -> None:
+    from webhooks.tasks import deliver_webhook_outbox
+
+    # if there is already a pending task, it will deliver these messages too
+    deliver_webhook_outbox.delay(dedup_key=OUTBOX_DELIVERY_DEDUP_KEY)
+
+
+def _claim_messages(now: datetime) -> typing.List[WebhookOutboxMessage]:
+    with transaction.atomic():
+        message_ids = list(
+            WebhookOutboxMessage.objects.filter(next_attempt_at__lte=now)
+            .order_by("id")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[: settings.WEBHOOK_OUTBOX_MAX_MESSAGES]
+        )
+        WebhookOutboxMessage.objects.filter(id__in=message_ids).update(
+            next_attempt_at=now + CLAIM_DURATION
+        )
+
+    return list(
+        WebhookOutboxMessage.objects.filter(id__in=message_ids)
+        .select_related(
+            "environment_webhook__environment__project__organisation",
+            "organisation_webhook__organisation",
+        )
+        .order_by("id")
+    )
+
+
+def _get_deliveries(
+    messages: typing.List[WebhookOutboxMessage],
+) -> typing.List[OutboxDelivery]:
+    webhook_messages = defaultdict(list)
+    disabled_message_ids = []
+    for message in messages:
+        if message.webhook.enabled:
+            webhook_messages[message.webhook].append(message)
+        else:
+            disabled_message_ids.append(message.id)
+
+    WebhookOutboxMessage.objects.filter(id__in=disabled_message_ids).delete()
+
+    batch_size = settings.WEBHOOK_OUTBOX_BATCH_SIZE
+    deliveries = []
+    for webhook, messages in webhook_messages.items():
+        webhook_type = (
+            WebhookType.ORGANISATION
+            if messages[0].organisation_webhook_id
+            else WebhookType.ENVIRONMENT
+        )
+        for start in range(0, len(messages), batch_size):
+            end = start + batch_size
+            deliveries.append(
+                OutboxDelivery(webhook, webhook_type, messages[start:end])
+            )
+    return deliveries
+
+
+def _get_max_deliveries_per_thread() -> int:
+    # leave half of the claim duration to cover the time spent waiting for a
+    # thread in the delivery pool
+    delivery_seconds = (
+        settings.WEBHOOK_CONNECT_TIMEOUT_SECONDS + settings.WEBHOOK_READ_TIMEOUT_SECONDS
+    )
+    return max(1, int(CLAIM_DURATION.total_seconds() / 2 // delivery_seconds))
+
+
+def _get_num_allowed_deliveries(url: str, num_deliveries: int, now: datetime) -> int:
+    limit = settings.WEBHOOK_MAX_DELIVERIES_PER_URL_PER_MINUTE
+    if not limit or not num_deliveries:
+        return num_deliveries
+
+    # the limit is only approximate with cache backends that don't increment
+    # atomically, e.g. the database cache, since concurrent runs may both read the
+    # same count. Use e.g. a redis backend for WEBHOOKS_CACHE_BACKEND if it must
+    # be exact.
+
+    url_hash = hashlib.sha1(url.encode()).hexdigest()
+    key = f"webhook-deliveries:{url_hash}:{now.strftime('%Y%m%d%H%M')}"
+    webhooks_cache.add(key, 0, timeout=60)
+    num_made = webhooks_cache.incr(key, num_deliveries) - num_deliveries
+    return max(0, min(num_deliveries, limit - num_made))
+
+
+def _make_deliveries(
+    deliveries: typing.List[OutboxDelivery],
+) -> typing.List[typing.Tuple[OutboxDelivery, typing.Optional[int]]]:
+    results = []
+    for outbox_delivery in deliveries:
+        try:
+            response = _call_webhook(outbox_delivery.webhook, outbox_delivery.payload)
+            status_code = response.status_code
+        except requests.exceptions.RequestException:
+            status_code = None
+        except Exception:
+            # treated as a failed delivery, so that it doesn't lose the results
+            # of the other deliveries
+            logger.exception(
+                "Failed to deliver webhook to %s.", outbox_delivery.webhook.url
+            )
+            status_code = None
+        results.append((outbox_delivery, status_code))
+    return results
+
+
+def _handle_result(
+    outbox_delivery: OutboxDelivery, status_code: typing.Optional[int]
+) -> None:
+    message_ids = [message.id for message in outbox_delivery.messages]
+    if status_code and 200 <= status_code < 300:
+        WebhookOutboxMessage.objects.filter(id__in=message_ids).delete()
+        return
+
+    num_attempts = max(message.num_attempts for message in outbox_delivery.messages)
+    num_attempts += 1
+    if num_attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        logger.warning(
+            "Dropping %d webhook message(s) for %s after %d attempts.",
+            len(message_ids),
+            outbox_delivery.webhook.url,
+            num_attempts,
+        )
+        WebhookOutboxMessage.objects.filter(id__in=message_ids).delete()
+        send_failure_email(
+            outbox_delivery.webhook,
+            outbox_delivery.payload,
+            outbox_delivery.webhook_type,
+            status_code,
+        )
+        return
+
+    backoff_seconds = settings.WEBHOOK_RETRY_BACKOFF_SECONDS * 2 ** (num_attempts - 1)
+    WebhookOutboxMessage.objects.filter(id__in=message_ids).update(
+        num_attempts=num_attempts,
+        next_attempt_at=timezone.now() + timedelta(seconds=backoff_seconds),
+    )
+
+
+def _release_messages(
+    messages: typing.List[WebhookOutboxMessage], next_attempt_at: datetime
+) -> None:
+    if messages:
+        WebhookOutboxMessage.objects.filter(
+            id__in=[message.id for message in messages]
+        ).update(next_attempt_at=next_attempt_at)
+
+
+def _next_minute(now: datetime) -> datetime:
+    return now.replace(second=0, microsecond=0) + timedelta(minutes=1)
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from task_processor.decorators import (
+    register_recurring_task,
+    register_task_handler,
+)
+from task_processor.models import TaskPriority
+from webhooks.outbox import deliver_outbox_messages
+
+
+@register_task_handler(priority=TaskPriority.HIGH)
+def deliver_webhook_outbox():
+    deliver_outbox_messages()
+
+
+@register_recurring_task(run_every=timedelta(minutes=1), priority=TaskPriority.HIGH)
+def deliver_webhook_outbox_periodically():
+    # delivers any messages being retried, or that weren't delivered because of
+    # rate limits
+    deliver_outbox_messages()
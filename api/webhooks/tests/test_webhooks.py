@@ -4,11 +4,15 @@ import json
 from unittest import TestCase, mock
 
 import pytest
+import requests
 from core.constants import FLAGSMITH_SIGNATURE_HEADER
+from core.signing import sign_payload
+from django.test import override_settings
 
 from environments.models import Environment, Webhook
 from organisations.models import Organisation, OrganisationWebhook
 from projects.models import Project
+from task_processor.task_run_method import TaskRunMethod
 from webhooks.sample_webhook_data import (
     environment_webhook_data,
     organisation_webhook_data,
@@ -17,6 +21,7 @@ from webhooks.webhooks import (
     WebhookEventType,
     WebhookType,
     call_environment_webhooks,
+    send_failure_email,
     trigger_sample_webhook,
 )
 
@@ -24,14 +29,21 @@ from webhooks.webhooks import (
 @pytest.mark.django_db
 class WebhooksTestCase(TestCase):
     def setUp(self) -> None:
+        # deliver the webhooks before call_environment_webhooks returns
+        run_synchronously = override_settings(
+            TASK_RUN_METHOD=TaskRunMethod.SYNCHRONOUSLY
+        )
+        run_synchronously.enable()
+        self.addCleanup(run_synchronously.disable)
+
         organisation = Organisation.objects.create(name="Test organisation")
         project = Project.objects.create(name="Test project", organisation=organisation)
         self.environment = Environment.objects.create(
             name="Test environment", project=project
         )
 
-    @mock.patch("webhooks.webhooks.requests")
-    def test_requests_made_to_all_urls_for_environment(self, mock_requests):
+    @mock.patch("webhooks.delivery.get_session")
+    def test_requests_made_to_all_urls_for_environment(self, mock_get_session):
         # Given
         webhook_1 = Webhook.objects.create(
             url="http://url.1.com", enabled=True, environment=self.environment
@@ -48,18 +60,18 @@ class WebhooksTestCase(TestCase):
         )
 
         # Then
-        assert len(mock_requests.post.call_args_list) == 2
+        assert len(mock_get_session.return_value.post.call_args_list) == 2
 
         # and
-        call_1_args, _ = mock_requests.post.call_args_list[0]
-        call_2_args, _ = mock_requests.post.call_args_list[1]
+        call_1_args, _ = mock_get_session.return_value.post.call_args_list[0]
+        call_2_args, _ = mock_get_session.return_value.post.call_args_list[1]
         all_call_args = call_1_args + call_2_args
         assert all(
             str(webhook.url) in all_call_args for webhook in (webhook_1, webhook_2)
         )
 
-    @mock.patch("webhooks.webhooks.requests")
-    def test_request_not_made_to_disabled_webhook(self, mock_requests):
+    @mock.patch("webhooks.delivery.get_session")
+    def test_request_not_made_to_disabled_webhook(self, mock_get_session):
         # Given
         Webhook.objects.create(
             url="http://url.1.com", enabled=False, environment=self.environment
@@ -73,35 +85,35 @@ class WebhooksTestCase(TestCase):
         )
 
         # Then
-        mock_requests.post.assert_not_called()
+        mock_get_session.return_value.post.assert_not_called()
 
-    @mock.patch("webhooks.webhooks.requests")
+    @mock.patch("webhooks.delivery.get_session")
     def test_trigger_sample_webhook_makes_correct_post_request_for_environment(
-        self, mock_request
+        self, mock_get_session
     ):
         url = "http://test.test"
         webhook = Webhook(url=url)
         trigger_sample_webhook(webhook, WebhookType.ENVIRONMENT)
-        args, kwargs = mock_request.post.call_args
+        args, kwargs = mock_get_session.return_value.post.call_args
         assert json.loads(kwargs["data"]) == environment_webhook_data
         assert args[0] == url
 
-    @mock.patch("webhooks.webhooks.requests")
+    @mock.patch("webhooks.delivery.get_session")
     def test_trigger_sample_webhook_makes_correct_post_request_for_organisation(
-        self, mock_request
+        self, mock_get_session
     ):
         url = "http://test.test"
         webhook = OrganisationWebhook(url=url)
 
         trigger_sample_webhook(webhook, WebhookType.ORGANISATION)
-        args, kwargs = mock_request.post.call_args
+        args, kwargs = mock_get_session.return_value.post.call_args
         assert json.loads(kwargs["data"]) == organisation_webhook_data
         assert args[0] == url
 
     @mock.patch("webhooks.webhooks.WebhookSerializer")
-    @mock.patch("webhooks.webhooks.requests")
+    @mock.patch("webhooks.delivery.get_session")
     def test_request_made_with_correct_signature(
-        self, mock_requests, webhook_serializer
+        self, mock_get_session, webhook_serializer
     ):
         # Given
         payload = {"key": "value"}
@@ -126,14 +138,14 @@ class WebhooksTestCase(TestCase):
             event_type=WebhookEventType.FLAG_UPDATED,
         )
         # When
-        _, kwargs = mock_requests.post.call_args_list[0]
+        _, kwargs = mock_get_session.return_value.post.call_args_list[0]
         # Then
         received_signature = kwargs["headers"][FLAGSMITH_SIGNATURE_HEADER]
         assert hmac.compare_digest(expected_signature, received_signature) is True
 
-    @mock.patch("webhooks.webhooks.requests")
+    @mock.patch("webhooks.delivery.get_session")
     def test_request_does_not_have_signature_header_if_secret_is_not_set(
-        self, mock_requests
+        self, mock_get_session
     ):
         # Given
         Webhook.objects.create(
@@ -147,5 +159,90 @@ class WebhooksTestCase(TestCase):
         )
 
         # Then
-        _, kwargs = mock_requests.post.call_args_list[0]
+        _, kwargs = mock_get_session.return_value.post.call_args_list[0]
         assert FLAGSMITH_SIGNATURE_HEADER not in kwargs["headers"]
+
+    @mock.patch("webhooks.webhooks.send_failure_email")
+    @mock.patch("webhooks.delivery.get_session")
+    def test_failure_email_sent_if_request_times_out(
+        self, mock_get_session, mock_send_failure_email
+    ):
+        # Given
+        webhook = Webhook.objects.create(
+            url="http://url.1.com", enabled=True, environment=self.environment
+        )
+        mock_get_session.return_value.post.side_effect = requests.exceptions.Timeout
+
+        # When
+        call_environment_webhooks(
+            environment=self.environment,
+            data={},
+            event_type=WebhookEventType.FLAG_UPDATED,
+        )
+
+        # Then
+        mock_send_failure_email.assert_called_once_with(
+            webhook, mock.ANY, WebhookType.ENVIRONMENT
+        )
+
+    @mock.patch("webhooks.delivery.get_session")
+    def test_request_made_with_timeouts(self, mock_get_session):
+        # Given
+        Webhook.objects.create(
+            url="http://url.1.com", enabled=True, environment=self.environment
+        )
+
+        # When
+        with override_settings(
+            WEBHOOK_CONNECT_TIMEOUT_SECONDS=1, WEBHOOK_READ_TIMEOUT_SECONDS=2
+        ):
+            call_environment_webhooks(
+                environment=self.environment,
+                data={},
+                event_type=WebhookEventType.FLAG_UPDATED,
+            )
+
+        # Then
+        _, kwargs = mock_get_session.return_value.post.call_args
+        assert kwargs["timeout"] == (1, 2)
+
+    @mock.patch("webhooks.webhooks.EmailMultiAlternatives")
+    def test_send_failure_email_is_throttled(self, mock_email):
+        # Given
+        webhook = Webhook.objects.create(
+            url="http://url.1.com", enabled=True, environment=self.environment
+        )
+
+        # When
+        for _ in range(2):
+            send_failure_email(webhook, {}, WebhookType.ENVIRONMENT, 500)
+
+        # Then
+        mock_email.return_value.send.assert_called_once_with()
+
+    @mock.patch("webhooks.webhooks.sign_payload", wraps=sign_payload)
+    @mock.patch("webhooks.webhooks.json.dumps", wraps=json.dumps)
+    @mock.patch("webhooks.delivery.get_session")
+    def test_payload_serialized_once_and_signed_once_per_secret(
+        self, mock_get_session, mock_dumps, mock_sign_payload
+    ):
+        # Given
+        mock_get_session.return_value.post.return_value.status_code = 200
+        for secret in ("secret-1", "secret-1", "secret-2", ""):
+            Webhook.objects.create(
+                url="http://url.1.com", environment=self.environment, secret=secret
+            )
+
+        # When
+        call_environment_webhooks(
+            environment=self.environment,
+            data={},
+            event_type=WebhookEventType.FLAG_UPDATED,
+        )
+
+        # Then
+        post_calls = mock_get_session.return_value.post.call_args_list
+        assert len(post_calls) == 4
+        assert len({id(kwargs["data"]) for _, kwargs in post_calls}) == 1
+        mock_dumps.assert_called_once()
+        assert mock_sign_payload.call_count == 2
@@ -6,17 +6,20 @@ import requests
 from core.constants import FLAGSMITH_SIGNATURE_HEADER
 from core.signing import sign_payload
 from django.conf import settings
+from django.core.cache import caches
 from django.core.mail import EmailMultiAlternatives
 from django.core.serializers.json import DjangoJSONEncoder
 from django.template.loader import get_template
 
 from environments.models import Webhook
 from organisations.models import OrganisationWebhook
+from task_processor.task_run_method import TaskRunMethod
 from webhooks.sample_webhook_data import (
     environment_webhook_data,
     organisation_webhook_data,
 )
 
+from . import delivery
 from .models import AbstractBaseWebhookModel
 from .serializers import WebhookSerializer
 
@@ -25,6 +28,8 @@ if typing.TYPE_CHECKING:
 
 WebhookModels = typing.Union[OrganisationWebhook, "environments.models.Webhook"]
 
+webhooks_cache = caches[settings.WEBHOOKS_CACHE_LOCATION]
+
 
 class WebhookEventType(enum.Enum):
     FLAG_UPDATED = "FLAG_UPDATED"
@@ -37,6 +42,23 @@ class WebhookType(enum.Enum):
     ENVIRONMENT = "ENVIRONMENT"
 
 
+class WebhookPayload:
+    """
+    The body of a webhook request, serialized once so that it can be sent to any
+    number of webhooks, along with its signature for each of their secrets.
+    """
+
+    def __init__(self, data: typing.Any):
+        self.data = data
+        self.body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        self._signatures: typing.Dict[str, str] = {}
+
+    def get_signature(self, secret: str) -> str:
+        if secret not in self._signatures:
+            self._signatures[secret] = sign_payload(self.body, key=secret)
+        return self._signatures[secret]
+
+
 WEBHOOK_SAMPLE_DATA = {
     WebhookType.ORGANISATION: organisation_webhook_data,
     WebhookType.ENVIRONMENT: environment_webhook_data,
@@ -55,7 +77,9 @@ def call_environment_webhooks(environment, data, event_type):
         return
 
     _call_webhooks(
-        environment.webhooks.filter(enabled=True),
+        environment.webhooks.filter(enabled=True).select_related(
+            "environment__project__organisation"
+        ),
         data,
         event_type,
         WebhookType.ENVIRONMENT,
@@ -67,7 +91,7 @@ def call_organisation_webhooks(organisation, data, event_type):
         return
 
     _call_webhooks(
-        organisation.webhooks.filter(enabled=True),
+        organisation.webhooks.filter(enabled=True).select_related("organisation"),
         data,
         event_type,
         WebhookType.ORGANISATION,
@@ -91,38 +115,64 @@ def trigger_sample_webhook(
 def _call_webhook(
     webhook: typing.Type[AbstractBaseWebhookModel],
     data: typing.Mapping,
+) -> requests.models.Response:
+    return _post_webhook(webhook, WebhookPayload(data))
+
+
+def _post_webhook(
+    webhook: typing.Type[AbstractBaseWebhookModel], payload: WebhookPayload
 ) -> requests.models.Response:
     headers = {"content-type": "application/json"}
-    json_data = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
     if webhook.secret:
-        signature = sign_payload(json_data, key=webhook.secret)
-        headers.update({FLAGSMITH_SIGNATURE_HEADER: signature})
+        headers[FLAGSMITH_SIGNATURE_HEADER] = payload.get_signature(webhook.secret)
 
-    return requests.post(str(webhook.url), data=json_data, headers=headers)
+    return delivery.post(str(webhook.url), data=payload.body, headers=headers)
 
 
 def _call_webhook_email_on_error(
-    webhook: WebhookModels, data: typing.Mapping, webhook_type: WebhookType
+    webhook: WebhookModels, payload: WebhookPayload, webhook_type: WebhookType
 ):
     try:
-        res = _call_webhook(webhook, data)
-    except requests.exceptions.ConnectionError:
-        send_failure_email(webhook, data, webhook_type)
+        res = _post_webhook(webhook, payload)
+    except requests.exceptions.RequestException:
+        send_failure_email(webhook, payload.data, webhook_type)
         return
 
     if res.status_code != 200:
-        send_failure_email(webhook, data, webhook_type, res.status_code)
+        send_failure_email(webhook, payload.data, webhook_type, res.status_code)
 
 
 def _call_webhooks(webhooks, data, event_type, webhook_type):
     webhook_data = {"event_type": event_type.value, "data": data}
     serializer = WebhookSerializer(data=webhook_data)
     serializer.is_valid(raise_exception=False)
+
+    if settings.TASK_RUN_METHOD == TaskRunMethod.TASK_PROCESSOR:
+        # imported here since the outbox uses the functions in this module to
+        # deliver the webhooks
+        from webhooks.outbox import add_to_outbox
+
+        add_to_outbox(webhooks, serializer.data, webhook_type)
+        return
+
+    # otherwise, each webhook is delivered separately by the delivery thread pool,
+    # so they are delivered concurrently and don't block the caller. The payload is
+    # serialized once, and signed once per secret, for all of them.
+    payload = WebhookPayload(serializer.data)
     for webhook in webhooks:
-        _call_webhook_email_on_error(webhook, serializer.data, webhook_type)
+        delivery.submit(_call_webhook_email_on_error, webhook, payload, webhook_type)
 
 
 def send_failure_email(webhook, data, webhook_type, status_code=None):
+    # only send one email per webhook every WEBHOOK_FAILURE_EMAIL_THROTTLE_SECONDS
+    # so that an endpoint which is down doesn't result in an email for every event
+    if not webhooks_cache.add(
+        f"webhook-failure-email:{webhook_type.value}:{webhook.id}",
+        True,
+        timeout=settings.WEBHOOK_FAILURE_EMAIL_THROTTLE_SECONDS,
+    ):
+        return
+
     template_data = _get_failure_email_template_data(
         webhook, data, webhook_type, status_code
     )